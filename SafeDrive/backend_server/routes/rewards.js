@@ -2,6 +2,19 @@ const express = require('express');
 const router = express.Router();
 const db = require('../db');
 
+// Same table the CMS batch endpoint claims keys in (shared cloud DB)
+const LEDGER_DDL = `
+    CREATE TABLE IF NOT EXISTS reward_credit_ledger (
+        idempotency_key TEXT PRIMARY KEY,
+        phone_number TEXT NOT NULL,
+        plate_number TEXT,
+        points INTEGER NOT NULL,
+        junction_id TEXT,
+        status TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT NOW()
+    )`;
+let ledgerReady = null;
+
 /**
  * 💸 [ANPR REWARD ENDPOINT]
  * Receives points from the AI Python scripts.
@@ -9,9 +22,12 @@ const db = require('../db');
  * 1. Normalize Plate.
  * 2. If Registered -> Update user points + wallet.
  * 3. If Unregistered -> Store as "Ghost Data" in user_rewards (Cloud DB).
+ * Idempotent: the edge outbox retries a credit with the same idempotency_key.
+ * The key is claimed in reward_credit_ledger in the same transaction as the
+ * balance change; a key that is already there changes nothing.
  */
 router.post('/credit', async (req, res) => {
-    const { plate_number, points, reason, junction_id } = req.body;
+    const { plate_number, points, reason, junction_id, idempotency_key } = req.body;
 
     if (!plate_number || !points) {
         return res.status(400).json({ success: false, message: "Missing plate or points" });
@@ -20,15 +36,41 @@ router.post('/credit', async (req, res) => {
     const normalizedPlate = plate_number.toUpperCase().replace(/[\s-]/g, '');
     console.log(`📡 [REWARDS] Received Reward Request: ${normalizedPlate} (+${points} pts)`);
 
+    let client;
     try {
+        if (idempotency_key) {
+            ledgerReady = ledgerReady || db.query(LEDGER_DDL).catch((err) => { ledgerReady = null; throw err; });
+            await ledgerReady;
+        }
+        client = await db.pool.connect();
+        await client.query('BEGIN');
+
+        // Claims the key; false = this credit was already applied (edge retry)
+        const claim = async (phone, status) => {
+            if (!idempotency_key) return true;
+            const claimed = await client.query(
+                `INSERT INTO reward_credit_ledger (idempotency_key, phone_number, plate_number, points, junction_id, status)
+                 VALUES ($1, $2, $3, $4, $5, $6)
+                 ON CONFLICT (idempotency_key) DO NOTHING RETURNING idempotency_key`,
+                [idempotency_key, phone, plate_number, points, junction_id || null, status]
+            );
+            return claimed.rowCount > 0;
+        };
+        const duplicate = async () => {
+            await client.query('ROLLBACK');
+            console.log(`♻️ [REWARDS] Duplicate credit ${idempotency_key} ignored`);
+            return res.json({ success: true, message: "Already credited", duplicate: true });
+        };
+
         // 1. Check if user exists (via vehicles table)
-        const vehicleRes = await db.query(
+        const vehicleRes = await client.query(
             'SELECT user_id FROM vehicles WHERE plate_number = $1',
             [normalizedPlate]
         );
 
         if (vehicleRes.rows.length > 0) {
             const userId = vehicleRes.rows[0].user_id;
+            if (!await claim(`user_${userId}`, 'CREDITED')) return duplicate();
 
             // Update user balance
             const earnedWallet = (points / 100) * 0.50; // Ratio from settings.py
@@ -40,14 +82,15 @@ router.post('/credit', async (req, res) => {
                 WHERE user_id = $3
                 RETURNING total_earned_points, wallet_balance
             `;
-            await db.query(updateQuery, [points, earnedWallet, userId]);
+            await client.query(updateQuery, [points, earnedWallet, userId]);
 
             // Log Transaction
             const txnQuery = `
                 INSERT INTO transactions (user_id, type, amount, description)
                 VALUES ($1, 'EARNED', $2, $3)
             `;
-            await db.query(txnQuery, [userId, points, `${reason || 'Traffic Compliance'} (Junction: ${junction_id || 'Unknown'})`]);
+            await client.query(txnQuery, [userId, points, `${reason || 'Traffic Compliance'} (Junction: ${junction_id || 'Unknown'})`]);
+            await client.query('COMMIT');
 
             console.log(`✅ [REWARDS] Credited User ${userId} for plate ${normalizedPlate}`);
             return res.json({ success: true, message: "Reward credited to user wallet", ghost: false });
@@ -59,7 +102,7 @@ router.post('/credit', async (req, res) => {
                 WHERE REPLACE(REPLACE("v1_plate", '-', ''), ' ', '') = $1 
                    OR REPLACE(REPLACE("v2_plate", '-', ''), ' ', '') = $1
             `;
-            const rtoRes = await db.trafficQuery(rtoQuery, [normalizedPlate]);
+            const rtoRes = await client.query(rtoQuery, [normalizedPlate]);
 
             let targetPhone, targetEmail, targetName, targetLicense;
             if (rtoRes.rows.length > 0) {
@@ -76,6 +119,7 @@ router.post('/credit', async (req, res) => {
                 targetLicense = "GHOST-LKUP";
                 console.log(`👻 [REWARDS] Not in RTO. Using Ghost ID: ${targetPhone}`);
             }
+            if (!await claim(targetPhone, 'GHOST_RECORDED')) return duplicate();
 
             const rto = rtoRes.rows[0] || {};
             const isV2 = rto.v2_plate && rto.v2_plate.toUpperCase().replace(/[\s-]/g, '') === normalizedPlate;
@@ -100,7 +144,7 @@ router.post('/credit', async (req, res) => {
                     "last_updated" = NOW(), 
                     "updated_at" = NOW()`;
 
-            await db.trafficQuery(ghostQuery, [
+            await client.query(ghostQuery, [
                 targetPhone, targetEmail, targetName, targetLicense,
                 rto.v1_plate || normalizedPlate, rto.v1_type || 'Car',
                 rto.v2_plate || null, rto.v2_type || 'Car',
@@ -109,13 +153,17 @@ router.post('/credit', async (req, res) => {
                 v1_p, // v1_points ($11)
                 v2_p // v2_points ($12)
             ]);
+            await client.query('COMMIT');
 
             return res.json({ success: true, message: `Points recorded for ${isV2 ? 'V2' : 'V1'} (${normalizedPlate})`, ghost: true });
         }
 
     } catch (err) {
+        if (client) await client.query('ROLLBACK').catch(() => {});
         console.error("❌ [REWARDS] Processing Error:", err.message);
         res.status(500).json({ success: false, message: "Internal Server Error" });
+    } finally {
+        if (client) client.release();
     }
 });
 
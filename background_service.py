@@ -8,8 +8,18 @@ This module handles non-real-time tasks that run asynchronously:
 4. Reward system violation-to-wallet pipeline
 
 Architecture:
-    - Runs as a daemon thread, spawned by main_controller.py
-    - Receives violation frames via a thread-safe queue
+    - A pool of daemon worker threads (BG_WORKERS), spawned by main_controller.py
+    - Jobs wait in bounded priority lanes: evidence > cycle_log > telemetry.
+      Each lane has its own capacity and overflow policy (BG_LANES):
+          block        producer waits up to BG_BLOCK_TIMEOUT s for room, then drops
+          drop_oldest  the oldest queued job makes room (newest data wins)
+          drop_newest  the new job is rejected
+          spill        the new job is written to the offline JSONL log instead
+    - A lower lane whose oldest job has waited BG_STARVATION_S is served
+      next, so an evidence burst cannot starve cycle logs
+    - Per-lane counters (snapshot()): enqueue rate, depth, wait time, drops
+    - Evidence frames are encoded on a small process pool and stored
+      content-addressed, near-duplicate frames reuse the stored file (vision_heavy.evidence_encoder)
     - Does NOT interfere with the real-time signal cycle
     - Uploads are async and failure-tolerant (edge keeps working if cloud is down)
 """
@@ -20,18 +30,54 @@ import time
 import json
 import threading
 import traceback
-from queue import Queue, Empty
+from collections import deque
 from datetime import datetime
-import cv2
 
 from config.settings import SystemConfig
 from cms_layer.cloud_db_handler import db  # Unified Connection Handlerme
+from vision_heavy.evidence_encoder import EvidenceEncoder
 
 # Add project root to path
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+LANES = ("evidence", "cycle_log", "telemetry")  # Priority order
+JOB_LANES = {"violation": "evidence", "cycle_log": "cycle_log", "anomaly": "telemetry"}
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest", "spill")
+DEFAULT_LANES = {  # lane: (capacity, overflow policy)
+    "evidence": (200, "block"),
+    "cycle_log": (500, "spill"),
+    "telemetry": (200, "drop_oldest"),
+}
+
+
+class _Lane:
+    """One bounded priority lane + its counters (guarded by the service's condition)."""
+
+    def __init__(self, name, capacity, policy):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Lane {name}: unknown overflow policy {policy!r}")
+        self.name = name
+        self.capacity = capacity
+        self.policy = policy
+        self.jobs = deque()
+        self.waits = deque(maxlen=1024)  # Seconds queued, most recent jobs
+        self.stats = {"enqueued": 0, "processed": 0, "dropped": 0, "spilled": 0, "blocked": 0,
+                      "aged": 0, "max_depth": 0}
+        self._rate_mark = (time.monotonic(), 0)
+
+    def snapshot(self):
+        now = time.monotonic()
+        mark_t, mark_n = self._rate_mark
+        self._rate_mark = (now, self.stats["enqueued"])
+        waits = sorted(self.waits)
+        return {**self.stats, "depth": len(self.jobs), "capacity": self.capacity, "policy": self.policy,
+                "enqueue_rate": round((self.stats["enqueued"] - mark_n) / max(now - mark_t, 1e-6), 2),
+                "wait_avg_ms": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+                "wait_p95_ms": round(waits[int(0.95 * (len(waits) - 1))] * 1000, 2) if waits else 0.0,
+                "wait_max_ms": round(waits[-1] * 1000, 2) if waits else 0.0}
+
 
 class BackgroundService:
     """
@@ -40,22 +86,54 @@ class BackgroundService:
     Receives jobs from the real-time pipeline and processes them
     without blocking the signal cycle.
     
-    Job types:
-        - "violation": Process a violation frame (ANPR → OCR → DB)
-        - "cycle_log": Upload a cycle summary to cloud DB
-        - "anomaly": Process and store anomaly detection data
+    Job types (lane):
+        - "violation" (evidence): Process a violation frame (ANPR → OCR → DB)
+        - "cycle_log" (cycle_log): Upload a cycle summary to cloud DB
+        - "anomaly" (telemetry): Process and store anomaly detection data
     """
     
-    def __init__(self):
-        self._job_queue = Queue(maxsize=1000)
+    def __init__(self, workers=None, lanes=None, block_timeout=None, starvation_s=None):
+        """
+        Args:
+            workers:       Worker threads (default BG_WORKERS)
+            lanes:         {lane: (capacity, overflow policy)} (default BG_LANES)
+            block_timeout: Max producer wait on a full "block" lane (s)
+            starvation_s:  Queue age after which a lower lane is served first (s)
+        """
+        self.workers = workers or getattr(SystemConfig, "BG_WORKERS", 2)
+        lanes = {**DEFAULT_LANES, **(lanes or getattr(SystemConfig, "BG_LANES", {}))}
+        self._lanes = {name: _Lane(name, *lanes[name]) for name in LANES}
+        self.block_timeout = block_timeout if block_timeout is not None else getattr(SystemConfig, "BG_BLOCK_TIMEOUT", 0.25)
+        self.starvation_s = starvation_s if starvation_s is not None else getattr(SystemConfig, "BG_STARVATION_S", 5.0)
+        self._cond = threading.Condition()
         self._stop_event = threading.Event()
-        self._worker_thread = None
+        self._worker_threads = []
+        self._busy = 0
+        self._stats_lock = threading.Lock()
         self._stats = {
             "violations_processed": 0,
+            "duplicate_violations": 0,
             "cycles_uploaded": 0,
             "anomalies_logged": 0,
             "errors": 0
         }
+        self._handlers = {
+            "violation": self._process_violation,
+            "cycle_log": self._upload_cycle_log,
+            "anomaly": self._log_anomaly,
+        }
+        self._spill_handlers = {"cycle_log": self._spill_cycle_log}
+        self._evidence = EvidenceEncoder(
+            os.path.join(PROJECT_ROOT, "cloud_storage", "active_violations"),
+            fmt=getattr(SystemConfig, "EVIDENCE_FORMAT", "jpg"),
+            quality=getattr(SystemConfig, "EVIDENCE_QUALITY", 90),
+            processes=getattr(SystemConfig, "EVIDENCE_ENCODER_PROCS", 2),
+            max_distance=getattr(SystemConfig, "EVIDENCE_PHASH_DISTANCE", 6),
+            window_s=getattr(SystemConfig, "EVIDENCE_DEDUPE_WINDOW_S", 10.0),
+        )
+        for lane in self._lanes.values():
+            if lane.policy == "spill" and lane.name not in self._spill_handlers:
+                raise ValueError(f"Lane {lane.name} has no spill target")
         
         # Lazy-load heavy modules only when needed
         self._plate_detector = None
@@ -64,18 +142,29 @@ class BackgroundService:
         self._violation_manager = None
     
     def start(self):
-        """Start the background worker thread."""
-        self._worker_thread = threading.Thread(
-            target=self._worker_loop, daemon=True, name="BackgroundWorker"
-        )
-        self._worker_thread.start()
-        print("  🔧 [Background] Heavy processing service started")
+        """Start the background worker pool."""
+        self._stop_event.clear()
+        self._worker_threads = [
+            threading.Thread(target=self._worker_loop, daemon=True, name=f"BackgroundWorker-{i}")
+            for i in range(self.workers)
+        ]
+        for t in self._worker_threads:
+            t.start()
+        threading.Thread(target=self._evidence.warm_up, daemon=True, name="EvidenceWarmUp").start()
+        print(f"  🔧 [Background] Heavy processing service started ({self.workers} workers)")
     
-    def stop(self):
-        """Stop the background worker."""
+    def stop(self, timeout=5.0):
+        """Stop the workers once the queued jobs are done (or after `timeout` s)."""
         self._stop_event.set()
-        if self._worker_thread:
-            self._worker_thread.join(timeout=5.0)
+        with self._cond:
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for t in self._worker_threads:
+            t.join(timeout=max(0.0, deadline - time.monotonic()))
+        self._evidence.close()
+        left = {name: len(lane.jobs) for name, lane in self._lanes.items() if lane.jobs}
+        if left:
+            print(f"  ⚠️ [Background] Stopped with jobs still queued: {left}")
         print(f"  🔧 [Background] Service stopped — Stats: {self._stats}")
     
     def submit_job(self, job_type, data):
@@ -85,41 +174,96 @@ class BackgroundService:
         Args:
             job_type: "violation", "cycle_log", "anomaly"
             data: dict with job-specific payload
+        Returns:
+            True if the job was queued (or spilled to the offline log),
+            False if the lane's overflow policy dropped it.
         """
-        try:
-            self._job_queue.put_nowait({
-                "type": job_type,
-                "data": data,
-                "submitted_at": time.time()
-            })
-        except Exception:
-            self._stats["errors"] += 1
+        lane = self._lanes[JOB_LANES.get(job_type, "telemetry")]
+        job = {"type": job_type, "data": data, "submitted_at": time.time(), "queued_at": time.monotonic()}
+        with self._cond:
+            if len(lane.jobs) >= lane.capacity:
+                if lane.policy == "block":
+                    lane.stats["blocked"] += 1
+                    self._cond.wait_for(lambda: len(lane.jobs) < lane.capacity, timeout=self.block_timeout)
+                elif lane.policy == "drop_oldest":
+                    lane.jobs.popleft()
+                    lane.stats["dropped"] += 1
+            full = len(lane.jobs) >= lane.capacity
+            if not full:
+                lane.jobs.append(job)
+                lane.stats["enqueued"] += 1
+                lane.stats["max_depth"] = max(lane.stats["max_depth"], len(lane.jobs))
+                self._cond.notify_all()  # Producers wait on the same condition
+            elif lane.policy == "spill":
+                lane.stats["spilled"] += 1
+            else:
+                lane.stats["dropped"] += 1
+                if lane.stats["dropped"] % 100 == 1:  # First drop, then every 100th
+                    print(f"  ⚠️ [Background] {lane.name} lane full ({lane.capacity}) — "
+                          f"{job_type} dropped ({lane.stats['dropped']} so far)")
+                return False
+        if full:
+            self._spill_handlers[lane.name](data)  # Outside the lock: file I/O
+        return True
+
+    def snapshot(self):
+        """Backpressure metrics per lane + job counters."""
+        with self._cond:
+            lanes = {name: lane.snapshot() for name, lane in self._lanes.items()}
+            busy = self._busy
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {"workers": self.workers, "busy": busy, "lanes": lanes, "evidence": self._evidence.snapshot(), **stats}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
     
     # ─────────────────────────────────────────────────────────
     # WORKER LOOP
     # ─────────────────────────────────────────────────────────
     
+    def _next_job(self):
+        """Highest-priority job (a starving lower lane goes first). None once stopped and drained."""
+        with self._cond:
+            while True:
+                queued = [lane for lane in self._lanes.values() if lane.jobs]
+                if queued:
+                    now = time.monotonic()
+                    lane = queued[0]
+                    for lower in queued[1:]:
+                        if now - lower.jobs[0]["queued_at"] >= self.starvation_s:
+                            lane = lower
+                            lane.stats["aged"] += 1
+                            break
+                    job = lane.jobs.popleft()
+                    lane.waits.append(now - job["queued_at"])
+                    self._busy += 1
+                    self._cond.notify_all()  # Room for blocked producers
+                    return lane, job
+                if self._stop_event.is_set():
+                    return None, None
+                self._cond.wait(1.0)
+
     def _worker_loop(self):
-        """Main worker loop — processes jobs from the queue."""
-        while not self._stop_event.is_set():
+        """Worker loop — processes jobs from the lanes."""
+        while True:
+            lane, job = self._next_job()
+            if job is None:
+                return
             try:
-                job = self._job_queue.get(timeout=1.0)
-                job_type = job.get("type", "")
-                
-                if job_type == "violation":
-                    self._process_violation(job["data"])
-                elif job_type == "cycle_log":
-                    self._upload_cycle_log(job["data"])
-                elif job_type == "anomaly":
-                    self._log_anomaly(job["data"])
+                handler = self._handlers.get(job.get("type", ""))
+                if handler is not None:
+                    handler(job["data"])
                 else:
-                    print(f"  ⚠️ [Background] Unknown job type: {job_type}")
-                    
-            except Empty:
-                continue
+                    print(f"  ⚠️ [Background] Unknown job type: {job.get('type', '')}")
             except Exception as e:
-                self._stats["errors"] += 1
+                self._count("errors")
                 traceback.print_exc()
+            finally:
+                with self._cond:
+                    self._busy -= 1
+                    lane.stats["processed"] += 1
     
     # ─────────────────────────────────────────────────────────
     # JOB HANDLERS
@@ -137,32 +281,34 @@ class BackgroundService:
             
             if frame is None: return
 
+            junction_id = data.get("junction_id", SystemConfig.JUNCTION_ID)
+
             # 1. Save Snapshot to "Cloud Storage" (Simulated via shared folder)
             # In production, this would be S3.upload_file()
-            storage_dir = os.path.join(PROJECT_ROOT, "cloud_storage", "active_violations")
-            os.makedirs(storage_dir, exist_ok=True)
-            
-            filename = f"vio_{int(timestamp)}_{violation_type}.jpg"
-            file_path = os.path.join(storage_dir, filename)
-            cv2.imwrite(file_path, frame)
+            # Encoded off-thread, named by content; the same vehicle re-triggering reuses the file
+            file_path, duplicate = self._evidence.store(frame, data.get("vehicle_bbox"),
+                                                        junction_id=junction_id, violation_type=violation_type)
+            if duplicate:
+                print(f"  ♻️ [Background] Duplicate {violation_type} evidence ({duplicate}) -> {os.path.basename(file_path)}")
+                self._count("duplicate_violations")
             
             # 2. Insert into DB with status='PENDING'
             self._store_violation_request({
                 "evidence_path": file_path,
                 "violation_type": violation_type,
                 "timestamp": timestamp,
-                "junction_id": data.get("junction_id", SystemConfig.JUNCTION_ID),
+                "junction_id": junction_id,
                 "metadata": {
-                    "bbox": data.get("vehicle_bbox", []),
+                    "bbox": data.get("vehicle_bbox") or [],
                     "vehicle_class": "unknown" # Could pass from detection
                 }
             })
             
             print(f"  ☁️ [Background] Uploaded Violation {violation_type} -> Cloud Queue")
-            self._stats["violations_processed"] += 1
+            self._count("violations_processed")
             
         except Exception as e:
-            self._stats["errors"] += 1
+            self._count("errors")
             print(f"  ⚠️ [Background] Cloud Upload Failed: {e}")
     
     
@@ -193,24 +339,34 @@ class BackgroundService:
                 conn.commit()
                 cur.close()
                 conn.close()
-                self._stats["cycles_uploaded"] += 1
+                self._count("cycles_uploaded")
                 return
 
             # Fallback to JSON
-            log_path = os.path.join(PROJECT_ROOT, "logs")
-            os.makedirs(log_path, exist_ok=True)
-            log_file = os.path.join(log_path, f"cycles_{datetime.now().strftime('%Y%m%d')}.jsonl")
-            
-            entry = {"timestamp": datetime.now().isoformat(), **data}
-            with open(log_file, 'a') as f:
-                f.write(json.dumps(entry) + "\n")
-            
-            self._stats["cycles_uploaded"] += 1
+            self._append_cycle_jsonl(data)
+            self._count("cycles_uploaded")
             
         except Exception as e:
-            self._stats["errors"] += 1
+            self._count("errors")
             print(f"⚠️ [Background] Cycle Log Failed: {e}")
     
+    def _append_cycle_jsonl(self, data):
+        log_path = os.path.join(PROJECT_ROOT, "logs")
+        os.makedirs(log_path, exist_ok=True)
+        log_file = os.path.join(log_path, f"cycles_{datetime.now().strftime('%Y%m%d')}.jsonl")
+        
+        entry = {"timestamp": datetime.now().isoformat(), **data}
+        with open(log_file, 'a') as f:
+            f.write(json.dumps(entry) + "\n")
+    
+    def _spill_cycle_log(self, data):
+        """Overflow of the cycle_log lane: straight to the offline JSONL log (nothing is lost)."""
+        try:
+            self._append_cycle_jsonl(data)
+        except Exception as e:
+            self._count("errors")
+            print(f"⚠️ [Background] Cycle Log Spill Failed: {e}")
+    
     def _log_anomaly(self, data):
         """
         Store anomaly detection data.
@@ -238,10 +394,10 @@ class BackgroundService:
             with open(log_file, 'a') as f:
                 f.write(json.dumps(entry) + "\n")
             
-            self._stats["anomalies_logged"] += 1
+            self._count("anomalies_logged")
             
         except Exception as e:
-            self._stats["errors"] += 1
+            self._count("errors")
     
     # ─────────────────────────────────────────────────────────
     # HEAVY MODULE INITIALIZATION (Lazy)
@@ -329,4 +485,5 @@ if __name__ == "__main__":
     })
     
     time.sleep(3)
+    print(json.dumps(svc.snapshot(), indent=2))
     svc.stop()
@@ -0,0 +1,241 @@
+"""
+App DB Outbox - Transactional Outbox + Relay for Mobile App DB Mirroring (CMS)
+Role: A reward credit must reach the Mobile App DB (safedrive_apps) even if
+      that DB is slow or down, without making /rewards/credit wait for it.
+
+1. enqueue(cur, ...) writes app_db_outbox rows with the same cursor (and so
+   the same commit) as the user_rewards upsert: a credit and its mirror
+   record exist together or not at all.
+2. AppDbRelay drains the table in id order, `batch_size` rows at a time:
+   points summed per phone, one UPDATE users ... FROM (VALUES ...) and one
+   multi-row INSERT into transactions on the app DB, then the rows are
+   deleted. One relay at a time (pg advisory lock), so rows of a user are
+   always applied in the order they were written, whichever worker relays.
+3. A failed batch stays in the table and the relay backs off exponentially.
+   Only a batch the app DB rejects counts an attempt (attempts + 1); an
+   unreachable app DB (outage, lost connection) does not, so an outage of
+   any length turns no credit into a dead letter. Rows past `max_attempts`
+   are left as dead letters until redrive() (POST /rewards/outbox/redrive).
+
+Delivery is at-least-once: a crash between the app DB commit and the DELETE
+replays that batch.
+
+Metrics (snapshot()): relayed rows, pending rows, lag of the oldest pending
+row and of the last relayed batch.
+"""
+
+import threading
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+_RELAY_LOCK_KEY = 0x4F555442  # "OUTB" - one relay across all CMS workers
+_UNAVAILABLE = (psycopg2.OperationalError, psycopg2.InterfaceError)  # App DB down, not the rows
+
+
+def enqueue(cur, credits):
+    """credits: [(phone, points, plate)]. Caller commits (with the balance change)."""
+    if credits:
+        execute_values(cur, "INSERT INTO app_db_outbox (phone_number, points, plate_number) VALUES %s",
+                       credits, page_size=len(credits))
+
+
+async def enqueue_async(conn, credits):
+    """enqueue on an async_db.AsyncConn (inside the credit transaction)."""
+    if credits:
+        await conn.execute("""
+            INSERT INTO app_db_outbox (phone_number, points, plate_number)
+            SELECT * FROM unnest(%s::text[], %s::int[], %s::text[])
+        """, *map(list, zip(*credits)))
+
+
+class AppDbRelay:
+    def __init__(self, get_connection, connect_app, wallet_per_point, interval=1.0, batch_size=500,
+                 max_attempts=20, backoff_max=60.0):
+        """
+        Args:
+            get_connection:   Zero-arg callable returning a CMS DB connection (or None)
+            connect_app:      Zero-arg callable returning an app DB connection
+            wallet_per_point: INR added to wallet_balance per point
+            interval:         Seconds between drains when idle (notify() wakes it early)
+            batch_size:       Outbox rows relayed per app DB transaction
+            max_attempts:     Rejected attempts before a row is left as a dead letter
+            backoff_max:      Cap of the exponential retry delay (seconds)
+        """
+        self.module_name = "APP_DB"
+        self.get_connection = get_connection
+        self.connect_app = connect_app
+        self.wallet_per_point = wallet_per_point
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_max = backoff_max
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._failures = 0
+        self._next_try = 0.0
+        self.stats = {"relayed_rows": 0, "batches": 0, "synced_users": 0, "unknown_users": 0,
+                      "errors": 0, "pending_rows": 0, "dead_rows": 0, "lag_s": 0.0,
+                      "last_batch_lag_s": 0.0, "max_batch_lag_s": 0.0, "last_batch_ms": 0.0}
+
+    # ─────────────────────────────────────────────────────────
+    # LIFECYCLE
+    # ─────────────────────────────────────────────────────────
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="AppDb-Relay")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+
+    def notify(self):
+        """New rows committed: relay now instead of at the next interval."""
+        self._wake.set()
+
+    def snapshot(self):
+        return dict(self.stats)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if time.monotonic() < self._next_try:
+                continue
+            try:
+                while self.relay_once() == self.batch_size and not self._stop.is_set():
+                    pass  # Backlog: keep draining
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"  ❌ [{self.module_name}] Relay error: {e}")
+
+    # ─────────────────────────────────────────────────────────
+    # RELAY
+    # ─────────────────────────────────────────────────────────
+
+    def relay_once(self):
+        """Relays one batch. Returns the number of outbox rows relayed (0 = idle / failed / locked)."""
+        conn = self.get_connection()
+        if conn is None:
+            return 0
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (_RELAY_LOCK_KEY,))
+            if not cur.fetchone()[0]:
+                conn.rollback()  # Another worker is relaying
+                return 0
+            self._refresh_backlog(cur)
+            cur.execute("""
+                SELECT id, phone_number, points, plate_number,
+                       EXTRACT(EPOCH FROM clock_timestamp() - created_at)
+                FROM app_db_outbox WHERE attempts < %s ORDER BY id LIMIT %s
+            """, (self.max_attempts, self.batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                conn.commit()
+                return 0
+
+            t0 = time.perf_counter()
+            ids = [row[0] for row in rows]
+            try:
+                synced, users = self._apply(rows)
+            except _UNAVAILABLE as e:
+                conn.rollback()  # Not the rows' fault: no attempt counted
+                self._backoff(e, len(rows))
+                return 0
+            except Exception as e:
+                cur.execute("UPDATE app_db_outbox SET attempts = attempts + 1 WHERE id = ANY(%s)", (ids,))
+                conn.commit()
+                self._backoff(e, len(rows))
+                return 0
+            cur.execute("DELETE FROM app_db_outbox WHERE id = ANY(%s)", (ids,))
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._failures = 0
+        lag = float(max(row[4] for row in rows))
+        self.stats["relayed_rows"] += len(rows)
+        self.stats["batches"] += 1
+        self.stats["synced_users"] += synced
+        self.stats["unknown_users"] += users - synced
+        self.stats["pending_rows"] = max(0, self.stats["pending_rows"] - len(rows))
+        self.stats["last_batch_lag_s"] = round(lag, 3)
+        self.stats["max_batch_lag_s"] = max(self.stats["max_batch_lag_s"], round(lag, 3))
+        self.stats["last_batch_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        return len(rows)
+
+    def redrive(self):
+        """Puts dead letters back in the queue (attempts = 0). Returns the number of rows."""
+        conn = self.get_connection()
+        if conn is None:
+            return None
+        try:
+            cur = conn.cursor()
+            cur.execute("UPDATE app_db_outbox SET attempts = 0 WHERE attempts >= %s", (self.max_attempts,))
+            count = cur.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        if count:
+            print(f"  🔁 [{self.module_name}] Re-driving {count} dead-letter rows")
+            self._next_try = 0.0
+            self.notify()
+        return count
+
+    def _refresh_backlog(self, cur):
+        cur.execute("""
+            SELECT COUNT(*) FILTER (WHERE attempts < %s), COUNT(*) FILTER (WHERE attempts >= %s),
+                   COALESCE(EXTRACT(EPOCH FROM clock_timestamp() - MIN(created_at) FILTER (WHERE attempts < %s)), 0)
+            FROM app_db_outbox
+        """, (self.max_attempts, self.max_attempts, self.max_attempts))
+        pending, dead, lag = cur.fetchone()
+        self.stats["pending_rows"], self.stats["dead_rows"], self.stats["lag_s"] = pending, dead, round(float(lag), 3)
+
+    def _apply(self, rows):
+        """Mirrors a batch to the app DB in one transaction. Returns (users synced, users in batch)."""
+        per_user = {}  # Insertion order = first outbox id of each user
+        for _, phone, points, plate, _ in rows:
+            entry = per_user.setdefault(phone, [0, []])
+            entry[0] += points
+            if plate and plate not in entry[1]:
+                entry[1].append(plate)
+
+        app = self.connect_app()
+        try:
+            cur = app.cursor()
+            synced = execute_values(cur, """
+                UPDATE users AS u
+                SET total_earned_points = u.total_earned_points + v.points,
+                    wallet_balance = u.wallet_balance + v.wallet
+                FROM (VALUES %s) AS v(phone, points, wallet)
+                WHERE u.phone_number = v.phone
+                RETURNING u.user_id, v.phone
+            """, [(phone, points, points * self.wallet_per_point) for phone, (points, _) in per_user.items()],
+                template="(%s, %s::integer, %s::numeric)", page_size=len(per_user), fetch=True)
+            tx_rows = [(user_id, per_user[phone][0], f"Reward for Good Driving ({', '.join(per_user[phone][1])})")
+                       for user_id, phone in synced]
+            if tx_rows:
+                execute_values(cur, "INSERT INTO transactions (user_id, type, amount, description) VALUES %s",
+                               tx_rows, template="(%s, 'EARNED', %s, %s)", page_size=len(tx_rows))
+            app.commit()
+        finally:
+            app.close()
+        if synced:
+            print(f"  ✅ [{self.module_name}] Synced {sum(per_user[p][0] for _, p in synced)} pts to {len(synced)} users")
+        return len(synced), len(per_user)
+
+    def _backoff(self, error, count):
+        self._failures += 1
+        self.stats["errors"] += 1
+        delay = min(self.backoff_max, self.interval * (2 ** self._failures))
+        self._next_try = time.monotonic() + delay
+        print(f"  ❌ [{self.module_name}] Sync Failed ({count} rows kept, retry in {delay:.0f}s): {error}")
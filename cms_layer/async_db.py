@@ -0,0 +1,189 @@
+"""
+Async DB - asyncpg Pool for the CMS Event Loop
+Role: Serve the credit, violation, history and live-status paths without
+      parking a threadpool thread on every blocking psycopg2 call. Enabled
+      with CMS_DB_DRIVER=asyncpg; the psycopg2 path (cloud_db_handler) stays
+      the default and is used whenever this pool is not available.
+
+- One asyncpg pool (min_size..max_size connections) on the first reachable
+  target, cloud first then local, same credentials as CloudDBHandler.
+- SQL is shared with the psycopg2 code: "%s" placeholders are rewritten to
+  asyncpg's $1..$n once per statement (cached).
+- jsonb columns decode to Python objects, as with psycopg2.
+- If no target answers at startup (or the pool breaks), `available` is
+  False and a background probe retries with exponential backoff, like the
+  sync pool's circuit breaker.
+"""
+
+import asyncio
+import json
+import re
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+try:
+    import asyncpg
+except ImportError:  # Optional: only needed with CMS_DB_DRIVER=asyncpg
+    asyncpg = None
+
+_PLACEHOLDER = re.compile(r"%s")
+
+
+@lru_cache(maxsize=512)
+def to_dollar(sql):
+    """'... = %s AND x < %s' -> '... = $1 AND x < $2'."""
+    counter = iter(range(1, 10_000))
+    return _PLACEHOLDER.sub(lambda _: f"${next(counter)}", sql)
+
+
+async def _init_connection(conn):
+    for name in ("json", "jsonb"):
+        await conn.set_type_codec(name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+class AsyncDB:
+    def __init__(self, targets, min_size=2, max_size=16, command_timeout=10.0, probe_max=60.0):
+        """
+        Args:
+            targets:         [(label, connect_kwargs)] tried in order (CLOUD, LOCAL)
+            min_size:        Connections opened with the pool
+            max_size:        Upper bound of pooled connections
+            command_timeout: Seconds before a statement is cancelled
+            probe_max:       Cap of the reconnect backoff (seconds)
+        """
+        self.module_name = "ASYNC_DB"
+        self.targets = targets
+        self.min_size = min_size
+        self.max_size = max_size
+        self.command_timeout = command_timeout
+        self.probe_max = probe_max
+        self.pool = None
+        self.source = "NONE"
+        self._probe_task = None
+        self.stats = {"queries": 0, "transactions": 0, "errors": 0, "connect_failures": 0}
+
+    @property
+    def available(self):
+        return self.pool is not None
+
+    # ─────────────────────────────────────────────────────────
+    # LIFECYCLE
+    # ─────────────────────────────────────────────────────────
+
+    async def start(self):
+        """Opens the pool (or schedules the reconnect probe). Returns True when available."""
+        if asyncpg is None:
+            print(f"⚠️ [{self.module_name}] asyncpg not installed - staying on the psycopg2 path")
+            return False
+        if await self._connect():
+            return True
+        if self._probe_task is None:
+            self._probe_task = asyncio.create_task(self._probe())
+        return False
+
+    async def _connect(self):
+        for label, kwargs in self.targets:
+            try:
+                self.pool = await asyncpg.create_pool(min_size=self.min_size, max_size=self.max_size,
+                                                      command_timeout=self.command_timeout,
+                                                      init=_init_connection, **kwargs)
+                self.source = label
+                print(f"✅ [{self.module_name}] Pool ready on {label} ({self.min_size}-{self.max_size} connections)")
+                return True
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+                self.stats["connect_failures"] += 1
+                print(f"⚠️ [{self.module_name}] {label} unavailable: {e}")
+        return False
+
+    async def _probe(self):
+        delay = 2.0
+        while self.pool is None:
+            await asyncio.sleep(delay)
+            if await self._connect():
+                break
+            delay = min(self.probe_max, delay * 2)
+        self._probe_task = None
+
+    async def close(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+        pool, self.pool = self.pool, None
+        if pool is not None:
+            await pool.close()
+
+    def _broken(self, error):
+        """Connection-level failure: drop the pool, fall back to psycopg2 until the probe reconnects."""
+        self.stats["errors"] += 1
+        if isinstance(error, (OSError, asyncpg.exceptions.ConnectionDoesNotExistError,
+                              asyncpg.exceptions.CannotConnectNowError)) and self.pool is not None:
+            print(f"⚡ [{self.module_name}] Pool lost ({error}) - using psycopg2 until it is back")
+            pool, self.pool = self.pool, None
+            pool.terminate()
+            if self._probe_task is None:
+                self._probe_task = asyncio.create_task(self._probe())
+
+    # ─────────────────────────────────────────────────────────
+    # QUERIES ("%s" placeholders, shared with the psycopg2 code)
+    # ─────────────────────────────────────────────────────────
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Yields an AsyncConn; commits on exit, rolls back on error."""
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    self.stats["transactions"] += 1
+                    yield AsyncConn(conn, self.stats)
+        except Exception as e:
+            self._broken(e)
+            raise
+
+    async def fetch(self, sql, *params):
+        async with self.transaction() as conn:
+            return await conn.fetch(sql, *params)
+
+    async def fetchrow(self, sql, *params):
+        async with self.transaction() as conn:
+            return await conn.fetchrow(sql, *params)
+
+    async def execute(self, sql, *params):
+        async with self.transaction() as conn:
+            return await conn.execute(sql, *params)
+
+    def snapshot(self):
+        pool = self.pool
+        return {**self.stats, "available": pool is not None, "source": self.source,
+                "size": pool.get_size() if pool else 0, "idle": pool.get_idle_size() if pool else 0}
+
+
+class AsyncConn:
+    """One pooled connection inside a transaction (same "%s" SQL as the psycopg2 code)."""
+
+    def __init__(self, conn, stats):
+        self.raw = conn
+        self._stats = stats
+
+    async def fetch(self, sql, *params):
+        self._stats["queries"] += 1
+        return await self.raw.fetch(to_dollar(sql), *params)
+
+    async def fetchrow(self, sql, *params):
+        self._stats["queries"] += 1
+        return await self.raw.fetchrow(to_dollar(sql), *params)
+
+    async def execute(self, sql, *params):
+        self._stats["queries"] += 1
+        return await self.raw.execute(to_dollar(sql), *params)
+
+    async def executemany(self, sql, rows):
+        self._stats["queries"] += 1
+        return await self.raw.executemany(to_dollar(sql), rows)
+
+
+def get_async_db(handler, settings):
+    """AsyncDB over the handler's targets, or None when CMS_DB_DRIVER is not asyncpg."""
+    if getattr(settings, "CMS_DB_DRIVER", "psycopg2") != "asyncpg":
+        return None
+    return AsyncDB(handler.connect_targets(),
+                   min_size=getattr(settings, "ASYNC_DB_POOL_MIN", 2),
+                   max_size=getattr(settings, "ASYNC_DB_POOL_MAX", 16))
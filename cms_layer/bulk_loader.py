@@ -0,0 +1,136 @@
+"""
+Bulk Loader - COPY-based Seeding for Large Tables (CMS)
+Role: Load thousands to millions of rows without one INSERT round trip per row.
+
+- PostgreSQL (psycopg2 cursor): rows are streamed through COPY FROM STDIN into
+  a temporary staging table, then merged with one INSERT ... SELECT
+  (ON CONFLICT DO UPDATE / DO NOTHING) so re-seeding stays idempotent.
+- SQLite stand-ins (tests, benchmarks): executemany in batches with the same
+  conflict handling.
+
+Rows are consumed lazily from any iterable, so a 1M-row seed never has to be
+materialised as one list or one giant string.
+"""
+
+import itertools
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_field(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value).translate(_COPY_ESCAPES)
+
+
+class _CopyStream:
+    """File-like object over rows in COPY text format (read() is all copy_expert needs)."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ""
+        self.count = 0
+
+    def read(self, size=-1):
+        size = 65536 if size is None or size < 0 else size
+        while len(self._buffer) < size:
+            chunk = list(itertools.islice(self._rows, 1000))
+            if not chunk:
+                break
+            self.count += len(chunk)
+            self._buffer += "".join("\t".join(map(_copy_field, row)) + "\n" for row in chunk)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _is_sqlite(cur):
+    return type(cur).__module__.startswith("sqlite3")
+
+
+def _conflict_clause(conflict, update):
+    if not conflict:
+        return ""
+    if not update:
+        return f" ON CONFLICT ({', '.join(conflict)}) DO NOTHING"
+    sets = ", ".join(f"{col} = excluded.{col}" for col in update)
+    return f" ON CONFLICT ({', '.join(conflict)}) DO UPDATE SET {sets}"
+
+
+def bulk_insert(cur, table, columns, rows, conflict=None, update=None, batch_size=10000):
+    """
+    Inserts `rows` (iterable of tuples ordered like `columns`) into `table`.
+
+    Args:
+        conflict:   Unique column(s) for ON CONFLICT (None = plain insert)
+        update:     Columns overwritten on conflict (None/empty = DO NOTHING)
+        batch_size: Rows per executemany batch (SQLite path)
+    Returns the number of rows read from `rows`. Caller commits.
+    """
+    cols = ", ".join(columns)
+    if _is_sqlite(cur):
+        sql = (f"INSERT INTO {table} ({cols}) VALUES ({', '.join('?' * len(columns))})"
+               + _conflict_clause(conflict, update))
+        total = 0
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                return total
+            cur.executemany(sql, batch)
+            total += len(batch)
+
+    stream = _CopyStream(rows)
+    if not conflict:
+        cur.copy_expert(f"COPY {table} ({cols}) FROM STDIN", stream)
+        return stream.count
+
+    staging = f"_stage_{table}"
+    cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+    cur.execute(f"TRUNCATE {staging}")
+    cur.copy_expert(f"COPY {staging} ({cols}) FROM STDIN", stream)
+    # DISTINCT ON: a duplicate key inside one load must not hit the same row twice
+    cur.execute(f"""
+        INSERT INTO {table} ({cols})
+        SELECT DISTINCT ON ({', '.join(conflict)}) {cols} FROM {staging}
+        {_conflict_clause(conflict, update)}
+    """)
+    return stream.count
+
+
+RTO_COLUMNS = ("phone_number", "email", "owner_name", "driver_license_id",
+               "v1_plate", "v1_type", "v2_plate", "v2_type")
+
+
+def profile_rows(profiles):
+    """dummy_profiles_*.json entries -> rto_registry rows (RTO_COLUMNS order)."""
+    for p in profiles:
+        yield (p['phone'], p['email'], p['owner'], p['license'],
+               p['v1_plate'], p.get('v1_type', 'Car'), p['v2_plate'], p.get('v2_type', 'Car'))
+
+
+def load_rto_profiles(cur, profiles):
+    """Upserts RTO registry identities (vehicles refreshed, identity kept). Returns rows read."""
+    return bulk_insert(cur, "rto_registry", RTO_COLUMNS, profile_rows(profiles),
+                       conflict=("phone_number",), update=("v1_plate", "v1_type", "v2_plate", "v2_type"))
+
+
+def synthetic_profiles(count, start=1):
+    """Deterministic unique profiles for seeding benchmarks (2 plates per owner)."""
+    first = ["Aditya", "Priya", "Rahul", "Sneha", "Amit", "Neha", "Vikram", "Anjali", "Rohan", "Kavita"]
+    last = ["Sharma", "Patel", "Verma", "Gupta", "Singh", "Joshi", "Deshmukh", "Mehta", "Reddy", "Nair"]
+    series = "ABCDEFGHJKLMNPQRSTUVWXYZ"
+    for i in range(start, start + count):
+        f, l = first[i % 10], last[(i // 10) % 10]
+        a, b = divmod(i * 2, 10000)
+        yield {
+            "owner": f"{f} {l}",
+            "email": f"{f.lower()}.{l.lower()}.{i}@safedrive.in",
+            "phone": f"9{i:09d}",
+            "license": f"DL-{i:08d}",
+            "v1_plate": f"MH{12 + a // 576 % 40:02d}-{series[a // 24 % 24]}{series[a % 24]}-{b:04d}",
+            "v2_plate": f"MH{12 + a // 576 % 40:02d}-{series[a // 24 % 24]}{series[a % 24]}-{b + 1:04d}",
+            "v1_type": "Car" if i % 3 else "Bike",
+            "v2_type": "Bike" if i % 3 else "Car",
+        }
@@ -4,13 +4,23 @@ import psycopg2
 import time
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
+from cms_layer.db_pool import ConnectionPool, PoolError
 
 # Load env from parent directory (Traffic_System_Root/.env)
 _PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 load_dotenv(os.path.join(_PROJECT_ROOT, '.env'))
 
 class CloudDBHandler:
-    def __init__(self):
+    """
+    Cloud-first DB access with local fallback.
+
+    Connections come from one ConnectionPool per target; a circuit breaker
+    remembers an unreachable cloud so requests go straight to the local DB
+    while a background probe waits for the cloud to come back.
+    cloud_factory / local_factory replace the psycopg2 connect (tests, benches).
+    """
+
+    def __init__(self, cloud_factory=None, local_factory=None, maxconn=None):
         self.module_name = "DB_HANDLER"
         
         # Cloud Credentials
@@ -27,53 +37,81 @@ class CloudDBHandler:
         self.local_pass = os.getenv("DB_PASS", "aynan@2023")
         self.local_port = os.getenv("DB_PORT", "5432")
 
-    def get_cloud_connection(self):
-        """Returns connection to DigitalOcean Postgres."""
-        if not self.cloud_host:
+        maxconn = maxconn or int(os.getenv("DB_POOL_MAX", "8"))
+        self.pools = {}
+        if cloud_factory or self.cloud_host:
+            self.pools["CLOUD"] = ConnectionPool("CLOUD", cloud_factory or self._connect_cloud, maxconn=maxconn)
+        else:
             print(f"⚠️ [{self.module_name}] Cloud Credentials Missing in .env")
-            return None
-            
-        try:
-            conn = psycopg2.connect(
-                host=self.cloud_host,
-                database=self.cloud_name,
-                user=self.cloud_user,
-                password=self.cloud_pass,
-                port=self.cloud_port,
-                sslmode="require",
-                connect_timeout=5 
-            )
-            return conn
-        except Exception as e:
-            print(f"❌ [{self.module_name}] Cloud Connection Failed: {e}")
-            return None
+        self.pools["LOCAL"] = ConnectionPool("LOCAL", local_factory or self._connect_local, maxconn=maxconn)
+
+    def _connect_cloud(self):
+        return psycopg2.connect(
+            host=self.cloud_host,
+            database=self.cloud_name,
+            user=self.cloud_user,
+            password=self.cloud_pass,
+            port=self.cloud_port,
+            sslmode="require",
+            connect_timeout=5
+        )
+
+    def _connect_local(self):
+        return psycopg2.connect(
+            host=self.local_host,
+            database=self.local_name,
+            user=self.local_user,
+            password=self.local_pass,
+            port=self.local_port
+        )
+
+    def connect_targets(self):
+        """[(source, asyncpg connect kwargs)] in failover order, for async_db."""
+        targets = []
+        if self.cloud_host:
+            targets.append(("CLOUD", {"host": self.cloud_host, "database": self.cloud_name, "user": self.cloud_user,
+                                      "password": self.cloud_pass, "port": int(self.cloud_port),
+                                      "ssl": "require", "timeout": 5}))
+        targets.append(("LOCAL", {"host": self.local_host, "database": self.local_name, "user": self.local_user,
+                                  "password": self.local_pass, "port": int(self.local_port)}))
+        return targets
+
+    def get_cloud_connection(self):
+        """Returns pooled connection to DigitalOcean Postgres (None if unavailable)."""
+        return self._checkout("CLOUD")
 
     def get_local_connection(self):
-        """Returns connection to Local Edge Postgres."""
+        """Returns pooled connection to Local Edge Postgres (None if unavailable)."""
+        return self._checkout("LOCAL")
+
+    def _checkout(self, source):
+        pool = self.pools.get(source)
+        if pool is None:
+            return None
         try:
-            conn = psycopg2.connect(
-                host=self.local_host,
-                database=self.local_name,
-                user=self.local_user,
-                password=self.local_pass,
-                port=self.local_port
-            )
-            return conn
-        except Exception as e:
-            print(f"❌ [{self.module_name}] Local Connection Failed: {e}")
+            return pool.getconn()
+        except PoolError as e:
+            if pool.breaker.allow():  # Open-circuit skips are silent (logged once on open)
+                print(f"❌ [{self.module_name}] {source.title()} Connection Failed: {e}")
             return None
 
     def get_best_connection(self):
-        """Tries Cloud, falls back to Local."""
+        """Tries Cloud, falls back to Local. An open cloud circuit costs nothing."""
         conn = self.get_cloud_connection()
         if conn: return conn, "CLOUD"
-        
-        print(f"⚠️ [{self.module_name}] Falling back to Local DB...")
+
         conn = self.get_local_connection()
         if conn: return conn, "LOCAL"
-        
+
         return None, "NONE"
 
+    def pool_stats(self):
+        return {source: pool.snapshot() for source, pool in self.pools.items()}
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.closeall()
+
 # Singleton Instance
 db = CloudDBHandler()
 
@@ -1,36 +1,106 @@
+import json
+import random
+import threading
 import time
 import requests
+from requests.adapters import HTTPAdapter
 from config.settings import SystemConfig
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(payload):
+    """Compact JSON body (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
 class CMSConnector:
-    def __init__(self, intersection_id, server_url=None):
+    """
+    Edge → CMS link.
+
+    - One pooled keep-alive requests.Session (no TCP/TLS handshake per pulse).
+    - send_data() / push_to_carla() only hand the payload to a sender thread
+      (latest wins), so CMS round-trips never block the control loop.
+    - Heartbeats are delta-encoded against the last state the server ACKed;
+      a full keyframe is sent on start, every KEYFRAME_INTERVAL s, after an
+      error, or when the server answers RESYNC.
+    - Commands arrive over one persistent long-poll subscription
+      (/commands/{id}/subscribe) with reconnect backoff; polling after each
+      heartbeat is only used while the subscription is down.
+    - With an EdgeOutbox, pulses that fail while the CMS is down are stored
+      (one full heartbeat per REPLAY_INTERVAL, counts accumulated) and
+      replayed later as history; CARLA decisions go through it coalesced.
+    """
+
+    KEYFRAME_INTERVAL = 10.0   # Seconds between full heartbeats
+    HEARTBEAT_TIMEOUT = 2.0
+    COMMAND_TIMEOUT = 2.0
+    SUBSCRIBE_TIMEOUT = 25.0   # Server-side long-poll hold (seconds)
+    BACKOFF_MAX = 30.0
+    REPLAY_INTERVAL = 5.0      # Seconds between heartbeats stored for replay
+
+    def __init__(self, intersection_id, server_url=None, start_thread=True, outbox=None):
         self.intersection_id = intersection_id
         # Use CMS_SERVER_URL from .env (points to Python FastAPI on port 8000)
         self.server_url = server_url or SystemConfig.CMS_SERVER_URL
         self.connected = False
         self.active_overrides = {}  # {lane_name: command_dict}
 
-        print(f"[CMS] Initializing Edge Node: {self.intersection_id} -> {self.server_url}")
-
-    def send_data(self, lane_status, decisions, green_times, directional_counts=None):
-        """
-        Push Heartbeat to CMS Server.
+        # Persistent pooled session (keep-alive)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        # Sender thread state: single "latest" slot per message kind
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pending_heartbeat = None
+        self._pending_carla = None
+
+        # Delta encoding state
+        self._seq = 0
+        self._acked_seq = None
+        self._acked_lanes = {}       # Server-confirmed lane state
+        self._last_keyframe = 0.0
+
+        # Store-and-forward (edge_outbox.EdgeOutbox, optional)
+        self.outbox = outbox
+        self._unstored = None        # Failed pulse not yet written to the outbox
+        self._last_stored = 0.0
+
+        self.stats = {"sent": 0, "deltas": 0, "keyframes": 0, "resyncs": 0,
+                      "dropped": 0, "errors": 0, "bytes": 0, "last_rtt_ms": 0.0}
 
-        Args:
-            lane_status:        Dict of per-phase lane stats (D_i, Event, etc.)
-            decisions:          Dict of current decisions (kept for API compat)
-            green_times:        Dict of {phase: green_time_seconds}
-            directional_counts: Optional Camera 5 directional counts dict
-                                e.g. {"Straight": 5, "Left": 2, "Right": 1}
-        """
-        payload = {
-            "junction_id": self.intersection_id,
-            "timestamp": time.time(),
-            "lanes": {}
-        }
+        print(f"[CMS] Initializing Edge Node: {self.intersection_id} -> {self.server_url}")
 
-        lanes = list(lane_status.keys())
-        for i, lane in enumerate(lanes):
+        # Command subscription (own session: a long-poll holds its connection)
+        self._sub_session = requests.Session()
+        self._subscribed = False
+
+        self._thread = None
+        self._sub_thread = None
+        if start_thread:
+            self._thread = threading.Thread(target=self._sender_loop, daemon=True, name="CMS-Sender")
+            self._thread.start()
+            self._sub_thread = threading.Thread(target=self._subscribe_loop, daemon=True, name="CMS-Commands")
+            self._sub_thread.start()
+
+    # ─────────────────────────────────────────────────────────
+    # PUBLIC API (non-blocking)
+    # ─────────────────────────────────────────────────────────
+
+    def build_lanes(self, lane_status, green_times, directional_counts=None):
+        """Lane payload exactly as the /heartbeat endpoint expects it."""
+        lanes = {}
+        for i, lane in enumerate(lane_status.keys()):
             lane_data = lane_status.get(lane, {})
             saturation = lane_data.get("D_i", 0) * 100
 
@@ -44,86 +114,279 @@ class CMSConnector:
             if i == 0 and directional_counts:
                 lane_payload["directional_counts"] = directional_counts
 
-            payload["lanes"][lane] = lane_payload
-
-        try:
-            response = requests.post(
-                f"{self.server_url}/heartbeat",
-                json=payload,
-                timeout=2
-            )
-            print(f"[CMS HB] Status: {response.status_code}")
+            lanes[lane] = lane_payload
+        return lanes
 
-            if response.status_code == 200:
-                self.connected = True
-                resp_data = response.json()
+    def send_data(self, lane_status, decisions, green_times, directional_counts=None):
+        """
+        Queue a Heartbeat for the CMS Server (returns immediately).
 
-                # FAIL-SAFE: Server says not throttled -> clear local memory
-                if resp_data.get("server_says_throttled") is False:
-                    if self.active_overrides:
-                        print("[CMS SYNC] Server says clear. Removing stuck throttle.")
-                        self.active_overrides = {}
+        Args:
+            lane_status:        Dict of per-phase lane stats (D_i, Event, etc.)
+            decisions:          Dict of current decisions (kept for API compat)
+            green_times:        Dict of {phase: green_time_seconds}
+            directional_counts: Optional Camera 5 directional counts dict
+                                e.g. {"Straight": 5, "Left": 2, "Right": 1}
+        Returns:
+            self.connected (state of the last completed round-trip)
+        """
+        lanes = self.build_lanes(lane_status, green_times, directional_counts)
+        with self._lock:
+            if self._pending_heartbeat is not None:
+                # Unsent pulse is superseded; keep its counts (they are increments)
+                self.stats["dropped"] += 1
+                lanes = self._carry_counts(self._pending_heartbeat["lanes"], lanes)
+            self._pending_heartbeat = {"timestamp": time.time(), "lanes": lanes}
+        self._wake.set()
+        if self._thread is None:
+            self.flush()
+        return self.connected
 
-                return True
+    def check_for_updates(self):
+        """
+        Returns active_overrides: {lane_name: command_dict}.
+        Commands are polled by the sender thread after each heartbeat,
+        so this never touches the network.
+        """
+        with self._lock:
+            return dict(self.active_overrides)
 
+    def get_active_override(self, lane):
+        with self._lock:
+            return self.active_overrides.get(lane, None)
+
+    def flush(self):
+        """Sends whatever is pending on the calling thread (tests / no-thread mode)."""
+        self._drain_once()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.HEARTBEAT_TIMEOUT + 1)
+        self.session.close()
+        self._sub_session.close()
+
+    # ─────────────────────────────────────────────────────────
+    # SENDER THREAD
+    # ─────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _carry_counts(old_lanes, new_lanes):
+        for lane, data in old_lanes.items():
+            counts = data.get("directional_counts")
+            if not counts or lane not in new_lanes:
+                continue
+            merged = dict(counts)
+            for k, v in (new_lanes[lane].get("directional_counts") or {}).items():
+                merged[k] = merged.get(k, 0) + v
+            new_lanes[lane]["directional_counts"] = merged
+        return new_lanes
+
+    def _sender_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(timeout=1.0)
+            self._wake.clear()
+            self._drain_once()
+
+    def _drain_once(self):
+        with self._lock:
+            heartbeat, self._pending_heartbeat = self._pending_heartbeat, None
+            carla, self._pending_carla = self._pending_carla, None
+        if heartbeat is not None:
+            if self._send_heartbeat(heartbeat) and not self._subscribed:
+                self._poll_commands()
+        if carla is not None:
+            self._send_carla(carla)
+
+    def _encode(self, heartbeat):
+        """Returns (path, payload, is_keyframe)."""
+        now = time.time()
+        self._seq += 1
+        keyframe = (self._acked_seq is None or now - self._last_keyframe >= self.KEYFRAME_INTERVAL)
+        if keyframe:
+            return "/heartbeat", {
+                "junction_id": self.intersection_id,
+                "timestamp": heartbeat["timestamp"],
+                "seq": self._seq,
+                "lanes": heartbeat["lanes"]
+            }, True
+
+        changed = {}
+        for lane, fields in heartbeat["lanes"].items():
+            base = self._acked_lanes.get(lane, {})
+            diff = {k: v for k, v in fields.items()
+                    if k == "directional_counts" or base.get(k) != v}
+            if diff:
+                changed[lane] = diff
+        return "/heartbeat/delta", {
+            "junction_id": self.intersection_id,
+            "timestamp": heartbeat["timestamp"],
+            "seq": self._seq,
+            "base_seq": self._acked_seq,
+            "lanes": changed
+        }, False
+
+    def _send_heartbeat(self, heartbeat):
+        path, payload, keyframe = self._encode(heartbeat)
+        body = _dumps(payload)
+        try:
+            t0 = time.time()
+            response = self.session.post(f"{self.server_url}{path}", data=body,
+                                         timeout=self.HEARTBEAT_TIMEOUT)
+            self.stats["last_rtt_ms"] = round((time.time() - t0) * 1000, 1)
         except requests.exceptions.RequestException as e:
             print(f"[CMS HB ERROR] {e}")
             self.connected = False
+            self.stats["errors"] += 1
+            self._acked_seq = None  # Server state unknown → next pulse is a keyframe
+            self._store_for_replay(heartbeat)
             return False
 
-    def check_for_updates(self):
+        self.stats["sent"] += 1
+        self.stats["bytes"] += len(body)
+        self.stats["keyframes" if keyframe else "deltas"] += 1
+
+        if response.status_code != 200:
+            print(f"[CMS HB] Status: {response.status_code}")
+            self._acked_seq = None
+            if response.status_code >= 500:
+                self._store_for_replay(heartbeat)
+            return False
+
+        self.connected = True
+        self._flush_unstored()
+        resp_data = response.json()
+        if resp_data.get("status") == "RESYNC":
+            # Server lost our base (restart / missed pulse): resend in full now
+            self.stats["resyncs"] += 1
+            self._acked_seq = None
+            with self._lock:
+                pending = self._pending_heartbeat
+                if pending is None:
+                    self._pending_heartbeat = heartbeat
+                else:
+                    pending["lanes"] = self._carry_counts(heartbeat["lanes"], pending["lanes"])
+            self._wake.set()
+            return False
+
+        # Server state now equals the full lane set of this pulse (minus increments)
+        self._acked_seq = payload["seq"]
+        self._acked_lanes = {
+            lane: {k: v for k, v in fields.items() if k != "directional_counts"}
+            for lane, fields in heartbeat["lanes"].items()
+        }
+        if keyframe:
+            self._last_keyframe = time.time()
+
+        # FAIL-SAFE: Server says not throttled -> clear local memory
+        if resp_data.get("server_says_throttled") is False:
+            with self._lock:
+                if self.active_overrides:
+                    print("[CMS SYNC] Server says clear. Removing stuck throttle.")
+                    self.active_overrides = {}
+        return True
+
+    def _store_for_replay(self, heartbeat):
+        """Keeps one full heartbeat per REPLAY_INTERVAL; skipped pulses add their counts."""
+        if self.outbox is None:
+            return
+        if self._unstored is not None:
+            heartbeat = {"timestamp": heartbeat["timestamp"],
+                         "lanes": self._carry_counts(self._unstored["lanes"], heartbeat["lanes"])}
+        self._unstored = heartbeat
+        if heartbeat["timestamp"] - self._last_stored >= self.REPLAY_INTERVAL:
+            self._flush_unstored()
+
+    def _flush_unstored(self):
+        if self.outbox is None or self._unstored is None:
+            return
+        heartbeat, self._unstored = self._unstored, None
+        self._last_stored = heartbeat["timestamp"]
+        self.outbox.append(self.server_url, "/heartbeat", _dumps({
+            "junction_id": self.intersection_id,
+            "timestamp": heartbeat["timestamp"],
+            "lanes": heartbeat["lanes"],
+            "replayed": True
+        }))
+
+    def _subscribe_loop(self):
+        """Keeps one long-poll open; reconnects with exponential backoff + jitter."""
+        backoff = 1.0
+        url = f"{self.server_url}/commands/{self.intersection_id}/subscribe"
+        while not self._stop.is_set():
+            try:
+                response = self._sub_session.get(url, params={"timeout": self.SUBSCRIBE_TIMEOUT},
+                                                 timeout=self.SUBSCRIBE_TIMEOUT + 5)
+                if response.status_code == 404:
+                    # Older CMS without the push channel: stay on polling
+                    print("[CMS SUB] Subscription not supported by server - polling instead")
+                    self._subscribed = False
+                    return
+                if response.status_code == 200:
+                    if not self._subscribed:
+                        print("[CMS SUB] Command subscription active")
+                    self._subscribed = True
+                    backoff = 1.0
+                    data = response.json()
+                    self.apply_commands(data if isinstance(data, list) else [data])
+                    continue
+                self._subscribed = False
+            except requests.exceptions.RequestException:
+                if self._stop.is_set():
+                    return
+                self._subscribed = False
+            self._stop.wait(timeout=backoff * random.uniform(0.8, 1.2))
+            backoff = min(backoff * 2, self.BACKOFF_MAX)
+
+    def _poll_commands(self):
         """
         Poll for commands from server.
-        Returns active_overrides: {lane_name: command_dict}
 
         Phase 7: Server returns a LIST of commands (multi-lane throttle).
         Handles both old-style single dict and new list format.
         """
-        if not self.connected:
-            return self.active_overrides
-
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.server_url}/commands/{self.intersection_id}",
-                timeout=2
+                timeout=self.COMMAND_TIMEOUT
             )
-
-            if response.status_code == 200:
-                data = response.json()
-
-                # Handle list (Phase 7 multi-lane) or single dict (legacy)
-                command_list = data if isinstance(data, list) else [data]
-
-                for cmd in command_list:
-                    cmd_type = cmd.get("command_type", "NO_OP")
-
-                    if cmd_type == "THROTTLE_ADJUST":
-                        target_lane = cmd.get("target_lane")
-                        if target_lane:
-                            self.active_overrides[target_lane] = cmd
-                            val = cmd.get("value", "?")
-                            reason = cmd.get("reason", "")
-                            print(f"[CMS CMD] THROTTLE: {target_lane} by {val}s | {reason}")
-
-                    elif cmd_type == "RESTORE_NORMAL":
-                        target_lane = cmd.get("target_lane")
-                        if target_lane and target_lane in self.active_overrides:
-                            del self.active_overrides[target_lane]
-                            print(f"[CMS CMD] RESTORE: {target_lane}")
-
         except requests.exceptions.RequestException:
-            pass
-
-        return self.active_overrides
-
-    def get_active_override(self, lane):
-        return self.active_overrides.get(lane, None)
+            return
+
+        if response.status_code != 200:
+            return
+        data = response.json()
+
+        # Handle list (Phase 7 multi-lane) or single dict (legacy)
+        command_list = data if isinstance(data, list) else [data]
+        self.apply_commands(command_list)
+
+    def apply_commands(self, command_list):
+        with self._lock:
+            for cmd in command_list:
+                cmd_type = cmd.get("command_type", "NO_OP")
+
+                if cmd_type == "THROTTLE_ADJUST":
+                    target_lane = cmd.get("target_lane")
+                    if target_lane:
+                        self.active_overrides[target_lane] = cmd
+                        val = cmd.get("value", "?")
+                        reason = cmd.get("reason", "")
+                        print(f"[CMS CMD] THROTTLE: {target_lane} by {val}s | {reason}")
+
+                elif cmd_type == "RESTORE_NORMAL":
+                    target_lane = cmd.get("target_lane")
+                    if target_lane and target_lane in self.active_overrides:
+                        del self.active_overrides[target_lane]
+                        print(f"[CMS CMD] RESTORE: {target_lane}")
 
     # ── CARLA Integration ────────────────────────────────────────
     def push_to_carla(self, decision_result, lane_combinations=None):
         """
         Forward the DecisionMaker result to the CARLA bridge server.
-        Non-blocking: silently fails if bridge is not running.
+        Non-blocking: appended to the outbox (latest decision wins) or queued
+        for the sender thread, silently dropped if the bridge is not running.
 
         Args:
             decision_result: dict from DecisionMaker.decide_signals()
@@ -138,7 +401,7 @@ class CMSConnector:
             if not scores:
                 return
 
-            winner = max(scores, key=scores.get)
+            winner = decision_result.get("winner_phase") or max(scores, key=scores.get)
 
             # Resolve allowed lanes from conflict matrix
             allowed = [f"{winner}_All"]
@@ -159,12 +422,23 @@ class CMSConnector:
                 "system_state": state,
                 "phase_saturations": saturations,
             }
+        except Exception:
+            return
 
+        if self.outbox is not None:
             carla_url = getattr(SystemConfig, 'CARLA_BRIDGE_URL', 'http://localhost:8100')
-            requests.post(
-                f"{carla_url}/carla/decision",
-                json=payload,
-                timeout=0.5
-            )
+            self.outbox.append(carla_url, "/carla/decision", _dumps(payload), coalesce_key="decision")
+            return
+
+        with self._lock:
+            self._pending_carla = payload
+        self._wake.set()
+        if self._thread is None:
+            self.flush()
+
+    def _send_carla(self, payload):
+        carla_url = getattr(SystemConfig, 'CARLA_BRIDGE_URL', 'http://localhost:8100')
+        try:
+            self.session.post(f"{carla_url}/carla/decision", data=_dumps(payload), timeout=0.5)
         except Exception:
-            pass  # CARLA bridge not running = non-critical
\ No newline at end of file
+            pass  # CARLA bridge not running = non-critical
@@ -0,0 +1,100 @@
+"""
+Command Bus - CMS → Junction Command Delivery (Phase 7 push channel)
+Role: Holds pending THROTTLE_ADJUST / RESTORE_NORMAL commands per junction and
+      wakes long-poll subscribers the moment a command is queued.
+
+- push() / replace() are thread-safe (called from DB/background code).
+- wait() is awaited by the /commands/{node_id}/subscribe endpoint.
+- pop() serves the legacy polling endpoint; both paths drain the same queue.
+- Storage is a StateBackend. With a shared backend (several uvicorn workers)
+  the command may be queued by another process, so wait() also re-checks the
+  backend every `poll_interval` seconds; same-process pushes still wake at once.
+"""
+
+import asyncio
+import threading
+from typing import Dict, List
+
+from .state_backend import InProcessBackend, StateBackend
+
+
+class CommandBus:
+    def __init__(self, backend: StateBackend = None, poll_interval: float = 0.05):
+        self.backend = backend or InProcessBackend()
+        self.poll_interval = poll_interval if self.backend.shared else None
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, set] = {}   # {node_id: {(loop, asyncio.Event), ...}}
+
+    def push(self, node_id: str, command: dict, dedupe_key: str = "target_lane") -> bool:
+        """
+        Queues one command. A command whose dedupe_key value is already queued
+        for the node is replaced (same phase re-throttled with a new value);
+        an identical one is skipped. Returns True if queued.
+        """
+        if not self.backend.push_command(node_id, command, dedupe_key):
+            return False
+        self._notify(node_id)
+        return True
+
+    def replace(self, node_id: str, commands: List[dict]):
+        """Replaces everything pending for a node (e.g. RESTORE_NORMAL for all phases)."""
+        self.backend.replace_commands(node_id, commands)
+        self._notify(node_id)
+
+    def pop(self, node_id: str) -> List[dict]:
+        return self.backend.pop_commands(node_id)
+
+    def pending(self, node_id: str) -> List[dict]:
+        return self.backend.pending_commands(node_id)
+
+    def subscriber_count(self, node_id: str = None) -> int:
+        with self._lock:
+            if node_id is not None:
+                return len(self._waiters.get(node_id, ()))
+            return sum(len(w) for w in self._waiters.values())
+
+    def _notify(self, node_id: str):
+        with self._lock:
+            waiters = list(self._waiters.get(node_id, ()))
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait(self, node_id: str, timeout: float) -> List[dict]:
+        """
+        Long-poll: returns pending commands immediately, otherwise waits up to
+        `timeout` seconds for a push. Returns [] on timeout.
+        """
+        commands = self.pop(node_id)
+        if commands:
+            return commands
+
+        entry = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.setdefault(node_id, set()).add(entry)
+        try:
+            # Re-check: a push may have landed between pop() and registration
+            commands = self.pop(node_id)
+            if commands:
+                return commands
+            deadline = asyncio.get_running_loop().time() + timeout
+            while True:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    return []
+                slice_s = remaining if self.poll_interval is None else min(remaining, self.poll_interval)
+                try:
+                    await asyncio.wait_for(entry[1].wait(), timeout=slice_s)
+                except asyncio.TimeoutError:
+                    if self.poll_interval is None:
+                        return []
+                entry[1].clear()
+                commands = self.pop(node_id)
+                if commands:
+                    return commands
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(node_id)
+                if waiters is not None:
+                    waiters.discard(entry)
+                    if not waiters:
+                        del self._waiters[node_id]
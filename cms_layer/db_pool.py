@@ -0,0 +1,220 @@
+"""
+DB Pool - Pooled Connections + Circuit Breaker per Database Target
+Role: Reuse database connections instead of a new TCP/TLS/auth handshake per
+      request, and stop paying the cloud connect timeout on every call while
+      the cloud database is unreachable.
+
+- ConnectionPool: bounded pool over any DB-API factory (psycopg2, sqlite3).
+  getconn() returns a PooledConnection; its close() hands the connection back
+  (rolled back, broken ones discarded), so existing `conn.close()` callers
+  work unchanged.
+- CircuitBreaker: after a failed connect the target is OPEN and skipped
+  immediately; a background probe retries with exponential backoff and
+  closes the breaker once the target answers again.
+"""
+
+import random
+import threading
+import time
+
+
+class PoolError(Exception):
+    """Target unavailable: breaker open, connect failed or pool exhausted."""
+
+
+class CircuitBreaker:
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+
+    def __init__(self, name, failure_threshold=1, probe_interval=2.0, probe_max=60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.probe_max = probe_max
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            was_open, self.state = self.state == self.OPEN, self.CLOSED
+        return was_open
+
+    def record_failure(self):
+        """Returns True when this failure opened the breaker."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                return True
+            return False
+
+
+class PooledConnection:
+    """Proxy: behaves like the raw connection; close() returns it to the pool."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get("_conn")
+        if conn is None:
+            raise PoolError("Connection already returned to the pool")
+        return getattr(conn, name)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.putconn(conn)
+
+    def discard(self):
+        """Close the underlying connection for real (e.g. after a protocol error)."""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.putconn(conn, discard=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._conn.commit()
+        finally:
+            self.close()
+
+    def __del__(self):
+        # Callers that return early without close() must not leak the slot
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    def __init__(self, name, factory, maxconn=8, acquire_timeout=5.0, breaker=None, probe=True):
+        """
+        Args:
+            name:            Label for logs ("CLOUD", "LOCAL")
+            factory:         Zero-arg callable returning a new DB-API connection
+            maxconn:         Upper bound of open connections (idle + checked out)
+            acquire_timeout: Max wait for a free slot when all are checked out
+            breaker:         CircuitBreaker (default: one per pool)
+            probe:           Start a background reconnect probe when the breaker opens
+        """
+        self.module_name = "DB_POOL"
+        self.name = name
+        self.factory = factory
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.breaker = breaker or CircuitBreaker(name)
+        self.probe = probe
+
+        self._idle = []                                # LIFO: warmest connection first
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._probe_thread = None
+
+        self.stats = {"created": 0, "reused": 0, "connect_failures": 0, "discarded": 0,
+                      "exhausted": 0, "short_circuited": 0}
+
+    def getconn(self):
+        if not self.breaker.allow():
+            self.stats["short_circuited"] += 1
+            raise PoolError(f"{self.name} circuit open")
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self.stats["exhausted"] += 1
+            raise PoolError(f"{self.name} pool exhausted ({self.maxconn} connections in use)")
+
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                break
+            if getattr(conn, "closed", 0):
+                self.stats["discarded"] += 1
+                continue
+            self.stats["reused"] += 1
+            return PooledConnection(self, conn)
+
+        try:
+            conn = self.factory()
+        except Exception as e:
+            self._slots.release()
+            self.stats["connect_failures"] += 1
+            self._on_failure(e)
+            raise PoolError(f"{self.name} connect failed: {e}") from e
+        self.stats["created"] += 1
+        self.breaker.record_success()
+        return PooledConnection(self, conn)
+
+    def putconn(self, conn, discard=False):
+        try:
+            if not discard and not getattr(conn, "closed", 0):
+                try:
+                    conn.rollback()  # No-op when idle; ends anything left open
+                except Exception:
+                    discard = True
+            if discard or getattr(conn, "closed", 0):
+                self.stats["discarded"] += 1
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            else:
+                with self._lock:
+                    self._idle.append(conn)
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def snapshot(self):
+        with self._lock:
+            idle = len(self._idle)
+        return {**self.stats, "idle": idle, "state": self.breaker.state}
+
+    # ─────────────────────────────────────────────────────────
+    # CIRCUIT BREAKER PROBE
+    # ─────────────────────────────────────────────────────────
+
+    def _on_failure(self, error):
+        if self.breaker.record_failure():
+            print(f"⚡ [{self.module_name}] {self.name} circuit OPEN ({error}) - routing around it")
+            if self.probe:
+                self._probe_thread = threading.Thread(target=self._probe_loop, daemon=True,
+                                                      name=f"DB-Probe-{self.name}")
+                self._probe_thread.start()
+
+    def _probe_loop(self):
+        delay = self.breaker.probe_interval
+        while not self.breaker.allow():
+            time.sleep(delay * random.uniform(0.8, 1.2))
+            try:
+                conn = self.factory()
+            except Exception:
+                delay = min(delay * 2, self.breaker.probe_max)
+                continue
+            self.stats["created"] += 1
+            with self._lock:
+                if len(self._idle) < self.maxconn:
+                    self._idle.append(conn)  # Probe connection becomes the first pooled one
+                    conn = None
+            if conn is not None:
+                conn.close()
+            self.breaker.record_success()
+            print(f"✅ [{self.module_name}] {self.name} reachable again - circuit CLOSED")
@@ -0,0 +1,237 @@
+"""
+Edge Outbox - Store-and-Forward for Edge → CMS / CARLA / SafeDrive Traffic
+Role: Nothing the edge node wants to POST is lost or retried inline while a
+      server is down. Producers append to a local SQLite (WAL) table; one
+      drainer thread replays the entries later.
+
+Features:
+1. Hot path = one local INSERT (WAL, synchronous=NORMAL, no fsync per append).
+2. Per-destination FIFO: entries for a destination are replayed in order; a
+   failing destination backs off exponentially without blocking the others.
+3. Batching: up to `batch_size` rows are read and deleted per transaction;
+   they are sent concurrently through the shared HttpDispatcher (bounded
+   pool, per-destination limit), so one slow backend does not stall others.
+4. Coalescing: an append with a coalesce_key replaces the older unsent entry
+   with the same key (latest-state messages such as the CARLA decision).
+5. Bounded retention: oldest entries are evicted beyond max_rows / max_age_s.
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_PATH = os.path.join(_PROJECT_ROOT, "logs", "edge_outbox.db")
+
+
+class EdgeOutbox:
+    def __init__(self, path=DEFAULT_PATH, sender=None, dispatcher=None, batch_size=50, max_rows=50000,
+                 max_age_s=24 * 3600, backoff_base=1.0, backoff_max=60.0, start=True):
+        """
+        Args:
+            path:        SQLite file (":memory:" for tests)
+            sender:      callable(dest, path, body) -> True / False / None,
+                         called serially (tests); default is the dispatcher
+            dispatcher:  HttpDispatcher (default: the shared instance)
+            batch_size:  Rows read + deleted per drain transaction
+            max_rows:    Retention bound (oldest evicted first)
+            max_age_s:   Entries older than this are evicted
+        """
+        self.module_name = "EDGE_OUTBOX"
+        self.path = path
+        self.sender = sender
+        if sender is None:
+            from cms_layer.http_dispatcher import get_dispatcher
+            dispatcher = dispatcher or get_dispatcher()
+        self.dispatcher = dispatcher
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.max_age_s = max_age_s
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dest TEXT NOT NULL,
+                path TEXT NOT NULL,
+                body BLOB NOT NULL,
+                coalesce_key TEXT,
+                created REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_dest ON outbox (dest, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_coalesce ON outbox (dest, coalesce_key)")
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._backoff = {}       # {dest: (next_try, failures)}
+        self._appends = 0
+
+        self.stats = {"appended": 0, "coalesced": 0, "delivered": 0, "retried": 0,
+                      "rejected": 0, "evicted": 0}
+
+        self._thread = None
+        if start:
+            self._thread = threading.Thread(target=self._drain_loop, daemon=True, name="Outbox-Drainer")
+            self._thread.start()
+
+    # ─────────────────────────────────────────────────────────
+    # HOT PATH
+    # ─────────────────────────────────────────────────────────
+
+    def append(self, dest, path, body, coalesce_key=None):
+        """
+        Queue one POST. body may be bytes, str or a JSON-serialisable object.
+        Returns the entry id.
+        """
+        if not isinstance(body, (bytes, bytearray)):
+            body = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+        with self._lock:
+            if coalesce_key is not None:
+                cur = self._conn.execute("DELETE FROM outbox WHERE dest = ? AND coalesce_key = ?",
+                                         (dest, coalesce_key))
+                self.stats["coalesced"] += cur.rowcount
+            cur = self._conn.execute(
+                "INSERT INTO outbox (dest, path, body, coalesce_key, created) VALUES (?, ?, ?, ?, ?)",
+                (dest, path, bytes(body), coalesce_key, time.time())
+            )
+            self.stats["appended"] += 1
+            self._appends += 1
+            if self._appends % 100 == 0:
+                self._enforce_retention()
+        self._wake.set()
+        return cur.lastrowid
+
+    def depth(self, dest=None):
+        with self._lock:
+            if dest is None:
+                return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE dest = ?", (dest,)).fetchone()[0]
+
+    def _enforce_retention(self):
+        """Caller holds self._lock."""
+        evicted = self._conn.execute("DELETE FROM outbox WHERE created < ?",
+                                     (time.time() - self.max_age_s,)).rowcount
+        excess = self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0] - self.max_rows
+        if excess > 0:
+            evicted += self._conn.execute(
+                "DELETE FROM outbox WHERE id IN (SELECT id FROM outbox ORDER BY id LIMIT ?)", (excess,)
+            ).rowcount
+        if evicted:
+            self.stats["evicted"] += evicted
+            print(f"⚠️ [{self.module_name}] Retention: evicted {evicted} oldest entries")
+
+    # ─────────────────────────────────────────────────────────
+    # DRAINER
+    # ─────────────────────────────────────────────────────────
+
+    def _drain_loop(self):
+        while not self._stop.is_set():
+            sent = self.drain_once()
+            if not sent:
+                # Sleep until new work or the earliest backoff expires
+                now = time.time()
+                waits = [t - now for t, _ in self._backoff.values()]
+                self._wake.wait(timeout=max(0.05, min(waits)) if waits else 1.0)
+                self._wake.clear()
+
+    def drain_once(self):
+        """Replays one batch. Returns the number of entries delivered or dropped."""
+        now = time.time()
+        blocked = [d for d, (t, _) in self._backoff.items() if t > now]
+        with self._lock:
+            query = "SELECT id, dest, path, body FROM outbox"
+            if blocked:
+                query += f" WHERE dest NOT IN ({','.join('?' * len(blocked))})"
+            rows = self._conn.execute(query + " ORDER BY id LIMIT ?", (*blocked, self.batch_size)).fetchall()
+        if not rows:
+            return 0
+
+        done, failed_ids, failed = [], [], set()
+        for entry_id, dest, result in self._deliver(rows):
+            if result is False:
+                failed.add(dest)
+                failed_ids.append(entry_id)
+                continue
+            done.append(entry_id)
+            self.stats["delivered" if result else "rejected"] += 1
+            if result is None:
+                print(f"⚠️ [{self.module_name}] Dropped entry {entry_id} rejected by {dest}")
+            if dest not in failed:
+                self._backoff.pop(dest, None)
+
+        for dest in failed:
+            _, failures = self._backoff.get(dest, (0, 0))
+            delay = min(self.backoff_max, self.backoff_base * (2 ** failures)) * random.uniform(0.8, 1.2)
+            self._backoff[dest] = (time.time() + delay, failures + 1)
+            self.stats["retried"] += 1
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            if done:
+                self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in done])
+            if failed_ids:
+                self._conn.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?",
+                                       [(i,) for i in failed_ids])
+            self._conn.execute("COMMIT")
+        return len(done)
+
+    def _deliver(self, rows):
+        """Yields (id, dest, result) in row order."""
+        if self.dispatcher is None:
+            failed = set()
+            for entry_id, dest, path, body in rows:
+                if dest in failed:
+                    # Keep per-destination order: nothing after the first failure
+                    yield entry_id, dest, False
+                    continue
+                result = self.sender(dest, path, body)
+                if result is False:
+                    failed.add(dest)
+                yield entry_id, dest, result
+            return
+
+        # Concurrent: the dispatcher keeps one request in flight per (dest, path),
+        # so each key is delivered in FIFO order, and fails the rest of a
+        # destination's queue as soon as one request fails
+        futures = [(entry_id, dest, self.dispatcher.submit(dest, path, body))
+                   for entry_id, dest, path, body in rows]
+        for entry_id, dest, future in futures:
+            try:
+                yield entry_id, dest, future.result() if future is not None else False
+            except Exception:
+                yield entry_id, dest, False
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        with self._lock:
+            self._conn.close()
+
+
+# --- SHARED INSTANCE (one drainer per edge process) ---
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_outbox():
+    """Process-wide outbox used by CMSConnector, CARLA sync and ANPR credits."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            from config.settings import SystemConfig
+            _shared = EdgeOutbox(path=getattr(SystemConfig, "EDGE_OUTBOX_PATH", DEFAULT_PATH),
+                                 max_rows=getattr(SystemConfig, "EDGE_OUTBOX_MAX_ROWS", 50000))
+        return _shared
@@ -0,0 +1,220 @@
+"""
+Heartbeat Aggregator - Write-Behind Persistence for Edge Heartbeats
+Role: Heartbeats arrive at ~3 Hz per junction but junction_status only needs
+      the latest state. Instead of one DB transaction per heartbeat, keep the
+      latest state per junction in memory and flush every `interval` seconds:
+
+      1. one multi-row UPSERT into junction_status (latest state per junction)
+      2. one bulk INSERT of all buffered directional_counts rows
+      3. replayed counts (add_counts) in their own INSERT, so one bad replayed
+         row cannot cost the live counts of the whole flush
+      4. after_flush(cur, states) - congestion / recovery logic over the batch
+
+      The oldest recorded_at flushed since the last rollup is kept
+      (take_rollup_since()), so replayed counts older than the rollup window
+      still reach the rollups.
+
+Metrics (snapshot()): flushes, heartbeats coalesced, rows per flush, flush latency.
+"""
+
+import json
+import threading
+import time
+
+from psycopg2.extras import execute_values
+
+
+class HeartbeatAggregator:
+    def __init__(self, get_connection, after_flush=None, interval=1.0, max_count_rows=20000):
+        """
+        Args:
+            get_connection: Zero-arg callable returning a DB connection (or None)
+            after_flush:    callable(cur, states) run after the upsert commits;
+                            states = {junction_id: {"phase_saturations", "junction_saturation"}}
+            interval:       Seconds between flushes
+            max_count_rows: Buffered directional_counts rows kept while the DB is down
+        """
+        self.module_name = "HB_WRITER"
+        self.get_connection = get_connection
+        self.after_flush = after_flush
+        self.interval = interval
+        self.max_count_rows = max_count_rows
+
+        self._lock = threading.Lock()
+        self._latest = {}    # {junction_id: (saturation, raw_data_json, phase_saturations)}
+        self._counts = []    # [(junction_id, phase, counts_json, recorded_at_epoch)]
+        self._replayed = []  # Same rows from replayed heartbeats (add_counts)
+        self._rollup_since = None  # Oldest recorded_at flushed since the last rollup (epoch)
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.stats = {"heartbeats": 0, "coalesced": 0, "flushes": 0, "status_rows": 0,
+                      "count_rows": 0, "dropped_counts": 0, "errors": 0,
+                      "last_flush_ms": 0.0, "max_flush_ms": 0.0, "last_rows": 0}
+
+    # ─────────────────────────────────────────────────────────
+    # PRODUCER SIDE (request handlers)
+    # ─────────────────────────────────────────────────────────
+
+    def submit(self, junction_id, raw_data, junction_saturation, phase_saturations, directional_counts=None):
+        """
+        Records the latest state of a junction (replaces any unflushed one).
+        directional_counts: {phase: counts_dict} increments, always kept.
+        """
+        now = time.time()
+        row = (junction_saturation, json.dumps(raw_data), phase_saturations)
+        with self._lock:
+            if junction_id in self._latest:
+                self.stats["coalesced"] += 1
+            self._latest[junction_id] = row
+            self.stats["heartbeats"] += 1
+            self._buffer_counts(self._counts, junction_id, directional_counts, now)
+        self._ensure_thread()
+
+    def add_counts(self, junction_id, directional_counts, recorded_at):
+        """Counts only (replayed heartbeats): stored at their original time."""
+        with self._lock:
+            self._buffer_counts(self._replayed, junction_id, directional_counts, recorded_at)
+        self._ensure_thread()
+
+    def _buffer_counts(self, buffer, junction_id, directional_counts, recorded_at):
+        """Caller holds self._lock."""
+        for phase, counts in (directional_counts or {}).items():
+            buffer.append((junction_id, phase, json.dumps(counts), recorded_at))
+        self._trim(buffer)
+
+    def _trim(self, buffer):
+        """Caller holds self._lock. Keeps the newest max_count_rows rows."""
+        overflow = len(buffer) - self.max_count_rows
+        if overflow > 0:
+            del buffer[:overflow]
+            self.stats["dropped_counts"] += overflow
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, daemon=True, name="HB-Writer")
+                    self._thread.start()
+
+    def snapshot(self):
+        with self._lock:
+            pending = {"pending_junctions": len(self._latest),
+                       "pending_count_rows": len(self._counts) + len(self._replayed)}
+        flushes = self.stats["flushes"]
+        rows = self.stats["status_rows"] + self.stats["count_rows"]
+        return {**self.stats, **pending,
+                "rows_per_flush": round(rows / flushes, 1) if flushes else 0.0}
+
+    # ─────────────────────────────────────────────────────────
+    # FLUSHER
+    # ─────────────────────────────────────────────────────────
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+        self.flush()
+
+    def flush(self):
+        """Writes everything buffered. Returns the number of rows written."""
+        with self._lock:
+            latest, self._latest = self._latest, {}
+            counts, self._counts = self._counts, []
+            replayed, self._replayed = self._replayed, []
+        if not latest and not counts and not replayed:
+            return 0
+
+        t0 = time.perf_counter()
+        conn = self.get_connection()
+        if not conn:
+            self._requeue(latest, counts, replayed)
+            return 0
+
+        written, status_done = 0, False
+        cur = conn.cursor()
+        try:
+            if latest:
+                execute_values(cur, """
+                    INSERT INTO junction_status (junction_id, saturation_level, raw_data)
+                    VALUES %s
+                    ON CONFLICT (junction_id)
+                    DO UPDATE SET saturation_level = EXCLUDED.saturation_level,
+                                  raw_data = EXCLUDED.raw_data,
+                                  last_updated = CURRENT_TIMESTAMP
+                """, [(jid, sat, raw) for jid, (sat, raw, _) in latest.items()])
+                conn.commit()
+                status_done = True
+                written += len(latest)
+                self.stats["status_rows"] += len(latest)
+
+            written += self._insert_counts(conn, cur, counts, "Directional")
+            written += self._insert_counts(conn, cur, replayed, "Replayed")
+
+            if latest and self.after_flush:
+                self.after_flush(cur, {
+                    jid: {"phase_saturations": phases, "junction_saturation": sat}
+                    for jid, (sat, _, phases) in latest.items()
+                })
+                conn.commit()
+        except Exception as e:
+            conn.rollback()
+            self.stats["errors"] += 1
+            print(f"[HB_BG_ERROR] {e}")
+            if not status_done:
+                self._requeue(latest, [], [])
+        finally:
+            cur.close()
+            conn.close()
+
+        elapsed_ms = round((time.perf_counter() - t0) * 1000, 2)
+        self.stats["flushes"] += 1
+        self.stats["last_flush_ms"] = elapsed_ms
+        self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], elapsed_ms)
+        self.stats["last_rows"] = written
+        return written
+
+    def _insert_counts(self, conn, cur, rows, label):
+        """One bulk INSERT into directional_counts, committed on its own. Returns rows written."""
+        if not rows:
+            return 0
+        try:
+            execute_values(cur, """
+                INSERT INTO directional_counts (junction_id, phase, counts_json, recorded_at)
+                VALUES %s
+            """, rows, template="(%s, %s, %s, to_timestamp(%s))", page_size=1000)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()  # Table may not exist yet, or no partition for a replayed day - non-fatal
+            self.stats["dropped_counts"] += len(rows)
+            print(f"⚠️ [{self.module_name}] {label} counts not stored: {e}")
+            return 0
+        self.stats["count_rows"] += len(rows)
+        self.note_rollup_since(min(row[3] for row in rows))
+        return len(rows)
+
+    def note_rollup_since(self, recorded_at):
+        """Counts from recorded_at (epoch) on are in the raw table but maybe not in the rollups yet."""
+        with self._lock:
+            if self._rollup_since is None or recorded_at < self._rollup_since:
+                self._rollup_since = recorded_at
+
+    def take_rollup_since(self):
+        """Oldest recorded_at (epoch) flushed since the last call, or None. Re-note it if the rollup fails."""
+        with self._lock:
+            since, self._rollup_since = self._rollup_since, None
+        return since
+
+    def _requeue(self, latest, counts, replayed):
+        """DB unavailable: keep state for the next flush (newer submissions win)."""
+        with self._lock:
+            for jid, row in latest.items():
+                self._latest.setdefault(jid, row)
+            self._counts[:0] = counts
+            self._replayed[:0] = replayed
+            self._trim(self._counts)
+            self._trim(self._replayed)
@@ -0,0 +1,365 @@
+"""
+History Store - Partitioned Raw History + Time-Series Rollups (CMS)
+Role: Keep dashboard history queries cheap as data accumulates.
+
+Raw tables (PARTITION BY RANGE, one partition per UTC day):
+    directional_counts   per-heartbeat movement counts (heartbeat writer)
+    saturation_history   per-junction saturation snapshot every 60 s
+                         (log_snapshot: one INSERT ... SELECT from junction_status)
+
+Rollups (upserted, recomputed over a short lateness window each run):
+    traffic_rollup_{1m,15m,1h}      vehicles per junction / phase / movement
+    saturation_rollup_{1m,15m,1h}   avg / max saturation + sample count
+    1m is built from the raw tables, 15m from 1m, 1h from 15m.
+
+Retention: raw partitions older than HISTORY_RETENTION_DAYS are DROPped
+(no DELETE scans); rollup rows expire per resolution (ROLLUP_RETENTION_DAYS).
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+from psycopg2.extras import execute_values
+
+RESOLUTIONS = {"1m": 60, "15m": 900, "1h": 3600}      # Finest first (cascade order)
+RAW_TABLES = {"directional_counts": "recorded_at", "saturation_history": "ts"}
+ROLLUP_LATENESS = timedelta(minutes=15)               # Late / replayed rows still counted
+
+
+def _bucket(column, seconds):
+    return f"to_timestamp(floor(extract(epoch FROM {column}) / {seconds}) * {seconds})"
+
+
+def _floor(ts, seconds):
+    return datetime.fromtimestamp(int(ts.timestamp()) // seconds * seconds, tz=timezone.utc)
+
+
+def pick_resolution(hours):
+    """Coarsest-enough resolution for a dashboard window."""
+    if hours <= 6:
+        return "1m"
+    if hours <= 72:
+        return "15m"
+    return "1h"
+
+
+_SNAPSHOT_SQL = """
+    INSERT INTO saturation_history (junction_id, avg_saturation, total_flow_count, active_alerts, ts)
+    SELECT junction_id, saturation_level, 0,
+           CASE WHEN saturation_level > 95 THEN 'Gridlock'
+                WHEN saturation_level > 80 THEN 'Congested'
+                ELSE 'Normal' END,
+           NOW()
+    FROM junction_status
+"""
+_COUNTS_SQL = """
+    SELECT bucket, phase, movement, vehicles FROM traffic_rollup_{res}
+    WHERE junction_id = %s AND bucket >= %s
+    ORDER BY bucket
+"""
+_SATURATION_SQL = """
+    SELECT bucket, avg_saturation, max_saturation, samples FROM saturation_rollup_{res}
+    WHERE junction_id = %s AND bucket >= %s
+    ORDER BY bucket
+"""
+
+
+def _count_series(rows):
+    series = {}
+    for bucket, phase, movement, vehicles in rows:
+        point = series.setdefault(bucket.isoformat(), {})
+        point.setdefault(phase, {})[movement] = vehicles
+    return [{"bucket": b, "phases": p} for b, p in series.items()]
+
+
+def _saturation_series(rows):
+    return [{"bucket": b.isoformat(), "avg": round(a, 1), "max": round(m, 1), "samples": n}
+            for b, a, m, n in rows]
+
+
+class HistoryStore:
+    def __init__(self, get_connection, retention_days=30, rollup_retention_days=None):
+        self.module_name = "HISTORY"
+        self.get_connection = get_connection
+        self.retention_days = retention_days
+        self.rollup_retention_days = rollup_retention_days or {"1m": 7, "15m": 90, "1h": 730}
+        self.snapshot_stats = {"snapshots": 0, "rows": 0, "last_ms": 0.0, "max_ms": 0.0, "errors": 0}
+
+    # ─────────────────────────────────────────────────────────
+    # SCHEMA + PARTITIONS
+    # ─────────────────────────────────────────────────────────
+
+    def ensure_schema(self, cur):
+        """Creates (or migrates to) the partitioned tables and rollups. Caller commits."""
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS saturation_history (
+                junction_id TEXT NOT NULL,
+                avg_saturation FLOAT DEFAULT 0.0,
+                total_flow_count INTEGER DEFAULT 0,
+                active_alerts TEXT DEFAULT 'Normal',
+                ts TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            ) PARTITION BY RANGE (ts)
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_sh_junction_ts ON saturation_history (junction_id, ts)")
+        self._ensure_partitioned_counts(cur)
+
+        for res in RESOLUTIONS:
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS traffic_rollup_{res} (
+                    junction_id TEXT NOT NULL,
+                    phase TEXT NOT NULL,
+                    movement TEXT NOT NULL,
+                    bucket TIMESTAMPTZ NOT NULL,
+                    vehicles BIGINT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (junction_id, bucket, phase, movement)
+                )
+            """)
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS saturation_rollup_{res} (
+                    junction_id TEXT NOT NULL,
+                    bucket TIMESTAMPTZ NOT NULL,
+                    avg_saturation FLOAT NOT NULL,
+                    max_saturation FLOAT NOT NULL,
+                    samples INTEGER NOT NULL,
+                    PRIMARY KEY (junction_id, bucket)
+                )
+            """)
+        self.ensure_partitions(cur, days_back=self.retention_days)
+
+    def _ensure_partitioned_counts(self, cur):
+        cur.execute("SELECT relkind FROM pg_class WHERE relname = 'directional_counts' "
+                    "AND relnamespace = 'public'::regnamespace")
+        row = cur.fetchone()
+        if row and row[0] == 'p':
+            return
+
+        if row:
+            # Plain table from an older setup: keep it as *_legacy, copy recent rows below
+            print(f"🔧 [{self.module_name}] Migrating directional_counts to daily partitions...")
+            cur.execute("ALTER TABLE directional_counts RENAME TO directional_counts_legacy")
+        cur.execute("""
+            CREATE TABLE directional_counts (
+                junction_id TEXT NOT NULL,
+                phase TEXT NOT NULL,
+                counts_json JSONB NOT NULL,
+                recorded_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            ) PARTITION BY RANGE (recorded_at)
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_dcp_junction_time ON directional_counts (junction_id, recorded_at)")
+        if not row:
+            return
+
+        cur.execute("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_name = 'directional_counts_legacy'
+              AND column_name IN ('junction_id', 'phase', 'counts_json', 'recorded_at')
+        """)
+        if cur.fetchone()[0] == 4:
+            self.ensure_partitions(cur, days_back=self.retention_days)
+            cur.execute("""
+                INSERT INTO directional_counts (junction_id, phase, counts_json, recorded_at)
+                SELECT junction_id, phase, counts_json::jsonb, recorded_at
+                FROM directional_counts_legacy
+                WHERE recorded_at >= %s
+            """, (_floor(datetime.now(timezone.utc), 86400) - timedelta(days=self.retention_days),))
+            print(f"✅ [{self.module_name}] Copied {cur.rowcount} recent rows (old table kept as directional_counts_legacy)")
+
+    def ensure_partitions(self, cur, days_back=0, days_ahead=2):
+        """Daily partitions from today-days_back to today+days_ahead (idempotent)."""
+        today = _floor(datetime.now(timezone.utc), 86400)
+        for table in RAW_TABLES:
+            for offset in range(-days_back, days_ahead + 1):
+                day = today + timedelta(days=offset)
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table}_p{day:%Y%m%d} PARTITION OF {table}
+                    FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')
+                """)
+
+    def drop_expired(self, cur):
+        """DROPs raw partitions past retention and expires rollup rows. Returns dropped names."""
+        cutoff = _floor(datetime.now(timezone.utc), 86400) - timedelta(days=self.retention_days)
+        dropped = []
+        for table in RAW_TABLES:
+            cur.execute("""
+                SELECT c.relname FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                JOIN pg_class p ON p.oid = i.inhparent
+                WHERE p.relname = %s
+            """, (table,))
+            for (name,) in cur.fetchall():
+                try:
+                    day = datetime.strptime(name.rsplit("_p", 1)[1], "%Y%m%d").replace(tzinfo=timezone.utc)
+                except (IndexError, ValueError):
+                    continue  # Not one of ours
+                if day < cutoff:
+                    cur.execute(f"DROP TABLE IF EXISTS {name}")
+                    dropped.append(name)
+
+        now = datetime.now(timezone.utc)
+        for res, days in self.rollup_retention_days.items():
+            for kind in ("traffic", "saturation"):
+                cur.execute(f"DELETE FROM {kind}_rollup_{res} WHERE bucket < %s", (now - timedelta(days=days),))
+        return dropped
+
+    # ─────────────────────────────────────────────────────────
+    # WRITES
+    # ─────────────────────────────────────────────────────────
+
+    def record_saturation(self, cur, rows, ts=None):
+        """rows: [(junction_id, avg_saturation, total_flow_count, active_alerts)] in one INSERT."""
+        ts = ts or datetime.now(timezone.utc)
+        execute_values(cur, """
+            INSERT INTO saturation_history (junction_id, avg_saturation, total_flow_count, active_alerts, ts)
+            VALUES %s
+        """, [(*row, ts) for row in rows])
+
+    def log_snapshot(self):
+        """
+        The 60 s saturation snapshot: one INSERT ... SELECT from junction_status
+        on one pooled connection, whatever the fleet size. Returns rows written.
+        """
+        conn = self.get_connection()
+        if not conn:
+            return None
+        t0 = time.perf_counter()
+        cur = conn.cursor()
+        try:
+            cur.execute(_SNAPSHOT_SQL)
+            conn.commit()
+            return self._snapshot_done(cur.rowcount, t0)
+        except Exception:
+            conn.rollback()
+            self.snapshot_stats["errors"] += 1
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    async def log_snapshot_async(self, db):
+        """log_snapshot on the async_db pool."""
+        t0 = time.perf_counter()
+        try:
+            status = await db.execute(_SNAPSHOT_SQL)  # "INSERT 0 <rows>"
+        except Exception:
+            self.snapshot_stats["errors"] += 1
+            raise
+        return self._snapshot_done(int(status.rsplit(" ", 1)[-1]), t0)
+
+    def _snapshot_done(self, rows, t0):
+        elapsed_ms = round((time.perf_counter() - t0) * 1000, 2)
+        stats = self.snapshot_stats
+        stats["snapshots"] += 1
+        stats["rows"] = rows
+        stats["last_ms"] = elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        return rows
+
+    # ─────────────────────────────────────────────────────────
+    # ROLLUPS
+    # ─────────────────────────────────────────────────────────
+
+    def rollup(self, cur, since=None, until=None):
+        """
+        Recomputes every rollup bucket that overlaps [since, until).
+        The window always covers the last ROLLUP_LATENESS (periodic job); pass
+        an older `since` to backfill. Returns {table: rows upserted}.
+        """
+        until = until or datetime.now(timezone.utc)
+        since = min(since, until - ROLLUP_LATENESS) if since else until - ROLLUP_LATENESS
+        upserted = {}
+        previous = None
+        for res, seconds in RESOLUTIONS.items():
+            start = _floor(since, seconds)
+            if previous is None:
+                traffic_src = f"""
+                    SELECT {_bucket('recorded_at', seconds)} AS b, junction_id, phase, kv.key,
+                           SUM((kv.value)::text::numeric)::bigint
+                    FROM directional_counts, jsonb_each(counts_json) AS kv
+                    WHERE recorded_at >= %s AND recorded_at < %s AND jsonb_typeof(kv.value) = 'number'
+                    GROUP BY 1, 2, 3, 4
+                """
+                saturation_src = f"""
+                    SELECT {_bucket('ts', seconds)} AS b, junction_id,
+                           AVG(avg_saturation), MAX(avg_saturation), COUNT(*)
+                    FROM saturation_history
+                    WHERE ts >= %s AND ts < %s
+                    GROUP BY 1, 2
+                """
+            else:
+                traffic_src = f"""
+                    SELECT {_bucket('bucket', seconds)} AS b, junction_id, phase, movement, SUM(vehicles)
+                    FROM traffic_rollup_{previous}
+                    WHERE bucket >= %s AND bucket < %s
+                    GROUP BY 1, 2, 3, 4
+                """
+                saturation_src = f"""
+                    SELECT {_bucket('bucket', seconds)} AS b, junction_id,
+                           SUM(avg_saturation * samples) / SUM(samples), MAX(max_saturation), SUM(samples)
+                    FROM saturation_rollup_{previous}
+                    WHERE bucket >= %s AND bucket < %s
+                    GROUP BY 1, 2
+                """
+
+            cur.execute(f"""
+                INSERT INTO traffic_rollup_{res} (bucket, junction_id, phase, movement, vehicles)
+                {traffic_src}
+                ON CONFLICT (junction_id, bucket, phase, movement) DO UPDATE SET vehicles = EXCLUDED.vehicles
+            """, (start, until))
+            upserted[f"traffic_rollup_{res}"] = cur.rowcount
+
+            cur.execute(f"""
+                INSERT INTO saturation_rollup_{res} (bucket, junction_id, avg_saturation, max_saturation, samples)
+                {saturation_src}
+                ON CONFLICT (junction_id, bucket) DO UPDATE SET
+                    avg_saturation = EXCLUDED.avg_saturation,
+                    max_saturation = EXCLUDED.max_saturation,
+                    samples = EXCLUDED.samples
+            """, (start, until))
+            upserted[f"saturation_rollup_{res}"] = cur.rowcount
+            previous = res
+        return upserted
+
+    def run_maintenance(self, full=False, since=None):
+        """
+        Periodic job: rollups every call (back to `since` when late rows were
+        ingested); partitions + retention when full=True (once a day). Runs on
+        its own connection; returns a summary dict (None on failure).
+        """
+        conn = self.get_connection()
+        if not conn:
+            return None
+        cur = conn.cursor()
+        try:
+            summary = {"rollup": self.rollup(cur, since=since)}
+            if full:
+                self.ensure_partitions(cur)
+                summary["dropped"] = self.drop_expired(cur)
+                if summary["dropped"]:
+                    print(f"🧹 [{self.module_name}] Dropped partitions: {', '.join(summary['dropped'])}")
+            conn.commit()
+            return summary
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠️ [{self.module_name}] Maintenance failed: {e}")
+            return None
+        finally:
+            cur.close()
+            conn.close()
+
+    # ─────────────────────────────────────────────────────────
+    # DASHBOARD QUERIES (rollups only)
+    # ─────────────────────────────────────────────────────────
+
+    def query_counts(self, cur, junction_id, since, resolution):
+        cur.execute(_COUNTS_SQL.format(res=resolution), (junction_id, since))
+        return _count_series(cur.fetchall())
+
+    def query_saturation(self, cur, junction_id, since, resolution):
+        cur.execute(_SATURATION_SQL.format(res=resolution), (junction_id, since))
+        return _saturation_series(cur.fetchall())
+
+    async def query_counts_async(self, conn, junction_id, since, resolution):
+        return _count_series(await conn.fetch(_COUNTS_SQL.format(res=resolution), junction_id, since))
+
+    async def query_saturation_async(self, conn, junction_id, since, resolution):
+        return _saturation_series(await conn.fetch(_SATURATION_SQL.format(res=resolution), junction_id, since))
@@ -0,0 +1,211 @@
+"""
+HTTP Dispatcher - Bounded Outbound HTTP for the Edge Node
+Role: One shared worker pool + pooled keep-alive session for every POST the
+      edge sends (outbox replay: CMS, SafeDrive credits, CARLA decisions),
+      instead of a short-lived thread per request.
+
+Features:
+1. Bounded: `workers` threads and at most `max_queue` queued requests;
+   submit() on a full queue drops (counted) instead of growing.
+2. Per-destination concurrency limit: a slow backend holds at most
+   `per_dest_limit` workers; other destinations keep flowing. Each
+   (dest, path) has at most one request in flight, so its requests arrive
+   in submission order.
+3. Batching: requests to a registered (dest, path) are sent as one JSON
+   array POST to its batch path (up to max_items per request). A batch
+   path the server does not have (404 / 405) is a retry, not a rejection:
+   batching is switched off for that key and the items go out one by one.
+4. Fail-fast: when a destination fails, requests already queued for it are
+   failed at once rather than each waiting for its own timeout.
+
+Results (Future.result()): True delivered, False retry later, None rejected (4xx).
+"""
+
+import json
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpDispatcher:
+    def __init__(self, workers=4, max_queue=1000, per_dest_limit=2, timeout=2.0, session=None):
+        self.module_name = "HTTP_DISPATCH"
+        self.max_queue = max_queue
+        self.per_dest_limit = per_dest_limit
+        self.timeout = timeout
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max(workers, per_dest_limit), max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"Content-Type": "application/json"})
+        self.session = session
+
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()   # {(dest, path): deque[(body, future)]}
+        self._depth = 0
+        self._in_flight = {}            # {dest: active requests}
+        self._busy = set()              # (dest, path) keys with a request in flight (FIFO per key)
+        self._batch = {}                # {(dest, path): (batch_path, max_items, single)}
+        self._stop = False
+
+        self.stats = {"submitted": 0, "sent": 0, "failed": 0, "rejected": 0, "dropped": 0,
+                      "fast_failed": 0, "batches": 0, "batched_items": 0}
+
+        self._threads = [threading.Thread(target=self._worker, daemon=True, name=f"HTTP-Worker-{i}")
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    # ─────────────────────────────────────────────────────────
+    # PUBLIC API
+    # ─────────────────────────────────────────────────────────
+
+    def register_batch(self, dest, path, batch_path, max_items=50, single=False):
+        """
+        Requests to dest+path are coalesced into JSON-array POSTs to
+        dest+batch_path. single=True sends a lone request as a one-element
+        array too (when only the batch route reports failures as errors).
+        """
+        self._batch[(dest, path)] = (batch_path, max_items, single)
+
+    def submit(self, dest, path, body):
+        """
+        Queue one POST (body: bytes or JSON-serialisable). Returns a Future, or
+        None if the queue is full (request dropped).
+        """
+        if not isinstance(body, (bytes, bytearray)):
+            body = json.dumps(body).encode("utf-8")
+        future = Future()
+        with self._cond:
+            if self._depth >= self.max_queue:
+                self.stats["dropped"] += 1
+                return None
+            self._pending.setdefault((dest, path), deque()).append((bytes(body), future))
+            self._depth += 1
+            self.stats["submitted"] += 1
+            self._cond.notify()
+        return future
+
+    def queue_depth(self):
+        with self._cond:
+            return self._depth
+
+    def snapshot(self):
+        with self._cond:
+            return {**self.stats, "queue_depth": self._depth,
+                    "in_flight": sum(self._in_flight.values())}
+
+    def close(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=self.timeout + 1)
+        self.session.close()
+
+    # ─────────────────────────────────────────────────────────
+    # WORKERS
+    # ─────────────────────────────────────────────────────────
+
+    def _take(self):
+        """Caller holds self._cond. Pops the next job whose key is idle and whose destination has capacity."""
+        for key, queue in self._pending.items():
+            dest = key[0]
+            if key in self._busy or self._in_flight.get(dest, 0) >= self.per_dest_limit:
+                continue
+            batch = self._batch.get(key)
+            count = min(len(queue), batch[1]) if batch else 1
+            items = [queue.popleft() for _ in range(count)]
+            if not queue:
+                del self._pending[key]
+            else:
+                self._pending.move_to_end(key)  # Round-robin across keys
+            self._depth -= count
+            self._in_flight[dest] = self._in_flight.get(dest, 0) + 1
+            self._busy.add(key)
+            return key, items
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._take()
+                while job is None:
+                    if self._stop:
+                        return
+                    self._cond.wait(timeout=1.0)
+                    job = self._take()
+
+            (dest, path), items = job
+            result = self._post(dest, path, items)
+
+            fast_failed = []
+            with self._cond:
+                self._in_flight[dest] -= 1
+                self.stats["sent" if result else ("failed" if result is False else "rejected")] += len(items)
+                if len(items) > 1:
+                    self.stats["batches"] += 1
+                    self.stats["batched_items"] += len(items)
+                if result is False:
+                    fast_failed = self._fail_pending(dest)
+                self._busy.discard((dest, path))  # After the fail-fast: nothing later on this key can overtake
+                self._cond.notify_all()
+
+            for _, future in items:
+                future.set_result(result)
+            for future in fast_failed:
+                future.set_result(False)
+
+    def _fail_pending(self, dest):
+        """Caller holds self._cond. Fails everything still queued for dest."""
+        futures = []
+        for key in [k for k in self._pending if k[0] == dest]:
+            futures.extend(f for _, f in self._pending.pop(key))
+        self._depth -= len(futures)
+        self.stats["fast_failed"] += len(futures)
+        return futures
+
+    def _post(self, dest, path, items):
+        batch = self._batch.get((dest, path))
+        batched = bool(batch) and (len(items) > 1 or batch[2])
+        if batched:
+            url = f"{dest}{batch[0]}"
+            body = b"[" + b",".join(b for b, _ in items) + b"]"
+        else:
+            url, body = f"{dest}{path}", items[0][0]
+        try:
+            resp = self.session.post(url, data=body, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            return False
+        if resp.status_code < 400:
+            return True
+        if batched and resp.status_code in (404, 405):
+            # No batch route on this server: never drop the items for that
+            print(f"⚠️ [{self.module_name}] {url} -> {resp.status_code}, sending {dest}{path} unbatched")
+            self._batch.pop((dest, path), None)
+            return False
+        if resp.status_code in (408, 429) or resp.status_code >= 500:
+            return False
+        return None  # 4xx: the server will never accept this request
+
+
+# --- SHARED INSTANCE ---
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Process-wide dispatcher (edge outbox drainer and any other outbound POSTs)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            from config.settings import SystemConfig
+            _shared = HttpDispatcher(workers=getattr(SystemConfig, "HTTP_DISPATCH_WORKERS", 4),
+                                     max_queue=getattr(SystemConfig, "HTTP_DISPATCH_QUEUE", 1000),
+                                     per_dest_limit=getattr(SystemConfig, "HTTP_DISPATCH_PER_DEST", 2))
+        return _shared
@@ -0,0 +1,24 @@
+"""
+HTTP Protocol - uvicorn protocol with TCP_NODELAY for multi-worker CMS runs
+Role: With --workers N, uvicorn binds the listening socket itself
+      (socket.socket(family=...), proto 0) and asyncio only sets TCP_NODELAY
+      when proto == IPPROTO_TCP. Responses are written as headers + body, so
+      without it every keep-alive request waits ~40 ms for a delayed ACK.
+
+Usage: uvicorn cms_layer.server:app --workers 4 --http cms_layer.http_protocol:NoDelayHTTPProtocol
+"""
+
+import socket
+
+from uvicorn.protocols.http.auto import AutoHTTPProtocol
+
+
+class NoDelayHTTPProtocol(AutoHTTPProtocol):
+    def connection_made(self, transport):
+        sock = transport.get_extra_info("socket")
+        if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError:
+                pass
+        super().connection_made(transport)
@@ -0,0 +1,94 @@
+"""
+Leader Lease - One CMS Worker Runs the Periodic Jobs
+Role: With CMS_WORKERS > 1 every uvicorn worker runs the startup hook, but
+      the history snapshot, rollups, partition management and ledger pruning
+      must run once per cluster, not once per worker.
+
+The lease is a session-level pg_try_advisory_lock held on a connection the
+leader keeps checked out. PostgreSQL releases it when that connection dies
+(worker crash, DB restart), and the next worker to ask takes over. held()
+is cheap for the leader (SELECT 1 on its own connection) and for the others
+(one try-lock on a pooled connection that goes straight back).
+"""
+
+import threading
+
+_LEADER_LOCK_KEY = 0x4C454144  # "LEAD" - periodic jobs across all CMS workers
+
+
+class LeaderLease:
+    def __init__(self, get_connection, key=_LEADER_LOCK_KEY):
+        """
+        Args:
+            get_connection: Zero-arg callable returning a DB connection (or None)
+            key:            Advisory lock key shared by every CMS process
+        """
+        self.module_name = "LEADER"
+        self.get_connection = get_connection
+        self.key = key
+        self._conn = None
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "lost": 0}
+
+    def held(self):
+        """True if this worker is (or just became) the leader."""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    cur = self._conn.cursor()
+                    cur.execute("SELECT 1")
+                    cur.fetchone()
+                    cur.close()
+                    self._conn.commit()
+                    return True
+                except Exception as e:
+                    print(f"⚠️ [{self.module_name}] Lease connection lost ({e}) - re-electing")
+                    self.stats["lost"] += 1
+                    self._drop()
+            return self._try_acquire()
+
+    def release(self):
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    cur = self._conn.cursor()
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (self.key,))
+                    self._conn.commit()
+                except Exception:
+                    pass
+                self._drop()
+
+    def _try_acquire(self):
+        """Caller holds self._lock."""
+        conn = self.get_connection()
+        if conn is None:
+            return False
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (self.key,))
+            won = cur.fetchone()[0]
+            cur.close()
+            conn.commit()  # Session lock: survives the commit, not idle in a transaction
+        except Exception as e:
+            print(f"⚠️ [{self.module_name}] Lease check failed: {e}")
+            self._discard(conn)
+            return False
+        if not won:
+            conn.close()  # Another worker leads
+            return False
+        self._conn = conn
+        self.stats["acquired"] += 1
+        print(f"👑 [{self.module_name}] This worker now runs the periodic jobs")
+        return True
+
+    def _drop(self):
+        conn, self._conn = self._conn, None
+        self._discard(conn)
+
+    @staticmethod
+    def _discard(conn):
+        # Really close it: a pooled connection must not go back holding the session lock
+        try:
+            conn.discard() if hasattr(conn, "discard") else conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,176 @@
+"""
+Live Status Hub - Versioned In-Memory Snapshot for Dashboards (CMS)
+Role: /live_status used to hit junction_status on every poll. The heartbeat
+      path already holds the freshest state in memory, so dashboards are now
+      served from here:
+
+- publish(): called once per accepted heartbeat. The junction's JSON body
+  is serialised ONCE and stored in the StateBackend with a new global version.
+- snapshot(): full state as pre-serialised bytes + ETag ("v<version>");
+  rebuilt at most once per version, so N polling clients cost one join.
+- wait_for_change() / changes_since(): SSE subscribers wake on publish and
+  receive only the bodies of junctions that changed since their version.
+
+Reads pull only the rows newer than the local version from the backend, so
+with a shared backend every worker serves heartbeats ingested by the others
+(`poll_interval` bounds how late an SSE client on another worker hears it).
+publish() is thread-safe; waiters are woken with call_soon_threadsafe.
+"""
+
+import asyncio
+import json
+import threading
+from collections.abc import Mapping
+
+from .state_backend import InProcessBackend
+
+try:
+    import orjson
+except ImportError:  # Optional speed-up
+    orjson = None
+
+
+def _dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+class LiveStatusHub:
+    def __init__(self, backend=None, poll_interval=0.1):
+        self.module_name = "LIVE_STATUS"
+        self.backend = backend or InProcessBackend()
+        self.poll_interval = poll_interval if self.backend.shared else None
+        self._lock = threading.Lock()
+        self._version = 0
+        self._bodies = {}          # {junction_id: (version, body_bytes)}  local mirror of the backend
+        self._snapshot = (0, b"{}")
+        self._waiters = set()      # {(loop, asyncio.Event)}
+        self.stats = {"published": 0, "serialisations": 0, "snapshot_builds": 0, "not_modified": 0}
+
+    @property
+    def version(self) -> int:
+        return self._sync()
+
+    def publish(self, junction_id: str, state: dict):
+        body = _dumps(state)
+        self.backend.publish_status(junction_id, body)
+        self.stats["published"] += 1
+        self.stats["serialisations"] += 1
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def load(self, states: dict):
+        """Warm start (e.g. from junction_status): only junctions nobody has published yet."""
+        self._sync()
+        for jid, state in states.items():
+            if jid not in self._bodies:
+                self.backend.publish_status(jid, _dumps(state))
+
+    def _sync(self) -> int:
+        """Pulls rows newer than the local version; returns the current version."""
+        with self._lock:
+            current, rows = self.backend.status_since(self._version)
+            for jid, version, body in rows:
+                self._bodies[jid] = (version, body)
+            self._version = max(self._version, current)
+            return self._version
+
+    def get(self, junction_id: str):
+        self._sync()
+        entry = self._bodies.get(junction_id)
+        return json.loads(entry[1]) if entry else None
+
+    def junctions(self):
+        self._sync()
+        return list(self._bodies)
+
+    def snapshot(self):
+        """Returns (version, body_bytes) for the whole network."""
+        version = self._sync()
+        with self._lock:
+            if self._snapshot[0] != version:
+                self._snapshot = (version, self._join(self._bodies.items()))
+                self.stats["snapshot_builds"] += 1
+            return self._snapshot
+
+    def changes_since(self, version: int):
+        """Returns (current_version, body_bytes with only the junctions changed after `version`)."""
+        current = self._sync()
+        with self._lock:
+            return current, self._join((jid, e) for jid, e in self._bodies.items() if e[0] > version)
+
+    @staticmethod
+    def _join(entries):
+        return b"{" + b",".join(_dumps(jid) + b":" + body for jid, (_, body) in entries) + b"}"
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._waiters)
+
+    async def wait_for_change(self, version: int, timeout: float) -> bool:
+        """True when the version moved past `version` within `timeout` seconds."""
+        if self._sync() != version:
+            return True
+        loop = asyncio.get_running_loop()
+        entry = (loop, asyncio.Event())
+        with self._lock:
+            self._waiters.add(entry)
+        try:
+            deadline = loop.time() + timeout
+            while self._sync() == version:  # Also catches a publish between the check and registration
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return False
+                slice_s = remaining if self.poll_interval is None else min(remaining, self.poll_interval)
+                try:
+                    await asyncio.wait_for(entry[1].wait(), timeout=slice_s)
+                except asyncio.TimeoutError:
+                    pass
+                entry[1].clear()
+            return True
+        finally:
+            with self._lock:
+                self._waiters.discard(entry)
+
+    async def stream(self, since: int = None, keepalive: float = 15.0, max_events: int = None):
+        """
+        Server-sent events: one full `snapshot` event (unless resuming from
+        `since`, i.e. Last-Event-ID), then `update` events carrying only the
+        changed junctions. Comment lines keep idle connections open.
+        """
+        if since is None or since > self.version:
+            version, body = self.snapshot()
+            yield b"event: snapshot\nid: %d\ndata: " % version + body + b"\n\n"
+        else:
+            version = since
+        sent = 0
+        while max_events is None or sent < max_events:
+            if not await self.wait_for_change(version, keepalive):
+                yield b": keepalive\n\n"
+                continue
+            version, body = self.changes_since(version)
+            if body != b"{}":
+                yield b"event: update\nid: %d\ndata: " % version + body + b"\n\n"
+                sent += 1
+
+
+class StatusCache(Mapping):
+    """Read-only dict view of the hub: latest enriched heartbeat per junction."""
+
+    def __init__(self, hub: LiveStatusHub):
+        self._hub = hub
+
+    def __getitem__(self, junction_id):
+        state = self._hub.get(junction_id)
+        if state is None:
+            raise KeyError(junction_id)
+        return state
+
+    def __iter__(self):
+        return iter(self._hub.junctions())
+
+    def __len__(self):
+        return len(self._hub.junctions())
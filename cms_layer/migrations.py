@@ -0,0 +1,318 @@
+"""
+Migrations - Versioned, Non-Destructive CMS Schema Changes
+Role: Replaces the startup block that DROPped and recreated rto_registry /
+      user_rewards and re-seeded them row by row on every restart.
+
+- schema_migrations records every applied version; migrate() only runs the
+  ones that are missing, each in its own transaction, so a restart on an
+  up-to-date database is a single SELECT.
+- A PostgreSQL advisory lock serialises concurrent starters (several uvicorn
+  workers / CMS replicas): the first applies, the rest see nothing pending.
+- Migrations never drop data: tables with an incompatible older layout are
+  renamed to <table>_legacy_v<N> before the new layout is created.
+
+To change the schema, append a new (version, name, fn) entry - never edit an
+applied one. Every migration carries its own DDL (no helpers from other
+modules), so editing those modules cannot change what a version applies.
+"""
+
+import json
+import os
+import time
+
+from .bulk_loader import load_rto_profiles
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PROFILES_PATH = os.path.join(_PROJECT_ROOT, "config", "dummy_profiles_100.json")
+_LOCK_KEY = 0x534D4E54  # "SMNT" - pg_advisory_lock key shared by every CMS process
+
+
+def _core_tables(cur):
+    """Operational tables (all CREATE IF NOT EXISTS / ADD COLUMN IF NOT EXISTS)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS traffic_history_log (
+            id SERIAL PRIMARY KEY,
+            junction_id TEXT NOT NULL,
+            avg_saturation FLOAT DEFAULT 0.0,
+            total_flow_count INTEGER DEFAULT 0,
+            active_alerts TEXT DEFAULT 'Normal',
+            timestamp TIMESTAMP DEFAULT NOW()
+        )
+    """)
+    cur.execute("ALTER TABLE traffic_history_log ADD COLUMN IF NOT EXISTS avg_saturation FLOAT DEFAULT 0.0")
+    cur.execute("ALTER TABLE traffic_history_log ADD COLUMN IF NOT EXISTS total_flow_count INTEGER DEFAULT 0")
+    cur.execute("ALTER TABLE traffic_history_log ADD COLUMN IF NOT EXISTS active_alerts TEXT DEFAULT 'Normal'")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS junction_status (
+            junction_id TEXT PRIMARY KEY,
+            saturation_level FLOAT,
+            raw_data JSONB,
+            last_updated TIMESTAMP DEFAULT NOW()
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS active_interventions (
+            source_id TEXT PRIMARY KEY,
+            target_id TEXT,
+            reason TEXT,
+            timestamp TIMESTAMP DEFAULT NOW()
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS traffic_violations (
+            id SERIAL PRIMARY KEY,
+            junction_id TEXT NOT NULL,
+            plate_number TEXT DEFAULT 'PENDING',
+            violation_type TEXT NOT NULL,
+            violation_time TIMESTAMP DEFAULT NOW(),
+            evidence_url TEXT,
+            confidence FLOAT DEFAULT 0.0,
+            penalty_applied BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT NOW(),
+            status TEXT DEFAULT 'PENDING',
+            attributes JSONB DEFAULT '{}',
+            metadata JSONB DEFAULT '{}',
+            processed_at TIMESTAMP
+        )
+    """)
+
+
+def _app_sync_tables(cur):
+    """Users / vehicles / transactions (Cloud Auth Sync) incl. the local -> cloud column migration."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL,
+            full_name TEXT, -- Legacy Compatibility
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            mobile TEXT UNIQUE,
+            avatar_url TEXT,
+            total_earned_points INTEGER DEFAULT 0,
+            wallet_balance DECIMAL(10,2) DEFAULT 0.00,
+            role TEXT DEFAULT 'user',
+            last_login TIMESTAMP,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+    """)
+    cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS password_hash TEXT DEFAULT 'TEMP_HASH'")
+    cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS mobile TEXT UNIQUE")
+    cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS avatar_url TEXT")
+    cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS total_earned_points INTEGER DEFAULT 0")
+    cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS wallet_balance DECIMAL(10,2) DEFAULT 0.00")
+    cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS role TEXT DEFAULT 'user'")
+    cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS full_name TEXT")
+    cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS last_login TIMESTAMP")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS vehicles (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(user_id),
+            plate_number TEXT UNIQUE NOT NULL,
+            vehicle_type TEXT DEFAULT 'Car',
+            is_primary BOOLEAN DEFAULT FALSE,
+            rto_slot INTEGER DEFAULT 1, -- 1 for v1, 2 for v2
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+    """)
+    cur.execute("ALTER TABLE vehicles ADD COLUMN IF NOT EXISTS rto_slot INTEGER DEFAULT 1")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(user_id),
+            type TEXT NOT NULL, -- e.g., 'EARNED', 'REDEEMED'
+            amount INTEGER DEFAULT 0,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+    """)
+
+
+def _primary_key(cur, table):
+    cur.execute("""
+        SELECT a.attname FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = to_regclass(%s) AND i.indisprimary
+    """, (table,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def _set_aside(cur, table, expected_pk, version):
+    """Renames a table whose primary key is not `expected_pk` (older layout) instead of dropping it."""
+    cur.execute("SELECT to_regclass(%s)", (table,))
+    if cur.fetchone()[0] is None:
+        return
+    if _primary_key(cur, table) != [expected_pk]:
+        legacy = f"{table}_legacy_v{version}"
+        print(f"🔧 [MIGRATE] {table}: older layout kept as {legacy}")
+        cur.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+
+
+def _phone_identity(cur):
+    """RTO registry + user rewards keyed by phone_number (Dual-Vehicle profiles)."""
+    _set_aside(cur, "rto_registry", "phone_number", 3)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS rto_registry (
+            phone_number TEXT PRIMARY KEY,
+            email TEXT UNIQUE,
+            owner_name TEXT,
+            driver_license_id TEXT,
+
+            v1_plate TEXT UNIQUE,
+            v1_type TEXT DEFAULT 'Car',
+
+            v2_plate TEXT UNIQUE,
+            v2_type TEXT DEFAULT 'Car',
+
+            registered_at TIMESTAMP DEFAULT NOW()
+        )
+    """)
+
+    _set_aside(cur, "user_rewards", "phone_number", 3)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS user_rewards (
+            phone_number TEXT PRIMARY KEY,
+            user_id SERIAL,
+            email TEXT,
+            owner_name TEXT,
+            driver_license_id TEXT,
+
+            v1_plate TEXT,
+            v1_points INTEGER DEFAULT 0,
+            v1_type TEXT DEFAULT 'Car',
+
+            v2_plate TEXT,
+            v2_points INTEGER DEFAULT 0,
+            v2_type TEXT DEFAULT 'Car',
+
+            total_points INTEGER DEFAULT 0, -- Combined Score (V1 + V2)
+
+            vehicle_type TEXT DEFAULT 'Car', -- Legacy Compatibility
+            last_updated TIMESTAMP DEFAULT NOW(),
+            updated_at TIMESTAMP DEFAULT NOW()
+        )
+    """)
+    cur.execute("ALTER TABLE user_rewards ADD COLUMN IF NOT EXISTS total_points INTEGER DEFAULT 0")
+
+
+def _seed_rto_profiles(cur):
+    """Demo identities from dummy_profiles_100.json (one COPY + merge; rewards stay empty)."""
+    if not os.path.exists(PROFILES_PATH):
+        print(f"⚠️ [MIGRATE] {PROFILES_PATH} not found - RTO registry left empty")
+        return
+    with open(PROFILES_PATH, 'r') as f:
+        profiles = json.load(f)
+    loaded = load_rto_profiles(cur, profiles)
+    print(f"✅ [MIGRATE] RTO Registry seeded ({loaded} users, {loaded * 2} plates)")
+
+
+def _normalised_plates(cur):
+    """Indexed, write-maintained normalised plates (credit lookups no longer scan the registry)."""
+    for slot in ("v1", "v2"):
+        cur.execute(f"""
+            ALTER TABLE rto_registry ADD COLUMN IF NOT EXISTS {slot}_plate_norm TEXT
+            GENERATED ALWAYS AS (UPPER(REPLACE(REPLACE({slot}_plate, '-', ''), ' ', ''))) STORED
+        """)
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_rto_{slot}_plate_norm ON rto_registry ({slot}_plate_norm)")
+
+
+def _reward_credit_ledger(cur):
+    """Idempotency keys of applied /rewards/credit events (see reward_ledger.py)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS reward_credit_ledger (
+            idempotency_key TEXT PRIMARY KEY,
+            phone_number TEXT NOT NULL,
+            plate_number TEXT,
+            points INTEGER NOT NULL,
+            junction_id TEXT,
+            status TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_reward_ledger_created ON reward_credit_ledger (created_at)")
+
+
+def _app_db_outbox(cur):
+    """Credits waiting to be mirrored to the Mobile App DB (see app_db_outbox.py)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS app_db_outbox (
+            id BIGSERIAL PRIMARY KEY,
+            phone_number TEXT NOT NULL,
+            points INTEGER NOT NULL,
+            plate_number TEXT,
+            attempts INTEGER DEFAULT 0,
+            created_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """)
+
+
+def _violation_listing(cur):
+    """Columns older violation tables may lack (was re-run on every report) + keyset pagination indexes."""
+    cur.execute("ALTER TABLE traffic_violations ADD COLUMN IF NOT EXISTS status TEXT DEFAULT 'PENDING'")
+    cur.execute("ALTER TABLE traffic_violations ADD COLUMN IF NOT EXISTS attributes JSONB DEFAULT '{}'")
+    cur.execute("ALTER TABLE traffic_violations ADD COLUMN IF NOT EXISTS metadata JSONB DEFAULT '{}'")
+    cur.execute("ALTER TABLE traffic_violations ADD COLUMN IF NOT EXISTS processed_at TIMESTAMP")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_violations_created ON traffic_violations (created_at DESC, id DESC)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_violations_junction_created "
+                "ON traffic_violations (junction_id, created_at DESC, id DESC)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_violations_status_created "
+                "ON traffic_violations (status, created_at DESC, id DESC)")
+
+
+MIGRATIONS = [
+    (1, "core_tables", _core_tables),
+    (2, "app_sync_tables", _app_sync_tables),
+    (3, "phone_identity", _phone_identity),
+    (4, "seed_rto_profiles", _seed_rto_profiles),
+    (5, "normalised_plates", _normalised_plates),
+    (6, "reward_credit_ledger", _reward_credit_ledger),
+    (7, "app_db_outbox", _app_db_outbox),
+    (8, "violation_listing", _violation_listing),
+]
+
+
+def applied_versions(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT NOW(),
+            duration_ms FLOAT
+        )
+    """)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def migrate(conn, migrations=MIGRATIONS):
+    """Applies pending migrations in order. Returns the list of versions applied."""
+    cur = conn.cursor()
+    applied = []
+    try:
+        cur.execute("SELECT pg_advisory_lock(%s)", (_LOCK_KEY,))
+        done = applied_versions(cur)
+        conn.commit()
+        for version, name, fn in migrations:
+            if version in done:
+                continue
+            t0 = time.perf_counter()
+            try:
+                fn(cur)
+                cur.execute("INSERT INTO schema_migrations (version, name, duration_ms) VALUES (%s, %s, %s)",
+                            (version, name, round((time.perf_counter() - t0) * 1000, 1)))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                print(f"xx [MIGRATE] v{version} {name} failed - later migrations not applied")
+                raise
+            applied.append(version)
+            print(f"🔧 [MIGRATE] Applied v{version} {name}")
+    finally:
+        try:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (_LOCK_KEY,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+        cur.close()
+    return applied
@@ -0,0 +1,150 @@
+"""
+Plate Cache - Normalised Plate -> RTO Owner Resolution (CMS)
+Role: /rewards/credit resolves the same few thousand plates over and over
+      (ANPR re-detects a car at every junction it passes).
+
+- rto_registry carries v1_plate_norm / v2_plate_norm (generated on write by
+  PostgreSQL, indexed - see migrations.py), so a lookup is an index probe
+  instead of a REPLACE(REPLACE(...)) scan over every row.
+- PlateOwnerCache keeps the most recent resolutions in a bounded LRU.
+  Unregistered plates (ghosts) are cached too, with a shorter TTL.
+- invalidate() bumps a generation counter in a shared mapping (StateBackend
+  kv), so a registry change empties the cache in every worker.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+OWNER_BY_PLATE_SQL = """
+    SELECT email, owner_name, phone_number, driver_license_id, v1_plate, v1_type, v2_plate, v2_type
+    FROM rto_registry
+    WHERE v1_plate_norm = %s OR v2_plate_norm = %s
+    LIMIT 1
+"""
+
+OWNERS_BY_PLATES_SQL = """
+    SELECT v1_plate_norm, v2_plate_norm,
+           email, owner_name, phone_number, driver_license_id, v1_plate, v1_type, v2_plate, v2_type
+    FROM rto_registry
+    WHERE v1_plate_norm = ANY(%s) OR v2_plate_norm = ANY(%s)
+"""
+
+
+def normalize_plate(plate):
+    """'MH 12-AB-1234' -> 'MH12AB1234' (same rule as the generated *_plate_norm columns)."""
+    return (plate or "").replace("-", "").replace(" ", "").upper()
+
+
+class PlateOwnerCache:
+    def __init__(self, max_entries=50000, ttl=300.0, miss_ttl=30.0, shared=None):
+        """
+        Args:
+            max_entries: LRU bound (least recently used plate evicted first)
+            ttl:         Seconds a registered owner stays cached (covers
+                         registry edits made outside the CMS)
+            miss_ttl:    Seconds an unregistered plate stays cached
+            shared:      Mapping holding the "generation" counter; pass a
+                         StateBackend kv so invalidate() reaches every worker
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.shared = shared if shared is not None else {}
+        self._entries = OrderedDict()  # norm -> (expires_at, owner row or None)
+        self._generation = self.shared.get("generation", 0)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _check_generation(self):
+        generation = self.shared.get("generation", 0)
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, norm):
+        """Returns (cached, owner). owner is None for a cached unregistered plate."""
+        now = time.monotonic()
+        with self._lock:
+            self._check_generation()
+            entry = self._entries.get(norm)
+            if entry is None or entry[0] < now:
+                self.stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(norm)
+            self.stats["hits"] += 1
+            return True, entry[1]
+
+    def put(self, norm, owner, generation=None):
+        """generation: value seen before the DB read - a result older than an invalidate() is dropped."""
+        expires = time.monotonic() + (self.ttl if owner is not None else self.miss_ttl)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[norm] = (expires, owner)
+            self._entries.move_to_end(norm)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self):
+        """Registry changed: drop every cached resolution (all workers)."""
+        with self._lock:
+            self._generation = self.shared.get("generation", 0) + 1
+            self.shared["generation"] = self._generation
+            self._entries.clear()
+            self.stats["invalidations"] += 1
+
+    def resolve(self, cur, plate):
+        """Owner row (OWNER_BY_PLATE_SQL columns) for `plate`, or None if not registered."""
+        norm = normalize_plate(plate)
+        cached, owner = self.get(norm)
+        if cached:
+            return owner
+        generation = self._generation
+        cur.execute(OWNER_BY_PLATE_SQL, (norm, norm))
+        owner = cur.fetchone()
+        owner = tuple(owner) if owner is not None else None
+        self.put(norm, owner, generation)
+        return owner
+
+    def resolve_many(self, cur, plates):
+        """{normalised plate: owner row or None} for every plate; cache misses in one query."""
+        owners, missing = self._cached(plates)
+        if missing:
+            generation = self._generation
+            cur.execute(OWNERS_BY_PLATES_SQL, (missing, missing))
+            self._fill(owners, missing, cur.fetchall(), generation)
+        return owners
+
+    async def resolve_many_async(self, conn, plates):
+        """resolve_many on an async_db.AsyncConn."""
+        owners, missing = self._cached(plates)
+        if missing:
+            generation = self._generation
+            self._fill(owners, missing, await conn.fetch(OWNERS_BY_PLATES_SQL, missing, missing), generation)
+        return owners
+
+    def _cached(self, plates):
+        owners, missing = {}, []
+        for norm in {normalize_plate(p) for p in plates}:
+            cached, owner = self.get(norm)
+            if cached:
+                owners[norm] = owner
+            else:
+                missing.append(norm)
+        return owners, missing
+
+    def _fill(self, owners, missing, rows, generation):
+        found = {}
+        for v1_norm, v2_norm, *owner in rows:
+            found[v1_norm] = found[v2_norm] = tuple(owner)
+        for norm in missing:
+            owners[norm] = found.get(norm)
+            self.put(norm, owners[norm], generation)
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {**self.stats, "entries": len(self._entries), "generation": self._generation,
+                    "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0}
@@ -0,0 +1,153 @@
+"""
+Reward Ledger - Idempotent, Set-Based Reward Credits (CMS)
+Role: Apply N /rewards/credit events in one transaction, exactly once each.
+
+- Every credit may carry a client-generated idempotency_key (the edge creates
+  it when the credit enters its outbox, so every retry reuses it). Keys are
+  claimed with one INSERT ... ON CONFLICT DO NOTHING RETURNING into
+  reward_credit_ledger; a key that is already there is answered DUPLICATE
+  and changes nothing.
+- Owners are resolved for all plates at once (PlateOwnerCache.resolve_many).
+- Balances change with one multi-row upsert into user_rewards, points summed
+  per phone number first (ON CONFLICT cannot touch the same row twice).
+
+The caller commits; the ledger rows and the balance changes share that commit.
+apply_credits_async is the same three steps on an asyncpg connection
+(async_db), with unnest() arrays in place of execute_values.
+"""
+
+from psycopg2.extras import execute_values
+
+from .plate_cache import normalize_plate
+
+_UPSERT_REWARDS_HEAD = """
+    INSERT INTO user_rewards
+    (phone_number, email, owner_name, driver_license_id, v1_plate, v1_points, v2_plate, v2_points)
+"""
+_UPSERT_REWARDS_CONFLICT = """
+    ON CONFLICT (phone_number) DO UPDATE SET
+    email = COALESCE(EXCLUDED.email, user_rewards.email),
+    owner_name = EXCLUDED.owner_name,
+    driver_license_id = COALESCE(EXCLUDED.driver_license_id, user_rewards.driver_license_id),
+    v1_plate = EXCLUDED.v1_plate,
+    v2_plate = COALESCE(EXCLUDED.v2_plate, user_rewards.v2_plate),
+    v1_points = user_rewards.v1_points + EXCLUDED.v1_points,
+    v2_points = user_rewards.v2_points + EXCLUDED.v2_points,
+    last_updated = NOW(),
+    updated_at = NOW()
+"""
+_UPSERT_REWARDS_SQL = _UPSERT_REWARDS_HEAD + "VALUES %s" + _UPSERT_REWARDS_CONFLICT
+_UPSERT_REWARDS_UNNEST_SQL = (_UPSERT_REWARDS_HEAD
+                              + "SELECT * FROM unnest(%s::text[], %s::text[], %s::text[], %s::text[], "
+                                "%s::text[], %s::int[], %s::text[], %s::int[])"
+                              + _UPSERT_REWARDS_CONFLICT)
+
+_LEDGER_COLUMNS = "idempotency_key, phone_number, plate_number, points, junction_id, status"
+_CLAIM_SQL = f"""
+    INSERT INTO reward_credit_ledger ({_LEDGER_COLUMNS})
+    VALUES %s ON CONFLICT (idempotency_key) DO NOTHING RETURNING idempotency_key
+"""
+_CLAIM_UNNEST_SQL = f"""
+    INSERT INTO reward_credit_ledger ({_LEDGER_COLUMNS})
+    SELECT * FROM unnest(%s::text[], %s::text[], %s::text[], %s::int[], %s::text[], %s::text[])
+    ON CONFLICT (idempotency_key) DO NOTHING RETURNING idempotency_key
+"""
+
+
+def prune_ledger(cur, retention_days):
+    """Keys older than any edge retry window can go (the edge outbox keeps entries <= 24 h)."""
+    cur.execute("DELETE FROM reward_credit_ledger WHERE created_at < NOW() - make_interval(days => %s)",
+                (retention_days,))
+    return cur.rowcount
+
+
+def _target(credit, owner):
+    """(phone, status, row_template, slot) for one credit."""
+    if owner is None:
+        # Ghost Data: unregistered plate, points parked on the plate itself
+        return f"ghost_{credit.plate_number}", "GHOST_RECORDED", (None, "Ghost Owner", None, credit.plate_number, None), 1
+    email, name, phone, license_id, v1_plate, _, v2_plate, _ = owner
+    slot = 1 if normalize_plate(credit.plate_number) == normalize_plate(v1_plate) else 2
+    return phone, "CREDITED", (email, name, license_id, v1_plate, v2_plate), slot
+
+
+def _ledger_rows(credits, targets, results):
+    """Step 1 input: ledger rows to claim (first occurrence of a key in the batch wins)."""
+    seen, rows = set(), []
+    for i, (credit, (phone, status, _, _)) in enumerate(zip(credits, targets)):
+        key = getattr(credit, "idempotency_key", None)
+        if key is None:
+            continue
+        if key in seen:
+            results[i] = {"status": "DUPLICATE", "idempotency_key": key}
+            continue
+        seen.add(key)
+        rows.append((key, phone, credit.plate_number, credit.points, credit.junction_id, status))
+    return rows
+
+
+def _tally(credits, targets, results, claimed):
+    """Step 2: sums the surviving credits per phone. Returns (upsert rows, credited)."""
+    balances, credited = {}, []
+    for i, (credit, (phone, status, template, slot)) in enumerate(zip(credits, targets)):
+        key = getattr(credit, "idempotency_key", None)
+        if results[i] is not None:
+            continue
+        if key is not None and key not in claimed:
+            results[i] = {"status": "DUPLICATE", "idempotency_key": key}
+            continue
+        entry = balances.setdefault(phone, [template, 0, 0])
+        entry[slot] += credit.points
+        results[i] = {"status": status, "phone_number": phone}
+        if status == "CREDITED":
+            credited.append((phone, credit.points, credit.plate_number))
+    rows = [(phone, email, name, license_id, v1_plate, v1_points, v2_plate, v2_points)
+            for phone, ((email, name, license_id, v1_plate, v2_plate), v1_points, v2_points) in balances.items()]
+    return rows, credited
+
+
+def apply_credits(cur, credits, owners):
+    """
+    Args:
+        credits: Objects with plate_number, points, junction_id and an
+                 optional idempotency_key (RewardCredit)
+        owners:  {normalised plate: RTO owner row or None} for those plates
+    Returns (results, credited):
+        results:  one dict per credit, in order ({"status", "phone_number"})
+        credited: [(phone, points, plate)] newly applied to registered owners
+                  (what the app DB mirror needs)
+    """
+    results = [None] * len(credits)
+    targets = [_target(c, owners.get(normalize_plate(c.plate_number))) for c in credits]
+
+    # 1. Claim idempotency keys
+    ledger_rows = _ledger_rows(credits, targets, results)
+    claimed = set()
+    if ledger_rows:
+        claimed = {row[0] for row in execute_values(cur, _CLAIM_SQL, ledger_rows,
+                                                    page_size=len(ledger_rows), fetch=True)}
+
+    # 2. Sum the surviving credits per phone number
+    rows, credited = _tally(credits, targets, results, claimed)
+
+    # 3. One multi-row upsert for every affected profile
+    if rows:
+        execute_values(cur, _UPSERT_REWARDS_SQL, rows, page_size=len(rows))
+    return results, credited
+
+
+async def apply_credits_async(conn, credits, owners):
+    """apply_credits on an async_db.AsyncConn (column arrays through unnest)."""
+    results = [None] * len(credits)
+    targets = [_target(c, owners.get(normalize_plate(c.plate_number))) for c in credits]
+
+    ledger_rows = _ledger_rows(credits, targets, results)
+    claimed = set()
+    if ledger_rows:
+        claimed = {row[0] for row in await conn.fetch(_CLAIM_UNNEST_SQL, *map(list, zip(*ledger_rows)))}
+
+    rows, credited = _tally(credits, targets, results, claimed)
+
+    if rows:
+        await conn.execute(_UPSERT_REWARDS_UNNEST_SQL, *map(list, zip(*rows)))
+    return results, credited
@@ -1,11 +1,14 @@
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Dict, List, Optional
 import uvicorn
 import os
 import json
+import time
 import asyncio
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from psycopg2.extras import RealDictCursor
 from config.settings import SystemConfig
@@ -35,41 +38,114 @@ app.add_middleware(
 )
 
 # --- DATABASE CONNECTION (Unified) ---
-from .cloud_db_handler import get_db_connection
+from .cloud_db_handler import db as db_handler, get_db_connection
+from .async_db import get_async_db
+from .command_bus import CommandBus
+from .heartbeat_aggregator import HeartbeatAggregator
+from .history_store import HistoryStore, RESOLUTIONS, pick_resolution
+from .leader import LeaderLease
+from .live_status import LiveStatusHub, StatusCache
+from .migrations import migrate
+from .app_db_outbox import AppDbRelay, enqueue as enqueue_app_db_sync, enqueue_async as enqueue_app_db_sync_async
+from .plate_cache import PlateOwnerCache
+from .reward_ledger import apply_credits, apply_credits_async, prune_ledger
+from .state_backend import get_state_backend
+from .violation_pages import (decode_cursor as decode_violation_cursor, fetch_page as fetch_violation_page,
+                              fetch_page_async as fetch_violation_page_async)
+from .throttle_graph import ThrottleController, ThrottleGraph
+
+history = HistoryStore(get_db_connection, retention_days=getattr(SystemConfig, "HISTORY_RETENTION_DAYS", 30))
+leader = LeaderLease(get_db_connection)  # Periodic jobs run in one worker only (CMS_WORKERS > 1)
+
+# --- ASYNC DB (CMS_DB_DRIVER=asyncpg; None = psycopg2 only) ---
+async_db = get_async_db(db_handler, SystemConfig)
+
+async def _db_call(async_fn, sync_fn, *args):
+    """async_fn on the asyncpg pool when it is enabled and up, else sync_fn (psycopg2) in the threadpool."""
+    if async_db is not None and async_db.available:
+        return await async_fn(*args)
+    return await asyncio.to_thread(sync_fn, *args)
 
 # --- BACKGROUND TASK: HISTORY LOGGER (Gap 4 Solution) ---
 async def log_history_task():
     """
-    Runs in background to snapshot traffic state every 60s for Analytics.
+    Runs in background to snapshot traffic state every 60s for Analytics
+    (one INSERT ... SELECT from junction_status into the partitioned
+    saturation_history: a single round-trip whatever the fleet size).
+    Leader worker only: one snapshot row per junction per minute.
     """
     while True:
         await asyncio.sleep(60) # Wait 1 minute
-        conn = get_db_connection()
-        if conn:
-            try:
-                cur = conn.cursor()
-                # Aggregate data from live status
-                cur.execute("SELECT junction_id, saturation_level FROM junction_status")
-                rows = cur.fetchall()
-                
-                for row in rows:
-                    jid, sat = row
-                    alert_status = "Normal"
-                    if sat > 80: alert_status = "Congested"
-                    if sat > 95: alert_status = "Gridlock"
-                    
-                    # Insert into History Log
-                    cur.execute("""
-                        INSERT INTO traffic_history_log (junction_id, avg_saturation, total_flow_count, active_alerts)
-                        VALUES (%s, %s, %s, %s)
-                    """, (jid, sat, 0, alert_status)) # 0 flow count placeholder for now
-                
-                conn.commit()
-                print("📝 [HISTORY] Traffic Snapshot saved to Database.")
-            except Exception as e:
-                print(f"History Log Error: {e}")
-            finally:
-                conn.close()
+        try:
+            if not await asyncio.to_thread(leader.held):
+                continue
+            rows = await _db_call(lambda: history.log_snapshot_async(async_db), history.log_snapshot)
+            if rows is not None:
+                print(f"📝 [HISTORY] Traffic Snapshot saved to Database "
+                      f"({rows} junctions, {history.snapshot_stats['last_ms']:.1f}ms).")
+        except Exception as e:
+            print(f"History Log Error: {e}")
+
+
+# --- BACKGROUND TASK: ROLLUPS + RETENTION ---
+async def history_maintenance_task():
+    """
+    Every 60s: recompute recent 1m/15m/1h rollups, reaching back to the
+    oldest directional counts flushed since the last run (replayed heartbeats
+    can be hours old). Once a day (and at start): create upcoming daily
+    partitions and DROP partitions past retention.
+    Leader worker only; the others hand their late-count marks over through
+    the shared state backend.
+    """
+    last_full_day = None
+    while True:
+        late = heartbeat_writer.take_rollup_since()
+        if not await asyncio.to_thread(leader.held):
+            last_full_day = None  # Run the daily part at once if this worker takes over
+            if late is not None:
+                _share_rollup_since(late)
+            await asyncio.sleep(60)
+            continue
+        late = _collect_rollup_since(late)
+        today = time.strftime("%Y-%m-%d", time.gmtime())
+        full = today != last_full_day
+        since = datetime.fromtimestamp(late, timezone.utc) if late is not None else None
+        summary = await asyncio.to_thread(history.run_maintenance, full, since)
+        if summary is None and late is not None:
+            heartbeat_writer.note_rollup_since(late)  # Retry the backfill next run
+        if full and summary is not None:
+            last_full_day = today
+            await asyncio.to_thread(_prune_reward_ledger)
+        await asyncio.sleep(60)
+
+def _share_rollup_since(late):
+    """Non-leader: leave this worker's oldest flushed recorded_at for the leader's next rollup."""
+    key = str(os.getpid())
+    previous = rollup_marks.get(key)
+    rollup_marks[key] = late if previous is None else min(previous, late)
+
+def _collect_rollup_since(late):
+    """Leader: oldest recorded_at across its own flushes and every worker's mark."""
+    for key, _ in list(rollup_marks.items()):
+        mark = rollup_marks.pop(key, None)
+        if mark is not None:
+            late = mark if late is None else min(late, mark)
+    return late
+
+def _prune_reward_ledger():
+    conn = get_db_connection()
+    if not conn: return
+    try:
+        cur = conn.cursor()
+        removed = prune_ledger(cur, getattr(SystemConfig, "REWARD_LEDGER_RETENTION_DAYS", 7))
+        conn.commit()
+        if removed:
+            print(f"🧹 [REWARD] Pruned {removed} expired idempotency keys")
+    except Exception as e:
+        print(f"⚠️ [REWARD] Ledger prune failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
 
 @app.on_event("startup")
 async def startup_event():
@@ -77,229 +153,39 @@ async def startup_event():
     if JUNCTION_ID not in TOPOLOGY_NODES:
         print(f"⚠️  [SERVER] Warning: ID '{JUNCTION_ID}' not found in Topology!")
     
-    # Start the history logger when server starts
+    # Start the history logger + rollup/retention job when server starts
     asyncio.create_task(log_history_task())
+    asyncio.create_task(history_maintenance_task())
+    app_db_relay.start()
+    if async_db is not None:
+        await async_db.start()
 
-    # --- DB SCHEMA INIT ---
+    # --- DB SCHEMA INIT (versioned, non-destructive: see migrations.py) ---
     conn = get_db_connection()
     if conn:
         try:
             print("[SERVER] Verifying Database Schema...")
-            cur = conn.cursor()
-            
-            # 1. Traffic History Log
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS traffic_history_log (
-                    id SERIAL PRIMARY KEY,
-                    junction_id TEXT NOT NULL,
-                    avg_saturation FLOAT DEFAULT 0.0,
-                    total_flow_count INTEGER DEFAULT 0,
-                    active_alerts TEXT DEFAULT 'Normal',
-                    timestamp TIMESTAMP DEFAULT NOW()
-                )
-            """)
-            # Migration for missing columns
-            try:
-                cur.execute("ALTER TABLE traffic_history_log ADD COLUMN IF NOT EXISTS avg_saturation FLOAT DEFAULT 0.0")
-                cur.execute("ALTER TABLE traffic_history_log ADD COLUMN IF NOT EXISTS total_flow_count INTEGER DEFAULT 0")
-                cur.execute("ALTER TABLE traffic_history_log ADD COLUMN IF NOT EXISTS active_alerts TEXT DEFAULT 'Normal'")
-            except Exception: pass
-
-            # 2. Junction Status
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS junction_status (
-                    junction_id TEXT PRIMARY KEY,
-                    saturation_level FLOAT,
-                    raw_data JSONB,
-                    last_updated TIMESTAMP DEFAULT NOW()
-                )
-            """)
-            
-            # 3. Active Interventions
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS active_interventions (
-                    source_id TEXT PRIMARY KEY,
-                    target_id TEXT,
-                    reason TEXT,
-                    timestamp TIMESTAMP DEFAULT NOW()
-                )
-            """)
-
-            # 4. Traffic Violations (Moved from Endpoint to Startup)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS traffic_violations (
-                    id SERIAL PRIMARY KEY,
-                    junction_id TEXT NOT NULL,
-                    plate_number TEXT DEFAULT 'PENDING',
-                    violation_type TEXT NOT NULL,
-                    violation_time TIMESTAMP DEFAULT NOW(),
-                    evidence_url TEXT,
-                    confidence FLOAT DEFAULT 0.0,
-                    penalty_applied BOOLEAN DEFAULT FALSE,
-                    created_at TIMESTAMP DEFAULT NOW(),
-                    status TEXT DEFAULT 'PENDING',
-                    attributes JSONB DEFAULT '{}',
-                    metadata JSONB DEFAULT '{}',
-                    processed_at TIMESTAMP
-                )
-            """)
-            
-            # 5. Users (Cloud Auth Sync)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id SERIAL PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    full_name TEXT, -- Legacy Compatibility
-                    email TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    mobile TEXT UNIQUE,
-                    avatar_url TEXT,
-                    total_earned_points INTEGER DEFAULT 0,
-                    wallet_balance DECIMAL(10,2) DEFAULT 0.00,
-                    role TEXT DEFAULT 'user',
-                    last_login TIMESTAMP,
-                    created_at TIMESTAMP DEFAULT NOW()
-                )
-            """)
-
-            # Ensure columns exist and names are correct if table was already created
-            # This is "Siraj's Migration" to ensure the move from local -> cloud works.
-            try:
-                # Legacy column handling is now done via ADD COLUMN IF NOT EXISTS below
-                
-                # 2. Add all production columns
-                cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS password_hash TEXT DEFAULT 'TEMP_HASH'")
-                cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS mobile TEXT UNIQUE")
-                cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS avatar_url TEXT")
-                cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS total_earned_points INTEGER DEFAULT 0")
-                cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS wallet_balance DECIMAL(10,2) DEFAULT 0.00")
-                cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS role TEXT DEFAULT 'user'")
-                cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS full_name TEXT")
-                cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS last_login TIMESTAMP")
-            except Exception as e:
-                print(f"⚠️  Users Migration Warning: {e}")
-                conn.rollback() # Clear the aborted transaction state
-
-            # 6. Vehicles (Cloud Auth Sync)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS vehicles (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES users(user_id),
-                    plate_number TEXT UNIQUE NOT NULL,
-                    vehicle_type TEXT DEFAULT 'Car',
-                    is_primary BOOLEAN DEFAULT FALSE,
-                    rto_slot INTEGER DEFAULT 1, -- 1 for v1, 2 for v2
-                    created_at TIMESTAMP DEFAULT NOW()
-                )
-            """)
-            
-            try:
-                cur.execute("ALTER TABLE vehicles ADD COLUMN IF NOT EXISTS rto_slot INTEGER DEFAULT 1")
-            except Exception as e:
-                print(f"⚠️  Vehicles Migration Warning: {e}")
-                conn.rollback() # Clear the aborted transaction state
-
-            # 7. Transactions (Cloud Auth Sync)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES users(user_id),
-                    type TEXT NOT NULL, -- e.g., 'EARNED', 'REDEEMED'
-                    amount INTEGER DEFAULT 0,
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT NOW()
-                )
-            """)
-
-            # 7. RTO REGISTRY (Identity Source)
-            # Refactored for Phone-based Identity (User: Siraj)
-            # FORCE RECREATION to ensure phone_number is the PRIMARY KEY
-            cur.execute("DROP TABLE IF EXISTS rto_registry CASCADE")
-            cur.execute("""
-                CREATE TABLE rto_registry (
-                    phone_number TEXT PRIMARY KEY,
-                    email TEXT UNIQUE,
-                    owner_name TEXT,
-                    driver_license_id TEXT,
-                    
-                    v1_plate TEXT UNIQUE,
-                    v1_type TEXT DEFAULT 'Car',
-                    
-                    v2_plate TEXT UNIQUE,
-                    v2_type TEXT DEFAULT 'Car',
-                    
-                    registered_at TIMESTAMP DEFAULT NOW()
-                )
-            """)
-
-            # 8. User Rewards (App View)
-            # FORCE RECREATION to ensure phone_number is the PRIMARY KEY
-            cur.execute("DROP TABLE IF EXISTS user_rewards CASCADE")
-            cur.execute("""
-                CREATE TABLE user_rewards (
-                    phone_number TEXT PRIMARY KEY,
-                    user_id SERIAL,
-                    email TEXT,
-                    owner_name TEXT,
-                    driver_license_id TEXT,
-                    
-                    v1_plate TEXT,
-                    v1_points INTEGER DEFAULT 0,
-                    v1_type TEXT DEFAULT 'Car',
-                    
-                    v2_plate TEXT,
-                    v2_points INTEGER DEFAULT 0,
-                    v2_type TEXT DEFAULT 'Car',
-                    
-                    total_points INTEGER DEFAULT 0, -- Combined Score (V1 + V2)
-                    
-                    vehicle_type TEXT DEFAULT 'Car', -- Legacy Compatibility
-                    last_updated TIMESTAMP DEFAULT NOW(),
-                    updated_at TIMESTAMP DEFAULT NOW()
-                )
-            """)
+            applied = migrate(conn)
+            if applied:
+                plate_cache.invalidate()  # Registry may have been (re)seeded
 
+            # Partitioned history + rollup tables
+            cur = conn.cursor()
             try:
-                cur.execute("ALTER TABLE user_rewards ADD COLUMN IF NOT EXISTS total_points INTEGER DEFAULT 0")
-            except Exception as e:
-                print(f"⚠️  User Rewards Migration Warning: {e}")
-                conn.rollback()
-
-            # --- SEED RTO DATA (From dummy_profiles_100.json) ---
-            try:
-                dummy_json_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'dummy_profiles_100.json')
-                if os.path.exists(dummy_json_path):
-                    with open(dummy_json_path, 'r') as f:
-                        profiles = json.load(f)
-                    
-                    print(f"[SERVER] Seeding RTO Registry with {len(profiles)} users (200 vehicles)...")
-                    
-                    for p in profiles:
-                        # 1. RTO Registry Only (Rewards table should stay empty until detection)
-                        cur.execute("""
-                            INSERT INTO rto_registry (phone_number, email, owner_name, driver_license_id, v1_plate, v1_type, v2_plate, v2_type)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                            ON CONFLICT (phone_number) DO UPDATE SET 
-                            v1_plate = EXCLUDED.v1_plate, 
-                            v1_type = EXCLUDED.v1_type,
-                            v2_plate = EXCLUDED.v2_plate,
-                            v2_type = EXCLUDED.v2_type;
-                        """, (p['phone'], p['email'], p['owner'], p['license'], p['v1_plate'], p.get('v1_type', 'Car'), p['v2_plate'], p.get('v2_type', 'Car')))
-                        
-                    conn.commit()
-                    print("✅ [SERVER] RTO Registry Synced (100 Users, 200 Plates).")
+                history.ensure_schema(cur)
+                conn.commit()
             except Exception as e:
-                print(f"⚠️ [SERVER] Failed to seed RTO data: {e}")
+                print(f"⚠️ [SERVER] History schema init failed: {e}")
                 conn.rollback()
-
-            conn.commit()
-            print("✅ [SERVER] Schema Verified (RTO Registry + Enhanced Rewards).")
+            print(f"✅ [SERVER] Schema Verified ({len(applied)} migration(s) applied).")
         except Exception as e:
             print(f"xx [SERVER] Schema Init Error: {e}")
             conn.rollback()
         finally:
             conn.close()
 
+    await _db_call(_warm_live_status_async, _warm_live_status)
+
 # --- 2. THE DEFINITIVE PUNE TOPOLOGY ---
 TOPOLOGY_NODES = {
     # --- WEST CORRIDOR (Aundh -> University) ---
@@ -407,57 +293,36 @@ NETWORK_CONNECTIONS = {
     "PUNE_JW_24": {"East": "PUNE_JW_34"}  
 }
 
-pending_commands = {}       # {upstream_id: [cmd_dict, ...]}  — Phase 7 multi-lane
-latest_score_cache = {}     # {junction_id: enriched_heartbeat}  — fast dashboard source
+# Hot state lives in a StateBackend (in-process, or SQLite shared by every uvicorn worker)
+state_backend = get_state_backend()
+command_bus = CommandBus(state_backend)           # {upstream_id: [cmd_dict, ...]}  — Phase 7 multi-lane, push + poll
+live_status = LiveStatusHub(state_backend)        # Versioned, pre-serialised latest heartbeats (/live_status + SSE)
+latest_score_cache = StatusCache(live_status)     # {junction_id: enriched_heartbeat}  — read-only view
+heartbeat_base = state_backend.kv("heartbeat_base")  # {junction_id: {"seq": int, "lanes": {...}}}  — delta base
+
+# Compiled once: upstream chains per junction/phase; decisions only on congestion-level changes
+throttle_graph = ThrottleGraph(NETWORK_CONNECTIONS, max_hops=getattr(SystemConfig, "THROTTLE_MAX_HOPS", 2))
+throttle_controller = ThrottleController(throttle_graph, levels=state_backend.kv("congestion_levels"),
+                                         reassert_s=getattr(SystemConfig, "THROTTLE_REASSERT_S", 30.0))
+rollup_marks = state_backend.kv("rollup_since")  # {worker pid: oldest recorded_at not yet rolled up}
+throttled_nodes = state_backend.kv("throttled")  # {upstream_id: {phase: seconds}}  — answers server_says_throttled
+plate_cache = PlateOwnerCache(max_entries=getattr(SystemConfig, "RTO_CACHE_SIZE", 50000),
+                              ttl=getattr(SystemConfig, "RTO_CACHE_TTL", 300.0),
+                              miss_ttl=getattr(SystemConfig, "RTO_CACHE_MISS_TTL", 30.0),
+                              shared=state_backend.kv("plate_cache"))  # {normalised plate: RTO owner row}
 
 
-# --- MongoDB Connection (For Mobile App Sync) ---
 # --- APP DB Connection (For Mobile App Sync) ---
-# We connect on-demand to avoid holding a connection if not needed constantly
-# or use a global if frequency is high. Here, on-demand is fine for rewards.
+# Credits are mirrored to the Mobile App's PostgreSQL DB (safedrive_apps) through
+# the app_db_outbox table (written in the credit transaction) and a background relay.
+def _connect_app_db():
+    import psycopg2
+    return psycopg2.connect(**SystemConfig.APP_DB_PARAMS)
 
-def sync_to_app_db(phone, points, plate):
-    """
-    Syncs the reward credit to the Mobile App's PostgreSQL DB (safedrive_apps).
-    Keyed by phone_number for identity consistency.
-    """
-    try:
-        # Connect to App DB
-        import psycopg2
-        conn = psycopg2.connect(**SystemConfig.APP_DB_PARAMS)
-        cur = conn.cursor()
-        
-        # 1. Update User Points and Wallet
-        # 100 Points = 0.50 INR (From SystemConfig)
-        wallet_inc = points * (SystemConfig.CREDIT_VALUE_INR / SystemConfig.POINTS_TO_CREDIT_RATIO)
-        
-        cur.execute("""
-            UPDATE users 
-            SET total_earned_points = total_earned_points + %s,
-                wallet_balance = wallet_balance + %s
-            WHERE phone_number = %s
-            RETURNING user_id
-        """, (points, wallet_inc, phone))
-        
-        row = cur.fetchone()
-        
-        if row:
-            user_id = row[0]
-             # 2. Log Transaction
-            cur.execute("""
-                INSERT INTO transactions (user_id, type, amount, description)
-                VALUES (%s, 'EARNED', %s, %s)
-            """, (user_id, points, f"Reward for Good Driving ({plate})"))
-             
-            conn.commit()
-            print(f"  ✅ [APP_DB] Synced +{points} pts to {email}")
-        else:
-            print(f"  ⚠️ [APP_DB] User {email} not found in App DB.")
-             
-        cur.close()
-        conn.close()
-    except Exception as e:
-        print(f"  ❌ [APP_DB] Sync Failed: {e}")
+app_db_relay = AppDbRelay(get_db_connection, _connect_app_db,
+                          wallet_per_point=SystemConfig.CREDIT_VALUE_INR / SystemConfig.POINTS_TO_CREDIT_RATIO,
+                          interval=getattr(SystemConfig, "APP_DB_SYNC_INTERVAL", 1.0),
+                          batch_size=getattr(SystemConfig, "APP_DB_SYNC_BATCH", 500))
 
 # --- Pydantic Models ---
 class LaneData(BaseModel):
@@ -471,6 +336,15 @@ class Heartbeat(BaseModel):
     junction_id: str
     timestamp: float
     lanes: Dict[str, LaneData]
+    seq: Optional[int] = None   # Sender sequence (base for /heartbeat/delta)
+    replayed: bool = False      # Sent late from the edge outbox (historical, not live)
+
+class HeartbeatDelta(BaseModel):
+    junction_id: str
+    timestamp: float
+    seq: int
+    base_seq: int
+    lanes: Dict[str, dict] = {}  # Only the fields that changed since base_seq
 
 class GhostInjection(BaseModel):
     target_junction: str
@@ -496,37 +370,132 @@ def get_commands(node_id: str):
     Returns a list of command dicts (multi-lane throttle support).
     Clears the queue after delivery (one-shot commands).
     """
-    cmds = pending_commands.pop(node_id, [])
-    # Normalise: always return a list even if legacy single-dict was stored
-    if isinstance(cmds, dict):
-        cmds = [cmds]
-    return cmds
+    return command_bus.pop(node_id)
+
+
+@app.get("/commands/{node_id}/subscribe")
+async def subscribe_commands(node_id: str, timeout: float = 25.0):
+    """
+    Long-poll subscription: returns as soon as a command is queued for the
+    node (or [] after `timeout` seconds). The edge node re-subscribes at once,
+    so command latency is one network hop instead of one poll interval.
+    """
+    return await command_bus.wait(node_id, timeout=max(0.0, min(timeout, 60.0)))
 
 
 @app.get("/live_status")
-def get_live_status():
+def get_live_status(request: Request):
+    """
+    Latest state of every junction, served from memory (no DB query).
+    Send If-None-Match with the previous ETag to get 304 when nothing changed.
+    """
+    version, body = live_status.snapshot()
+    etag = f'"v{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        live_status.stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/live_status/stream")
+async def stream_live_status(request: Request, since: Optional[int] = None):
+    """
+    Server-sent events: a full snapshot, then only the junctions that changed.
+    Reconnecting clients resume from Last-Event-ID (or ?since=<version>).
+    """
+    last_id = request.headers.get("last-event-id")
+    if since is None and last_id and last_id.isdigit():
+        since = int(last_id)
+    return StreamingResponse(live_status.stream(since), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _warm_live_status():
+    """Seed the hub from junction_status so dashboards see state right after a restart."""
     conn = get_db_connection()
-    if not conn: return {}
+    if not conn:
+        return
     cur = conn.cursor(cursor_factory=RealDictCursor)
-    state = {}
     try:
         cur.execute("SELECT junction_id, raw_data FROM junction_status")
-        rows = cur.fetchall()
-        for row in rows:
-            state[row['junction_id']] = row['raw_data']
+        live_status.load({row['junction_id']: row['raw_data'] for row in cur.fetchall()})
+    except Exception as e:
+        print(f"⚠️ [SERVER] Live status warm-up skipped: {e}")
     finally:
         cur.close()
         conn.close()
-    return state
+
+async def _warm_live_status_async():
+    try:
+        rows = await async_db.fetch("SELECT junction_id, raw_data FROM junction_status")
+        live_status.load({row['junction_id']: row['raw_data'] for row in rows})
+    except Exception as e:
+        print(f"⚠️ [SERVER] Live status warm-up skipped: {e}")
 
 @app.post("/heartbeat")
 @app.post("/api/heartbeat")
-async def receive_heartbeat(data: Heartbeat, background_tasks: BackgroundTasks):
+async def receive_heartbeat(data: Heartbeat):
     """
     RECEIVE Heartbeat from Edge Node (Turbo: 300ms pulses).
     1. Compute per-phase saturation & update in-memory cache immediately.
-    2. Offload heavy DB persistence + congestion logic to background task.
+    2. Hand the state to the write-behind heartbeat_writer (batched DB
+       persistence + congestion logic once per flush interval).
+
+    Replayed heartbeats (edge outbox after an outage) are history only: they
+    must not overwrite live state or trigger throttling, so just their
+    directional counts are persisted.
+    """
+    if data.replayed:
+        now = time.time()
+        if data.timestamp >= now - history.retention_days * 86400:  # No partition past retention
+            # A replay is from the past; a future stamp is edge clock skew (and may have no partition)
+            heartbeat_writer.add_counts(data.junction_id, _directional_counts(data),
+                                        recorded_at=min(data.timestamp, now))
+        return {"status": "ACK", "server_says_throttled": False}
+
+    if data.seq is not None:
+        heartbeat_base[data.junction_id] = {
+            "seq": data.seq,
+            "lanes": {
+                lane: stats.dict(exclude={"directional_counts"}, exclude_none=True)
+                for lane, stats in data.lanes.items()
+            }
+        }
+    return _ingest_heartbeat(data)
+
+
+@app.post("/heartbeat/delta")
+async def receive_heartbeat_delta(delta: HeartbeatDelta):
     """
+    Delta-encoded heartbeat: only changed lane fields since base_seq.
+    Answers RESYNC when the base is unknown (server restart, missed pulse)
+    so the edge node resends a full /heartbeat.
+    """
+    base = heartbeat_base.get(delta.junction_id)
+    if base is None or base["seq"] != delta.base_seq:
+        return {"status": "RESYNC"}
+
+    lanes = {lane: dict(fields) for lane, fields in base["lanes"].items()}
+    for lane, fields in delta.lanes.items():
+        lanes.setdefault(lane, {}).update(fields)
+    try:
+        data = Heartbeat(junction_id=delta.junction_id, timestamp=delta.timestamp,
+                         lanes=lanes, seq=delta.seq)
+    except Exception:
+        return {"status": "RESYNC"}
+
+    heartbeat_base[delta.junction_id] = {
+        "seq": delta.seq,
+        "lanes": {
+            lane: {k: v for k, v in fields.items() if k != "directional_counts"}
+            for lane, fields in lanes.items()
+        }
+    }
+    return _ingest_heartbeat(data)
+
+
+def _ingest_heartbeat(data: Heartbeat):
     # 1. Compute per-phase saturation & junction average
     phase_saturations = {}
     for lane_name, lane_stats in data.lanes.items():
@@ -537,85 +506,119 @@ async def receive_heartbeat(data: Heartbeat, background_tasks: BackgroundTasks):
         if phase_saturations else 0.0
     )
 
-    # 2. Update in-memory cache (ultra-fast dashboard source)
+    # 2. Update in-memory cache (ultra-fast dashboard source, shared across workers)
     cache_entry = data.dict()
     cache_entry["phase_saturations"] = phase_saturations
     cache_entry["junction_saturation"] = junction_avg_sat
-    latest_score_cache[data.junction_id] = cache_entry
+    live_status.publish(data.junction_id, cache_entry)
+
+    # 3. Write-behind: latest state per junction is flushed in batches
+    heartbeat_writer.submit(data.junction_id, cache_entry, junction_avg_sat, phase_saturations,
+                            directional_counts=_directional_counts(data))
 
-    # 3. Offload DB + congestion logic to background
-    background_tasks.add_task(persist_heartbeat_to_db, data, phase_saturations, junction_avg_sat)
+    return {"status": "ACK", "server_says_throttled": data.junction_id in throttled_nodes}
 
-    return {"status": "ACK", "server_says_throttled": False}
 
+def _directional_counts(data: Heartbeat):
+    return {lane: stats.directional_counts for lane, stats in data.lanes.items() if stats.directional_counts}
 
-async def persist_heartbeat_to_db(data: Heartbeat, phase_saturations: dict, junction_avg_sat: float):
+
+def _apply_congestion_logic(cur, states):
     """
-    Background task: DB persistence + multi-phase congestion logic.
-    Runs AFTER the fast ACK is already returned to the edge node.
+    Runs after each heartbeat flush over the latest state of every junction
+    that reported since the previous flush (multi-phase throttling + recovery).
+    Only junctions whose congestion level changed are acted on (and steady
+    congestion is re-asserted every THROTTLE_REASSERT_S).
     """
-    conn = get_db_connection()
-    if not conn:
-        return
-    cur = conn.cursor()
-    try:
-        # 1. UPSERT junction status with per-phase saturation
-        enriched = data.dict()
-        enriched["phase_saturations"] = phase_saturations
-        enriched["junction_saturation"] = junction_avg_sat
-        json_data = json.dumps(enriched)
+    throttle, cleared, released = throttle_controller.evaluate(states)
 
-        cur.execute("""
-            INSERT INTO junction_status (junction_id, saturation_level, raw_data)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (junction_id)
-            DO UPDATE SET saturation_level = EXCLUDED.saturation_level,
-                          raw_data = EXCLUDED.raw_data,
-                          last_updated = CURRENT_TIMESTAMP;
-        """, (data.junction_id, junction_avg_sat, json_data))
-        conn.commit()
+    # 1. CONGESTION CHECK (per-phase, multi-throttle; only the phases that changed)
+    for junction_id, phase_saturations in throttle:
+        if junction_id in EXTERNAL_LINKS:
+            print(f"[FEDERATED] Alert -> {EXTERNAL_LINKS[junction_id]}")
+        else:
+            _trigger_advanced_throttling(junction_id, phase_saturations, cur)
+
+    # 1b. OUT OF GRIDLOCK: feeders further up the approach only held while it lasted
+    for junction_id, phases in released:
+        for phase_name in phases:
+            for upstream_id, hop in throttle_controller.release_targets(junction_id, phase_name):
+                _release_phase(upstream_id, junction_id, phase_name, hop, cur)
+
+    # 2. RECOVERY CHECK (one query for every junction that has just cleared)
+    if cleared:
+        cur.execute("SELECT source_id, target_id FROM active_interventions WHERE target_id = ANY(%s)", (cleared,))
+        for source_id, target_id in cur.fetchall():
+            print(f"[RECOVERY] {target_id} clear -> releasing {source_id}")
+            _trigger_recovery(source_id, cur)
+
+
+heartbeat_writer = HeartbeatAggregator(
+    lambda: get_db_connection(),
+    after_flush=_apply_congestion_logic,
+    interval=getattr(SystemConfig, "HEARTBEAT_FLUSH_INTERVAL", 1.0)
+)
 
-        # 2. CONGESTION CHECK (per-phase, multi-throttle)
-        any_congested = any(s > 80 for s in phase_saturations.values())
-        if any_congested:
-            if data.junction_id in EXTERNAL_LINKS:
-                print(f"[FEDERATED] Alert -> {EXTERNAL_LINKS[data.junction_id]}")
-            else:
-                _trigger_advanced_throttling(data.junction_id, phase_saturations, cur)
-                conn.commit()
 
-        # 3. RECOVERY CHECK
-        cur.execute("SELECT source_id FROM active_interventions WHERE target_id = %s", (data.junction_id,))
-        active_sources = cur.fetchall()
-        if active_sources and junction_avg_sat < 50:
-            for row in active_sources:
-                print(f"[RECOVERY] {data.junction_id} clear -> releasing {row[0]}")
-                _trigger_recovery(row[0], cur)
-            conn.commit()
+@app.on_event("shutdown")
+async def shutdown_event():
+    heartbeat_writer.stop()  # Final flush
+    app_db_relay.stop()      # Undelivered rows stay in app_db_outbox
+    leader.release()         # Another worker takes the periodic jobs over
+    if async_db is not None:
+        await async_db.close()
 
-        # 4. PERSIST DIRECTIONAL COUNTS (if provided by edge node)
-        for lane_name, lane_stats in data.lanes.items():
-            if lane_stats.directional_counts:
-                try:
-                    cur.execute("""
-                        INSERT INTO directional_counts
-                            (junction_id, phase, counts_json, recorded_at)
-                        VALUES (%s, %s, %s, NOW())
-                    """, (
-                        data.junction_id,
-                        lane_name,
-                        json.dumps(lane_stats.directional_counts)
-                    ))
-                except Exception:
-                    pass  # Table may not exist yet - non-fatal
-        conn.commit()
 
-    except Exception as e:
-        print(f"[HB_BG_ERROR] {e}")
+@app.get("/history/{junction_id}/counts")
+async def get_count_history(junction_id: str, hours: float = 24, resolution: Optional[str] = None):
+    """Directional vehicle counts per bucket, read from the rollup tables only."""
+    return await _history_query("query_counts", junction_id, hours, resolution)
+
+
+@app.get("/history/{junction_id}/saturation")
+async def get_saturation_history(junction_id: str, hours: float = 24, resolution: Optional[str] = None):
+    """Average / peak saturation per bucket, read from the rollup tables only."""
+    return await _history_query("query_saturation", junction_id, hours, resolution)
+
+
+async def _history_query(query, junction_id, hours, resolution):
+    resolution = resolution or pick_resolution(hours)
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {list(RESOLUTIONS)}")
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    series = await _db_call(_history_series_async, _history_series, query, junction_id, since, resolution)
+    return {"junction_id": junction_id, "resolution": resolution, "series": series}
+
+def _history_series(query, junction_id, since, resolution):
+    conn = get_db_connection()
+    if not conn:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    cur = conn.cursor()
+    try:
+        return getattr(history, query)(cur, junction_id, since, resolution)
     finally:
         cur.close()
         conn.close()
 
+async def _history_series_async(query, junction_id, since, resolution):
+    async with async_db.transaction() as conn:
+        return await getattr(history, f"{query}_async")(conn, junction_id, since, resolution)
+
+
+@app.get("/heartbeat/stats")
+def get_heartbeat_stats():
+    """Write-behind metrics: flush latency, rows per flush, coalesced heartbeats."""
+    return {**heartbeat_writer.snapshot(),
+            "live_status": {**live_status.stats, "version": live_status.version,
+                            "sse_subscribers": live_status.subscriber_count()}}
+
+@app.get("/db/stats")
+def get_db_stats():
+    """Request-path DB driver and pool metrics (psycopg2 pools always; asyncpg pool when enabled)."""
+    return {"driver": getattr(SystemConfig, "CMS_DB_DRIVER", "psycopg2"), "psycopg2": db_handler.pool_stats(),
+            "asyncpg": async_db.snapshot() if async_db is not None else None,
+            "history_snapshot": history.snapshot_stats, "leader": {"pid": os.getpid(), **leader.stats}}
+
 @app.post("/inject_congestion")
 def inject_ghost_congestion(data: GhostInjection):
     conn = get_db_connection()
@@ -638,6 +641,7 @@ def inject_ghost_congestion(data: GhostInjection):
         """
         cur.execute(sql, (data.target_junction, data.saturation_value, json.dumps(fake_data)))
         conn.commit()
+        live_status.publish(data.target_junction, fake_data)
         
         if data.saturation_value > 50:
             # Ghost Attack: build synthetic phase_saturations dict
@@ -663,9 +667,8 @@ def inject_ghost_congestion(data: GhostInjection):
 
 @app.get("/commands/{junction_id}")
 def get_commands(junction_id: str):
-    if junction_id in pending_commands:
-        return pending_commands.pop(junction_id)
-    return {"command_type": "NO_OP"}
+    cmds = command_bus.pop(junction_id)
+    return cmds or {"command_type": "NO_OP"}
 
 # --- VIOLATION REPORTING (Phase 5: CMS + Enforcement) ---
 
@@ -682,6 +685,35 @@ class RewardCredit(BaseModel):
     points: int
     reason: str
     junction_id: str
+    idempotency_key: Optional[str] = None  # Client-generated; retries reuse it and are not credited twice
+
+_INSERT_VIOLATION_SQL = """
+    INSERT INTO traffic_violations
+    (junction_id, plate_number, violation_type, evidence_url, confidence)
+    VALUES (%s, %s, %s, %s, %s)
+    RETURNING id
+"""
+
+def _violation_row(report):
+    return (report.junction_id, report.plate_number, report.violation_type, report.evidence_url, report.confidence)
+
+def _store_violation(report):
+    """Returns the new violation id, or None when no database is reachable."""
+    conn = get_db_connection()
+    if not conn: return None
+    try:
+        cur = conn.cursor()
+        # Table + columns + listing indexes come from migrations.py (startup)
+        cur.execute(_INSERT_VIOLATION_SQL, _violation_row(report))
+        violation_id = cur.fetchone()[0]
+        conn.commit()
+        return violation_id
+    finally:
+        conn.close()
+
+async def _store_violation_async(report):
+    row = await async_db.fetchrow(_INSERT_VIOLATION_SQL, *_violation_row(report))
+    return row["id"]
 
 @app.post("/violations/report")
 async def report_violation(report: ViolationReport):
@@ -689,101 +721,84 @@ async def report_violation(report: ViolationReport):
     Receives violation reports from edge devices.
     Stores in database and optionally triggers reward wallet deduction.
     """
-    conn = get_db_connection()
-    if conn:
+    try:
+        violation_id = await _db_call(_store_violation_async, _store_violation, report)
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+    if violation_id is None:
+        return {"status": "db_unavailable"}
+
+    junction_name = TOPOLOGY_NODES.get(report.junction_id, {}).get('name', report.junction_id)
+    print(f"🚨 VIOLATION #{violation_id}: {report.violation_type} by {report.plate_number} at {junction_name}")
+
+    return {
+        "status": "recorded",
+        "violation_id": violation_id,
+        "junction": junction_name
+    }
+
+async def _violation_page(limit, cursor, junction_id=None, status=None):
+    if cursor is not None:
         try:
-            cur = conn.cursor()
-            # Ensure violations table exists (Handled at Startup now)
-            # Schema Migration for existing tables (Hackathon safe)
-            try:
-                cur.execute("ALTER TABLE traffic_violations ADD COLUMN IF NOT EXISTS status TEXT DEFAULT 'PENDING'")
-                cur.execute("ALTER TABLE traffic_violations ADD COLUMN IF NOT EXISTS attributes JSONB DEFAULT '{}'")
-                cur.execute("ALTER TABLE traffic_violations ADD COLUMN IF NOT EXISTS metadata JSONB DEFAULT '{}'")
-                cur.execute("ALTER TABLE traffic_violations ADD COLUMN IF NOT EXISTS processed_at TIMESTAMP")
-                conn.commit()
-            except Exception:
-                conn.rollback() # Ignore if already exists or error
-            
-            cur.execute("""
-                INSERT INTO traffic_violations 
-                (junction_id, plate_number, violation_type, evidence_url, confidence)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
-                report.junction_id,
-                report.plate_number,
-                report.violation_type,
-                report.evidence_url,
-                report.confidence
-            ))
-            
-            violation_id = cur.fetchone()[0]
-            conn.commit()
-            
-            junction_name = TOPOLOGY_NODES.get(report.junction_id, {}).get('name', report.junction_id)
-            print(f"🚨 VIOLATION #{violation_id}: {report.violation_type} by {report.plate_number} at {junction_name}")
-            
-            return {
-                "status": "recorded",
-                "violation_id": violation_id,
-                "junction": junction_name
-            }
-            
-        except Exception as e:
-            return {"status": "error", "error": str(e)}
-        finally:
-            conn.close()
-    
-    return {"status": "db_unavailable"}
+            decode_violation_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return await _db_call(_violation_page_async, _violation_page_sync, limit, cursor, junction_id, status)
 
-@app.get("/violations/{junction_id}")
-async def get_violations(junction_id: str, limit: int = 50):
-    """Get recent violations for a junction."""
+def _violation_page_sync(limit, cursor, junction_id, status):
     conn = get_db_connection()
-    if conn:
-        try:
-            cur = conn.cursor(cursor_factory=RealDictCursor)
-            cur.execute("""
-                SELECT * FROM traffic_violations 
-                WHERE junction_id = %s 
-                ORDER BY created_at DESC 
-                LIMIT %s
-            """, (junction_id, limit))
-            return {"violations": cur.fetchall()}
-        except Exception as e:
-            return {"violations": [], "error": str(e)}
-        finally:
-            conn.close()
-    return {"violations": []}
+    if not conn:
+        return {"violations": [], "next_cursor": None}
+    try:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        rows, next_cursor = fetch_violation_page(cur, limit, cursor, junction_id=junction_id, status=status)
+        return {"violations": rows, "next_cursor": next_cursor}
+    except Exception as e:
+        return {"violations": [], "next_cursor": None, "error": str(e)}
+    finally:
+        conn.close()
+
+async def _violation_page_async(limit, cursor, junction_id, status):
+    try:
+        async with async_db.transaction() as conn:
+            rows, next_cursor = await fetch_violation_page_async(conn, limit, cursor, junction_id=junction_id, status=status)
+        return {"violations": rows, "next_cursor": next_cursor}
+    except Exception as e:
+        return {"violations": [], "next_cursor": None, "error": str(e)}
+
+@app.get("/violations")
+async def list_violations(limit: int = 50, cursor: Optional[str] = None,
+                    junction_id: Optional[str] = None, status: Optional[str] = None):
+    """
+    City-wide violations, newest first (keyset pagination).
+    Pass the returned next_cursor to get the following page; null = last page.
+    """
+    return await _violation_page(limit, cursor, junction_id=junction_id, status=status)
+
+@app.get("/violations/{junction_id}")
+async def get_violations(junction_id: str, limit: int = 50, cursor: Optional[str] = None, status: Optional[str] = None):
+    """Get recent violations for a junction (next_cursor continues the listing)."""
+    return await _violation_page(limit, cursor, junction_id=junction_id, status=status)
 
 
 def _trigger_advanced_throttling(congested_node_id, phase_saturations, cur):
     """
     Smart-Net 2.0 (Phase 7): Multi-phase throttling.
-    Sends THROTTLE_ADJUST for every congested phase (>80%) up to 3 upstreams.
-    Throttle severity is proportional to each phase's individual saturation.
+    Sends THROTTLE_ADJUST for every congested phase (>80%) up to 3 phases.
+    Throttle severity is proportional to each phase's individual saturation;
+    in gridlock (>95%) feeders further up the same approach are throttled too
+    (precomputed chains, THROTTLE_MAX_HOPS).
     """
-    connections = NETWORK_CONNECTIONS.get(congested_node_id, {})
     target_name = TOPOLOGY_NODES.get(congested_node_id, {}).get('name', congested_node_id)
-    throttled_count = 0
-
-    for phase_name, sat in phase_saturations.items():
-        if sat <= 80 or throttled_count >= 3:
-            continue  # Only throttle congested phases; max 3 at once
 
-        upstream_id = connections.get(phase_name)
-        if not upstream_id:
-            continue  # No upstream feeder defined for this phase
-
-        # Severity-based throttle value
-        if sat > 95:
-            throttle_value = 25
+    for upstream_id, phase_name, throttle_value, hop in throttle_controller.plan(congested_node_id, phase_saturations):
+        sat = phase_saturations[phase_name]
+        if hop > 1:
+            print(f"[GRIDLOCK] Phase {phase_name} @ {sat}% -> hop-{hop} throttle ({throttle_value}s) to {upstream_id}")
+        elif throttle_value == 25:
             print(f"[GRIDLOCK] Phase {phase_name} @ {sat}% -> HEAVY throttle ({throttle_value}s) to {upstream_id}")
-        elif sat > 80:
-            throttle_value = 15
-            print(f"[CONGESTION] Phase {phase_name} @ {sat}% -> HIGH throttle ({throttle_value}s) to {upstream_id}")
         else:
-            throttle_value = 10
+            print(f"[CONGESTION] Phase {phase_name} @ {sat}% -> HIGH throttle ({throttle_value}s) to {upstream_id}")
 
         # Persist intervention
         cur.execute("""
@@ -792,124 +807,143 @@ def _trigger_advanced_throttling(congested_node_id, phase_saturations, cur):
             ON CONFLICT (source_id) DO NOTHING
         """, (upstream_id, congested_node_id, f"Phase {phase_name} Congestion ({sat}%)"))
 
-        # Queue command as list to support multi-lane response
-        if upstream_id not in pending_commands:
-            pending_commands[upstream_id] = []
-        # Avoid duplicate commands for same phase
-        existing_phases = [cmd.get("target_lane") for cmd in pending_commands[upstream_id]]
-        if phase_name not in existing_phases:
-            pending_commands[upstream_id].append({
-                "command_type": "THROTTLE_ADJUST",
-                "target_lane": phase_name,
-                "action": "REDUCE_GREEN",
-                "value": throttle_value,
-                "reason": f"Congestion at {target_name} phase {phase_name} ({sat}%)"
-            })
-        throttled_count += 1
+        # Queue command (pushed to subscribers immediately; replaces a pending one for the same phase)
+        command_bus.push(upstream_id, {
+            "command_type": "THROTTLE_ADJUST",
+            "target_lane": phase_name,
+            "action": "REDUCE_GREEN",
+            "value": throttle_value,
+            "reason": f"Congestion at {target_name} phase {phase_name} ({sat}%)"
+        })
+        throttled_nodes[upstream_id] = {**throttled_nodes.get(upstream_id, {}), phase_name: throttle_value}
+
+
+def _release_phase(source_id, target_id, phase_name, hop, cur):
+    cur.execute("DELETE FROM active_interventions WHERE source_id = %s AND target_id = %s", (source_id, target_id))
+    phases = {p: v for p, v in throttled_nodes.get(source_id, {}).items() if p != phase_name}
+    if phases:
+        throttled_nodes[source_id] = phases
+    else:
+        throttled_nodes.pop(source_id, None)
+    command_bus.push(source_id, {  # Replaces a pending THROTTLE_ADJUST for the phase
+        "command_type": "RESTORE_NORMAL",
+        "target_lane": phase_name,
+        "reason": f"Gridlock cleared at {target_id}"
+    })
+    print(f"[RESTORE] {source_id} phase {phase_name} (hop-{hop} of {target_id})")
 
 
 def _trigger_recovery(source_id, cur):
     cur.execute("DELETE FROM active_interventions WHERE source_id = %s", (source_id,))
-    pending_commands[source_id] = [
+    throttled_nodes.pop(source_id, None)
+    command_bus.replace(source_id, [
         {
             "command_type": "RESTORE_NORMAL",
             "target_lane": phase,
             "reason": "Traffic Cleared"
         }
         for phase in ["North", "South", "East", "West"]
-    ]
+    ])
     print(f"[RESTORE] {source_id}")
 
 # =============================================================================
 # 6. REWARD SYSTEM ENDPOINTS (Phase 16)
 # =============================================================================
 
+def _credit_batch(credits):
+    """Resolves, de-duplicates and applies credits + their app DB outbox rows in one transaction."""
+    conn = get_db_connection()
+    if not conn: return None
+    cur = conn.cursor()
+    try:
+        owners = plate_cache.resolve_many(cur, [c.plate_number for c in credits])
+        results, credited = apply_credits(cur, credits, owners)
+        enqueue_app_db_sync(cur, credited)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    if credited:
+        app_db_relay.notify()
+    return results
+
+async def _credit_batch_async(credits):
+    async with async_db.transaction() as conn:
+        owners = await plate_cache.resolve_many_async(conn, [c.plate_number for c in credits])
+        results, credited = await apply_credits_async(conn, credits, owners)
+        await enqueue_app_db_sync_async(conn, credited)
+    if credited:
+        app_db_relay.notify()
+    return results
+
 @app.post("/rewards/credit")
-def credit_points(data: RewardCredit):
+async def credit_points(data: RewardCredit):
     """
     Internal Endpoint: Traffic Processor sends 'Good Behavior' events here.
-    Supports Dual-Vehicle User Profiles (V1/V2).
+    Supports Dual-Vehicle User Profiles (V1/V2). Unregistered plates are
+    parked on a ghost profile; a repeated idempotency_key is a no-op.
     """
-    conn = get_db_connection()
-    if not conn: return {"status": "DB_ERROR"}
-    cur = conn.cursor()
-    
     try:
-        plate = data.plate_number
-        points = data.points
-        
-        # 1. Lookup in RTO Registry (Identity Source)
-        # Normalize input plate for search
-        p_val = plate.replace("-", "").replace(" ", "").upper()
-        cur.execute("""
-            SELECT email, owner_name, phone_number, driver_license_id, v1_plate, v1_type, v2_plate, v2_type
-            FROM rto_registry 
-            WHERE REPLACE(REPLACE(v1_plate, '-', ''), ' ', '') = %s 
-               OR REPLACE(REPLACE(v2_plate, '-', ''), ' ', '') = %s
-        """, (p_val, p_val))
-        
-        rto_user = cur.fetchone()
-        
-        if rto_user:
-            # 2. Registered Vehicle Found!
-            (email, owner, phone, license_id, v1_plate, v1_type, v2_plate, v2_type) = rto_user
-            
-            # Upsert into User Rewards (Keyed by Phone)
-            cur.execute("""
-                INSERT INTO user_rewards 
-                (phone_number, email, owner_name, driver_license_id, v1_plate, v1_points, v2_plate, v2_points)
-                VALUES (%s, %s, %s, %s, %s, 0, %s, 0)
-                ON CONFLICT (phone_number) DO UPDATE SET 
-                email = EXCLUDED.email,
-                owner_name = EXCLUDED.owner_name,
-                driver_license_id = EXCLUDED.driver_license_id,
-                v1_plate = EXCLUDED.v1_plate, 
-                v2_plate = EXCLUDED.v2_plate;
-            """, (phone, email, owner, license_id, v1_plate, v2_plate))
-            
-            # Determine which slot to credit (Normalize for safe comparison)
-            p_norm = plate.replace("-", "").replace(" ", "").upper()
-            v1_norm = (v1_plate or "").replace("-", "").replace(" ", "").upper()
-            
-            if p_norm == v1_norm:
-                cur.execute("UPDATE user_rewards SET v1_points = v1_points + %s, last_updated = NOW(), updated_at = NOW() WHERE phone_number = %s", (points, phone))
-            else:
-                cur.execute("UPDATE user_rewards SET v2_points = v2_points + %s, last_updated = NOW(), updated_at = NOW() WHERE phone_number = %s", (points, phone))
-                
-            conn.commit()
-            try:
-                sync_to_app_db(phone, points, plate)
-            except Exception as e:
-                print(f"  ⚠️ [SYNC] Failed to sync with Mobile App: {e}")
-            
-            print(f"  🏆 [REWARD] +{points} pts to {phone} ({plate})")
-            return {"status": "CREDITED", "user": phone}
-            
-        else:
-            # 3. Ghost Data: Store points for unregistered plate
-            # Use ghost_PHONE logic for consistency if we want, or stay with plate.
-            # User said "unique key should be phone number", for ghost data we still only have plate.
-            ghost_id = f"ghost_{plate}" 
-            print(f"  👻 [GHOST] {plate} not in RTO. Creating/Updating Ghost Profile...")
-            
-            cur.execute("""
-                INSERT INTO user_rewards 
-                (phone_number, owner_name, v1_plate, v1_points, last_updated, updated_at)
-                VALUES (%s, %s, %s, %s, NOW(), NOW())
-                ON CONFLICT (phone_number) 
-                DO UPDATE SET v1_points = user_rewards.v1_points + %s, last_updated = NOW(), updated_at = NOW()
-            """, (ghost_id, "Ghost Owner", plate, points, points))
-            
-            conn.commit()
-            return {"status": "GHOST_RECORDED", "phone_number": ghost_id}
-        
+        results = await _db_call(_credit_batch_async, _credit_batch, [data])
     except Exception as e:
         print(f"❌ [REWARD] Credit Failed: {e}")
-        conn.rollback()
         return {"status": "ERROR", "detail": str(e)}
-    finally:
-        cur.close()
-        conn.close()
+    if results is None: return {"status": "DB_ERROR"}
+
+    result = results[0]
+    if result["status"] == "CREDITED":
+        print(f"  🏆 [REWARD] +{data.points} pts to {result['phone_number']} ({data.plate_number})")
+        return {"status": "CREDITED", "user": result["phone_number"]}
+    if result["status"] == "GHOST_RECORDED":
+        print(f"  👻 [GHOST] {data.plate_number} not in RTO. Ghost Profile updated.")
+    return result
+
+@app.post("/rewards/credit/batch")
+async def credit_points_batch(credits: List[RewardCredit]):
+    """
+    Batch form of /rewards/credit (the edge dispatcher coalesces queued
+    credits into one JSON array). All credits commit together or not at
+    all; results are returned in request order.
+    """
+    if not credits: return {"status": "OK", "results": []}
+    try:
+        results = await _db_call(_credit_batch_async, _credit_batch, credits)
+    except Exception as e:
+        print(f"❌ [REWARD] Batch Credit Failed ({len(credits)} credits): {e}")
+        raise HTTPException(status_code=503, detail=str(e))  # Edge keeps the batch and retries
+    if results is None:
+        raise HTTPException(status_code=503, detail="DB_ERROR")
+
+    applied = sum(r["status"] != "DUPLICATE" for r in results)
+    print(f"  🏆 [REWARD] Batch: {applied}/{len(credits)} credits applied")
+    return {"status": "OK", "applied": applied, "results": results}
+
+@app.get("/rewards/cache")
+def get_plate_cache_stats():
+    """Plate -> owner LRU metrics (hit rate, evictions, invalidations)."""
+    return plate_cache.snapshot()
+
+@app.get("/rewards/outbox/stats")
+def get_app_db_outbox_stats():
+    """App DB relay: pending / dead rows, lag of the oldest pending row (lag_s) and of the last batch."""
+    return app_db_relay.snapshot()
+
+@app.post("/rewards/outbox/redrive")
+def redrive_app_db_outbox():
+    """Re-queues dead-letter rows (after fixing what the app DB rejected them for)."""
+    count = app_db_relay.redrive()
+    if count is None:
+        raise HTTPException(status_code=503, detail="DB_ERROR")
+    return {"status": "REQUEUED", "rows": count}
+
+@app.delete("/rewards/cache")
+def invalidate_plate_cache():
+    """Call after editing rto_registry outside the CMS (seed / sync tools)."""
+    plate_cache.invalidate()
+    return {"status": "INVALIDATED", "generation": plate_cache.snapshot()["generation"]}
 
 @app.get("/rewards/profile/{phone}")
 def get_user_profile(phone: str):
@@ -965,4 +999,13 @@ def get_user_profile(phone: str):
         conn.close()
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    workers = getattr(SystemConfig, "CMS_WORKERS", 1)
+    if workers > 1:
+        if SystemConfig.CMS_STATE_BACKEND == "memory":
+            # Workers re-import this module and read the backend from the environment
+            print("⚠️ [SERVER] CMS_WORKERS > 1 needs shared state - using CMS_STATE_BACKEND=sqlite")
+            os.environ["CMS_STATE_BACKEND"] = "sqlite"
+        uvicorn.run("cms_layer.server:app", host="0.0.0.0", port=8000, workers=workers,
+                    http="cms_layer.http_protocol:NoDelayHTTPProtocol")
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,328 @@
+"""
+State Backend - Shared CMS State for Single- and Multi-Worker Deployments
+Role: The CMS keeps three pieces of hot state outside the database:
+
+    status     latest heartbeat per junction (pre-serialised, versioned)
+    commands   pending THROTTLE_ADJUST / RESTORE_NORMAL per junction
+    kv         small keyed state, e.g. the delta-heartbeat base per junction
+
+With module-level dicts that state lives in one process, which pins uvicorn
+to a single worker. Backends:
+
+- InProcessBackend: plain dicts behind a lock (default, one worker).
+- SQLiteBackend:    one WAL file shared by every worker on the host. Each
+                    write is a short local transaction (no fsync per write),
+                    reads are indexed by version so workers only fetch what
+                    changed. `shared = True` tells callers that changes can
+                    come from other processes and must be polled.
+
+get_state_backend() picks one from SystemConfig.CMS_STATE_BACKEND.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_PATH = os.path.join(_PROJECT_ROOT, "logs", "cms_state.db")
+
+
+class StateBackend:
+    """Interface. Commands are dicts; status bodies are JSON bytes."""
+    shared = False
+
+    def kv(self, namespace):
+        """MutableMapping for `namespace` (values must be JSON-serialisable)."""
+        raise NotImplementedError
+
+    def publish_status(self, junction_id, body):
+        """Stores the latest body for a junction; returns the new global version."""
+        raise NotImplementedError
+
+    def status_since(self, version):
+        """Returns (current_version, [(junction_id, version, body)] changed after `version`)."""
+        raise NotImplementedError
+
+    def status_version(self):
+        raise NotImplementedError
+
+    def push_command(self, node_id, command, dedupe_key="target_lane"):
+        """
+        Queues one command; a pending command with the same dedupe value is
+        replaced (latest wins, e.g. 15 s -> 25 s). Returns False if an
+        identical command was already pending.
+        """
+        raise NotImplementedError
+
+    def replace_commands(self, node_id, commands):
+        raise NotImplementedError
+
+    def pop_commands(self, node_id):
+        raise NotImplementedError
+
+    def pending_commands(self, node_id):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+# ─────────────────────────────────────────────────────────
+# IN-PROCESS (single worker)
+# ─────────────────────────────────────────────────────────
+
+class InProcessBackend(StateBackend):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kv = {}
+        self._status = {}      # {junction_id: (version, body)}
+        self._version = 0
+        self._commands = {}    # {node_id: [command, ...]}
+
+    def kv(self, namespace):
+        return self._kv.setdefault(namespace, {})
+
+    def publish_status(self, junction_id, body):
+        with self._lock:
+            self._version += 1
+            self._status[junction_id] = (self._version, body)
+            return self._version
+
+    def status_since(self, version):
+        with self._lock:
+            return self._version, [(jid, v, body) for jid, (v, body) in self._status.items() if v > version]
+
+    def status_version(self):
+        return self._version
+
+    def push_command(self, node_id, command, dedupe_key="target_lane"):
+        with self._lock:
+            queue = self._commands.setdefault(node_id, [])
+            key = command.get(dedupe_key)
+            if key is not None:
+                for i, pending in enumerate(queue):
+                    if pending.get(dedupe_key) == key:
+                        if pending == command:
+                            return False
+                        queue[i] = command
+                        return True
+            queue.append(command)
+            return True
+
+    def replace_commands(self, node_id, commands):
+        with self._lock:
+            self._commands[node_id] = list(commands)
+
+    def pop_commands(self, node_id):
+        with self._lock:
+            return self._commands.pop(node_id, [])
+
+    def pending_commands(self, node_id):
+        with self._lock:
+            return list(self._commands.get(node_id, []))
+
+
+# ─────────────────────────────────────────────────────────
+# SQLITE (multi-worker, one host)
+# ─────────────────────────────────────────────────────────
+
+class SQLiteKV:
+    """dict-like view of one kv namespace in a SQLiteBackend."""
+
+    def __init__(self, backend, namespace):
+        self._backend = backend
+        self._ns = namespace
+
+    def get(self, key, default=None):
+        row = self._backend._conn().execute(
+            "SELECT value FROM kv WHERE ns = ? AND key = ?", (self._ns, key)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._backend._write("INSERT OR REPLACE INTO kv (ns, key, value) VALUES (?, ?, ?)",
+                             (self._ns, key, json.dumps(value)))
+
+    def __delitem__(self, key):
+        self._backend._write("DELETE FROM kv WHERE ns = ? AND key = ?", (self._ns, key))
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return self._backend._conn().execute("SELECT COUNT(*) FROM kv WHERE ns = ?", (self._ns,)).fetchone()[0]
+
+    def items(self):
+        rows = self._backend._conn().execute("SELECT key, value FROM kv WHERE ns = ?", (self._ns,)).fetchall()
+        return [(k, json.loads(v)) for k, v in rows]
+
+    def pop(self, key, default=None):
+        row = self._backend._conn().execute(
+            "DELETE FROM kv WHERE ns = ? AND key = ? RETURNING value", (self._ns, key)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def clear(self):
+        self._backend._write("DELETE FROM kv WHERE ns = ?", (self._ns,))
+
+
+_MISSING = object()
+
+
+class SQLiteBackend(StateBackend):
+    shared = True
+
+    def __init__(self, path=DEFAULT_PATH, command_ttl=300.0):
+        """
+        Args:
+            path:        SQLite file shared by all workers on the host
+            command_ttl: Pending commands older than this are never delivered
+                         (a restarted CMS must not replay stale throttles)
+        """
+        self.module_name = "STATE"
+        self.path = path
+        self.command_ttl = command_ttl
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO counters VALUES ('status', 0);
+            CREATE TABLE IF NOT EXISTS status (
+                junction_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                body BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_status_version ON status (version);
+            CREATE TABLE IF NOT EXISTS commands (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                node_id TEXT NOT NULL,
+                dedupe TEXT,
+                body TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_commands_node ON commands (node_id, id);
+            CREATE TABLE IF NOT EXISTS kv (
+                ns TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (ns, key)
+            );
+        """)
+
+    def _conn(self):
+        """One connection per thread (uvicorn runs sync endpoints in a thread pool)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, sql, params=()):
+        self._conn().execute(sql, params)
+
+    def kv(self, namespace):
+        return SQLiteKV(self, namespace)
+
+    def publish_status(self, junction_id, body):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute(
+                "UPDATE counters SET value = value + 1 WHERE name = 'status' RETURNING value").fetchone()[0]
+            conn.execute("INSERT OR REPLACE INTO status (junction_id, version, body) VALUES (?, ?, ?)",
+                         (junction_id, version, body))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return version
+
+    def status_since(self, version):
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            current = conn.execute("SELECT value FROM counters WHERE name = 'status'").fetchone()[0]
+            rows = conn.execute("SELECT junction_id, version, body FROM status WHERE version > ?",
+                                (version,)).fetchall() if current > version else []
+        finally:
+            conn.execute("COMMIT")
+        return current, [(jid, v, bytes(body)) for jid, v, body in rows]
+
+    def status_version(self):
+        return self._conn().execute("SELECT value FROM counters WHERE name = 'status'").fetchone()[0]
+
+    def push_command(self, node_id, command, dedupe_key="target_lane"):
+        key = command.get(dedupe_key)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if key is not None:
+                row = conn.execute("SELECT id, body FROM commands WHERE node_id = ? AND dedupe = ? AND created_at >= ?",
+                                   (node_id, str(key), time.time() - self.command_ttl)).fetchone()
+                if row and json.loads(row[1]) == command:
+                    conn.execute("COMMIT")
+                    return False
+                if row:
+                    conn.execute("UPDATE commands SET body = ?, created_at = ? WHERE id = ?",
+                                 (json.dumps(command), time.time(), row[0]))
+                    conn.execute("COMMIT")
+                    return True
+            conn.execute("INSERT INTO commands (node_id, dedupe, body, created_at) VALUES (?, ?, ?, ?)",
+                         (node_id, None if key is None else str(key), json.dumps(command), time.time()))
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def replace_commands(self, node_id, commands):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM commands WHERE node_id = ?", (node_id,))
+            conn.executemany("INSERT INTO commands (node_id, dedupe, body, created_at) VALUES (?, NULL, ?, ?)",
+                             [(node_id, json.dumps(c), now) for c in commands])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def pop_commands(self, node_id):
+        rows = self._conn().execute(
+            "DELETE FROM commands WHERE node_id = ? RETURNING id, body, created_at", (node_id,)).fetchall()
+        cutoff = time.time() - self.command_ttl
+        return [json.loads(body) for _, body, created in sorted(rows) if created >= cutoff]
+
+    def pending_commands(self, node_id):
+        rows = self._conn().execute(
+            "SELECT body FROM commands WHERE node_id = ? AND created_at >= ? ORDER BY id",
+            (node_id, time.time() - self.command_ttl)).fetchall()
+        return [json.loads(body) for (body,) in rows]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def get_state_backend():
+    """Backend selected by SystemConfig.CMS_STATE_BACKEND ("memory" | "sqlite")."""
+    from config.settings import SystemConfig
+    kind = getattr(SystemConfig, "CMS_STATE_BACKEND", "memory")
+    if kind == "sqlite":
+        return SQLiteBackend(getattr(SystemConfig, "CMS_STATE_PATH", DEFAULT_PATH))
+    if kind != "memory":
+        raise ValueError(f"Unknown CMS_STATE_BACKEND '{kind}' (expected 'memory' or 'sqlite')")
+    return InProcessBackend()
@@ -0,0 +1,183 @@
+"""
+Throttle Graph - Compiled Upstream Adjacency + Incremental Congestion Control
+Role: NETWORK_CONNECTIONS maps {junction: {phase: upstream_feeder}}. Instead of
+      walking it on every congestion event, it is compiled once at startup:
+
+- chains[node][phase]: ((upstream, hop), ...) following the same approach
+  direction up to `max_hops` (hop 1 = direct feeder), cycle-safe.
+- upstream_sets[node]: every junction that can feed `node` within max_hops
+  (any direction) - blast radius of a throttle, used by dashboards / tests.
+- edge_phase[(upstream, downstream)]: approach direction of each link.
+- downstream[upstream]: junctions the node feeds (reverse adjacency).
+
+ThrottleController keeps the congestion level of every phase (NORMAL /
+CONGESTED > 80% / GRIDLOCK > 95%) and, per flush, only reports the junctions
+whose level changed: escalations / de-escalations to throttle, phases that
+left gridlock (their hop-2+ feeders are released) and junctions that just
+cleared (< 50%) to recover. Steady congestion costs a dict comparison
+instead of a fresh round of DB writes and commands; its throttles are only
+re-asserted every `reassert_s`, in case an edge restarted and lost them.
+"""
+
+import time
+
+NORMAL, CONGESTED, GRIDLOCK = 0, 1, 2
+
+CONGESTED_ABOVE = 80
+GRIDLOCK_ABOVE = 95
+CLEAR_BELOW = 50
+
+
+def phase_level(saturation):
+    if saturation > GRIDLOCK_ABOVE:
+        return GRIDLOCK
+    if saturation > CONGESTED_ABOVE:
+        return CONGESTED
+    return NORMAL
+
+
+class ThrottleGraph:
+    def __init__(self, connections, max_hops=1):
+        """
+        Args:
+            connections: {downstream_id: {phase: upstream_id}}
+            max_hops:    Length of the upstream chains (1 = direct feeders only)
+        """
+        self.max_hops = max(1, max_hops)
+        self.feeders = {node: dict(phases) for node, phases in connections.items()}
+        self.edge_phase = {}
+        downstream = {}
+        for node, phases in self.feeders.items():
+            for phase, upstream in phases.items():
+                self.edge_phase[(upstream, node)] = phase
+                downstream.setdefault(upstream, set()).add(node)
+        self.downstream = {node: frozenset(nodes) for node, nodes in downstream.items()}
+
+        self.chains = {node: {phase: self._chain(node, phase) for phase in phases}
+                       for node, phases in self.feeders.items()}
+        self.upstream_sets = {node: self._upstream_set(node) for node in self.feeders}
+
+    def _chain(self, node, phase):
+        """Same-direction feeders: node <-phase- u1 <-phase- u2 ... (stops at loops / gaps)."""
+        chain, seen, current = [], {node}, node
+        for hop in range(1, self.max_hops + 1):
+            upstream = self.feeders.get(current, {}).get(phase)
+            if upstream is None or upstream in seen:
+                break
+            chain.append((upstream, hop))
+            seen.add(upstream)
+            current = upstream
+        return tuple(chain)
+
+    def _upstream_set(self, node):
+        seen, frontier = {node}, [node]
+        for _ in range(self.max_hops):
+            frontier = [u for n in frontier for u in self.feeders.get(n, {}).values() if u not in seen]
+            seen.update(frontier)
+            if not frontier:
+                break
+        seen.discard(node)
+        return frozenset(seen)
+
+    def throttle_targets(self, node, phase):
+        return self.chains.get(node, {}).get(phase, ())
+
+
+class ThrottleController:
+    def __init__(self, graph, levels=None, max_phases=3, reassert_s=30.0):
+        """
+        Args:
+            graph:      ThrottleGraph
+            levels:     Mapping used to remember each junction's last state
+                        ({jid: {"phases": {phase: level}, "clear": bool, "hot": bool, "at": epoch}});
+                        pass a StateBackend kv so every worker shares it
+            max_phases: Max phases throttled per junction at once
+            reassert_s: Seconds after which the throttles of a junction that
+                        stays congested are sent again
+        """
+        self.graph = graph
+        self.levels = levels if levels is not None else {}
+        self.max_phases = max_phases
+        self.reassert_s = reassert_s
+        self.stats = {"evaluated": 0, "unchanged": 0, "throttle_events": 0, "recover_events": 0,
+                      "release_events": 0, "reasserted": 0}
+
+    def evaluate(self, states, now=None):
+        """
+        states: {jid: {"phase_saturations": {phase: sat}, "junction_saturation": float}}
+        Returns (throttle, recover, release):
+            throttle: [(jid, {phase: sat})] phases whose level rose or changed while congested,
+                      or every congested phase when its throttles are due to be re-asserted
+            recover:  [jid] junctions that just dropped below CLEAR_BELOW
+            release:  [(jid, [phase])] phases that just left GRIDLOCK (see release_targets)
+        """
+        throttle, recover, release = [], [], []
+        levels = self.levels
+        now = time.time() if now is None else now
+        unchanged = reasserted = 0
+        for jid, state in states.items():
+            saturations = state["phase_saturations"]
+            clear = state["junction_saturation"] < CLEAR_BELOW
+            hot = max(saturations.values(), default=0) > CONGESTED_ABOVE
+            previous = levels.get(jid)
+            if previous is not None and previous["clear"] == clear and not hot and not previous["hot"]:
+                unchanged += 1  # Fast path: stayed uncongested (the common case)
+                continue
+            current = {phase: GRIDLOCK if sat > GRIDLOCK_ABOVE else CONGESTED if sat > CONGESTED_ABOVE else NORMAL
+                       for phase, sat in saturations.items()}
+            if previous is not None and previous["clear"] == clear and previous["phases"] == current:
+                if hot and now - previous.get("at", 0) >= self.reassert_s:
+                    levels[jid] = {**previous, "at": now}  # Steady congestion: send the throttles again
+                    throttle.append((jid, {phase: saturations[phase] for phase, level in current.items() if level}))
+                    reasserted += 1
+                else:
+                    unchanged += 1
+                continue
+
+            before = previous["phases"] if previous else {}
+            changed = {phase: saturations[phase] for phase, level in current.items()
+                       if level and before.get(phase) != level}
+            released = [phase for phase, level in before.items() if level == GRIDLOCK and current.get(phase) != GRIDLOCK]
+            at = now if changed else (previous or {}).get("at", 0)
+            levels[jid] = {"phases": current, "clear": clear, "hot": hot, "at": at}
+            if changed:
+                throttle.append((jid, changed))
+            if released:
+                release.append((jid, released))
+            # First sighting counts as a transition: interventions may predate a restart
+            if clear and (previous is None or not previous["clear"]):
+                recover.append(jid)
+
+        self.stats["evaluated"] += len(states)
+        self.stats["unchanged"] += unchanged
+        self.stats["reasserted"] += reasserted
+        self.stats["throttle_events"] += len(throttle)
+        self.stats["recover_events"] += len(recover)
+        self.stats["release_events"] += len(release)
+        return throttle, recover, release
+
+    def plan(self, jid, phase_saturations):
+        """
+        Commands for a congested junction: [(upstream_id, phase, value, hop)].
+        Direct feeders get 15 s (congested) / 25 s (gridlock); feeders further
+        up the same approach get 10 s, only while the phase is in gridlock.
+        """
+        actions, phases = [], 0
+        for phase, sat in phase_saturations.items():
+            level = phase_level(sat)
+            if level == NORMAL or phases >= self.max_phases:
+                continue
+            chain = self.graph.throttle_targets(jid, phase)
+            if not chain:
+                continue  # No upstream feeder defined for this phase
+            for upstream, hop in chain:
+                if hop == 1:
+                    actions.append((upstream, phase, 25 if level == GRIDLOCK else 15, hop))
+                elif level == GRIDLOCK:
+                    actions.append((upstream, phase, 10, hop))
+            phases += 1
+        return actions
+
+    def release_targets(self, jid, phase):
+        """Feeders throttled only while `phase` of jid was in gridlock: [(upstream_id, hop)], hop >= 2."""
+        return [(upstream, hop) for upstream, hop in self.graph.throttle_targets(jid, phase) if hop > 1]
@@ -0,0 +1,85 @@
+"""
+Violation Pages - Keyset Pagination over traffic_violations (CMS)
+Role: List violations newest-first with a cost per page that does not grow
+      with depth. Instead of LIMIT/OFFSET (which reads and throws away every
+      skipped row), each page continues strictly after the last row returned:
+
+          WHERE (created_at, id) < (:last_created_at, :last_id)
+          ORDER BY created_at DESC, id DESC LIMIT :n
+
+The cursor handed to clients is an opaque, URL-safe token of that pair.
+Matching composite indexes ((created_at, id), and prefixed by junction_id /
+status for the filtered listings) are created by migrations.py, so every page
+is an index range scan that stops after n + 1 rows.
+"""
+
+import base64
+from datetime import datetime
+
+MAX_PAGE = 500
+
+# Explicit list (= every column) so the page query does not depend on SELECT * ordering
+COLUMNS = ("id", "junction_id", "plate_number", "violation_type", "violation_time", "evidence_url",
+           "confidence", "penalty_applied", "created_at", "status", "attributes", "metadata", "processed_at")
+
+def encode_cursor(created_at, row_id):
+    stamp = created_at.isoformat() if hasattr(created_at, "isoformat") else str(created_at)
+    return base64.urlsafe_b64encode(f"{stamp}|{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor. Raises ValueError on a malformed token."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        stamp, row_id = raw.rsplit("|", 1)
+        return stamp, int(row_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def page_query(limit, cursor=None, junction_id=None, status=None, columns=COLUMNS):
+    """Returns (sql, params) for one page (limit + 1 rows are fetched to detect the next page)."""
+    where, params = [], []
+    if junction_id is not None:
+        where.append("junction_id = %s")
+        params.append(junction_id)
+    if status is not None:
+        where.append("status = %s")
+        params.append(status)
+    if cursor is not None:
+        where.append("(created_at, id) < (%s, %s)")
+        params.extend(decode_cursor(cursor))
+    sql = f"SELECT {', '.join(columns)} FROM traffic_violations"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY created_at DESC, id DESC LIMIT %s"
+    params.append(max(1, min(limit, MAX_PAGE)) + 1)
+    return sql, params
+
+
+def fetch_page(cur, limit, cursor=None, junction_id=None, status=None):
+    """
+    cur must return mappings (RealDictCursor). Returns (rows, next_cursor);
+    next_cursor is None on the last page.
+    """
+    limit = max(1, min(limit, MAX_PAGE))
+    sql, params = page_query(limit, cursor, junction_id, status)
+    cur.execute(sql, params)
+    return _paged(cur.fetchall(), limit)
+
+
+async def fetch_page_async(conn, limit, cursor=None, junction_id=None, status=None):
+    """fetch_page on an async_db.AsyncConn (rows as dicts)."""
+    limit = max(1, min(limit, MAX_PAGE))
+    sql, params = page_query(limit, cursor, junction_id, status)
+    if cursor is not None:
+        params[-3] = datetime.fromisoformat(params[-3])  # asyncpg binds timestamps as datetime, not text
+    return _paged([dict(row) for row in await conn.fetch(sql, *params)], limit)
+
+
+def _paged(rows, limit):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last["created_at"], last["id"])
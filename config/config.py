@@ -31,4 +31,22 @@ GREEN_MAX = 90            # Maximum green time (seconds)
 YELLOW_DURATION = 15      # Fixed yellow phase duration (seconds)
 FREEZE_OFFSET = 3         # Seconds before green ends: snapshot state
 DEADLINE_OFFSET = 10      # Seconds remaining in yellow: calculation must be done
-# Processing Window = YELLOW_DURATION - DEADLINE_OFFSET = 5 seconds
\ No newline at end of file
+# Processing Window = YELLOW_DURATION - DEADLINE_OFFSET = 5 seconds
+
+# --- Speculative Decision Mode (Part 6 extension) ---
+# During GREEN the next decision is pre-computed from live data every
+# SPECULATIVE_INTERVAL seconds; at FREEZE only changed phases are recomputed.
+SPECULATIVE_MODE = False          # Also enabled with --speculative
+SPECULATIVE_INTERVAL = 2          # Seconds between speculative recomputes
+SPECULATIVE_WARN_FRACTION = 0.5   # Warn if one decision takes > 50% of the Processing Window
+
+# --- Decision Policy ---
+# "GREEDY"    = highest composite score wins, green ∝ score share (Part 6 default)
+# "LOOKAHEAD" = core_logic/phase_optimizer.py searches (phase, green) sequences
+#               over the next cycles and minimises total weighted queue
+DECISION_POLICY = "GREEDY"        # Also selected with --policy LOOKAHEAD
+LOOKAHEAD_DEPTH = 3               # Green phases searched ahead (2-3 cycles)
+LOOKAHEAD_HORIZON = 240           # Seconds over which plans are compared
+LOOKAHEAD_BUDGET = 1.0            # Search deadline (seconds), well inside the Processing Window
+LOOKAHEAD_DISCHARGE_RATE = 50.0   # Weighted units/second released by the green approach (~1 car/s)
+LOOKAHEAD_EWMA_ALPHA = 0.3        # Smoothing of per-approach arrival-rate estimates
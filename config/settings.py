@@ -39,6 +39,70 @@ class SystemConfig:
     # CARLA Bridge Server (for simulation demo)
     CARLA_BRIDGE_URL = os.getenv("CARLA_BRIDGE_URL", "http://localhost:8100")
 
+    # Edge store-and-forward outbox (SQLite WAL, replayed when servers are back)
+    EDGE_OUTBOX_PATH = os.getenv("EDGE_OUTBOX_PATH", os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs", "edge_outbox.db"))
+    EDGE_OUTBOX_MAX_ROWS = int(os.getenv("EDGE_OUTBOX_MAX_ROWS", "50000"))
+
+    # Shared outbound HTTP pool (workers, queued requests, in-flight per destination)
+    HTTP_DISPATCH_WORKERS = int(os.getenv("HTTP_DISPATCH_WORKERS", "4"))
+    HTTP_DISPATCH_QUEUE = int(os.getenv("HTTP_DISPATCH_QUEUE", "1000"))
+    HTTP_DISPATCH_PER_DEST = int(os.getenv("HTTP_DISPATCH_PER_DEST", "2"))
+
+    # CMS heartbeat write-behind: seconds between batched junction_status flushes
+    HEARTBEAT_FLUSH_INTERVAL = float(os.getenv("HEARTBEAT_FLUSH_INTERVAL", "1.0"))
+
+    # CMS hot state (latest heartbeats, pending commands): "memory" = one worker,
+    # "sqlite" = WAL file shared by CMS_WORKERS uvicorn workers on this host
+    CMS_STATE_BACKEND = os.getenv("CMS_STATE_BACKEND", "memory")
+    CMS_STATE_PATH = os.getenv("CMS_STATE_PATH", os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs", "cms_state.db"))
+    CMS_WORKERS = int(os.getenv("CMS_WORKERS", "1"))
+
+    # CMS request-path DB driver: "psycopg2" = pooled sync connections in the threadpool,
+    # "asyncpg" = one asyncpg pool on the event loop (psycopg2 stays the fallback while it is down)
+    CMS_DB_DRIVER = os.getenv("CMS_DB_DRIVER", "psycopg2")
+    ASYNC_DB_POOL_MIN = int(os.getenv("ASYNC_DB_POOL_MIN", "2"))
+    ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", "16"))
+
+    # Edge background service: worker threads, per-lane (capacity, overflow policy) in priority
+    # order, max producer wait on a full "block" lane (s), queue age that lets a lower lane go first (s)
+    BG_WORKERS = int(os.getenv("BG_WORKERS", "2"))
+    BG_LANES = {
+        "evidence": (int(os.getenv("BG_QUEUE_EVIDENCE", "200")), os.getenv("BG_POLICY_EVIDENCE", "block")),
+        "cycle_log": (int(os.getenv("BG_QUEUE_CYCLE_LOG", "500")), os.getenv("BG_POLICY_CYCLE_LOG", "spill")),
+        "telemetry": (int(os.getenv("BG_QUEUE_TELEMETRY", "200")), os.getenv("BG_POLICY_TELEMETRY", "drop_oldest")),
+    }
+    BG_BLOCK_TIMEOUT = float(os.getenv("BG_BLOCK_TIMEOUT", "0.25"))
+    BG_STARVATION_S = float(os.getenv("BG_STARVATION_S", "5.0"))
+    # Violation evidence: "jpg" / "webp", quality, encoding processes (0 = on the worker thread;
+    # a single-core edge gains nothing from shipping frames to another process), phash bits that
+    # still count as the same vehicle, and how long (s) stored evidence is remembered for that check
+    EVIDENCE_FORMAT = os.getenv("EVIDENCE_FORMAT", "jpg")
+    EVIDENCE_QUALITY = int(os.getenv("EVIDENCE_QUALITY", "90"))
+    EVIDENCE_ENCODER_PROCS = int(os.getenv("EVIDENCE_ENCODER_PROCS", str(min(2, (os.cpu_count() or 1) - 1))))
+    EVIDENCE_PHASH_DISTANCE = int(os.getenv("EVIDENCE_PHASH_DISTANCE", "6"))
+    EVIDENCE_DEDUPE_WINDOW_S = float(os.getenv("EVIDENCE_DEDUPE_WINDOW_S", "10"))
+
+    # Upstream chain length for congestion throttling (hop 2+ only while a phase is in gridlock)
+    THROTTLE_MAX_HOPS = int(os.getenv("THROTTLE_MAX_HOPS", "2"))
+    # Throttles of a junction that stays congested are re-sent this often (edge restarts lose them)
+    THROTTLE_REASSERT_S = float(os.getenv("THROTTLE_REASSERT_S", "30"))
+
+    # Raw history (directional_counts, saturation_history) kept in daily partitions for N days
+    HISTORY_RETENTION_DAYS = int(os.getenv("HISTORY_RETENTION_DAYS", "30"))
+
+    # /rewards/credit plate -> owner LRU (entries, seconds for registered / unregistered plates)
+    RTO_CACHE_SIZE = int(os.getenv("RTO_CACHE_SIZE", "50000"))
+    RTO_CACHE_TTL = float(os.getenv("RTO_CACHE_TTL", "300"))
+    RTO_CACHE_MISS_TTL = float(os.getenv("RTO_CACHE_MISS_TTL", "30"))
+
+    # Idempotency keys of applied reward credits are remembered this long (edge retries stop after 24 h)
+    REWARD_LEDGER_RETENTION_DAYS = int(os.getenv("REWARD_LEDGER_RETENTION_DAYS", "7"))
+    # Reward mirror to the mobile app DB: relay poll interval (s, new credits wake it early), rows per batch
+    APP_DB_SYNC_INTERVAL = float(os.getenv("APP_DB_SYNC_INTERVAL", "1.0"))
+    APP_DB_SYNC_BATCH = int(os.getenv("APP_DB_SYNC_BATCH", "500"))
+
     # Mobile App Database (PostgreSQL)
     APP_DB_PARAMS = {
         "dbname": "safedrive_apps",
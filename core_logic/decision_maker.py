@@ -1,12 +1,14 @@
 import json
 import os
+import time
 import config
 from collections import deque
 from core_logic.hybrid_core import HybridCore
 from core_logic.traffic_standards import classify_state
+from core_logic.phase_optimizer import LookaheadOptimizer
 
 class DecisionMaker:
-    def __init__(self):
+    def __init__(self, policy=None):
         """
         THE BRAIN (Decision Maker)
         - Manages 4 Hybrid Cores (N, S, E, W).
@@ -46,6 +48,21 @@ class DecisionMaker:
         # 6. LANE COMBINATIONS (Conflict Matrix - Part 9)
         self._load_lane_combinations()
 
+        # 7. SPECULATIVE MODE (computed during GREEN, validated at FREEZE)
+        # Per-phase HybridCore results keyed by an input fingerprint, so the
+        # FREEZE decision only recomputes phases whose detections changed.
+        self._phase_cache = {}     # {phase: (fingerprint, core_data)}
+        self.speculative = None    # Latest candidate decision (see speculate())
+        self.last_decision_stats = {}
+
+        # 8. DECISION POLICY ("GREEDY" default, "LOOKAHEAD" = phase_optimizer search)
+        self.policy = (policy or getattr(config, "DECISION_POLICY", "GREEDY")).upper()
+        self.optimizer = LookaheadOptimizer() if self.policy == "LOOKAHEAD" else None
+        self.last_winner = None
+        if self.optimizer:
+            print(f"   🔭 [INIT] Lookahead policy: depth {self.optimizer.max_depth}, "
+                  f"budget {config.LOOKAHEAD_BUDGET}s")
+
     def _load_lane_combinations(self):
         """Loads the lane conflict matrix from config/lane_combinations.json."""
         base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -87,25 +104,41 @@ class DecisionMaker:
         phase_combos = self.lane_combinations.get(winner_phase, {})
         return phase_combos.get(state, [f"{winner_phase}_All"])
 
-    def decide_signals(self, vehicle_data):
+    def _fingerprint(self, vehicles):
+        """Hashable summary of one phase's inputs (boxes + classes)."""
+        fp = []
+        for v in vehicles:
+            if isinstance(v, dict):
+                fp.append((tuple(v.get("bbox_coordinates", ())), v.get("vehicle_type")))
+            else:
+                fp.append(tuple(v[:5]))
+        return (self.current_state, tuple(self.prev_open_lanes), tuple(fp))
+
+    def _score_phases(self, vehicle_data):
         """
-        MAIN API: Called by main.py
-        Args:
-            vehicle_data: Dict { "North": [vehicle_list], "South": ... }
-        Returns:
-            { "priority_scores": ..., "allocated_times": ..., "system_state": ... }
+        STEP 1 + 2: HybridCore data and composite scores for every phase.
+        Reuses cached core results for phases whose inputs are unchanged.
+        Returns (raw_scores, meta_data, total_p, recomputed_phases).
         """
         raw_scores = {}
         meta_data = {}
         total_p = 0
+        recomputed = []
         
         # --- STEP 1: GATHER SCORES FROM HYBRID CORES ---
         for phase_name, core in self.hybrid_cores.items():
             vehs = vehicle_data.get(phase_name, [])
             
-            # CALL HYBRID CORE
-            # Pass current state so it knows whether to apply 0.5 multiplier
-            data = core.process_hybrid_data(vehs, self.current_state, self.prev_open_lanes)
+            fp = self._fingerprint(vehs)
+            cached = self._phase_cache.get(phase_name)
+            if cached and cached[0] == fp:
+                data = cached[1]
+            else:
+                # CALL HYBRID CORE
+                # Pass current state so it knows whether to apply 0.5 multiplier
+                data = core.process_hybrid_data(vehs, self.current_state, self.prev_open_lanes)
+                self._phase_cache[phase_name] = (fp, data)
+                recomputed.append(phase_name)
             
             # --- STEP 2: COMPOSITE FORMULA ---
             # Composite = (Grid_Val * 100) + P_Straight + P_Left
@@ -128,6 +161,10 @@ class DecisionMaker:
                 "Final": int(composite_score)
             }
 
+        return raw_scores, meta_data, total_p, recomputed
+
+    def _finalize(self, raw_scores, meta_data, total_p):
+        """STEP 3 + 4: green times, next state and winner — pure, no state changes."""
         # --- STEP 3: ADAPTIVE GREEN TIME CALCULATION ---
         # Formula: Gi = Gmin + (Pi / Total_P) * (Gmax - Gmin)
         green_times = {}
@@ -150,12 +187,94 @@ class DecisionMaker:
             # Map grid_val (1.0-5.0) to saturation (0.0-1.0)
             avg_saturation = sum((v - 1.0) / 4.0 for v in grid_vals) / len(grid_vals)
         
-        self.current_state = self._determine_next_state(avg_saturation)
+        next_state = self._determine_next_state(avg_saturation)
         
         # Determine winner and allowed lanes from conflict matrix
         winner_phase = max(raw_scores, key=raw_scores.get)
-        allowed_lanes = self._get_allowed_lanes(winner_phase, self.current_state)
+        plan = None
+        if self.optimizer:
+            plan = self._lookahead_plan(meta_data)
+            winner_phase = plan["winner_phase"]
+            green_times[winner_phase] = plan["green_time"]
+        allowed_lanes = self._get_allowed_lanes(winner_phase, next_state)
+        return green_times, next_state, winner_phase, allowed_lanes, plan
+
+    def _lookahead_plan(self, meta_data):
+        """
+        Lookahead plan for the weighted queues. The search is only re-run when
+        the queues differ from the ones the speculative candidate was planned
+        for (arrival rates only change in decide_signals, after the plan).
+        """
+        queues = self._weighted_queues(meta_data)
+        key = tuple(sorted(queues.items()))
+        cached = self.speculative["plan"] if self.speculative else None
+        if cached and cached["queues_key"] == key:
+            return {**cached, "reused": True}
+        return {**self.optimizer.optimize(queues), "queues_key": key, "reused": False}
+
+    def _weighted_queues(self, meta_data):
+        """Composite score minus the empty-road grid baseline (Grid 1.0) per phase."""
+        return {
+            phase: max(0.0, (m["Grid_Raw"] - 1.0) * self.GRID_SCALAR + m["P_Str"] + m["P_Left"])
+            for phase, m in meta_data.items()
+        }
+
+    def speculate(self, vehicle_data):
+        """
+        SPECULATIVE MODE: Called every few seconds during GREEN with live data.
+        Computes a candidate decision WITHOUT touching state/history, warming the
+        per-phase cache so decide_signals() at FREEZE only redoes changed phases.
+        Returns the candidate (also kept in self.speculative).
+        """
+        t0 = time.time()
+        raw_scores, meta_data, total_p, recomputed = self._score_phases(vehicle_data)
+        green_times, next_state, winner_phase, allowed_lanes, plan = self._finalize(raw_scores, meta_data, total_p)
+        self.speculative = {
+            "winner_phase": winner_phase,
+            "plan": plan,  # Lookahead plan + the queues it was searched for (None when greedy)
+            "priority_scores": raw_scores,
+            "allocated_times": green_times,
+            "system_state": next_state,
+            "allowed_lanes": allowed_lanes,
+            "computed_at": t0,
+            "compute_time": time.time() - t0,
+            "recomputed_phases": recomputed
+        }
+        return self.speculative
+
+    def decide_signals(self, vehicle_data):
+        """
+        MAIN API: Called by main.py
+        Args:
+            vehicle_data: Dict { "North": [vehicle_list], "South": ... }
+        Returns:
+            { "priority_scores": ..., "allocated_times": ..., "system_state": ... }
+        """
+        t0 = time.time()
+        raw_scores, meta_data, total_p, recomputed = self._score_phases(vehicle_data)
+        green_times, next_state, winner_phase, allowed_lanes, plan = self._finalize(raw_scores, meta_data, total_p)
+        
+        # Validate against the speculative candidate (if any was computed this cycle)
+        speculative_hit = None
+        if self.speculative is not None:
+            speculative_hit = (self.speculative["winner_phase"] == winner_phase)
+            self.speculative = None
+        
+        self.current_state = next_state
         self.prev_open_lanes = allowed_lanes
+        
+        # Feed arrival-rate estimation (phases that were RED since the last decision)
+        if self.optimizer:
+            self.optimizer.observe(self._weighted_queues(meta_data), green_phase=self.last_winner)
+        self.last_winner = winner_phase
+        
+        self.last_decision_stats = {
+            "compute_time": time.time() - t0,
+            "recomputed_phases": recomputed,
+            "speculative_hit": speculative_hit
+        }
+        if self.optimizer:
+            self.last_decision_stats["lookahead"] = {**self.optimizer.last_stats, "reused": plan["reused"]}
 
         # Store for background heartbeat loop (real per-phase saturation)
         self.last_details = meta_data
@@ -167,7 +286,8 @@ class DecisionMaker:
             "priority_scores": raw_scores,
             "allocated_times": green_times,
             "system_state": self.current_state,
-            "details": meta_data
+            "details": meta_data,
+            "winner_phase": winner_phase
         }
 
     # --- CMS SUPPORT METHODS ---
@@ -0,0 +1,227 @@
+"""
+Phase Optimizer Module - Anytime Multi-Phase Lookahead
+Role: Optional replacement for the greedy "highest composite score wins" policy.
+      Searches sequences of (phase, green_time) over the next few cycles and
+      picks the first step of the plan that minimises total weighted queue.
+
+Model (fluid queues, one per approach):
+    - Queue q_p is the weighted vehicle load of a phase (HybridCore weights,
+      i.e. the composite score minus the empty-road grid baseline).
+    - Arrivals λ_p are estimated online (EWMA) from how fast the queues of the
+      phases that were RED grew between two decisions.
+    - The green phase discharges at DISCHARGE_RATE weighted units/second.
+    - Every switch costs LOST_TIME seconds (yellow + all-red) with no discharge.
+
+Search:
+    Iterative deepening (depth 1 → max_depth) with branch-and-bound. Each plan
+    is evaluated over a fixed horizon; plans shorter than the horizon are
+    completed with a greedy rollout so every depth yields a comparable cost.
+    The search is ANYTIME: when the deadline hits it returns the best plan found
+    so far (depth 1 always completes first, so a valid plan is always returned).
+"""
+
+import time
+import config
+
+PHASES = ["North", "South", "East", "West"]
+
+
+def _queue_area(q, rate, t):
+    """
+    Integrates a linear queue q(t) = max(0, q + rate*t) over [0, t].
+    Returns (q_end, area).
+    """
+    if t <= 0:
+        return q, 0.0
+    if rate >= 0 or q + rate * t >= 0:
+        q_end = q + rate * t
+        return q_end, (q + q_end) * t / 2.0
+    # Queue empties at t0 and stays at zero
+    t0 = -q / rate
+    return 0.0, q * t0 / 2.0
+
+
+class LookaheadOptimizer:
+    def __init__(self, g_min=None, g_max=None, lost_time=None, discharge_rate=None,
+                 horizon=None, max_depth=None, green_steps=None):
+        """
+        Args:
+            g_min / g_max:   Green time bounds (seconds), default config.GREEN_MIN/MAX
+            lost_time:       Seconds per switch with no discharge (yellow + all-red)
+            discharge_rate:  Weighted units/second released by the green phase
+            horizon:         Seconds over which plans are compared
+            max_depth:       Deepest plan searched (number of green phases)
+            green_steps:     Candidate green times; default 5 evenly spaced steps
+        """
+        self.g_min = g_min if g_min is not None else config.GREEN_MIN
+        self.g_max = g_max if g_max is not None else config.GREEN_MAX
+        self.lost_time = lost_time if lost_time is not None else config.YELLOW_DURATION + 2
+        self.discharge_rate = discharge_rate if discharge_rate is not None else config.LOOKAHEAD_DISCHARGE_RATE
+        self.horizon = horizon if horizon is not None else config.LOOKAHEAD_HORIZON
+        self.max_depth = max_depth if max_depth is not None else config.LOOKAHEAD_DEPTH
+        if green_steps is None:
+            n = 5
+            green_steps = [round(self.g_min + i * (self.g_max - self.g_min) / (n - 1)) for i in range(n)]
+        self.green_steps = sorted(set(int(g) for g in green_steps))
+
+        # ARRIVAL ESTIMATION (EWMA of observed growth on RED approaches)
+        self.alpha = config.LOOKAHEAD_EWMA_ALPHA
+        self.arrival_rates = {p: 0.0 for p in PHASES}
+        self._last_obs = None    # (timestamp, queues, green_phase)
+
+        self.last_stats = {}
+
+    # ─────────────────────────────────────────────────────────
+    # ARRIVAL RATES
+    # ─────────────────────────────────────────────────────────
+
+    def observe(self, queues, green_phase=None, timestamp=None):
+        """
+        Feeds one queue observation (called once per decision).
+        Approaches that were RED since the last observation only gained
+        vehicles, so their growth rate is a clean arrival sample.
+        """
+        now = timestamp if timestamp is not None else time.time()
+        if self._last_obs is not None:
+            prev_t, prev_q, prev_green = self._last_obs
+            dt = now - prev_t
+            if dt > 0:
+                for p in PHASES:
+                    if p == prev_green or p not in queues or p not in prev_q:
+                        continue
+                    sample = max(0.0, (queues[p] - prev_q[p]) / dt)
+                    self.arrival_rates[p] = (1 - self.alpha) * self.arrival_rates[p] + self.alpha * sample
+        self._last_obs = (now, dict(queues), green_phase)
+
+    # ─────────────────────────────────────────────────────────
+    # SIMULATION
+    # ─────────────────────────────────────────────────────────
+
+    def _step(self, queues, phase, green, budget):
+        """
+        Simulates one switch to `phase` for `green` seconds, truncated to `budget`
+        seconds. Returns (new_queues, area, elapsed).
+        """
+        lost = min(self.lost_time, budget)
+        green = min(green, budget - lost)
+        new_q = {}
+        area = 0.0
+        for p, q in queues.items():
+            lam = self.arrival_rates.get(p, 0.0)
+            q, a = _queue_area(q, lam, lost)
+            area += a
+            rate = lam - self.discharge_rate if p == phase else lam
+            q, a = _queue_area(q, rate, green)
+            area += a
+            new_q[p] = q
+        return new_q, area, lost + green
+
+    def _lower_bound(self, queues, remaining):
+        """Optimistic cost: every approach discharges at once, no lost time."""
+        total = 0.0
+        for p, q in queues.items():
+            total += _queue_area(q, self.arrival_rates.get(p, 0.0) - self.discharge_rate, remaining)[1]
+        return total
+
+    def greedy_choice(self, queues):
+        """Same rule as DecisionMaker: largest load wins, green ∝ its share."""
+        phase = max(queues, key=queues.get)
+        total = sum(queues.values())
+        share = queues[phase] / total if total > 0 else 0.0
+        return phase, int(self.g_min + share * (self.g_max - self.g_min))
+
+    def _rollout(self, queues, remaining):
+        """Completes a partial plan greedily up to the horizon. Returns its cost."""
+        cost = 0.0
+        while remaining > 1e-9:
+            phase, green = self.greedy_choice(queues)
+            queues, area, elapsed = self._step(queues, phase, green, remaining)
+            cost += area
+            remaining -= elapsed
+        return cost
+
+    # ─────────────────────────────────────────────────────────
+    # SEARCH
+    # ─────────────────────────────────────────────────────────
+
+    def optimize(self, queues, deadline_s=None):
+        """
+        MAIN API: Best plan for the given queues within deadline_s seconds.
+        Args:
+            queues: { "North": weighted_load, ... }
+        Returns:
+            { "winner_phase", "green_time", "plan": [(phase, green), ...],
+              "cost", "depth", "nodes", "timed_out" }
+        """
+        t0 = time.perf_counter()
+        budget = deadline_s if deadline_s is not None else config.LOOKAHEAD_BUDGET
+        deadline = t0 + budget
+        queues = {p: max(0.0, float(queues.get(p, 0.0))) for p in PHASES}
+
+        # Greedy plan is the incumbent: the optimiser can only improve on it
+        g_phase, g_green = self.greedy_choice(queues)
+        nq, area, elapsed = self._step(queues, g_phase, g_green, self.horizon)
+        best = {"cost": area + self._rollout(nq, self.horizon - elapsed), "plan": [(g_phase, g_green)], "depth": 0}
+
+        self._nodes = 0
+        self._timed_out = False
+        for depth in range(1, self.max_depth + 1):
+            self._search(queues, self.horizon, depth, [], 0.0, best, deadline)
+            if self._timed_out:
+                break
+            best["depth"] = depth
+
+        winner, green = best["plan"][0]
+        self.last_stats = {
+            "compute_time": time.perf_counter() - t0,
+            "depth": best["depth"],
+            "nodes": self._nodes,
+            "timed_out": self._timed_out
+        }
+        return {
+            "winner_phase": winner,
+            "green_time": max(self.g_min, min(self.g_max, green)),
+            "plan": list(best["plan"]),
+            "cost": best["cost"],
+            **{k: self.last_stats[k] for k in ("depth", "nodes", "timed_out")}
+        }
+
+    def _search(self, queues, remaining, depth, plan, cost, best, deadline):
+        if self._timed_out:
+            return
+        self._nodes += 1
+        if (self._nodes & 63) == 0 and time.perf_counter() > deadline:
+            self._timed_out = True
+            return
+
+        if depth == 0 or remaining <= 1e-9:
+            total = cost + self._rollout(queues, remaining)
+            if total < best["cost"] - 1e-9:
+                best["cost"] = total
+                best["plan"] = list(plan)
+            return
+
+        # Expand the most loaded approaches first so good plans are found early
+        for phase in sorted(queues, key=queues.get, reverse=True):
+            for green in self.green_steps:
+                nq, area, elapsed = self._step(queues, phase, green, remaining)
+                new_cost = cost + area
+                if new_cost + self._lower_bound(nq, remaining - elapsed) >= best["cost"]:
+                    continue  # Bound: cannot beat the incumbent
+                plan.append((phase, green))
+                self._search(nq, remaining - elapsed, depth - 1, plan, new_cost, best, deadline)
+                plan.pop()
+                if self._timed_out:
+                    return
+
+
+# --- TEST BLOCK ---
+if __name__ == "__main__":
+    print("\n🔭 --- TESTING LOOKAHEAD OPTIMIZER ---")
+    opt = LookaheadOptimizer()
+    opt.arrival_rates = {"North": 2.0, "South": 1.0, "East": 8.0, "West": 0.5}
+    queues = {"North": 900, "South": 300, "East": 600, "West": 50}
+    result = opt.optimize(queues, deadline_s=0.5)
+    print(f"   ► Plan:   {result['plan']}")
+    print(f"   ► Winner: {result['winner_phase']} for {result['green_time']}s")
+    print(f"   ► Depth {result['depth']}, {result['nodes']} nodes, timed out: {result['timed_out']}")
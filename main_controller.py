@@ -24,7 +24,6 @@ import time
 import json
 import threading
 import traceback
-import requests
 from queue import Queue, Empty
 from collections import defaultdict
 
@@ -38,6 +37,7 @@ from core_logic.decision_maker import DecisionMaker
 from core_logic.traffic_standards import classify_state
 from core_logic.traffic_standards import classify_state
 from cms_layer.cms_connector import CMSConnector
+from cms_layer.edge_outbox import get_outbox
 from background_service import BackgroundService # Heavy Ops
 
 
@@ -275,14 +275,21 @@ class VisionThread(threading.Thread):
         self.detect_method = "HYBRID" # Default
         self.show_roi = True
         self.dummy_anpr = False # Default
+        self.record_dir = None      # Record & Replay: write detections to <dir>/<phase>.htdr
+        self.replay_dir = None      # Record & Replay: read detections from <dir>/<phase>.htdr
+        self.replay_realtime = True # False = replay as fast as possible (benchmarks)
         
-    def configure(self, show_video=False, method="HYBRID", show_roi=True, dummy_anpr=False):
+    def configure(self, show_video=False, method="HYBRID", show_roi=True, dummy_anpr=False,
+                  record_dir=None, replay_dir=None, replay_realtime=True):
         self.show_video = show_video
         self.detect_method = method
         self.show_roi = show_roi
         self.dummy_anpr = dummy_anpr
+        self.record_dir = record_dir
+        self.replay_dir = replay_dir
+        self.replay_realtime = replay_realtime
         
-    def _init_detector(self):
+    def _init_detector(self, replay=False):
         """Initialize detection controller with phase-specific ROI config."""
         try:
             from vision_fast.detection_controller import DetectionController
@@ -314,9 +321,12 @@ class VisionThread(threading.Thread):
                 # (Logic handled inside DetectionController based on config usually, but we forced it)
             
             # Call initialize() to fully set up detector, lane mapper, zone analyzer
-            if not self._detection_controller.initialize():
+            if not self._detection_controller.initialize(replay=replay):
                 print(f"    ⚠️ [Vision-{self.phase_name}] Detector initialize() failed — will use raw frames")
                 self._detection_controller = None
+            elif self.record_dir and not replay:
+                from vision_fast.detection_recorder import log_path_for
+                self._detection_controller.enable_recording(log_path_for(self.record_dir, self.phase_name), self.phase_name)
                 
         except Exception as e:
             print(f"    ⚠️ [Vision-{self.phase_name}] Detector init failed: {e}")
@@ -334,6 +344,9 @@ class VisionThread(threading.Thread):
             self._run_video_loop()
         elif self.source == "GHOST":
             self._run_ghost_loop()
+        elif self.source == "REPLAY":
+            self._init_detector(replay=True)
+            self._run_replay_loop()
         else:
             print(f"    \u26a0\ufe0f [Vision-{self.phase_name}] Unknown source: {self.source}")
     
@@ -490,6 +503,44 @@ class VisionThread(threading.Thread):
             
             cap.release()
     
+    def _run_replay_loop(self):
+        """
+        Feed recorded detections (vision_fast/detection_recorder.py) through the
+        downstream pipeline instead of a video. No model, no frames, no ANPR.
+        """
+        from vision_fast.detection_recorder import DetectionReplaySource, log_path_for
+        
+        log_path = log_path_for(self.replay_dir or "", self.phase_name)
+        if not os.path.exists(log_path):
+            print(f"    \u26a0\ufe0f [Vision-{self.phase_name}] Replay log not found: {log_path}")
+            return
+        if not self._detection_controller:
+            print(f"    \u26a0\ufe0f [Vision-{self.phase_name}] No detection pipeline — replay aborted")
+            return
+        
+        source = DetectionReplaySource(log_path, realtime=self.replay_realtime, loop=True)
+        frame_shape = (source.frame_size[1], source.frame_size[0])  # (h, w)
+        print(f"    \u23ef\ufe0f [Vision-{self.phase_name}] Replaying: {os.path.basename(log_path)} "
+              f"({'realtime' if self.replay_realtime else 'max speed'})")
+        
+        frame_num = 0
+        for ts, detections in source.frames(stop_event=self._stop_event):
+            frame_num += 1
+            result = self._detection_controller.process_detections(
+                detections, frame_shape, timestamp=ts, detect_mode=self.detect_method
+            )
+            if result.get("status") == "success":
+                self.shared_queue.update_phase(
+                    self.phase_name,
+                    lane_data=result.get("lane_data", {}),
+                    raw_detections=result.get("raw_detections", []),
+                    intersection_status=result.get("intersection_status", "CLEAR")
+                )
+            if frame_num % 1000 == 0:
+                print(f"    \U0001f4f9 [Vision-{self.phase_name}] Replayed {frame_num} frames")
+        if not frame_num and not self._stop_event.is_set():
+            print(f"    \u26a0\ufe0f [Vision-{self.phase_name}] Replay log has no frames: {log_path}")
+    
     def _run_ghost_loop(self):
         """
         In GHOST mode, query the CARLA Bridge for lane data.
@@ -530,6 +581,8 @@ class VisionThread(threading.Thread):
     
     def stop(self):
         self._stop_event.set()
+        if self._detection_controller and self._detection_controller.recorder:
+            self._detection_controller.recorder.close()
 
 
 # =============================================================================
@@ -676,18 +729,35 @@ class MainController:
         else:
             print("  📷 [MAIN] ANPR Mode: REAL (OCR)")
 
+        # Record & Replay of per-camera detection streams
+        self.record_dir = None
+        self.replay_dir = None
+        self.replay_realtime = "--replay-fast" not in sys.argv
+        if "--record" in sys.argv:
+            self.record_dir = sys.argv[sys.argv.index("--record") + 1]
+            print(f"  ⏺️ [MAIN] Recording detections to {self.record_dir}")
+        if "--replay" in sys.argv:
+            self.replay_dir = sys.argv[sys.argv.index("--replay") + 1]
+            print(f"  ⏯️ [MAIN] Replaying detections from {self.replay_dir}")
+
         self.carla_sync = False
         if "--carla-sync" in sys.argv:
             self.carla_sync = True
             print("  🌐 [MAIN] CARLA Sync Enabled (HTTP POST to :8100)")
 
+        # Decision policy (GREEDY default, LOOKAHEAD = multi-phase optimiser)
+        self.policy = config.DECISION_POLICY
+        if "--policy" in sys.argv:
+            self.policy = sys.argv[sys.argv.index("--policy") + 1].upper()
+            print(f"  🔭 [MAIN] Decision policy: {self.policy}")
+
         self._stop_event = threading.Event()
         
         # --- Core Components ---
         self.shared_queue = SharedQueue()
         self.freeze_session = FreezeSession()
         self.signal_interface = SignalInterface(mode=mode)
-        self.decision_maker = DecisionMaker()
+        self.decision_maker = DecisionMaker(policy=self.policy)
         
         # --- Timing ---
         self.green_min = config.GREEN_MIN
@@ -696,6 +766,12 @@ class MainController:
         self.freeze_offset = config.FREEZE_OFFSET
         self.deadline_offset = config.DEADLINE_OFFSET
         
+        # --- Speculative Decision Mode ---
+        self.speculative = config.SPECULATIVE_MODE or "--speculative" in sys.argv
+        self.speculative_interval = config.SPECULATIVE_INTERVAL
+        processing_window = self.yellow_duration - self.deadline_offset
+        self.speculative_warn_time = processing_window * config.SPECULATIVE_WARN_FRACTION
+        
         # --- State ---
         self.state = self.STATE_GREEN
         self.current_green_time = self.green_min  # First cycle: minimum green
@@ -721,6 +797,8 @@ class MainController:
               f"FREEZE@T-{self.freeze_offset}s, "
               f"DEADLINE@T-{self.deadline_offset}s")
         print(f"  🎮 Mode: {self.mode}")
+        if self.speculative:
+            print(f"  🔮 Speculative decisions every {self.speculative_interval}s during GREEN")
         print("=" * 60 + "\n")
     
     def set_carla_bridge(self, bridge):
@@ -739,7 +817,8 @@ class MainController:
         if self.mode in ["VIDEO", "CAMERA"]:
             for phase in self.phases:
                 vt = VisionThread(phase, self.shared_queue, source=self.mode)
-                vt.configure(show_video=self.show_video, method=self.detect_method, show_roi=self.show_roi, dummy_anpr=self.dummy_anpr)
+                vt.configure(show_video=self.show_video, method=self.detect_method, show_roi=self.show_roi, dummy_anpr=self.dummy_anpr,
+                             record_dir=self.record_dir)
                 self.vision_threads.append(vt)
                 vt.start()
             
@@ -756,6 +835,13 @@ class MainController:
                 self.visualizer.set_callback(self._handle_keypress)
                 self.visualizer.start()
             
+        elif self.mode == "REPLAY":
+            for phase in self.phases:
+                vt = VisionThread(phase, self.shared_queue, source="REPLAY")
+                vt.configure(method=self.detect_method, replay_dir=self.replay_dir, replay_realtime=self.replay_realtime)
+                self.vision_threads.append(vt)
+                vt.start()
+            
         elif self.mode == "GHOST":
             for phase in self.phases:
                 # Pass Bridge to VisionThreads
@@ -779,7 +865,8 @@ class MainController:
             from config.settings import SystemConfig
             self.cms_connector = CMSConnector(
                 intersection_id=SystemConfig.JUNCTION_ID,
-                server_url=SystemConfig.CMS_SERVER_URL
+                server_url=SystemConfig.CMS_SERVER_URL,
+                outbox=get_outbox()
             )
             print(f"🌐 [MAIN] CMS Connector initialized for {SystemConfig.JUNCTION_ID} -> {SystemConfig.CMS_SERVER_URL}")
         except Exception:
@@ -806,6 +893,9 @@ class MainController:
             
         self.bg_service.stop()
         
+        if getattr(self, "cms_connector", None):
+            self.cms_connector.close()
+        
         # Signal all red for safety
         self.signal_interface.set_all_red()
         print("🛑 [MAIN] Shutdown complete — ALL RED\n")
@@ -839,7 +929,10 @@ class MainController:
                 # Wait for green duration, but trigger FREEZE at T-3s
                 green_wait = self.current_green_time - self.freeze_offset
                 if green_wait > 0:
-                    self._interruptible_sleep(green_wait)
+                    if self.speculative:
+                        self._speculative_green_wait(green_wait)
+                    else:
+                        self._interruptible_sleep(green_wait)
                 
                 if self._stop_event.is_set():
                     break
@@ -928,16 +1021,13 @@ class MainController:
                     # Actually carla bridge just uses decision.allocated_times.get(winner, DEFAULT)
                     payload["allocated_times"] = {next_winner: next_green}
                     
-                    # Send via HTTP
-                    def send_to_carla(p):
-                        try:
-                            resp = requests.post("http://localhost:8100/carla/decision", json=p, timeout=1.0)
-                            if resp.status_code == 200:
-                                print("  📡 [CARLA] Successfully synced decision to simulator")
-                        except Exception as e:
-                            print(f"  ⚠️ [CARLA Sync Error] {e}")
-                            
-                    threading.Thread(target=send_to_carla, args=(payload,), daemon=True).start()
+                    # Store-and-forward: local append, replayed by the outbox drainer
+                    try:
+                        from config.settings import SystemConfig
+                        get_outbox().append(SystemConfig.CARLA_BRIDGE_URL, "/carla/decision",
+                                            payload, coalesce_key="decision")
+                    except Exception as e:
+                        print(f"  ⚠️ [CARLA Sync Error] {e}")
         
         except KeyboardInterrupt:
             self.shutdown()
@@ -950,6 +1040,43 @@ class MainController:
     # DECISION CALCULATION
     # ─────────────────────────────────────────────────────────
     
+    def _build_vehicle_data(self, raw_detections):
+        """Per-phase detection lists in the shape DecisionMaker expects."""
+        # If we have raw_detections, use them (HybridCore needs bounding boxes)
+        # If we only have telemetry, we construct synthetic data
+        vehicle_data = {}
+        for phase in ["North", "South", "East", "West"]:
+            vehicle_data[phase] = raw_detections.get(phase, [])
+        return vehicle_data
+    
+    def _speculative_green_wait(self, seconds):
+        """
+        GREEN wait that pre-computes the next decision from live data every
+        speculative_interval seconds, so FREEZE only has to validate it.
+        """
+        end = time.time() + seconds
+        while not self._stop_event.is_set():
+            remaining = end - time.time()
+            if remaining <= 0:
+                break
+            self._interruptible_sleep(min(self.speculative_interval, remaining))
+            if self._stop_event.is_set() or time.time() >= end:
+                break
+            
+            live = self.shared_queue.get_snapshot()
+            try:
+                candidate = self.decision_maker.speculate(
+                    self._build_vehicle_data(live.get("raw_detections", {}))
+                )
+            except Exception as e:
+                print(f"  ⚠️ [SPECULATIVE] Candidate failed: {e}")
+                continue
+            
+            # Early warning: a decision this slow would eat the Processing Window
+            if candidate["compute_time"] > self.speculative_warn_time:
+                print(f"  ⏳ [SPECULATIVE] Slow decision: {candidate['compute_time']*1000:.0f}ms "
+                      f"(budget {self.speculative_warn_time*1000:.0f}ms) — phases {candidate['recomputed_phases']}")
+    
     def _calculate_next_phase(self, frozen_data):
         """
         Called during the Processing Window.
@@ -963,15 +1090,28 @@ class MainController:
         raw_detections = frozen_data.get("raw_detections", {})
         
         # Build vehicle data dict for DecisionMaker
-        # If we have raw_detections, use them (HybridCore needs bounding boxes)
-        # If we only have telemetry, we construct synthetic data
-        vehicle_data = {}
-        for phase in ["North", "South", "East", "West"]:
-            vehicle_data[phase] = raw_detections.get(phase, [])
+        vehicle_data = self._build_vehicle_data(raw_detections)
         
-        # Call DecisionMaker
+        # Call DecisionMaker (in speculative mode, unchanged phases are served from cache)
         result = self.decision_maker.decide_signals(vehicle_data)
         
+        stats = self.decision_maker.last_decision_stats
+        if self.speculative and stats.get("speculative_hit") is not None:
+            verdict = "CONFIRMED" if stats["speculative_hit"] else "ADJUSTED"
+            print(f"     🔮 Speculative winner {verdict} — recomputed {stats['recomputed_phases'] or 'nothing'} "
+                  f"in {stats['compute_time']*1000:.1f}ms")
+        if "lookahead" in stats:
+            la = stats["lookahead"]
+            source = "speculative plan reused" if la["reused"] else f"{la['compute_time']*1000:.0f}ms"
+            print(f"     🔭 Lookahead depth {la['depth']} ({la['nodes']} nodes, "
+                  f"{source}{', deadline hit' if la['timed_out'] else ''})")
+        outbox = getattr(self.cms_connector, "outbox", None)
+        if outbox is not None and outbox.dispatcher is not None:
+            backlog, http = outbox.depth(), outbox.dispatcher.snapshot()
+            if backlog or http["dropped"]:
+                print(f"     📮 Outbox backlog {backlog} | HTTP queue {http['queue_depth']}, "
+                      f"in-flight {http['in_flight']}, dropped {http['dropped']}")
+
         # Forward decision to CARLA bridge (non-blocking, fails silently if not running)
         if self.cms_connector:
             try:
@@ -994,7 +1134,7 @@ class MainController:
             winner = phases[(current_idx + 1) % 4]
             green_time = self.green_min
         else:
-            winner = max(scores, key=scores.get)
+            winner = result.get("winner_phase") or max(scores, key=scores.get)
             green_time = green_times.get(winner, self.green_min)
             green_time = max(self.green_min, min(self.green_max, green_time))
         
@@ -1051,14 +1191,14 @@ class MainController:
                             except Exception:
                                 directional_counts = None
 
-                        # --- 3. Send heartbeat ---
+                        # --- 3. Send heartbeat (queued: the CMS-Sender thread does the HTTP) ---
                         decisions = {"state": self.decision_maker.current_state}
                         self.cms_connector.send_data(
                             lane_status, decisions, green_times,
                             directional_counts=directional_counts
                         )
 
-                        # --- 4. Poll for CMS commands (multi-lane throttle) ---
+                        # --- 4. CMS commands (multi-lane throttle), polled by CMS-Sender ---
                         overrides = self.cms_connector.check_for_updates()
                         if overrides:
                             for lane, cmd in overrides.items():
@@ -1100,14 +1240,17 @@ class MainController:
             
             print("\n  📸 [MANUAL] Triggering Violation Upload...")
             # Submit to Background Service
-            self.bg_service.submit_job("violation", {
+            queued = self.bg_service.submit_job("violation", {
                 "violation_type": "RLV", # Simulate Red Light
                 "frame": frame,
                 "timestamp": time.time(),
                 "junction_id": SystemConfig.JUNCTION_ID,
-                "vehicle_bbox": [0,0,100,100] # Dummy bbox
+                "vehicle_bbox": None # Whole frame (no vehicle selected)
             })
-            print("  ✅ [MANUAL] Violation submitted to queue.")
+            if queued:
+                print("  ✅ [MANUAL] Violation submitted to queue.")
+            else:
+                print("  ⚠️ [MANUAL] Evidence lane full — violation dropped.")
 
 
 # =============================================================================
@@ -1123,6 +1266,8 @@ def main():
         python main_controller.py --video      → VIDEO mode (detect on tools/*.mp4)
         python main_controller.py --ghost      → GHOST mode (SUMO simulation)
         python main_controller.py --camera     → CAMERA mode (live feed)
+        python main_controller.py --video --record logs/replay   → also record detections
+        python main_controller.py --replay logs/replay           → REPLAY mode (no models)
     """
     import argparse
     
@@ -1138,10 +1283,18 @@ def main():
     parser.add_argument("--no-roi", action="store_true", help="Hide ROI lines in video")
     parser.add_argument("--dummy-anpr", action="store_true", help="Enable Dummy ANPR Mode (100 Profiles)")
     parser.add_argument("--carla-sync", action="store_true", help="Sync decisions to CARLA simulator over HTTP (port 8100)")
+    parser.add_argument("--policy", choices=["GREEDY", "LOOKAHEAD"], type=str.upper,
+                        help="Decision policy (default: config.DECISION_POLICY)")
+    parser.add_argument("--speculative", action="store_true", help="Pre-compute the next decision during GREEN")
+    parser.add_argument("--record", metavar="DIR", help="Record per-camera detections to DIR/<phase>.htdr")
+    parser.add_argument("--replay", metavar="DIR", help="Replay recorded detections from DIR instead of running models")
+    parser.add_argument("--replay-fast", action="store_true", help="Replay as fast as possible (ignore recorded timing)")
     
     args = parser.parse_args()
     
-    if args.video:
+    if args.replay:
+        mode = "REPLAY"
+    elif args.video:
         mode = "VIDEO"
     elif args.ghost:
         mode = "GHOST"
@@ -0,0 +1,199 @@
+"""
+verify_app_db_outbox.py
+
+Verification for the app DB outbox relay (cms_layer/app_db_outbox.py). No DB:
+the CMS outbox table and the app DB are fakes that answer the relay's SQL.
+Checks:
+1. App DB outage, then recovery: while the app DB is unreachable no attempt
+   is counted (however many retries), and every credit is relayed, summed
+   per phone, once it is back.
+2. A batch the app DB rejects counts attempts and ends as dead letters after
+   max_attempts; redrive() puts them back and they are relayed.
+"""
+
+import sys
+import os
+
+# Add project root to path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import psycopg2
+from cms_layer.app_db_outbox import AppDbRelay
+
+USERS = {"9800000001": 11, "9800000002": 12}  # phone -> app user_id
+
+
+class FakeOutbox:
+    """app_db_outbox rows: {id: [phone, points, plate, attempts]}."""
+
+    def __init__(self, credits):
+        self.rows = {i + 1: [phone, points, plate, 0] for i, (phone, points, plate) in enumerate(credits)}
+
+    def connection(self):
+        return FakeConnection(FakeOutboxCursor(self))
+
+
+class FakeConnection:
+    encoding = "UTF8"
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        cursor.connection = self
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeOutboxCursor:
+    def __init__(self, outbox):
+        self.outbox = outbox
+        self.rowcount = 0
+        self._result = []
+
+    def execute(self, sql, args=()):
+        rows = self.outbox.rows
+        if "pg_try_advisory_xact_lock" in sql:
+            self._result = [(True,)]
+        elif "COUNT(*)" in sql:
+            limit = args[0]
+            self._result = [(sum(r[3] < limit for r in rows.values()), sum(r[3] >= limit for r in rows.values()), 0)]
+        elif sql.lstrip().startswith("SELECT id"):
+            limit, size = args
+            self._result = [(i, *r[:3], 0.5) for i, r in sorted(rows.items()) if r[3] < limit][:size]
+        elif "attempts + 1" in sql:
+            for i in args[0]:
+                rows[i][3] += 1
+        elif "attempts = 0" in sql:
+            dead = [r for r in rows.values() if r[3] >= args[0]]
+            for r in dead:
+                r[3] = 0
+            self.rowcount = len(dead)
+        elif sql.lstrip().startswith("DELETE"):
+            for i in args[0]:
+                rows.pop(i, None)
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchall(self):
+        return self._result
+
+
+class FakeAppDb:
+    """connect_app target: down (OperationalError), rejecting (DataError) or applying."""
+
+    def __init__(self):
+        self.down = False
+        self.reject = False
+        self.connects = 0
+        self.points = {}
+        self.transactions = []
+
+    def connect(self):
+        self.connects += 1
+        if self.down:
+            raise psycopg2.OperationalError("could not connect to server: Connection refused")
+        return FakeConnection(FakeAppCursor(self))
+
+
+class FakeAppCursor:
+    def __init__(self, app):
+        self.app = app
+        self._args = []
+        self._result = []
+
+    def mogrify(self, template, args):
+        self._args.append(tuple(args))
+        return b"(row)"
+
+    def execute(self, sql, args=None):
+        sql = sql.decode() if isinstance(sql, bytes) else sql
+        rows, self._args = self._args, []
+        if self.app.reject:
+            raise psycopg2.DataError("numeric field overflow")
+        if "UPDATE users" in sql:
+            self._result = [(USERS[phone], phone) for phone, _, _ in rows if phone in USERS]
+            for phone, points, _ in rows:
+                if phone in USERS:
+                    self.app.points[phone] = self.app.points.get(phone, 0) + points
+        elif "INTO transactions" in sql:
+            self.app.transactions.extend(rows)
+
+    def fetchall(self):
+        return self._result
+
+
+def _relay(outbox, app):
+    return AppDbRelay(outbox.connection, app.connect, wallet_per_point=0.1, max_attempts=3)
+
+
+def test_outage_recovery():
+    print("\n--- Testing App DB Outage, Then Recovery ---")
+    outbox = FakeOutbox([("9800000001", 5, "MH12AB1234"), ("9800000002", 7, "MH12CD5678"),
+                         ("9800000001", 3, "MH12AB1234")])
+    app = FakeAppDb()
+    relay = _relay(outbox, app)
+
+    app.down = True
+    relayed = [relay.relay_once() for _ in range(10)]  # Far more retries than max_attempts
+    attempts = [r[3] for r in outbox.rows.values()]
+    if any(relayed) or attempts != [0, 0, 0] or relay.snapshot()["dead_rows"]:
+        print(f"XX Failed: outage counted attempts {attempts}, dead_rows={relay.snapshot()['dead_rows']}")
+        return False
+
+    app.down = False
+    if relay.relay_once() != 3 or outbox.rows:
+        print(f"XX Failed: after recovery {len(outbox.rows)} rows still queued")
+        return False
+    if app.points != {"9800000001": 8, "9800000002": 7} or len(app.transactions) != 2:
+        print(f"XX Failed: app DB points {app.points}, transactions {app.transactions}")
+        return False
+    print(f"OK {app.connects - 1} refused connects counted no attempt; 3 rows relayed on recovery as "
+          f"{len(app.transactions)} user updates.")
+    return True
+
+
+def test_dead_letters_redrive():
+    print("\n--- Testing Rejected Batch -> Dead Letters -> Redrive ---")
+    outbox = FakeOutbox([("9800000001", 5, "MH12AB1234"), ("9800000002", 7, "MH12CD5678")])
+    app = FakeAppDb()
+    relay = _relay(outbox, app)
+
+    app.reject = True
+    for _ in range(5):
+        relay.relay_once()
+    relay.relay_once()  # Refreshes the backlog counters
+    stats = relay.snapshot()
+    if [r[3] for r in outbox.rows.values()] != [3, 3] or stats["dead_rows"] != 2 or stats["pending_rows"]:
+        print(f"XX Failed: attempts {[r[3] for r in outbox.rows.values()]}, stats {stats}")
+        return False
+
+    app.reject = False
+    if relay.relay_once() != 0:
+        print("XX Failed: dead letters relayed without a redrive")
+        return False
+    requeued = relay.redrive()
+    if requeued != 2 or relay.relay_once() != 2 or outbox.rows:
+        print(f"XX Failed: redrive requeued {requeued}, {len(outbox.rows)} rows left")
+        return False
+    print(f"OK rejected batch dead after 3 attempts; redrive requeued {requeued} rows and they were relayed.")
+    return True
+
+
+if __name__ == "__main__":
+    print(">> Starting App DB Outbox Verification...")
+    ok = test_outage_recovery() and test_dead_letters_redrive()
+    if ok:
+        print("\n>> ALL SYSTEMS GO! App DB outbox relay survives outages and re-drives dead letters.")
+    else:
+        print("\n>> VERIFICATION FAILED.")
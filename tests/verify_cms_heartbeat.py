@@ -0,0 +1,368 @@
+"""
+verify_cms_heartbeat.py
+
+Verification for the pooled, non-blocking CMSConnector and delta heartbeats.
+Runs the real CMS FastAPI app in-process (uvicorn, no DB: the write-behind
+heartbeat writer gets no connection, or a recording fake). Checks:
+1. First pulse is a full keyframe; the next one carries only changed fields,
+   and the server cache still holds the complete merged lane state.
+2. After the server forgets the base (restart), RESYNC triggers a keyframe.
+3. send_data() returns immediately even when the CMS is unreachable.
+4. A command queued on the server reaches a subscribed junction at once
+   (long-poll push), without waiting for a heartbeat poll.
+5. Write-behind: many heartbeats from several junctions are flushed as one
+   junction_status upsert + one directional_counts insert.
+6. /live_status is served from memory with ETag / 304, and the SSE stream
+   pushes only the junction that changed.
+7. Counts replayed hours late reach the rollups: the next rollup reaches
+   back to their recorded_at instead of only the last ROLLUP_LATENESS.
+8. A replayed heartbeat stamped in the future is clamped to now, and a
+   failing replayed insert does not drop the live counts of the same flush.
+9. The 60 s saturation snapshot writes one row per junction with a single
+   INSERT ... SELECT (one statement, one commit) and records its timing.
+"""
+
+import sys
+import os
+import asyncio
+import json
+import socket
+import threading
+import time
+
+# Add project root to path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import requests
+import uvicorn
+import cms_layer.server as server
+from cms_layer.cms_connector import CMSConnector
+
+JUNCTION = "PUNE_JW_TEST"
+GREEN = {"North": 30, "South": 30, "East": 30, "West": 30}
+
+
+class RecordingConnection:
+    """Stands in for a psycopg2 connection; records the SQL each flush sends."""
+    encoding = "UTF8"
+
+    def __init__(self, fail_on=None, junctions=0):
+        self.statements = []
+        self.args = []
+        self.commits = 0
+        self.fail_on = fail_on  # execute() raises for SQL containing this
+        self.junctions = junctions  # Rows in junction_status (rowcount of a SELECT from it)
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class RecordingCursor:
+    rowcount = 0
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def mogrify(self, template, args):
+        return repr(tuple(args)).encode()
+
+    def execute(self, sql, args=None):
+        sql = sql.decode() if isinstance(sql, bytes) else sql
+        if self.connection.fail_on and self.connection.fail_on in sql:
+            raise RuntimeError(f"no partition of relation found for row ({self.connection.fail_on})")
+        self.connection.statements.append(sql)
+        self.connection.args.append(args)
+        self.rowcount = self.connection.junctions if "FROM junction_status" in sql else 0
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server():
+    server.heartbeat_writer.get_connection = lambda: None  # No DB in this test
+    port = _free_port()
+    cfg = uvicorn.Config(server.app, host="127.0.0.1", port=port, lifespan="off", log_level="error")
+    srv = uvicorn.Server(cfg)
+    threading.Thread(target=srv.run, daemon=True).start()
+    for _ in range(100):
+        if srv.started:
+            break
+        time.sleep(0.05)
+    return srv, f"http://127.0.0.1:{port}"
+
+
+def _status(d_north):
+    return {p: {"D_i": d_north if p == "North" else 0.1, "Event": "NORMAL"} for p in GREEN}
+
+
+def test_delta_round_trip(url):
+    print("\n--- Testing Keyframe → Delta ---")
+    cms = CMSConnector(JUNCTION, server_url=url, start_thread=False)
+    cms.send_data(_status(0.5), {}, GREEN)
+    cms.send_data(_status(0.9), {}, GREEN, directional_counts={"Straight": 3})
+    if cms.stats["keyframes"] != 1 or cms.stats["deltas"] != 1:
+        print(f"XX Failed: expected 1 keyframe + 1 delta, got {cms.stats}")
+        return False
+    lanes = server.latest_score_cache[JUNCTION]["lanes"]
+    if lanes["North"]["saturation_level"] != 90.0 or lanes["South"]["saturation_level"] != 10.0:
+        print(f"XX Failed: merged server state wrong: {lanes}")
+        return False
+    if lanes["North"].get("directional_counts") != {"Straight": 3}:
+        print(f"XX Failed: directional counts lost: {lanes['North']}")
+        return False
+    print(f"OK Server state complete after delta ({cms.stats['bytes']} bytes for 2 pulses).")
+    cms.close()
+    return True
+
+
+def test_resync(url):
+    print("\n--- Testing RESYNC After Server Restart ---")
+    cms = CMSConnector(JUNCTION, server_url=url, start_thread=False)
+    cms.send_data(_status(0.2), {}, GREEN)
+    server.heartbeat_base.clear()  # Server restart: base state gone
+    cms.send_data(_status(0.3), {}, GREEN)
+    cms.flush()  # Re-sends the pulse as a keyframe
+    if cms.stats["resyncs"] != 1 or cms.stats["keyframes"] != 2:
+        print(f"XX Failed: expected RESYNC + keyframe, got {cms.stats}")
+        return False
+    if server.latest_score_cache[JUNCTION]["lanes"]["North"]["saturation_level"] != 30.0:
+        print("XX Failed: pulse lost after RESYNC")
+        return False
+    print("OK Delta rejected, full heartbeat re-sent.")
+    cms.close()
+    return True
+
+
+def test_non_blocking():
+    print("\n--- Testing Non-Blocking Send (CMS down) ---")
+    cms = CMSConnector(JUNCTION, server_url=f"http://127.0.0.1:{_free_port()}")
+    t0 = time.perf_counter()
+    for _ in range(20):
+        cms.send_data(_status(0.5), {}, GREEN)
+        cms.check_for_updates()
+    elapsed = time.perf_counter() - t0
+    cms.close()
+    if elapsed > 0.05:
+        print(f"XX Failed: 20 pulses blocked the caller for {elapsed * 1000:.0f}ms")
+        return False
+    print(f"OK 20 pulses queued in {elapsed * 1000:.2f}ms with the CMS down.")
+    return True
+
+
+def test_command_push(url):
+    print("\n--- Testing Command Push (long-poll) ---")
+    cms = CMSConnector("PUNE_JW_PUSH", server_url=url)
+    for _ in range(100):
+        if server.command_bus.subscriber_count("PUNE_JW_PUSH"):
+            break
+        time.sleep(0.02)
+    t0 = time.perf_counter()
+    server.command_bus.push("PUNE_JW_PUSH", {"command_type": "THROTTLE_ADJUST", "target_lane": "East",
+                                             "value": 15, "reason": "test"})
+    while cms.get_active_override("East") is None and time.perf_counter() - t0 < 2.0:
+        time.sleep(0.005)
+    latency = time.perf_counter() - t0
+    cms._stop.set()
+    if cms.get_active_override("East") is None:
+        print("XX Failed: pushed command never arrived")
+        return False
+    print(f"OK Command delivered in {latency * 1000:.1f}ms (no heartbeat sent).")
+    return True
+
+
+def test_write_behind(url):
+    print("\n--- Testing Write-Behind Heartbeat Flush ---")
+    server.heartbeat_writer.flush()  # Nothing can flush without a DB...
+    server.heartbeat_writer._latest.clear()  # ...so start from an empty buffer
+    server.heartbeat_writer._counts.clear()
+    server.heartbeat_writer._replayed.clear()
+    connectors = [CMSConnector(f"PUNE_JW_WB{i}", server_url=url, start_thread=False) for i in range(3)]
+    for _ in range(10):
+        for cms in connectors:
+            cms.send_data(_status(0.4), {}, GREEN, directional_counts={"Straight": 1})
+
+    conn = RecordingConnection()
+    server.heartbeat_writer.get_connection = lambda: conn
+    rows = server.heartbeat_writer.flush()
+    server.heartbeat_writer.get_connection = lambda: None
+    for cms in connectors:
+        cms.close()
+
+    upserts = [s for s in conn.statements if "INTO junction_status" in s]
+    inserts = [s for s in conn.statements if "INTO directional_counts" in s]
+    stats = server.heartbeat_writer.snapshot()
+    if len(upserts) != 1 or len(inserts) != 1 or rows != 3 + 30:
+        print(f"XX Failed: {len(upserts)} upserts, {len(inserts)} inserts, {rows} rows (expected 1, 1, 33)")
+        return False
+    print(f"OK 30 heartbeats -> 1 upsert (3 junctions) + 1 insert (30 count rows) "
+          f"in {stats['last_flush_ms']}ms, {stats['coalesced']} coalesced.")
+    return True
+
+
+def test_live_status(url):
+    print("\n--- Testing Live Status ETag + SSE ---")
+    cms = CMSConnector("PUNE_JW_LIVE", server_url=url, start_thread=False)
+    cms.send_data(_status(0.2), {}, GREEN)
+    cms.close()
+
+    first = requests.get(f"{url}/live_status", timeout=2)
+    etag = first.headers.get("ETag")
+    again = requests.get(f"{url}/live_status", headers={"If-None-Match": etag}, timeout=2)
+    if "PUNE_JW_LIVE" not in first.json() or again.status_code != 304:
+        print(f"XX Failed: live_status={list(first.json())}, conditional GET -> {again.status_code}")
+        return False
+
+    events = []
+    version = etag.strip('"v')
+
+    def listen():
+        with requests.get(f"{url}/live_status/stream?since={version}", stream=True, timeout=5) as r:
+            for line in r.iter_lines():
+                if line.startswith(b"data: "):
+                    events.append(json.loads(line[6:]))
+                    return
+
+    listener = threading.Thread(target=listen, daemon=True)
+    listener.start()
+    time.sleep(0.2)
+    cms = CMSConnector("PUNE_JW_LIVE2", server_url=url, start_thread=False)
+    cms.send_data(_status(0.7), {}, GREEN)
+    cms.close()
+    listener.join(timeout=3)
+
+    changed = requests.get(f"{url}/live_status", headers={"If-None-Match": etag}, timeout=2)
+    if not events or list(events[0]) != ["PUNE_JW_LIVE2"] or changed.status_code != 200:
+        print(f"XX Failed: SSE events={[list(e) for e in events]}, GET after change -> {changed.status_code}")
+        return False
+    print(f"OK 304 while unchanged (ETag {etag}); SSE pushed only {list(events[0])}.")
+    return True
+
+
+def test_late_rollup(url):
+    print("\n--- Testing Rollup Backfill for Replayed Counts ---")
+    from datetime import datetime, timezone
+    server.heartbeat_writer.take_rollup_since()  # Forget earlier flushes
+    recorded_at = time.time() - 2 * 3600  # Replayed after a 2h outage
+    requests.post(f"{url}/heartbeat", json={
+        "junction_id": JUNCTION, "timestamp": recorded_at, "replayed": True,
+        "lanes": {"North": {"saturation_level": 40.0, "current_green_time": 30,
+                            "directional_counts": {"Straight": 3}}}}, timeout=2)
+
+    conn = RecordingConnection()
+    server.heartbeat_writer.get_connection = lambda: conn
+    server.heartbeat_writer.flush()
+    server.heartbeat_writer.get_connection = lambda: None
+    late = server.heartbeat_writer.take_rollup_since()
+    if late is None or abs(late - recorded_at) > 1:
+        print(f"XX Failed: rollup_since={late}, expected {recorded_at}")
+        return False
+
+    cur = RecordingConnection().cursor()
+    server.history.rollup(cur, since=datetime.fromtimestamp(late, timezone.utc))
+    start = cur.connection.args[0][0]
+    if start.timestamp() > recorded_at:
+        print(f"XX Failed: rollup starts at {start}, after the replayed counts")
+        return False
+    print(f"OK counts replayed 2h late -> rollup window starts {start:%H:%M} UTC.")
+    return True
+
+
+def test_replay_isolation(url):
+    print("\n--- Testing Replayed Rows Isolated From Live Counts ---")
+    writer = server.heartbeat_writer
+    skewed = time.time() + 5 * 86400  # Edge clock days ahead: no partition for it
+    requests.post(f"{url}/heartbeat", json={
+        "junction_id": JUNCTION, "timestamp": skewed, "replayed": True,
+        "lanes": {"North": {"saturation_level": 40.0, "current_green_time": 30,
+                            "directional_counts": {"Straight": 2}}}}, timeout=2)
+    stamped = writer._replayed[-1][3] if writer._replayed else None
+    if stamped is None or stamped > time.time():
+        print(f"XX Failed: replayed future stamp buffered as {stamped}")
+        return False
+
+    writer.add_counts(JUNCTION, {"North": {"Left": 1}}, recorded_at=time.time() - 3600)
+    writer.submit("PUNE_JW_LIVE_ROW", {}, 20.0, {"North": 20.0}, directional_counts={"North": {"Straight": 4}})
+    conn = RecordingConnection(fail_on=repr(JUNCTION))  # Only the replayed rows are for JUNCTION
+    writer.get_connection = lambda: conn
+    dropped = writer.stats["dropped_counts"]
+    rows = writer.flush()
+    writer.get_connection = lambda: None
+    live = [args for sql, args in zip(conn.statements, conn.args) if "INTO directional_counts" in sql]
+    if rows != 1 + 1 or len(live) != 1 or writer.stats["dropped_counts"] - dropped != 2:
+        print(f"XX Failed: {rows} rows written, {len(live)} count inserts, "
+              f"{writer.stats['dropped_counts'] - dropped} dropped (expected 2, 1, 2)")
+        return False
+    print("OK future replay clamped to now; the failing replayed insert dropped 2 rows, live counts stored.")
+    return True
+
+
+def test_history_snapshot():
+    print("\n--- Testing Set-Based Saturation Snapshot ---")
+    history = server.history
+    get_connection = history.get_connection
+    before = history.snapshot_stats["snapshots"]
+    conn = RecordingConnection(junctions=36)
+    history.get_connection = lambda: conn
+    try:
+        rows = history.log_snapshot()
+    finally:
+        history.get_connection = get_connection
+    stats = history.snapshot_stats
+    sql = conn.statements[0] if conn.statements else ""
+    if len(conn.statements) != 1 or conn.commits != 1 or conn.args != [None]:
+        print(f"XX Failed: {len(conn.statements)} statements, {conn.commits} commits, args {conn.args} "
+              f"(expected 1 parameterless statement, 1 commit)")
+        return False
+    if "INSERT INTO saturation_history" not in sql or "FROM junction_status" not in sql:
+        print(f"XX Failed: snapshot is not an INSERT ... SELECT from junction_status:{sql}")
+        return False
+    if rows != 36 or stats["rows"] != 36 or stats["snapshots"] != before + 1 or stats["last_ms"] < 0 \
+            or stats["max_ms"] < stats["last_ms"]:
+        print(f"XX Failed: returned {rows} rows, stats {stats}")
+        return False
+
+    class FakeAsyncDb:
+        async def execute(self, sql):
+            conn.statements.append(sql)
+            return "INSERT 0 36"
+
+    if asyncio.run(history.log_snapshot_async(FakeAsyncDb())) != 36 or conn.statements[1] != sql \
+            or stats["snapshots"] != before + 2:
+        print(f"XX Failed: async snapshot stats {stats}")
+        return False
+    print(f"OK 36 junctions -> 1 INSERT ... SELECT, 1 commit, {stats['last_ms']}ms recorded "
+          f"(async path: same statement).")
+    return True
+
+
+if __name__ == "__main__":
+    print(">> Starting CMS Heartbeat Verification...")
+    srv, url = _start_server()
+
+    ok = (test_delta_round_trip(url) and test_resync(url) and test_non_blocking() and test_command_push(url)
+          and test_write_behind(url) and test_live_status(url) and test_late_rollup(url)
+          and test_replay_isolation(url) and test_history_snapshot())
+    srv.should_exit = True
+    if ok:
+        print("\n>> ALL SYSTEMS GO! Pooled delta heartbeats, command push, write-behind and live status are verified.")
+    else:
+        print("\n>> VERIFICATION FAILED.")
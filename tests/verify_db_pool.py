@@ -0,0 +1,205 @@
+"""
+verify_db_pool.py
+
+Verification for the pooled DB connections (cms_layer/db_pool.py) and the
+cloud -> local failover in CloudDBHandler. No DB: targets are fakes whose
+reachability can be switched. Checks:
+1. Circuit breaker: opens after failure_threshold failed connects, an open
+   breaker short-circuits without calling the factory, the background probe
+   retries (half-open) while the target is down and closes the breaker once
+   it answers; the probe connection is the next one handed out.
+2. Return-on-error: close() rolls back and pools the connection, a
+   connection whose rollback fails (or that was closed / discard()ed) is
+   dropped, and every path gives the slot back (no exhaustion).
+3. Failover: a cloud outage costs one failed connect, then requests go
+   straight to LOCAL; once the probe closes the breaker they are back on
+   CLOUD.
+"""
+
+import sys
+import os
+import time
+
+# Add project root to path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from cms_layer.cloud_db_handler import CloudDBHandler
+from cms_layer.db_pool import CircuitBreaker, ConnectionPool, PoolError
+
+
+class FakeConnection:
+    def __init__(self, target):
+        self.target = target
+        self.closed = 0
+        self.rollbacks = 0
+        self.fail_rollback = False
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise RuntimeError("server closed the connection unexpectedly")
+        self.rollbacks += 1
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeTarget:
+    """Connection factory that can be switched down (connect raises)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.up = True
+        self.connects = 0
+
+    def connect(self):
+        self.connects += 1
+        if not self.up:
+            raise ConnectionError(f"{self.name} timeout expired")
+        return FakeConnection(self)
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_circuit_breaker():
+    print("\n--- Testing Circuit Breaker (open -> half-open probe -> closed) ---")
+    target = FakeTarget("CLOUD")
+    target.up = False
+    breaker = CircuitBreaker("CLOUD", failure_threshold=2, probe_interval=0.02, probe_max=0.05)
+    pool = ConnectionPool("CLOUD", target.connect, maxconn=2, breaker=breaker)
+
+    for attempt in range(2):
+        try:
+            pool.getconn()
+            print("XX Failed: connect to a down target succeeded")
+            return False
+        except PoolError:
+            pass
+        expected = CircuitBreaker.CLOSED if attempt == 0 else CircuitBreaker.OPEN
+        if breaker.state != expected:
+            print(f"XX Failed: state {breaker.state} after {attempt + 1} failures (threshold 2)")
+            return False
+
+    connects = target.connects
+    for _ in range(5):
+        try:
+            pool.getconn()
+        except PoolError:
+            pass
+    if pool.stats["short_circuited"] != 5 or pool.stats["connect_failures"] != 2:
+        print(f"XX Failed: open breaker still connecting, {pool.stats}")
+        return False
+
+    if not _wait_for(lambda: target.connects >= connects + 2) or breaker.state != CircuitBreaker.OPEN:
+        print(f"XX Failed: probe did not retry while down (connects={target.connects}, state={breaker.state})")
+        return False
+
+    target.up = True
+    if not _wait_for(lambda: breaker.state == CircuitBreaker.CLOSED):
+        print("XX Failed: breaker still OPEN after the target came back")
+        return False
+    conn = pool.getconn()
+    conn.close()
+    if pool.stats["reused"] != 1 or breaker.failures:
+        print(f"XX Failed: probe connection not reused after closing, {pool.snapshot()}")
+        return False
+    print(f"OK opened after 2 failures, {pool.stats['short_circuited']} requests short-circuited, "
+          f"probe made {target.connects - connects} connects and closed the breaker; its connection was reused.")
+    return True
+
+
+def test_return_on_error():
+    print("\n--- Testing Return-on-Error + Slot Release ---")
+    target = FakeTarget("LOCAL")
+    pool = ConnectionPool("LOCAL", target.connect, maxconn=1, acquire_timeout=0.05, probe=False)
+
+    conn = pool.getconn()
+    raw = conn._conn
+    try:
+        pool.getconn()
+        print("XX Failed: second checkout on a maxconn=1 pool succeeded")
+        return False
+    except PoolError:
+        pass
+    conn.close()
+    if raw.rollbacks != 1 or pool.snapshot()["idle"] != 1:
+        print(f"XX Failed: close() did not roll back and pool the connection ({raw.rollbacks} rollbacks)")
+        return False
+
+    conn = pool.getconn()
+    if conn._conn is not raw:
+        print("XX Failed: pooled connection not reused")
+        return False
+    raw.fail_rollback = True  # Connection broke while checked out
+    conn.close()
+    if not raw.closed or pool.snapshot()["idle"]:
+        print("XX Failed: connection with a failing rollback went back to the pool")
+        return False
+
+    conn = pool.getconn()
+    conn.discard()
+    conn = pool.getconn()
+    conn._conn.closed = 1  # Closed by the server while idle
+    conn.close()
+    conn = pool.getconn()
+    conn.close()
+
+    stats = pool.snapshot()
+    if stats["discarded"] != 3 or stats["created"] != 4 or stats["exhausted"] != 1:
+        print(f"XX Failed: counters {stats}")
+        return False
+    print(f"OK rolled back + pooled on close, broken / discarded / closed connections dropped "
+          f"({stats['discarded']}), slot released every time (created={stats['created']}).")
+    return True
+
+
+def test_failover():
+    print("\n--- Testing Cloud -> Local Failover + Return to Cloud ---")
+    cloud, local = FakeTarget("CLOUD"), FakeTarget("LOCAL")
+    handler = CloudDBHandler(cloud_factory=cloud.connect, local_factory=local.connect, maxconn=2)
+    handler.pools["CLOUD"].breaker = CircuitBreaker("CLOUD", probe_interval=0.02, probe_max=0.05)
+
+    cloud.up = False
+    sources = []
+    for _ in range(5):
+        conn, source = handler.get_best_connection()
+        sources.append(source)
+        conn.close()
+    cloud_stats = handler.pools["CLOUD"].stats
+    if sources != ["LOCAL"] * 5 or cloud_stats["connect_failures"] != 1 or cloud_stats["short_circuited"] != 4:
+        print(f"XX Failed: sources={sources}, stats={handler.pool_stats()}")
+        return False
+    if local.connects != 1:
+        print(f"XX Failed: {local.connects} local connects for 5 sequential requests")
+        return False
+
+    cloud.up = True
+    if not _wait_for(lambda: handler.pools["CLOUD"].breaker.allow()):
+        print("XX Failed: cloud breaker never closed")
+        return False
+    conn, source = handler.get_best_connection()
+    conn.close()
+    if source != "CLOUD":
+        print(f"XX Failed: still on {source} after the cloud recovered")
+        return False
+    handler.close()
+    print("OK outage cost 1 cloud connect, 5 requests served by LOCAL on 1 pooled connection, "
+          "back on CLOUD after recovery.")
+    return True
+
+
+if __name__ == "__main__":
+    print(">> Starting DB Pool Verification...")
+    ok = test_circuit_breaker() and test_return_on_error() and test_failover()
+    if ok:
+        print("\n>> ALL SYSTEMS GO! Connection pool, circuit breaker and failover are verified.")
+    else:
+        print("\n>> VERIFICATION FAILED.")
@@ -0,0 +1,278 @@
+"""
+verify_edge_outbox.py
+
+Verification for the edge store-and-forward outbox (the sender is a fake that
+can be switched "down"; only check 6 talks to a local HTTP backend). Checks:
+1. Entries are replayed in append order per destination; a failing
+   destination backs off and does not block the others.
+2. Coalesced appends keep only the latest entry (CARLA decision).
+3. Retention evicts the oldest rows beyond max_rows.
+4. CMSConnector stores heartbeats for replay while the CMS is down and keeps
+   the directional counts of the pulses it skipped.
+5. The hot path (append) stays a local write.
+6. Replay through the shared HttpDispatcher: per-destination concurrency is
+   capped, registered endpoints get batched, a dead destination fails fast.
+7. The dispatcher keeps per-(dest, path) FIFO order even when the first
+   request is slow (one request in flight per path).
+8. A 404 on a batch route keeps the items queued; they are then delivered
+   one by one to the plain route.
+"""
+
+import sys
+import os
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add project root to path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from cms_layer.edge_outbox import EdgeOutbox
+from cms_layer.cms_connector import CMSConnector
+from cms_layer.http_dispatcher import HttpDispatcher
+
+CMS = "http://cms"
+SAFEDRIVE = "http://safedrive"
+
+
+class FakeSender:
+    def __init__(self):
+        self.down = set()
+        self.received = []
+
+    def __call__(self, dest, path, body):
+        if dest in self.down:
+            return False
+        self.received.append((dest, path, json.loads(body)))
+        return True
+
+
+def test_order_and_backoff():
+    print("\n--- Testing Ordered Replay + Backoff ---")
+    sender = FakeSender()
+    box = EdgeOutbox(":memory:", sender=sender, batch_size=4, backoff_base=0.05, start=False)
+    sender.down.add(CMS)
+    for i in range(6):
+        box.append(CMS, "/heartbeat", {"n": i})
+        box.append(SAFEDRIVE, "", {"n": i})
+
+    box.drain_once()
+    box.drain_once()
+    if box.depth(CMS) != 6 or box.depth(SAFEDRIVE) != 0:
+        print(f"XX Failed: down CMS blocked others (cms={box.depth(CMS)}, safedrive={box.depth(SAFEDRIVE)})")
+        return False
+
+    sender.down.clear()
+    time.sleep(0.1)  # Let the backoff expire
+    while box.drain_once():
+        pass
+    order = [body["n"] for dest, _, body in sender.received if dest == CMS]
+    if order != list(range(6)):
+        print(f"XX Failed: replay order {order}")
+        return False
+    print(f"OK 12 entries delivered in order, stats={box.stats}")
+    box.close()
+    return True
+
+
+def test_coalesce_and_retention():
+    print("\n--- Testing Coalescing + Retention ---")
+    box = EdgeOutbox(":memory:", sender=FakeSender(), max_rows=50, start=False)
+    for i in range(10):
+        box.append("http://carla", "/carla/decision", {"winner_phase": i}, coalesce_key="decision")
+    if box.depth() != 1:
+        print(f"XX Failed: {box.depth()} CARLA decisions kept, expected 1")
+        return False
+    for i in range(200):
+        box.append(SAFEDRIVE, "", {"n": i})
+    if box.depth() > 50 + 100 or box.stats["evicted"] == 0:
+        print(f"XX Failed: retention not enforced (depth={box.depth()}, stats={box.stats})")
+        return False
+    print(f"OK 1 decision kept of 10, {box.stats['evicted']} oldest rows evicted.")
+    box.close()
+    return True
+
+
+def test_connector_replay():
+    print("\n--- Testing Heartbeat Store-and-Forward (CMS down) ---")
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        dead_url = f"http://127.0.0.1:{s.getsockname()[1]}"
+    sender = FakeSender()
+    box = EdgeOutbox(":memory:", sender=sender, start=False)
+    cms = CMSConnector("PUNE_JW_TEST", server_url=dead_url, start_thread=False, outbox=box)
+    status = {"North": {"D_i": 0.5, "Event": "NORMAL"}, "South": {"D_i": 0.1, "Event": "NORMAL"}}
+    for _ in range(5):
+        cms.send_data(status, {}, {"North": 30, "South": 30}, directional_counts={"Straight": 2})
+    cms._flush_unstored()
+    cms.close()
+
+    while box.drain_once():
+        pass
+    stored = [body for _, path, body in sender.received if path == "/heartbeat"]
+    total = sum(b["lanes"]["North"].get("directional_counts", {}).get("Straight", 0) for b in stored)
+    if not stored or not all(b.get("replayed") for b in stored) or total != 10:
+        print(f"XX Failed: {len(stored)} replayed heartbeats, Straight total={total} (expected 10)")
+        return False
+    print(f"OK 5 failed pulses stored as {len(stored)} replay heartbeats, no counts lost.")
+    return True
+
+
+def test_append_latency():
+    print("\n--- Testing Hot Path Latency ---")
+    path = os.path.join(PROJECT_ROOT, "logs", "verify_edge_outbox.db")
+    box = EdgeOutbox(path, sender=FakeSender(), start=False)
+    n = 2000
+    t0 = time.perf_counter()
+    for i in range(n):
+        box.append(CMS, "/heartbeat", b'{"n":1}')
+    per_append_us = (time.perf_counter() - t0) / n * 1e6
+    box.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    if per_append_us > 1000:
+        print(f"XX Failed: append took {per_append_us:.0f}us")
+        return False
+    print(f"OK append = {per_append_us:.1f}us (file-backed WAL).")
+    return True
+
+
+def test_dispatcher():
+    print("\n--- Testing Replay via Bounded Dispatcher ---")
+    received, active = [], {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    class Backend(BaseHTTPRequestHandler):
+        def do_POST(self):
+            with lock:
+                active["now"] += 1
+                active["max"] = max(active["max"], active["now"])
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(0.02)  # Slow backend
+            received.append(self.path)
+            with lock:
+                active["now"] -= 1
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    backend = ThreadingHTTPServer(("127.0.0.1", 0), Backend)
+    threading.Thread(target=backend.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{backend.server_port}"
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        dead_url = f"http://127.0.0.1:{s.getsockname()[1]}"
+
+    dispatcher = HttpDispatcher(workers=4, per_dest_limit=2)
+    dispatcher.register_batch(url, "/api/rewards/credit", "/api/rewards/credit/batch", max_items=10)
+    box = EdgeOutbox(":memory:", dispatcher=dispatcher, start=False)
+    for i in range(25):
+        box.append(url, "/api/rewards/credit", {"n": i})
+    for i in range(5):
+        box.append(url, "/heartbeat", {"n": i})
+        box.append(dead_url, "/heartbeat", {"n": i})
+    box.drain_once()
+    stats = dispatcher.snapshot()
+    dispatcher.close()
+    backend.shutdown()
+
+    if active["max"] > 2:
+        print(f"XX Failed: {active['max']} concurrent requests to one backend (limit 2)")
+        return False
+    if box.depth(url) != 0 or box.depth(dead_url) != 5 or received.count("/api/rewards/credit/batch") != 3:
+        print(f"XX Failed: depth={box.depth(url)}/{box.depth(dead_url)}, requests={received}")
+        return False
+    print(f"OK 30 entries in {len(received)} requests (max {active['max']} in flight), "
+          f"{stats['fast_failed']} dead-destination entries failed fast.")
+    return True
+
+
+def test_dispatcher_order():
+    print("\n--- Testing Per-Path FIFO Order in the Dispatcher ---")
+    arrived = []
+
+    class Backend(BaseHTTPRequestHandler):
+        def do_POST(self):
+            n = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["n"]
+            if n == 0:
+                time.sleep(0.2)  # Slow first request: later ones must not overtake it
+            arrived.append(n)
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    backend = ThreadingHTTPServer(("127.0.0.1", 0), Backend)
+    threading.Thread(target=backend.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{backend.server_port}"
+
+    dispatcher = HttpDispatcher(workers=4, per_dest_limit=2)
+    futures = [dispatcher.submit(url, "/heartbeat", {"n": i}) for i in range(4)]
+    results = [f.result(timeout=5) for f in futures]
+    dispatcher.close()
+    backend.shutdown()
+
+    if arrived != [0, 1, 2, 3] or not all(results):
+        print(f"XX Failed: arrival order {arrived}, results {results}")
+        return False
+    print(f"OK 4 POSTs to one path arrived in order {arrived}.")
+    return True
+
+
+def test_batch_404():
+    print("\n--- Testing Batch Route 404 (items kept) ---")
+    received = []
+
+    class Backend(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.path.endswith("/batch"):
+                self.send_response(404)  # Server without the batch route
+            else:
+                received.append(body["n"])
+                self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    backend = ThreadingHTTPServer(("127.0.0.1", 0), Backend)
+    threading.Thread(target=backend.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{backend.server_port}"
+
+    dispatcher = HttpDispatcher(workers=2)
+    dispatcher.register_batch(url, "/rewards/credit", "/rewards/credit/batch", max_items=50, single=True)
+    box = EdgeOutbox(":memory:", dispatcher=dispatcher, backoff_base=0.05, start=False)
+    for i in range(3):
+        box.append(url, "/rewards/credit", {"n": i})
+    box.drain_once()
+    kept = box.depth(url)
+    time.sleep(0.1)  # Let the backoff expire
+    while box.drain_once():
+        pass
+    dispatcher.close()
+    backend.shutdown()
+
+    if kept != 3 or box.depth(url) != 0 or received != [0, 1, 2]:
+        print(f"XX Failed: {kept} kept after the 404, then depth={box.depth(url)}, delivered={received}")
+        return False
+    print(f"OK 404 on the batch route kept all {kept} credits; delivered unbatched in order {received}.")
+    return True
+
+
+if __name__ == "__main__":
+    print(">> Starting Edge Outbox Verification...")
+    ok = (test_order_and_backoff() and test_coalesce_and_retention()
+          and test_connector_replay() and test_append_latency() and test_dispatcher()
+          and test_dispatcher_order() and test_batch_404())
+    if ok:
+        print("\n>> ALL SYSTEMS GO! Store-and-forward outbox is verified.")
+    else:
+        print("\n>> VERIFICATION FAILED.")
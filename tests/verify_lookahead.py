@@ -0,0 +1,99 @@
+"""
+verify_lookahead.py
+
+Verification for the anytime lookahead policy (core_logic/phase_optimizer.py).
+Pure, no models. Checks:
+1. The greedy plan is the incumbent: over random queues / arrival rates the
+   returned plan never costs more than the greedy one, and its cost is the
+   simulated cost of the returned plan.
+2. Anytime: a deadline that has already passed still returns a valid plan
+   (timed_out, green time inside [g_min, g_max]).
+3. observe(): EWMA of the growth of the approaches that were RED; the green
+   approach and shrinking queues add no arrivals.
+"""
+
+import sys
+import os
+import random
+
+# Add project root to path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from core_logic.phase_optimizer import PHASES, LookaheadOptimizer
+
+
+def _plan_cost(opt, queues, plan):
+    """Simulated cost of a plan over the horizon (greedy rollout after it)."""
+    remaining, cost = opt.horizon, 0.0
+    for phase, green in plan:
+        queues, area, elapsed = opt._step(queues, phase, green, remaining)
+        cost += area
+        remaining -= elapsed
+    return cost + opt._rollout(queues, remaining)
+
+
+def test_incumbent():
+    print("\n--- Testing Greedy Incumbent Never Beaten by a Worse Plan ---")
+    rng = random.Random(7)
+    opt = LookaheadOptimizer(max_depth=2)
+    improved = 0
+    for _ in range(30):
+        queues = {p: rng.uniform(0, 1000) for p in PHASES}
+        opt.arrival_rates = {p: rng.uniform(0, 10) for p in PHASES}
+        greedy_cost = _plan_cost(opt, queues, [opt.greedy_choice(queues)])
+        result = opt.optimize(queues, deadline_s=5.0)
+        if result["cost"] > greedy_cost + 1e-6:
+            print(f"XX Failed: plan {result['plan']} costs {result['cost']:.0f} > greedy {greedy_cost:.0f}")
+            return False
+        if abs(_plan_cost(opt, queues, result["plan"]) - result["cost"]) > 1e-6 * max(1.0, result["cost"]):
+            print(f"XX Failed: reported cost {result['cost']:.0f} is not the cost of {result['plan']}")
+            return False
+        improved += result["cost"] < greedy_cost - 1e-6
+    print(f"OK 30 random junctions: never worse than greedy, better in {improved}.")
+    return True
+
+
+def test_deadline():
+    print("\n--- Testing Anytime Deadline ---")
+    opt = LookaheadOptimizer(max_depth=8)
+    opt.arrival_rates = {"North": 2.0, "South": 1.0, "East": 8.0, "West": 0.5}
+    result = opt.optimize({"North": 900, "South": 300, "East": 600, "West": 50}, deadline_s=0.0)
+    if not result["timed_out"] or result["winner_phase"] not in PHASES or not result["plan"]:
+        print(f"XX Failed: {result}")
+        return False
+    if not opt.g_min <= result["green_time"] <= opt.g_max:
+        print(f"XX Failed: green time {result['green_time']} outside [{opt.g_min}, {opt.g_max}]")
+        return False
+    print(f"OK deadline hit after {result['nodes']} nodes, still returned {result['winner_phase']} "
+          f"for {result['green_time']}s (depth {result['depth']}).")
+    return True
+
+
+def test_observe():
+    print("\n--- Testing EWMA Arrival Estimation ---")
+    opt = LookaheadOptimizer()
+    alpha = opt.alpha
+    opt.observe({"North": 100, "South": 50, "East": 80, "West": 0}, green_phase="North", timestamp=0.0)
+    opt.observe({"North": 300, "South": 150, "East": 40, "West": 20}, green_phase="South", timestamp=10.0)
+    expected = {"North": 0.0, "South": alpha * 10.0, "East": 0.0, "West": alpha * 2.0}
+    if any(abs(opt.arrival_rates[p] - expected[p]) > 1e-9 for p in PHASES):
+        print(f"XX Failed: rates {opt.arrival_rates}, expected {expected}")
+        return False
+    opt.observe({"North": 300, "South": 150, "East": 40, "West": 40}, green_phase="East", timestamp=20.0)
+    west = (1 - alpha) * alpha * 2.0 + alpha * 2.0
+    if abs(opt.arrival_rates["West"] - west) > 1e-9 or abs(opt.arrival_rates["South"] - expected["South"]) > 1e-9:
+        print(f"XX Failed: second sample rates {opt.arrival_rates}")
+        return False
+    print(f"OK green North ignored, East shrinking -> 0, South {expected['South']:.1f}/s, "
+          f"West smoothed to {west:.2f}/s.")
+    return True
+
+
+if __name__ == "__main__":
+    print(">> Starting Lookahead Optimizer Verification...")
+    ok = test_incumbent() and test_deadline() and test_observe()
+    if ok:
+        print("\n>> ALL SYSTEMS GO! Anytime lookahead optimiser is verified.")
+    else:
+        print("\n>> VERIFICATION FAILED.")
@@ -0,0 +1,151 @@
+"""
+verify_plate_cache.py
+
+Verification for the RTO owner cache (cms_layer/plate_cache.py). No DB: the
+cursor is a fake that answers OWNER_BY_PLATE_SQL / OWNERS_BY_PLATES_SQL from
+a dict and counts queries. Checks:
+1. LRU: the least recently *used* plate is evicted first once max_entries
+   is exceeded (a hit refreshes a plate).
+2. TTLs: an unregistered plate (ghost) is re-queried after miss_ttl while a
+   registered owner stays cached until ttl.
+3. Invalidation across workers: two caches on two SQLiteBackend handles of
+   one state file (= two uvicorn workers); invalidate() in one empties the
+   other, and a DB read that started before the invalidate is not cached.
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+# Add project root to path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from cms_layer.plate_cache import PlateOwnerCache
+from cms_layer.state_backend import SQLiteBackend
+
+REGISTRY = {
+    "MH12AB1234": ("a@x.in", "Asha", "9800000001", "DL1", "MH-12-AB-1234", "Car", None, "Car"),
+    "MH12CD5678": ("b@x.in", "Bala", "9800000002", "DL2", "MH 12 CD 5678", "Car", None, "Car"),
+    "MH12EF9012": ("c@x.in", "Chet", "9800000003", "DL3", "MH12EF9012", "Bike", None, "Car"),
+    "MH12GH3456": ("d@x.in", "Devi", "9800000004", "DL4", "MH12GH3456", "Car", None, "Car"),
+}
+
+
+class FakeCursor:
+    def __init__(self, registry):
+        self.registry = registry
+        self.queries = 0
+        self.during_query = None  # Called while the "DB read" is in flight
+        self._result = []
+
+    def execute(self, sql, args):
+        self.queries += 1
+        if self.during_query:
+            self.during_query()
+        if "ANY" in sql:
+            self._result = [(norm, None, *self.registry[norm]) for norm in args[0] if norm in self.registry]
+        else:
+            owner = self.registry.get(args[0])
+            self._result = [owner] if owner else []
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return self._result
+
+
+def test_lru_eviction():
+    print("\n--- Testing LRU Eviction ---")
+    cache = PlateOwnerCache(max_entries=3)
+    cur = FakeCursor(REGISTRY)
+    for plate in ("MH-12-AB-1234", "MH12CD5678", "MH12EF9012"):
+        cache.resolve(cur, plate)
+    cache.resolve(cur, "mh 12 ab 1234")  # Hit: AB is now the most recently used
+    cache.resolve(cur, "MH12GH3456")     # Over the bound: CD (least recently used) goes
+    if cur.queries != 4 or cache.stats["evictions"] != 1:
+        print(f"XX Failed: {cur.queries} queries, stats {cache.stats}")
+        return False
+    cached = {norm: cache.get(norm)[0] for norm in REGISTRY}
+    if cached != {"MH12AB1234": True, "MH12CD5678": False, "MH12EF9012": True, "MH12GH3456": True}:
+        print(f"XX Failed: cached after eviction {cached}")
+        return False
+    print("OK 4 plates in a 3-entry cache: MH12CD5678 evicted, the re-used MH12AB1234 kept.")
+    return True
+
+
+def test_ttls():
+    print("\n--- Testing Owner TTL vs Miss TTL ---")
+    cache = PlateOwnerCache(ttl=1.0, miss_ttl=0.1)
+    cur = FakeCursor(REGISTRY)
+    owners = cache.resolve_many(cur, ["MH12AB1234", "KA01ZZ0001"])
+    if cur.queries != 1 or owners["KA01ZZ0001"] is not None or owners["MH12AB1234"] != REGISTRY["MH12AB1234"]:
+        print(f"XX Failed: first resolve_many {owners} in {cur.queries} queries")
+        return False
+    cache.resolve_many(cur, ["MH12AB1234", "KA01ZZ0001"])
+    if cur.queries != 1:
+        print("XX Failed: ghost plate not cached within miss_ttl")
+        return False
+
+    time.sleep(0.15)
+    # Plate registered meanwhile (outside the CMS)
+    cur.registry = {**REGISTRY, "KA01ZZ0001": ("e@x.in", "Esha", "9800000005", "DL5", "KA01ZZ0001", "Car", None, "Car")}
+    owners = cache.resolve_many(cur, ["MH12AB1234", "KA01ZZ0001"])
+    if cur.queries != 2 or owners["KA01ZZ0001"] is None:
+        print(f"XX Failed: ghost entry outlived miss_ttl ({cur.queries} queries, owner {owners['KA01ZZ0001']})")
+        return False
+    if cache.stats["hits"] != 3 or cache.stats["misses"] != 3:
+        print(f"XX Failed: registered owner re-queried before ttl, stats {cache.stats}")
+        return False
+    print(f"OK ghost re-queried after miss_ttl (now {owners['KA01ZZ0001'][1]}), registered owner served "
+          f"from cache (hits={cache.stats['hits']}).")
+    return True
+
+
+def test_invalidation_across_workers():
+    print("\n--- Testing Generation Invalidation Across Workers ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cms_state.db")
+        worker_a, worker_b = SQLiteBackend(path), SQLiteBackend(path)
+        cache_a = PlateOwnerCache(shared=worker_a.kv("plate_cache"))
+        cache_b = PlateOwnerCache(shared=worker_b.kv("plate_cache"))
+        cur_a, cur_b = FakeCursor(REGISTRY), FakeCursor(REGISTRY)
+
+        cache_a.resolve(cur_a, "MH12AB1234")
+        cache_b.resolve(cur_b, "MH12AB1234")
+        cache_b.resolve(cur_b, "MH12AB1234")
+        if cur_b.queries != 1:
+            print(f"XX Failed: worker B not caching ({cur_b.queries} queries)")
+            return False
+
+        cache_a.invalidate()
+        cache_b.resolve(cur_b, "MH12AB1234")
+        if cur_b.queries != 2 or cache_b.snapshot()["generation"] != 1 or cache_a.snapshot()["entries"]:
+            print(f"XX Failed: worker B kept its entries after worker A invalidated "
+                  f"(queries={cur_b.queries}, A={cache_a.snapshot()}, B={cache_b.snapshot()})")
+            return False
+
+        # Worker A invalidates while worker B's DB read is in flight
+        cur_b.during_query = cache_a.invalidate
+        cache_b.resolve(cur_b, "MH12CD5678")
+        cur_b.during_query = None
+        cache_b.resolve(cur_b, "MH12CD5678")
+        if cur_b.queries != 4 or cache_b.snapshot()["generation"] != 2:
+            print(f"XX Failed: owner read before the invalidate was served from cache ({cur_b.queries} queries)")
+            return False
+        worker_a.close()
+        worker_b.close()
+    print("OK invalidate() on worker A emptied worker B's cache via the shared kv; "
+          "a read in flight during the invalidate was not served again.")
+    return True
+
+
+if __name__ == "__main__":
+    print(">> Starting Plate Cache Verification...")
+    ok = test_lru_eviction() and test_ttls() and test_invalidation_across_workers()
+    if ok:
+        print("\n>> ALL SYSTEMS GO! Plate owner cache LRU, TTLs and cross-worker invalidation are verified.")
+    else:
+        print("\n>> VERIFICATION FAILED.")
@@ -0,0 +1,140 @@
+"""
+verify_reward_ledger.py
+
+Verification for the idempotent batch reward ledger (cms_layer/reward_ledger.py).
+No DB: apply_credits runs against a fake cursor that keeps the claimed
+idempotency keys and records the user_rewards upsert rows. Checks:
+1. _ledger_rows: a key repeated inside one batch is claimed once (the
+   repeat is DUPLICATE); credits without a key are not claimed.
+2. _tally: keys claimed by an earlier request are DUPLICATE; points are
+   summed per phone into the V1 / V2 slot of the plate; unregistered
+   plates go to a ghost profile and are not mirrored to the app DB.
+3. apply_credits: one claim + one upsert per batch, and replaying the
+   same batch (edge retry) changes no balance.
+"""
+
+import sys
+import os
+from types import SimpleNamespace
+
+# Add project root to path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from cms_layer.plate_cache import normalize_plate
+from cms_layer.reward_ledger import _ledger_rows, _tally, _target, apply_credits
+
+# (email, owner_name, phone, license, v1_plate, v1_type, v2_plate, v2_type)
+OWNER = ("asha@example.com", "Asha", "9800000001", "DL-1", "MH12AB1234", "Car", "MH 12 CD 5678", "Bike")
+OWNERS = {normalize_plate(OWNER[4]): OWNER, normalize_plate(OWNER[6]): OWNER}
+
+
+def _credit(plate, points, key=None):
+    return SimpleNamespace(plate_number=plate, points=points, junction_id="PUNE_JW_01", idempotency_key=key)
+
+
+def _targets(credits):
+    return [_target(c, OWNERS.get(normalize_plate(c.plate_number))) for c in credits]
+
+
+class FakeConnection:
+    encoding = "UTF8"
+
+
+class FakeCursor:
+    """execute_values target: claims keys like ON CONFLICT DO NOTHING RETURNING, records upserts."""
+    connection = FakeConnection()
+
+    def __init__(self, claimed=()):
+        self.claimed = set(claimed)
+        self.upserts = []
+        self.statements = 0
+        self._args = []
+        self._result = []
+
+    def mogrify(self, template, args):
+        self._args.append(tuple(args))
+        return b"(row)"
+
+    def execute(self, sql, args=None):
+        sql = sql.decode() if isinstance(sql, bytes) else sql
+        rows, self._args = self._args, []
+        self.statements += 1
+        if "reward_credit_ledger" in sql:
+            new = [row[0] for row in rows if row[0] not in self.claimed]
+            self.claimed.update(new)
+            self._result = [(key,) for key in new]
+        elif "user_rewards" in sql:
+            self.upserts.extend(rows)
+
+    def fetchall(self):
+        return self._result
+
+
+def test_ledger_rows():
+    print("\n--- Testing In-Batch Duplicate Keys ---")
+    credits = [_credit("MH12AB1234", 5, "k1"), _credit("MH12AB1234", 5, "k1"), _credit("MH12AB1234", 5)]
+    results = [None] * len(credits)
+    rows = _ledger_rows(credits, _targets(credits), results)
+    if [row[0] for row in rows] != ["k1"] or results[1] != {"status": "DUPLICATE", "idempotency_key": "k1"}:
+        print(f"XX Failed: rows={rows}, results={results}")
+        return False
+    if results[0] is not None or results[2] is not None:
+        print(f"XX Failed: first occurrence / keyless credit already decided: {results}")
+        return False
+    print("OK k1 claimed once, its repeat answered DUPLICATE, keyless credit not claimed.")
+    return True
+
+
+def test_tally():
+    print("\n--- Testing Per-Phone Tally (V1 / V2 / Ghost) ---")
+    credits = [_credit("MH12AB1234", 5, "a"), _credit("MH-12-CD-5678", 7, "b"), _credit("mh12ab1234", 3, "c"),
+               _credit("MH12ZZ0001", 4, "d"), _credit("MH12AB1234", 100, "old")]
+    results = [None] * len(credits)
+    rows, credited = _tally(credits, _targets(credits), results, claimed={"a", "b", "c", "d"})
+
+    owner_row = next(r for r in rows if r[0] == OWNER[2])
+    ghost_row = next((r for r in rows if r[0] == "ghost_MH12ZZ0001"), None)
+    if (owner_row[5], owner_row[7]) != (8, 7) or ghost_row is None or ghost_row[5] != 4 or len(rows) != 2:
+        print(f"XX Failed: upsert rows {rows}")
+        return False
+    if results[4] != {"status": "DUPLICATE", "idempotency_key": "old"} or results[3]["status"] != "GHOST_RECORDED":
+        print(f"XX Failed: results {results}")
+        return False
+    if sorted(credited) != sorted([(OWNER[2], 5, "MH12AB1234"), (OWNER[2], 7, "MH-12-CD-5678"),
+                                   (OWNER[2], 3, "mh12ab1234")]):
+        print(f"XX Failed: app DB mirror rows {credited}")
+        return False
+    print(f"OK one row per phone (V1=8, V2=7), ghost +4, earlier key skipped, {len(credited)} credits mirrored.")
+    return True
+
+
+def test_apply_credits():
+    print("\n--- Testing apply_credits (Fake Cursor, Retry) ---")
+    cur = FakeCursor(claimed={"seen-before"})
+    batch = [_credit("MH12AB1234", 5, "r1"), _credit("MH12CD5678", 5, "r2"), _credit("MH12AB1234", 9, "seen-before")]
+    results, credited = apply_credits(cur, batch, OWNERS)
+    statuses = [r["status"] for r in results]
+    if statuses != ["CREDITED", "CREDITED", "DUPLICATE"] or cur.statements != 2 or len(cur.upserts) != 1:
+        print(f"XX Failed: {statuses}, {cur.statements} statements, upserts={cur.upserts}")
+        return False
+    if (cur.upserts[0][5], cur.upserts[0][7]) != (5, 5):
+        print(f"XX Failed: balances {cur.upserts[0]}")
+        return False
+    statements = cur.statements
+
+    retry, credited_again = apply_credits(cur, batch, OWNERS)
+    if [r["status"] for r in retry] != ["DUPLICATE"] * 3 or credited_again or len(cur.upserts) != 1:
+        print(f"XX Failed: retry applied again: {retry}, upserts={cur.upserts}")
+        return False
+    print(f"OK 2 credited + 1 duplicate in {statements} statements; the retried batch changed nothing.")
+    return True
+
+
+if __name__ == "__main__":
+    print(">> Starting Reward Ledger Verification...")
+    ok = test_ledger_rows() and test_tally() and test_apply_credits()
+    if ok:
+        print("\n>> ALL SYSTEMS GO! Idempotent batch reward credits are verified.")
+    else:
+        print("\n>> VERIFICATION FAILED.")
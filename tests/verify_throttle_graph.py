@@ -0,0 +1,164 @@
+"""
+verify_throttle_graph.py
+
+Verification for the compiled throttle graph and the incremental congestion
+controller (pure, no DB). Checks:
+1. Chains follow one approach direction up to max_hops and stop at cycles;
+   upstream_sets cover every direction.
+2. Escalation: CONGESTED -> 15 s to the direct feeder, GRIDLOCK -> 25 s
+   (plus 10 s further up the chain); steady congestion sends nothing new.
+3. Clearing: a junction is recovered once when it drops below 50 %, not
+   while it sits between 50 % and 80 %.
+4. After a restart (empty levels) the first sighting of a clear junction
+   recovers it and a congested one is throttled again.
+5. Leaving gridlock releases the hop-2+ feeders of that phase (the direct
+   feeder keeps its 15 s throttle).
+6. Steady congestion is re-asserted every reassert_s (an edge that restarted
+   gets its throttle back), and not in between.
+"""
+
+import sys
+import os
+
+# Add project root to path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from cms_layer.throttle_graph import ThrottleController, ThrottleGraph
+
+# A <-North- B <-North- C <-North- A (cycle); A <-East- D
+CONNECTIONS = {
+    "A": {"North": "B", "East": "D"},
+    "B": {"North": "C"},
+    "C": {"North": "A"},
+}
+
+
+def _state(junction_saturation, **phases):
+    return {"phase_saturations": phases, "junction_saturation": junction_saturation}
+
+
+def test_chains():
+    print("\n--- Testing Chains + Cycles ---")
+    graph = ThrottleGraph(CONNECTIONS, max_hops=5)
+    chain = graph.throttle_targets("A", "North")
+    if chain != (("B", 1), ("C", 2)):
+        print(f"XX Failed: A/North chain {chain}, expected B(1) -> C(2) and a stop at the A cycle")
+        return False
+    if graph.upstream_sets["A"] != {"B", "C", "D"} or graph.throttle_targets("A", "South") != ():
+        print(f"XX Failed: upstream_sets[A]={set(graph.upstream_sets['A'])}")
+        return False
+    if ThrottleGraph(CONNECTIONS).throttle_targets("A", "North") != (("B", 1),):
+        print("XX Failed: max_hops=1 should stop at the direct feeder")
+        return False
+    print(f"OK A/North chain = {chain}, cycle back to A cut, blast radius {sorted(graph.upstream_sets['A'])}.")
+    return True
+
+
+def test_escalation():
+    print("\n--- Testing Escalation 15 s -> 25 s ---")
+    controller = ThrottleController(ThrottleGraph(CONNECTIONS, max_hops=2))
+    controller.evaluate({"A": _state(40, North=30)})
+
+    throttle, _, _ = controller.evaluate({"A": _state(70, North=85)})
+    plan = controller.plan("A", throttle[0][1]) if throttle else []
+    if plan != [("B", "North", 15, 1)]:
+        print(f"XX Failed: congested plan {plan}")
+        return False
+
+    steady, _, _ = controller.evaluate({"A": _state(72, North=88)})
+    if steady:
+        print(f"XX Failed: steady congestion re-throttled {steady}")
+        return False
+
+    throttle, _, _ = controller.evaluate({"A": _state(80, North=97)})
+    plan = controller.plan("A", throttle[0][1]) if throttle else []
+    if plan != [("B", "North", 25, 1), ("C", "North", 10, 2)]:
+        print(f"XX Failed: gridlock plan {plan}")
+        return False
+
+    down, _, _ = controller.evaluate({"A": _state(75, North=90)})
+    if [controller.plan(jid, phases) for jid, phases in down] != [[("B", "North", 15, 1)]]:
+        print(f"XX Failed: de-escalation {down}")
+        return False
+    print(f"OK 15 s -> 25 s (+10 s upstream) -> 15 s, nothing re-sent while steady; stats={controller.stats}")
+    return True
+
+
+def test_clearing():
+    print("\n--- Testing Recovery Below 50% ---")
+    controller = ThrottleController(ThrottleGraph(CONNECTIONS))
+    controller.evaluate({"A": _state(85, North=90)})
+    _, recover, _ = controller.evaluate({"A": _state(60, North=60)})
+    if recover:
+        print(f"XX Failed: recovered at 60% {recover}")
+        return False
+    _, recover, _ = controller.evaluate({"A": _state(45, North=45)})
+    _, again, _ = controller.evaluate({"A": _state(40, North=40)})
+    if recover != ["A"] or again:
+        print(f"XX Failed: recover={recover}, then {again} (expected ['A'] once)")
+        return False
+    print("OK recovered once on dropping below 50%, not at 60% and not again while clear.")
+    return True
+
+
+def test_restart():
+    print("\n--- Testing First Sighting After Restart ---")
+    controller = ThrottleController(ThrottleGraph(CONNECTIONS), levels={})
+    throttle, recover, _ = controller.evaluate({"A": _state(20, North=20), "B": _state(90, North=92)})
+    if recover != ["A"] or [jid for jid, _ in throttle] != ["B"]:
+        print(f"XX Failed: throttle={throttle}, recover={recover}")
+        return False
+    if controller.levels["B"]["phases"] != {"North": 1}:
+        print(f"XX Failed: levels not remembered {controller.levels}")
+        return False
+    print(f"OK clear A recovered, congested B throttled on first sight: {throttle}")
+    return True
+
+
+def test_release():
+    print("\n--- Testing Hop-2 Release on Leaving Gridlock ---")
+    controller = ThrottleController(ThrottleGraph(CONNECTIONS, max_hops=2))
+    controller.evaluate({"A": _state(80, North=97, East=97)})
+    throttle, _, release = controller.evaluate({"A": _state(75, North=90, East=97)})
+    if release != [("A", ["North"])] or [controller.plan(jid, p) for jid, p in throttle] != [[("B", "North", 15, 1)]]:
+        print(f"XX Failed: release={release}, throttle={throttle}")
+        return False
+    targets = controller.release_targets("A", "North")
+    if targets != [("C", 2)] or controller.release_targets("A", "East") != []:
+        print(f"XX Failed: release targets {targets}")
+        return False
+    _, _, release = controller.evaluate({"A": _state(60, North=60, East=60)})
+    if release != [("A", ["East"])]:
+        print(f"XX Failed: East gridlock -> normal gave release={release}")
+        return False
+    print(f"OK North 97% -> 90%: B stays at 15 s, hop-2 {targets} released; East released on clearing.")
+    return True
+
+
+def test_reassert():
+    print("\n--- Testing Re-Assert of Steady Congestion ---")
+    controller = ThrottleController(ThrottleGraph(CONNECTIONS), reassert_s=30)
+    t0 = 1000.0
+    controller.evaluate({"A": _state(70, North=88, East=30)}, now=t0)
+    early, _, _ = controller.evaluate({"A": _state(71, North=89, East=30)}, now=t0 + 10)
+    due, _, _ = controller.evaluate({"A": _state(72, North=90, East=30)}, now=t0 + 31)
+    after, _, _ = controller.evaluate({"A": _state(72, North=90, East=30)}, now=t0 + 40)
+    if early or due != [("A", {"North": 90})] or after:
+        print(f"XX Failed: +10s {early}, +31s {due}, +40s {after}")
+        return False
+    if controller.plan("A", due[0][1]) != [("B", "North", 15, 1)] or controller.stats["reasserted"] != 1:
+        print(f"XX Failed: re-asserted plan {controller.plan('A', due[0][1])}, stats={controller.stats}")
+        return False
+    print("OK nothing re-sent at +10 s, North throttle to B re-asserted at +31 s, then quiet again.")
+    return True
+
+
+if __name__ == "__main__":
+    print(">> Starting Throttle Graph Verification...")
+    ok = (test_chains() and test_escalation() and test_clearing() and test_restart() and test_release()
+          and test_reassert())
+    if ok:
+        print("\n>> ALL SYSTEMS GO! Throttle graph and incremental congestion control are verified.")
+    else:
+        print("\n>> VERIFICATION FAILED.")
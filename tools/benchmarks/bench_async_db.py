@@ -0,0 +1,192 @@
+"""
+bench_async_db.py — CMS request-path DB driver: psycopg2 (threadpool) vs asyncpg (event loop).
+
+Starts the real CMS once per driver (`CMS_DB_DRIVER=psycopg2|asyncpg`, one
+uvicorn worker, same PostgreSQL from .env / DB_*), then drives it from
+`--clients` load processes for `--duration` seconds. Each client loops over
+the DB-backed request mix of a busy control room:
+
+    credit      POST /rewards/credit/batch   (`--batch` credits, fresh idempotency keys)
+    violation   POST /violations/report
+    listing     GET  /violations?limit=50
+    history     GET  /history/{junction}/saturation?hours=6
+    heartbeat   POST /heartbeat               (DB-free, shows event-loop stalls)
+
+and records per-endpoint latency. The psycopg2 path queues DB calls behind
+the threadpool (and DB_POOL_MAX); the asyncpg path is bounded by
+ASYNC_DB_POOL_MAX and keeps the event loop free, which shows first in the
+DB-free heartbeat latency. When load generator, CMS and PostgreSQL share
+the same few cores the run is CPU-bound, so compare latencies, not only
+req/s.
+
+Needs a reachable PostgreSQL with the CMS schema (the server migrates it at
+startup) and `pip install asyncpg`; exits with a message otherwise. Credits
+and violations written by the run stay in the database.
+
+Usage:
+    python tools/benchmarks/bench_async_db.py
+    python tools/benchmarks/bench_async_db.py --clients 16 64 --duration 20 --out bench_output/async_db.json
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_utils import PHASES, PROJECT_ROOT, summarize, write_json
+
+JUNCTIONS = [f"PUNE_JW_{i:02d}" for i in range(1, 37)]
+DRIVERS = ["psycopg2", "asyncpg"]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _credits(n, batch):
+    return [{"plate_number": f"MH12BN{(n * batch + i) % 5000:04d}", "points": 5, "reason": "Lane discipline",
+             "junction_id": JUNCTIONS[i % len(JUNCTIONS)], "idempotency_key": f"bench:{uuid.uuid4().hex}"}
+            for i in range(batch)]
+
+
+def _requests(n, batch):
+    """(endpoint, method, path, json) for step n of a client's loop."""
+    jid = JUNCTIONS[n % len(JUNCTIONS)]
+    step = n % 5
+    if step == 0:
+        return "credit", "POST", "/rewards/credit/batch", _credits(n, batch)
+    if step == 1:
+        return "violation", "POST", "/violations/report", {
+            "junction_id": jid, "plate_number": f"MH12BN{n % 5000:04d}", "violation_type": "RLV",
+            "evidence_url": f"evidence/bench_{n}.jpg", "confidence": 0.9, "timestamp": time.time()}
+    if step == 2:
+        return "listing", "GET", f"/violations?limit=50&junction_id={jid}", None
+    if step == 3:
+        return "history", "GET", f"/history/{jid}/saturation?hours=6", None
+    return "heartbeat", "POST", "/heartbeat", {
+        "junction_id": jid, "timestamp": time.time(),
+        "lanes": {p: {"saturation_level": 40.0, "current_green_time": 30, "event": "NORMAL"} for p in PHASES}}
+
+
+def _client(url, offset, duration, batch, results):
+    session = requests.Session()
+    samples, errors, n = {}, {}, offset
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        name, method, path, body = _requests(n, batch)
+        t0 = time.perf_counter()
+        try:
+            ok = session.request(method, url + path, json=body, timeout=30).status_code == 200
+        except requests.RequestException:
+            ok = False
+        samples.setdefault(name, []).append(time.perf_counter() - t0)
+        errors[name] = errors.get(name, 0) + (not ok)
+        n += 1
+    results.put((samples, errors))
+
+
+def _start_server(driver, port):
+    env = {**os.environ, "CMS_DB_DRIVER": driver}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "cms_layer.server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            stats = requests.get(f"{url}/db/stats", timeout=1).json()
+            if driver == "asyncpg" and not (stats["asyncpg"] or {}).get("available"):
+                raise RuntimeError("asyncpg pool did not come up (check /db/stats)")
+            return proc, url
+        except requests.RequestException:
+            time.sleep(0.2)
+        except RuntimeError:
+            proc.terminate()
+            raise
+    proc.terminate()
+    raise RuntimeError("CMS did not start")
+
+
+def run(driver, clients, args):
+    proc, url = _start_server(driver, _free_port())
+    try:
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=_client, args=(url, i * 1_000_000, args.duration, args.batch, results))
+                 for i in range(clients)]
+        for p in procs:
+            p.start()
+        samples, errors = {}, {}
+        for _ in procs:
+            s, e = results.get()
+            for name, values in s.items():
+                samples.setdefault(name, []).extend(values)
+            for name, count in e.items():
+                errors[name] = errors.get(name, 0) + count
+        for p in procs:
+            p.join()
+        db_stats = requests.get(f"{url}/db/stats", timeout=5).json()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    total = sum(len(v) for v in samples.values())
+    return {"throughput_rps": round(total / args.duration, 1),
+            "endpoints": {name: {**summarize(v), "errors": errors.get(name, 0)} for name, v in samples.items()},
+            "db": db_stats}
+
+
+def _preflight():
+    try:
+        import asyncpg  # noqa: F401
+    except ImportError:
+        return "asyncpg is not installed (pip install asyncpg)"
+    from cms_layer.cloud_db_handler import get_db_connection
+    conn = get_db_connection()
+    if conn is None:
+        return "no PostgreSQL reachable (set DB_HOST / DB_NAME / DB_USER / DB_PASS)"
+    conn.close()
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CMS DB paths: psycopg2 threadpool vs asyncpg pool")
+    parser.add_argument("--drivers", nargs="+", default=DRIVERS, choices=DRIVERS)
+    parser.add_argument("--clients", type=int, nargs="+", default=[16, 64], help="Concurrent load processes")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds of load per run")
+    parser.add_argument("--batch", type=int, default=10, help="Credits per /rewards/credit/batch call")
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    problem = _preflight()
+    if problem:
+        print(f"❌ bench_async_db needs PostgreSQL + asyncpg: {problem}")
+        sys.exit(1)
+
+    report = {"config": {**{k: v for k, v in vars(args).items() if k != "out"}, "cpus": os.cpu_count()},
+              "results": {}}
+    print(f"🗄️  CMS DB driver load ({args.duration:.0f}s per run, {os.cpu_count()} CPUs)")
+    for clients in args.clients:
+        for driver in args.drivers:
+            r = run(driver, clients, args)
+            report["results"][f"{driver}_c{clients}"] = r
+            print(f"\n   {driver:<8} clients={clients:<3} {r['throughput_rps']:>8.1f} req/s")
+            for name, m in sorted(r["endpoints"].items()):
+                print(f"      {name:<10} p50={m['p50_ms']:>8.2f}ms  p95={m['p95_ms']:>8.2f}ms  "
+                      f"p99={m['p99_ms']:>8.2f}ms  errors={m['errors']}")
+
+    if args.out:
+        write_json(args.out, report)
+        print(f"\n   📝 Results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
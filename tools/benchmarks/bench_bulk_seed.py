@@ -0,0 +1,194 @@
+"""
+bench_bulk_seed.py — RTO registry seeding: per-row INSERT vs. bulk loader.
+
+Seeds 10k / 100k / 1M synthetic dual-vehicle profiles into an rto_registry
+table with the production layout and upsert rule (ON CONFLICT phone_number
+refreshes the plates), then re-seeds the same rows to check idempotency.
+
+    per_row  one INSERT ... ON CONFLICT per profile (the old startup loop)
+    bulk     cms_layer.bulk_loader.load_rto_profiles (executemany batches on
+             SQLite, COPY -> staging -> one INSERT ... SELECT on PostgreSQL)
+
+The default target is a throwaway SQLite file (no server round trips, so the
+per-row gap is the floor). `--rtt-ms` adds a projected column: the measured
+time plus one network round trip per statement, which is what a remote
+PostgreSQL charges the per-row loop. `--pg` runs against the configured
+database instead (tables go to a temporary schema that is dropped afterwards).
+
+Usage:
+    python tools/benchmarks/bench_bulk_seed.py
+    python tools/benchmarks/bench_bulk_seed.py --sizes 10000 100000 1000000 --rtt-ms 1.0 --out bench_output/bulk_seed.json
+    python tools/benchmarks/bench_bulk_seed.py --pg --sizes 10000 100000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_utils import write_json
+
+from cms_layer.bulk_loader import load_rto_profiles, profile_rows, synthetic_profiles
+
+RTO_DDL = """
+    CREATE TABLE rto_registry (
+        phone_number TEXT PRIMARY KEY,
+        email TEXT UNIQUE,
+        owner_name TEXT,
+        driver_license_id TEXT,
+        v1_plate TEXT UNIQUE,
+        v1_type TEXT DEFAULT 'Car',
+        v2_plate TEXT UNIQUE,
+        v2_type TEXT DEFAULT 'Car',
+        registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+PER_ROW_SQL = """
+    INSERT INTO rto_registry (phone_number, email, owner_name, driver_license_id, v1_plate, v1_type, v2_plate, v2_type)
+    VALUES ({p}, {p}, {p}, {p}, {p}, {p}, {p}, {p})
+    ON CONFLICT (phone_number) DO UPDATE SET
+    v1_plate = EXCLUDED.v1_plate, v1_type = EXCLUDED.v1_type,
+    v2_plate = EXCLUDED.v2_plate, v2_type = EXCLUDED.v2_type
+"""
+
+
+def per_row(cur, profiles, placeholder):
+    sql = PER_ROW_SQL.format(p=placeholder)
+    n = 0
+    for row in profile_rows(profiles):
+        cur.execute(sql, row)
+        n += 1
+    return n
+
+
+class SQLiteTarget:
+    placeholder = "?"
+
+    def __init__(self, workdir):
+        self.workdir = workdir
+        self.conn = None
+
+    def fresh(self, tag):
+        self.close()
+        path = os.path.join(self.workdir, f"seed_{tag}.db")
+        if os.path.exists(path):
+            os.remove(path)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(RTO_DDL)
+        return self.conn
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM rto_registry").fetchone()[0]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+class PostgresTarget:
+    placeholder = "%s"
+
+    def __init__(self):
+        from cms_layer.cloud_db_handler import get_db_connection
+        self.conn = get_db_connection()
+        if self.conn is None:
+            raise SystemExit("xx [BENCH] --pg: no PostgreSQL connection (check DB_* in .env)")
+        self.schema = f"bench_seed_{os.getpid()}"
+
+    def fresh(self, tag):
+        cur = self.conn.cursor()
+        cur.execute(f"DROP SCHEMA IF EXISTS {self.schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {self.schema}")
+        cur.execute(f"SET search_path TO {self.schema}")
+        cur.execute(RTO_DDL.replace("CURRENT_TIMESTAMP", "NOW()"))
+        self.conn.commit()
+        return self.conn
+
+    def count(self):
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM rto_registry")
+        return cur.fetchone()[0]
+
+    def close(self):
+        cur = self.conn.cursor()
+        cur.execute(f"DROP SCHEMA IF EXISTS {self.schema} CASCADE")
+        self.conn.commit()
+        self.conn.close()
+
+
+def _timed_load(target, mode, size):
+    conn = target.conn
+    cur = conn.cursor()
+    t0 = time.perf_counter()
+    if mode == "per_row":
+        n = per_row(cur, synthetic_profiles(size), target.placeholder)
+    else:
+        n = load_rto_profiles(cur, synthetic_profiles(size))
+    conn.commit()
+    return n, time.perf_counter() - t0
+
+
+def run(target, size, args):
+    result = {}
+    for mode in ("per_row", "bulk"):
+        if mode == "per_row" and size > args.per_row_max:
+            result[mode] = {"skipped": f"size > --per-row-max {args.per_row_max}"}
+            continue
+        target.fresh(f"{mode}_{size}")
+        n, seed_s = _timed_load(target, mode, size)
+        _, reseed_s = _timed_load(target, mode, size)  # Restart path: same rows again
+        # PostgreSQL bulk path: CREATE staging, TRUNCATE, COPY, INSERT ... SELECT
+        statements = n if mode == "per_row" else 4
+        r = {"rows": n, "seed_s": round(seed_s, 3), "reseed_s": round(reseed_s, 3),
+             "rows_per_s": round(n / seed_s), "statements": statements, "rows_after_reseed": target.count()}
+        if args.rtt_ms:
+            r["projected_seed_s"] = round(seed_s + statements * args.rtt_ms / 1000, 3)
+        result[mode] = r
+    if "seed_s" in result["per_row"]:
+        result["speedup"] = round(result["per_row"]["seed_s"] / result["bulk"]["seed_s"], 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-row vs bulk RTO registry seeding")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--per-row-max", type=int, default=1_000_000, help="Skip the per-row loop above this size")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="Project a network round trip per statement")
+    parser.add_argument("--pg", action="store_true", help="Seed the configured PostgreSQL (COPY path)")
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    report = {"config": {**{k: v for k, v in vars(args).items() if k != "out"}}, "results": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        target = PostgresTarget() if args.pg else SQLiteTarget(workdir)
+        print(f"🗃️  RTO registry seeding ({'PostgreSQL COPY' if args.pg else 'SQLite'})")
+        try:
+            for size in args.sizes:
+                r = run(target, size, args)
+                report["results"][str(size)] = r
+                print(f"\n   {size:,} profiles")
+                for mode in ("per_row", "bulk"):
+                    m = r[mode]
+                    if "skipped" in m:
+                        print(f"      {mode:<8} skipped ({m['skipped']})")
+                        continue
+                    projected = f" projected@{args.rtt_ms}ms={m['projected_seed_s']:.2f}s" if args.rtt_ms else ""
+                    print(f"      {mode:<8} seed={m['seed_s']:.2f}s ({m['rows_per_s']:,} rows/s) "
+                          f"reseed={m['reseed_s']:.2f}s rows={m['rows_after_reseed']:,}{projected}")
+                if "speedup" in r:
+                    print(f"      speedup  x{r['speedup']}")
+        finally:
+            target.close()
+
+    if args.out:
+        write_json(args.out, report)
+        print(f"\n   📝 Results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+bench_cms_workers.py — CMS heartbeat throughput vs. uvicorn worker count.
+
+Starts the real CMS (`uvicorn cms_layer.server:app --workers N`) with the
+SQLite state backend on a throwaway file, then drives it from `--clients`
+load processes. Each client owns a slice of the 36 junctions and POSTs full
+heartbeats back-to-back for `--duration` seconds (no think time: this
+measures capacity, not the 3 Hz production rate).
+
+Consistency checks run against every worker count (requests land on random
+workers, so these only pass if the state is really shared):
+    read-your-write  a heartbeat is visible in the next GET /live_status
+    command delivery a command queued in the shared store is returned once
+                     by GET /commands/{id}, whichever worker answers
+
+No PostgreSQL is needed: the write-behind flush just finds no connection.
+
+Usage:
+    python tools/benchmarks/bench_cms_workers.py
+    python tools/benchmarks/bench_cms_workers.py --workers 1 2 4 --clients 8 --out bench_output/cms_workers.json
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_utils import PROJECT_ROOT, summarize, write_json
+
+from cms_layer.state_backend import SQLiteBackend
+
+JUNCTIONS = [f"PUNE_JW_{i:02d}" for i in range(1, 37)]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _heartbeat(jid, n):
+    sat = 20.0 + (n * 7) % 60
+    return {
+        "junction_id": jid,
+        "timestamp": time.time(),
+        "seq": n,
+        "lanes": {phase: {"saturation_level": sat, "current_green_time": 30, "event": "NORMAL"}
+                  for phase in ("North", "South", "East", "West")},
+    }
+
+
+def _client(url, junctions, duration, results):
+    session = requests.Session()
+    samples, errors, n = [], 0, 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        jid = junctions[n % len(junctions)]
+        t0 = time.perf_counter()
+        try:
+            ok = session.post(f"{url}/heartbeat", json=_heartbeat(jid, n), timeout=5).status_code == 200
+        except requests.RequestException:
+            ok = False
+        samples.append(time.perf_counter() - t0)
+        errors += not ok
+        n += 1
+    results.put((samples, errors))
+
+
+def _start_server(workers, state_path, port):
+    env = {**os.environ, "CMS_STATE_BACKEND": "sqlite", "CMS_STATE_PATH": state_path,
+           "HEARTBEAT_FLUSH_INTERVAL": "1.0"}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "cms_layer.server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--http", "cms_layer.http_protocol:NoDelayHTTPProtocol",
+         "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            requests.get(f"{url}/topology", timeout=1)
+            time.sleep(1.0 if workers > 1 else 0)  # Let the remaining workers finish importing
+            return proc, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("CMS did not start")
+
+
+def _check_consistency(url, state_path, rounds=40):
+    session = requests.Session()
+    store = SQLiteBackend(state_path)
+    stale = lost = duplicated = 0
+    for i in range(rounds):
+        jid = JUNCTIONS[i % len(JUNCTIONS)]
+        hb = _heartbeat(jid, 10_000 + i)
+        session.post(f"{url}/heartbeat", json=hb, timeout=5)
+        seen = session.get(f"{url}/live_status", timeout=5).json().get(jid, {})
+        stale += seen.get("timestamp") != hb["timestamp"]
+
+        store.push_command(f"BENCH_{i}", {"command_type": "THROTTLE_ADJUST", "target_lane": "North", "value": 15})
+        got = session.get(f"{url}/commands/BENCH_{i}", timeout=5).json()
+        again = session.get(f"{url}/commands/BENCH_{i}", timeout=5).json()
+        lost += len(got) != 1
+        duplicated += len(again) != 0
+    store.close()
+    return {"rounds": rounds, "stale_reads": stale, "lost_commands": lost, "duplicated_commands": duplicated}
+
+
+def run(workers, args, workdir):
+    state_path = os.path.join(workdir, f"cms_state_w{workers}.db")
+    proc, url = _start_server(workers, state_path, _free_port())
+    try:
+        results = multiprocessing.Queue()
+        slices = [JUNCTIONS[i::args.clients] for i in range(args.clients)]
+        clients = [multiprocessing.Process(target=_client, args=(url, s, args.duration, results)) for s in slices]
+        for c in clients:
+            c.start()
+        samples, errors = [], 0
+        for _ in clients:
+            s, e = results.get()
+            samples.extend(s)
+            errors += e
+        for c in clients:
+            c.join()
+        consistency = _check_consistency(url, state_path)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return {**summarize(samples), "throughput_rps": round(len(samples) / args.duration, 1),
+            "errors": errors, "consistency": consistency}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CMS heartbeat throughput vs uvicorn worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="Load generator processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per worker count")
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    report = {"config": {**{k: v for k, v in vars(args).items() if k != "out"}, "cpus": os.cpu_count()},
+              "results": {}}
+    print(f"🚦 CMS heartbeat load ({args.clients} clients, {args.duration:.0f}s each, {os.cpu_count()} CPUs)")
+    with tempfile.TemporaryDirectory() as workdir:
+        for workers in args.workers:
+            r = run(workers, args, workdir)
+            report["results"][f"workers_{workers}"] = r
+            c = r["consistency"]
+            print(f"   workers={workers:<2} {r['throughput_rps']:>8.1f} req/s  p50={r['p50_ms']:.2f}ms "
+                  f"p95={r['p95_ms']:.2f}ms errors={r['errors']} | stale reads={c['stale_reads']}/{c['rounds']} "
+                  f"lost cmds={c['lost_commands']} dup cmds={c['duplicated_commands']}")
+
+    if args.out:
+        write_json(args.out, report)
+        print(f"\n   📝 Results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
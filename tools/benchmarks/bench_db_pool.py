@@ -0,0 +1,181 @@
+"""
+bench_db_pool.py — Per-request DB connections vs. pooled CloudDBHandler.
+
+Two throwaway SQLite files stand in for the cloud and the local Postgres.
+Connect cost is simulated (`--connect-ms`, TLS+auth handshake), and an
+unreachable cloud costs `--cloud-timeout-ms` before failing (the real
+connect_timeout is 5 s; scaled down so the run stays short).
+
+    legacy : new connection per request, cloud tried first every time
+    pooled : CloudDBHandler with one ConnectionPool per target + circuit breaker
+
+Scenarios:
+    cloud_up        both targets reachable
+    cloud_down      cloud unreachable the whole run
+    cloud_recovers  cloud down for the first `--outage-ms`, then back
+
+Each request = one INSERT + COMMIT, issued from `--threads` worker threads
+with `--think-ms` between requests (think time is not part of the latency).
+
+Usage:
+    python tools/benchmarks/bench_db_pool.py
+    python tools/benchmarks/bench_db_pool.py --requests 400 --threads 8 --out bench_output/db_pool.json
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_utils import summarize, write_json
+
+from cms_layer.cloud_db_handler import CloudDBHandler
+from cms_layer.db_pool import CircuitBreaker
+
+SCENARIOS = ("cloud_up", "cloud_down", "cloud_recovers")
+
+
+class StandIn:
+    """SQLite-backed target whose reachability can be switched at runtime."""
+
+    def __init__(self, path, connect_s, timeout_s):
+        self.path = path
+        self.connect_s = connect_s
+        self.timeout_s = timeout_s
+        self.up = True
+        self.connects = 0
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS traffic_history_log (junction_id TEXT, cycle_no INT, ts REAL)")
+        conn.commit()
+        conn.close()
+
+    def connect(self):
+        if not self.up:
+            time.sleep(self.timeout_s)
+            raise sqlite3.OperationalError("timeout expired")
+        time.sleep(self.connect_s)
+        self.connects += 1
+        return sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+
+
+class LegacyHandler:
+    """The pre-pool behaviour: fresh connection per call, cloud first."""
+
+    def __init__(self, cloud, local):
+        self.cloud, self.local = cloud, local
+
+    def get_best_connection(self):
+        for source, target in (("CLOUD", self.cloud), ("LOCAL", self.local)):
+            try:
+                return target.connect(), source
+            except sqlite3.Error:
+                continue
+        return None, "NONE"
+
+
+def _request(handler, i):
+    conn, source = handler.get_best_connection()
+    if conn is None:
+        return source
+    cur = conn.cursor()
+    cur.execute("INSERT INTO traffic_history_log VALUES (?, ?, ?)", ("PUNE_JW_01", i, time.time()))
+    conn.commit()
+    cur.close()
+    conn.close()
+    return source
+
+
+def run(mode, scenario, args, workdir):
+    cloud = StandIn(os.path.join(workdir, f"{mode}_{scenario}_cloud.db"), args.connect_ms / 1000, args.cloud_timeout_ms / 1000)
+    local = StandIn(os.path.join(workdir, f"{mode}_{scenario}_local.db"), args.connect_ms / 1000, args.cloud_timeout_ms / 1000)
+    cloud.up = scenario == "cloud_up"
+
+    if mode == "legacy":
+        handler = LegacyHandler(cloud, local)
+    else:
+        handler = CloudDBHandler(cloud_factory=cloud.connect, local_factory=local.connect, maxconn=args.threads)
+        handler.pools["CLOUD"].breaker = CircuitBreaker("CLOUD", probe_interval=args.probe_ms / 1000,
+                                                        probe_max=args.probe_ms / 1000)
+
+    samples, sources = [], {"CLOUD": 0, "LOCAL": 0, "NONE": 0}
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+    recovered = {"CLOUD": 0, "LOCAL": 0, "NONE": 0}
+
+    def worker():
+        for i in counter:
+            if scenario == "cloud_recovers" and not cloud.up and time.perf_counter() - start >= args.outage_ms / 1000:
+                cloud.up = True
+            after_outage = scenario == "cloud_recovers" and cloud.up
+            t0 = time.perf_counter()
+            source = _request(handler, i)
+            elapsed = time.perf_counter() - t0
+            with lock:
+                samples.append(elapsed)
+                sources[source] += 1
+                if after_outage:
+                    recovered[source] += 1
+            time.sleep(args.think_ms / 1000)
+
+    start = t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    if mode == "pooled":
+        handler.close()
+    result = {
+        **summarize(samples),
+        "throughput_rps": round(len(samples) / wall, 1),
+        "sources": sources,
+        "connects": {"cloud": cloud.connects, "local": local.connects},
+    }
+    if scenario == "cloud_recovers":
+        total = sum(recovered.values())
+        result["cloud_share_after_outage"] = round(recovered["CLOUD"] / total, 3) if total else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled CloudDBHandler vs per-request connections")
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--connect-ms", type=float, default=20.0, help="Simulated connect handshake")
+    parser.add_argument("--cloud-timeout-ms", type=float, default=250.0, help="Cost of connecting to a dead cloud")
+    parser.add_argument("--probe-ms", type=float, default=100.0, help="Breaker probe interval (pooled mode)")
+    parser.add_argument("--outage-ms", type=float, default=300.0, help="Cloud outage length in cloud_recovers")
+    parser.add_argument("--think-ms", type=float, default=5.0, help="Pause between requests per thread")
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append", help="Run only these (repeatable)")
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    report = {"config": {k: v for k, v in vars(args).items() if k != "out"}, "results": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        for scenario in args.scenario or SCENARIOS:
+            report["results"][scenario] = {}
+            print(f"\n🗄️  {scenario}")
+            for mode in ("legacy", "pooled"):
+                with contextlib.redirect_stdout(io.StringIO()):  # Pool/breaker logs
+                    r = run(mode, scenario, args, workdir)
+                report["results"][scenario][mode] = r
+                print(f"   {mode:<7} p50={r['p50_ms']:.2f}ms p95={r['p95_ms']:.2f}ms p99={r['p99_ms']:.2f}ms "
+                      f"| sources={r['sources']} connects={r['connects']}"
+                      + (f" cloud after outage={r['cloud_share_after_outage']}" if "cloud_share_after_outage" in r else ""))
+
+    if args.out:
+        write_json(args.out, report)
+        print(f"\n   📝 Results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+bench_decision_core.py — Microbenchmarks for core_logic on synthetic traffic.
+
+Generates vehicle layouts against the shipped config_Phase_*_Hybrid.json
+geometry, from an empty junction to gridlock, and times per scenario:
+
+    grid_core       GridCore.get_grid_system_status   (51-100m grid, one phase)
+    hybrid_core     HybridCore.process_hybrid_data    (one phase)
+    decision_maker  DecisionMaker.decide_signals      (all 4 phases, cold cache)
+    classify_state  traffic_standards.classify_state  (per call)
+
+Results are stable JSON (sorted keys, rounded ms percentiles). With a stored
+baseline, the run FAILS (exit 1) if any p50 regresses by more than --threshold.
+
+Usage:
+    python tools/benchmarks/bench_decision_core.py
+    python tools/benchmarks/bench_decision_core.py --threshold 0.3 --out bench_output/decision_core.json
+    python tools/benchmarks/bench_decision_core.py --update-baseline
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_utils import (PHASES, compare_to_baseline, load_json, load_phase_config, summarize,
+                         synthetic_detections, to_core_format, write_json)
+
+from core_logic.traffic_standards import classify_state
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "decision_core.json")
+
+# Vehicles per approach
+SCENARIOS = {
+    "empty": 0,
+    "light": 8,
+    "moderate": 25,
+    "rush_hour": 60,
+    "gridlock": 120,
+}
+
+CLASSIFY_BATCH = 1000
+
+
+def build_layouts(n_vehicles, repeat, seed):
+    """`repeat` frames of {phase: [x, y, w, h, class, conf]} with n_vehicles per phase."""
+    rng = random.Random(seed)
+    configs = {phase: load_phase_config(phase) for phase in PHASES}
+    return [
+        {phase: to_core_format(synthetic_detections(configs[phase], n_vehicles, rng)) for phase in PHASES}
+        for _ in range(repeat)
+    ]
+
+
+def bench_scenario(dm, layouts, seed):
+    core = dm.hybrid_cores["North"]
+    grid = core.grid_core
+    grid.phases["North"] = core.config.get("grid_rows_51_100m", [])
+    samples = {"grid_core": [], "hybrid_core": [], "decision_maker": [], "classify_state": []}
+    rng = random.Random(seed)
+
+    for frame in layouts:
+        vehicles = frame["North"]
+
+        t0 = time.perf_counter()
+        grid.get_grid_system_status({"North": vehicles})
+        samples["grid_core"].append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        core.process_hybrid_data(vehicles, dm.current_state, dm.prev_open_lanes)
+        samples["hybrid_core"].append(time.perf_counter() - t0)
+
+        dm._phase_cache.clear()  # Measure the full FREEZE-time decision, not a cache hit
+        t0 = time.perf_counter()
+        dm.decide_signals(frame)
+        samples["decision_maker"].append(time.perf_counter() - t0)
+
+        saturations = [rng.random() for _ in range(CLASSIFY_BATCH)]
+        t0 = time.perf_counter()
+        for s in saturations:
+            classify_state(s)
+        samples["classify_state"].append((time.perf_counter() - t0) / CLASSIFY_BATCH)
+
+    return {name: summarize(values) for name, values in samples.items()}
+
+
+def run(repeat, seed, warmup):
+    with contextlib.redirect_stdout(io.StringIO()):
+        from core_logic.decision_maker import DecisionMaker
+        dm = DecisionMaker(policy="GREEDY")
+
+    results = {}
+    for name, n_vehicles in SCENARIOS.items():
+        layouts = build_layouts(n_vehicles, repeat + warmup, seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            bench_scenario(dm, layouts[:warmup], seed)
+            results[name] = bench_scenario(dm, layouts[warmup:], seed)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark GridCore / HybridCore / DecisionMaker")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed frames per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed frames per scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="Allowed p50 slowdown vs. baseline (0.5 = +50%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Overwrite the baseline with this run")
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    print(f"⏱️  Decision core benchmark ({args.repeat} frames/scenario, seed {args.seed})\n")
+    results = run(args.repeat, args.seed, args.warmup)
+
+    print(f"   {'scenario':<10} {'component':<15} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for scenario, components in results.items():
+        for component, s in components.items():
+            print(f"   {scenario:<10} {component:<15} {s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9}")
+
+    report = {"repeat": args.repeat, "seed": args.seed, "scenarios": results}
+    if args.out:
+        write_json(args.out, report)
+        print(f"\n   📝 Results -> {args.out}")
+    if args.update_baseline:
+        write_json(args.baseline, report)
+        print(f"   📌 Baseline updated -> {args.baseline}")
+        return
+
+    baseline = load_json(args.baseline)
+    if baseline is None:
+        print(f"\n   ⚠️ No baseline at {args.baseline} (run with --update-baseline)")
+        return
+    regressions = compare_to_baseline(results, baseline.get("scenarios", {}), args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) over +{args.threshold:.0%}:")
+        for scenario, component, base, cur in regressions:
+            print(f"   {scenario}/{component}: p50 {base}ms → {cur}ms")
+        sys.exit(1)
+    print(f"\n✅ No p50 regression over +{args.threshold:.0%} vs. baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+bench_evidence_encoder.py — Violation evidence: inline cv2.imwrite vs. EvidenceEncoder.
+
+Synthesises `--events` violations on a fixed 1080p camera scene. Each event is
+one vehicle (a textured box at a random spot) captured in `--burst` near-identical
+frames (a few pixels of motion + sensor noise), as when the same vehicle keeps
+triggering the detector. The frames are stored by `--threads` threads (the
+BackgroundService workers):
+
+    inline    cv2.imwrite(vio_<ts>_<type>.jpg) on the calling thread (old path)
+    pipeline  EvidenceEncoder: `--procs` encoding processes, phash + content
+              names, near-duplicate skip, atomic writes (JPEG and WebP)
+
+Reported per mode: frames/s, per-frame latency, files and bytes written,
+bytes written per second, dedupe ratio, and events that ended up with no
+file at all (wrongly deduplicated against another vehicle; must be 0).
+
+Usage:
+    python tools/benchmarks/bench_evidence_encoder.py
+    python tools/benchmarks/bench_evidence_encoder.py --events 60 --burst 4 --procs 2 --threads 2 --out bench_output/evidence.json
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_utils import summarize, write_json
+
+from vision_heavy.evidence_encoder import EvidenceEncoder
+
+
+def _scene(rng, width, height):
+    """Smooth 'road' background with some texture (compresses like a real frame)."""
+    base = rng.integers(60, 140, size=(height // 16, width // 16, 3), dtype=np.uint8)
+    scene = cv2.resize(base, (width, height), interpolation=cv2.INTER_CUBIC)
+    return cv2.add(scene, rng.integers(0, 12, size=scene.shape, dtype=np.uint8))
+
+
+def _events(args):
+    rng = np.random.default_rng(args.seed)
+    scene = _scene(rng, args.width, args.height)
+    events = []
+    for e in range(args.events):
+        w, h = int(rng.integers(160, 320)), int(rng.integers(120, 240))
+        x, y = int(rng.integers(0, args.width - w - 20)), int(rng.integers(0, args.height - h - 20))
+        texture = cv2.resize(rng.integers(0, 255, size=(12, 12, 3), dtype=np.uint8), (w, h),
+                             interpolation=cv2.INTER_NEAREST)
+        frames = []
+        for k in range(args.burst):
+            frame = scene.copy()
+            dx, dy = 2 * k, k  # The vehicle creeps forward between triggers
+            frame[y + dy:y + dy + h, x + dx:x + dx + w] = texture
+            noise = rng.integers(-3, 4, size=frame.shape, dtype=np.int16)
+            frames.append((e, np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8),
+                           [x + dx, y + dy, x + dx + w, y + dy + h]))
+        events.append(frames)
+    return events
+
+
+def _run(events, args, store):
+    """Stores every frame from `args.threads` threads. Returns (wall s, per-frame latencies, events with a new file)."""
+    jobs = [frame for burst in events for frame in burst]  # Bursts arrive back to back
+    lock = threading.Lock()
+    latencies, written = [], set()
+    cursor = iter(jobs)
+
+    def worker():
+        while True:
+            with lock:
+                job = next(cursor, None)
+            if job is None:
+                return
+            event, frame, bbox = job
+            t0 = time.perf_counter()
+            new_file = store(event, frame, bbox)
+            with lock:
+                latencies.append(time.perf_counter() - t0)
+                if new_file:
+                    written.add(event)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0, latencies, written
+
+
+def run_inline(events, args, workdir):
+    out = os.path.join(workdir, "inline")
+    os.makedirs(out)
+    counter = iter(range(10 ** 9))
+
+    def store(event, frame, bbox):
+        # Old naming had 1 s resolution (vio_<int ts>_<type>.jpg); a counter keeps every file here
+        path = os.path.join(out, f"vio_{int(time.time())}_{next(counter)}_RLV.jpg")
+        return cv2.imwrite(path, frame)
+
+    wall, latencies, written = _run(events, args, store)
+    return _report(args, wall, latencies, written, out, 0)
+
+
+def run_pipeline(events, args, workdir, fmt):
+    out = os.path.join(workdir, f"pipeline_{fmt}")
+    encoder = EvidenceEncoder(out, fmt=fmt, quality=args.quality, processes=args.procs,
+                              max_distance=args.distance, window_s=60.0)
+    encoder.warm_up()  # Process spawn is a one-off startup cost, not part of the timing
+
+    def store(event, frame, bbox):
+        _, duplicate = encoder.store(frame, bbox, junction_id="PUNE_JW_01", violation_type="RLV")
+        return duplicate is None
+
+    wall, latencies, written = _run(events, args, store)
+    snap = encoder.snapshot()
+    encoder.close()
+    r = _report(args, wall, latencies, written, out, snap["exact_duplicates"] + snap["near_duplicates"])
+    r["encode_avg_ms"] = snap["encode_avg_ms"]
+    return r
+
+
+def _report(args, wall, latencies, written, out, duplicates):
+    files = os.listdir(out)
+    size = sum(os.path.getsize(os.path.join(out, f)) for f in files)
+    return {**summarize(latencies), "wall_s": round(wall, 3), "frames_per_s": round(len(latencies) / wall, 1),
+            "files": len(files), "bytes_written": size, "bytes_per_s": round(size / wall, 1),
+            "dedupe_ratio": round(duplicates / len(latencies), 3) if latencies else 0.0,
+            "events_without_file": args.events - len(written)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark violation evidence encoding and dedupe")
+    parser.add_argument("--events", type=int, default=40, help="Distinct violations (vehicles)")
+    parser.add_argument("--burst", type=int, default=4, help="Near-identical frames per violation")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--threads", type=int, default=2, help="Storing threads (BG_WORKERS)")
+    parser.add_argument("--procs", type=int, default=2, help="Encoding processes (EVIDENCE_ENCODER_PROCS)")
+    parser.add_argument("--quality", type=int, default=90)
+    parser.add_argument("--distance", type=int, default=6, help="phash bits that count as the same vehicle")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    events = _events(args)
+    frames = args.events * args.burst
+    report = {"config": {**{k: v for k, v in vars(args).items() if k != "out"}, "cpus": os.cpu_count()},
+              "results": {}}
+    print(f"📸 Evidence storage: {args.events} violations x {args.burst} frames ({args.width}x{args.height}), "
+          f"{args.threads} threads, {args.procs} encoder procs, {os.cpu_count()} CPUs")
+    with tempfile.TemporaryDirectory() as workdir:
+        runs = {"inline_jpg": lambda: run_inline(events, args, workdir),
+                "pipeline_jpg": lambda: run_pipeline(events, args, workdir, "jpg"),
+                "pipeline_webp": lambda: run_pipeline(events, args, workdir, "webp")}
+        for name, fn in runs.items():
+            r = fn()
+            report["results"][name] = r
+            print(f"   {name:<14} {r['frames_per_s']:>6.1f} frames/s  p50={r['p50_ms']:>7.1f}ms  "
+                  f"files={r['files']:>4}/{frames}  {r['bytes_written'] / 1e6:>7.1f} MB  "
+                  f"{r['bytes_per_s'] / 1e6:>6.2f} MB/s  dedupe={r['dedupe_ratio']:.2f}  "
+                  f"events without file={r['events_without_file']}")
+
+    if args.out:
+        write_json(args.out, report)
+        print(f"\n   📝 Results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
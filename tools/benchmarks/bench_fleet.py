@@ -0,0 +1,311 @@
+"""
+bench_fleet.py — How many junctions can one CMS serve? Full-fleet load simulation.
+
+Starts the real CMS (`uvicorn cms_layer.server:app`) and simulates `--junctions`
+edge nodes against it (default: the 36 Pune nodes of TOPOLOGY_NODES, read from
+GET /topology; more are added as SIM_JW_nnn). Each simulated junction behaves
+like vision_fast's CMS connector:
+
+    heartbeat   POST /heartbeat every `--interval` s (300 ms), four phases
+                with directional counts
+    commands    GET  /commands/{junction} every `--poll` s
+    credit      POST /rewards/credit, `--credits-per-min` per junction
+                (Poisson), fresh idempotency keys
+    congestion  `--congestion-per-min` episodes per junction: one phase sits
+                at 85-99 % saturation for `--episode` s (throttling on the
+                upstream nodes, THROTTLE_ADJUST / RESTORE_NORMAL commands)
+
+Junctions are spread over `--procs` load processes (one thread per junction),
+each on its own 300 ms schedule with a random phase offset. The report has
+throughput and p50/p95/p99 latency per endpoint, heartbeat schedule lag (how
+late pulses leave when the CMS or the generator falls behind), and the DB
+side: transactions/s from pg_stat_database (postgres mode; counts every
+client of that database) plus the CMS's own pool checkouts and write-behind
+flushes (GET /db/stats, /heartbeat/stats).
+
+    --db sqlite    hot state in the SQLite backend (CMS_STATE_BACKEND), no
+                   PostgreSQL: measures the HTTP / in-memory path; credits
+                   answer DB_ERROR and congestion logic (run in the
+                   write-behind flush) is skipped
+    --db postgres  local PostgreSQL from DB_* / .env (the cloud target is
+                   disabled for the run); the server migrates the schema
+
+Usage:
+    python tools/benchmarks/bench_fleet.py
+    python tools/benchmarks/bench_fleet.py --junctions 36 144 360 --duration 30 --db postgres --out bench_output/fleet.json
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_utils import PHASES, PROJECT_ROOT, summarize, write_json
+
+MOVEMENTS = ("Straight", "Left", "Right")
+
+load_dotenv(os.path.join(PROJECT_ROOT, ".env"))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ─────────────────────────────────────────────────────────
+# SIMULATED JUNCTION
+# ─────────────────────────────────────────────────────────
+
+def _heartbeat(jid, seq, rng, hot_phase):
+    lanes = {}
+    for phase in PHASES:
+        sat = rng.uniform(85.0, 99.0) if phase == hot_phase else rng.uniform(15.0, 65.0)
+        lanes[phase] = {"saturation_level": round(sat, 1), "current_green_time": 30, "event": "NORMAL",
+                        "directional_counts": {m: rng.randint(0, 4) for m in MOVEMENTS}}
+    return {"junction_id": jid, "timestamp": time.time(), "seq": seq, "lanes": lanes}
+
+
+def _credit(jid, rng):
+    return {"plate_number": f"MH12FL{rng.randint(0, 9999):04d}", "points": 5, "reason": "Lane discipline",
+            "junction_id": jid, "idempotency_key": f"{jid}:{uuid.uuid4().hex}"}
+
+
+def _junction(url, jid, args, seed, deadline, out):
+    rng = random.Random(seed)
+    session = requests.Session()
+    samples = {"heartbeat": [], "commands": [], "credit": []}
+    errors = {name: 0 for name in samples}
+    lag, commands, throttled_acks = [], 0, 0
+
+    def call(name, method, path, body=None):
+        t0 = time.perf_counter()
+        try:
+            resp = session.request(method, url + path, json=body, timeout=10)
+            ok = resp.status_code == 200
+        except requests.RequestException:
+            resp, ok = None, False
+        samples[name].append(time.perf_counter() - t0)
+        errors[name] += not ok
+        return resp.json() if ok else None
+
+    start = time.perf_counter() + rng.uniform(0, args.interval)  # Spread pulses like independent nodes
+    next_poll = start + rng.uniform(0, args.poll)
+    next_credit = start + rng.expovariate(args.credits_per_min / 60.0) if args.credits_per_min else math.inf
+    next_episode = start + rng.expovariate(args.congestion_per_min / 60.0) if args.congestion_per_min else math.inf
+    episode_end, hot_phase, seq = 0.0, None, 0
+    while True:
+        scheduled = start + seq * args.interval
+        if scheduled >= deadline:
+            break
+        now = time.perf_counter()
+        if scheduled > now:
+            time.sleep(scheduled - now)
+            now = scheduled
+        lag.append(now - scheduled)
+
+        if now >= next_episode:
+            hot_phase, episode_end = rng.choice(PHASES), now + args.episode
+            next_episode = now + args.episode + rng.expovariate(args.congestion_per_min / 60.0)
+        elif hot_phase and now >= episode_end:
+            hot_phase = None
+
+        ack = call("heartbeat", "POST", "/heartbeat", _heartbeat(jid, seq, rng, hot_phase))
+        throttled_acks += bool(ack and ack.get("server_says_throttled"))
+        seq += 1
+
+        if now >= next_poll:
+            commands += len(call("commands", "GET", f"/commands/{jid}") or [])
+            next_poll += args.poll
+        while now >= next_credit:
+            call("credit", "POST", "/rewards/credit", _credit(jid, rng))
+            next_credit += rng.expovariate(args.credits_per_min / 60.0)
+
+    out.append({"samples": samples, "errors": errors, "lag": lag,
+                "commands": commands, "throttled_acks": throttled_acks})
+
+
+def _load_process(url, junctions, args, seed, deadline_offset, results):
+    deadline = time.perf_counter() + deadline_offset
+    out = []
+    threads = [threading.Thread(target=_junction, args=(url, jid, args, seed + i, deadline, out), daemon=True)
+               for i, jid in enumerate(junctions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put(out)
+
+
+# ─────────────────────────────────────────────────────────
+# SERVER + DB COUNTERS
+# ─────────────────────────────────────────────────────────
+
+def _start_server(args, workdir, port):
+    env = {**os.environ, "CLOUD_DB_HOST": ""}  # Local targets only
+    if args.db == "sqlite":
+        env.update({"CMS_STATE_BACKEND": "sqlite", "CMS_STATE_PATH": os.path.join(workdir, "cms_state.db"),
+                    "DB_HOST": "127.0.0.1", "DB_PORT": str(_free_port())})  # Nothing listens there
+    elif args.workers > 1:
+        env.update({"CMS_STATE_BACKEND": "sqlite", "CMS_STATE_PATH": os.path.join(workdir, "cms_state.db")})
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "cms_layer.server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--http", "cms_layer.http_protocol:NoDelayHTTPProtocol",
+         "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 90  # Postgres mode migrates the schema at startup
+    while time.time() < deadline:
+        try:
+            requests.get(f"{url}/topology", timeout=1)
+            time.sleep(1.0 if args.workers > 1 else 0)
+            return proc, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("CMS did not start")
+
+
+def _pg_connect():
+    import psycopg2
+    return psycopg2.connect(host=os.getenv("DB_HOST", "127.0.0.1"), database=os.getenv("DB_NAME", "traffic_reward_pro"),
+                            user=os.getenv("DB_USER", "postgres"), password=os.getenv("DB_PASS", ""),
+                            port=os.getenv("DB_PORT", "5432"), connect_timeout=3)
+
+
+def _pg_transactions():
+    """Committed + rolled back transactions of the current database (None without PostgreSQL)."""
+    try:
+        conn = _pg_connect()
+    except Exception:
+        return None
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT xact_commit + xact_rollback FROM pg_stat_database WHERE datname = current_database()")
+        return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _server_counters(url):
+    """(pool checkouts, write-behind flushes, junction_status rows) summed over the pools of this worker."""
+    db = requests.get(f"{url}/db/stats", timeout=5).json()
+    hb = requests.get(f"{url}/heartbeat/stats", timeout=5).json()
+    checkouts = sum(p["created"] + p["reused"] for p in db["psycopg2"].values())
+    return checkouts, hb.get("flushes", 0), hb.get("status_rows", 0)
+
+
+# ─────────────────────────────────────────────────────────
+# RUN
+# ─────────────────────────────────────────────────────────
+
+def run(count, args, workdir):
+    proc, url = _start_server(args, workdir, _free_port())
+    try:
+        nodes = sorted(requests.get(f"{url}/topology", timeout=5).json()["nodes"])
+        junctions = (nodes + [f"SIM_JW_{i:03d}" for i in range(len(nodes) + 1, count + 1)])[:count]
+        pg = _pg_transactions if args.db == "postgres" else (lambda: None)
+        counters_before, pg_before = _server_counters(url), pg()
+
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=_load_process,
+                                         args=(url, junctions[i::args.procs], args, 1000 * i, args.duration, results))
+                 for i in range(min(args.procs, count))]
+        t0 = time.perf_counter()
+        for p in procs:
+            p.start()
+        per_junction = []
+        for _ in procs:
+            per_junction.extend(results.get())
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - t0
+
+        counters_after, pg_after = _server_counters(url), pg()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    endpoints, lag = {}, []
+    for j in per_junction:
+        lag.extend(j["lag"])
+        for name, values in j["samples"].items():
+            entry = endpoints.setdefault(name, {"samples": [], "errors": 0})
+            entry["samples"].extend(values)
+            entry["errors"] += j["errors"][name]
+    total = sum(len(e["samples"]) for e in endpoints.values())
+    checkouts, flushes, status_rows = (after - before for after, before in zip(counters_after, counters_before))
+    return {
+        "junctions": count,
+        "throughput_rps": round(total / elapsed, 1),
+        "expected_heartbeat_rps": round(count / args.interval, 1),
+        "endpoints": {name: {**summarize(e["samples"]), "rps": round(len(e["samples"]) / elapsed, 1),
+                             "errors": e["errors"]} for name, e in endpoints.items()},
+        "heartbeat_lag": summarize(lag),
+        "commands_received": sum(j["commands"] for j in per_junction),
+        "throttled_acks": sum(j["throttled_acks"] for j in per_junction),
+        "db": {"pg_tx_per_s": round((pg_after - pg_before) / elapsed, 1) if pg_before is not None and pg_after is not None else None,
+               "pool_checkouts_per_s": round(checkouts / elapsed, 1),
+               "flushes_per_s": round(flushes / elapsed, 2),
+               "status_rows_per_s": round(status_rows / elapsed, 1)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a junction fleet against a local CMS")
+    parser.add_argument("--junctions", type=int, nargs="+", default=[36], help="Fleet sizes to run")
+    parser.add_argument("--db", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--procs", type=int, default=4, help="Load generator processes")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load per fleet size")
+    parser.add_argument("--interval", type=float, default=0.3, help="Heartbeat period (s)")
+    parser.add_argument("--poll", type=float, default=1.0, help="Command poll period (s)")
+    parser.add_argument("--credits-per-min", type=float, default=6.0, help="Reward credits per junction per minute")
+    parser.add_argument("--congestion-per-min", type=float, default=0.5, help="Congestion episodes per junction per minute")
+    parser.add_argument("--episode", type=float, default=15.0, help="Congestion episode length (s)")
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    if args.db == "postgres" and _pg_transactions() is None:
+        print("❌ --db postgres needs a reachable local PostgreSQL (DB_HOST / DB_NAME / DB_USER / DB_PASS)")
+        sys.exit(1)
+
+    report = {"config": {**{k: v for k, v in vars(args).items() if k != "out"}, "cpus": os.cpu_count()},
+              "results": {}}
+    print(f"🚦 CMS fleet load ({args.db}, {args.workers} worker(s), {args.duration:.0f}s per size, "
+          f"{args.procs} load procs, {os.cpu_count()} CPUs)")
+    with tempfile.TemporaryDirectory() as workdir:
+        for count in args.junctions:
+            r = run(count, args, workdir)
+            report["results"][f"junctions_{count}"] = r
+            db = r["db"]
+            print(f"\n   {count} junctions: {r['throughput_rps']:.1f} req/s "
+                  f"(heartbeats expected {r['expected_heartbeat_rps']:.0f}/s), "
+                  f"lag p95={r['heartbeat_lag']['p95_ms']:.1f}ms, commands={r['commands_received']}, "
+                  f"throttled acks={r['throttled_acks']}")
+            for name, m in sorted(r["endpoints"].items()):
+                print(f"      {name:<10} {m['rps']:>7.1f}/s  p50={m['p50_ms']:>7.2f}ms  p95={m['p95_ms']:>7.2f}ms  "
+                      f"p99={m['p99_ms']:>7.2f}ms  errors={m['errors']}")
+            pg = f"{db['pg_tx_per_s']:.1f}" if db["pg_tx_per_s"] is not None else "n/a"
+            print(f"      db         pg tx/s={pg}  pool checkouts/s={db['pool_checkouts_per_s']:.1f}  "
+                  f"flushes/s={db['flushes_per_s']:.2f}  status rows/s={db['status_rows_per_s']:.1f}")
+
+    if args.out:
+        write_json(args.out, report)
+        print(f"\n   📝 Results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+bench_gridlock.py — LIGHT vs. ENSEMBLE Camera 5 gridlock detection.
+
+Runs both IntersectionDetector paths on the same intersection video:
+
+    ENSEMBLE : RT-DETR + Indian-YOLO every frame (reference)
+    LIGHT    : OccupancyEstimator + Indian-YOLO @ reduced resolution
+
+and reports, taking ENSEMBLE as ground truth:
+    - recall of "box blocked" EVENTS (a maximal run of BLOCKED frames counts as
+      recalled if LIGHT reports BLOCKED within ±tolerance frames of it)
+    - LIGHT false-alarm events, frame-level agreement
+    - per-frame latency percentiles of both paths
+
+Usage:
+    python tools/benchmarks/bench_gridlock.py --video tools/camera5.mp4
+    python tools/benchmarks/bench_gridlock.py --video cam5.mp4 --max-frames 3000 --tolerance 10 --out bench_output/gridlock.json
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_utils import PROJECT_ROOT, summarize, write_json
+
+import cv2
+
+
+def blocked_events(flags):
+    """[(start, end)] inclusive frame ranges where flags is True."""
+    events, start = [], None
+    for i, f in enumerate(flags):
+        if f and start is None:
+            start = i
+        elif not f and start is not None:
+            events.append((start, i - 1))
+            start = None
+    if start is not None:
+        events.append((start, len(flags) - 1))
+    return events
+
+
+def _hit(event, flags, tolerance):
+    lo = max(0, event[0] - tolerance)
+    hi = min(len(flags) - 1, event[1] + tolerance)
+    return any(flags[lo:hi + 1])
+
+
+def score(reference, candidate, tolerance):
+    ref_events = blocked_events(reference)
+    cand_events = blocked_events(candidate)
+    recalled = sum(1 for e in ref_events if _hit(e, candidate, tolerance))
+    false_alarms = sum(1 for e in cand_events if not _hit(e, reference, tolerance))
+    agree = sum(1 for r, c in zip(reference, candidate) if r == c)
+    return {
+        "reference_events": len(ref_events),
+        "light_events": len(cand_events),
+        "event_recall": round(recalled / len(ref_events), 4) if ref_events else None,
+        "false_alarm_events": false_alarms,
+        "frame_agreement": round(agree / len(reference), 4) if reference else None,
+    }
+
+
+def run(video, max_frames, stride):
+    from vision_fast.intersection_detector import IntersectionDetector
+
+    detectors = {}
+    for mode in ("ENSEMBLE", "LIGHT"):
+        det = IntersectionDetector(detector_mode=mode)
+        if not det.initialize():
+            print(f"❌ {mode} detector failed to initialize (models missing?)")
+            return None
+        detectors[mode] = det
+
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        print(f"❌ Could not open {video}")
+        return None
+
+    flags = {mode: [] for mode in detectors}
+    samples = {mode: [] for mode in detectors}
+    index = 0
+    while max_frames <= 0 or len(flags["ENSEMBLE"]) < max_frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        index += 1
+        if (index - 1) % stride:
+            continue
+        for mode, det in detectors.items():
+            with contextlib.redirect_stdout(io.StringIO()):
+                t0 = time.perf_counter()
+                status = det.detect_status(frame)
+                samples[mode].append(time.perf_counter() - t0)
+            flags[mode].append(status == "BLOCKED")
+    cap.release()
+
+    return flags, {mode: summarize(s) for mode, s in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LIGHT vs ENSEMBLE gridlock detection on Camera 5")
+    parser.add_argument("--video", default=os.path.join(PROJECT_ROOT, "tools", "camera5.mp4"))
+    parser.add_argument("--max-frames", type=int, default=0, help="Stop after N evaluated frames (0 = whole video)")
+    parser.add_argument("--stride", type=int, default=3, help="Evaluate every Nth frame (30 fps / 3 = monitor's 10 fps)")
+    parser.add_argument("--tolerance", type=int, default=10, help="Event matching tolerance (evaluated frames)")
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    result = run(args.video, args.max_frames, max(1, args.stride))
+    if result is None:
+        sys.exit(1)
+    flags, latency = result
+
+    report = {
+        "video": args.video,
+        "frames": len(flags["ENSEMBLE"]),
+        "stride": args.stride,
+        "tolerance": args.tolerance,
+        "latency": latency,
+        **score(flags["ENSEMBLE"], flags["LIGHT"], args.tolerance),
+    }
+
+    print(f"\n🚧 {report['frames']} frames evaluated")
+    for mode, s in latency.items():
+        print(f"   {mode:<9} p50={s['p50_ms']}ms p95={s['p95_ms']}ms p99={s['p99_ms']}ms")
+    print(f"   Blocked events: reference={report['reference_events']} light={report['light_events']}")
+    print(f"   Event recall: {report['event_recall']}  false alarms: {report['false_alarm_events']}  "
+          f"frame agreement: {report['frame_agreement']}")
+    if args.out:
+        write_json(args.out, report)
+        print(f"   📝 Results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
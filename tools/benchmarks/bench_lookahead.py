@@ -0,0 +1,165 @@
+"""
+bench_lookahead.py — Greedy vs. Lookahead decision policy in simulated time.
+
+Simulates one junction second by second: vehicles (Pune mix, HybridCore weights)
+arrive per approach, the green approach discharges at the saturation flow, and
+every switch costs yellow + all-red. At each decision point both policies see
+the same weighted queues:
+
+    GREEDY    : DecisionMaker rule — heaviest approach wins, green ∝ its share
+    LOOKAHEAD : core_logic.phase_optimizer.LookaheadOptimizer (anytime search)
+
+Reported per scenario: throughput (vehicles/hour), mean vehicle delay, mean
+total weighted queue and decision-time percentiles.
+
+Usage:
+    python tools/benchmarks/bench_lookahead.py
+    python tools/benchmarks/bench_lookahead.py --hours 4 --budget 0.2 --out bench_output/lookahead.json
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_utils import PHASES, VEHICLE_MIX, summarize, write_json
+
+import config
+from core_logic.phase_optimizer import LookaheadOptimizer
+
+# HybridCore.VEHICLE_WEIGHTS for the benchmark mix
+WEIGHTS = {"motorcycle": 35, "car": 50, "auto": 40, "bus": 80, "truck": 65, "tempo": 55}
+
+# Arrival rates in vehicles/second per approach; (start_s, rates) segments
+SCENARIOS = {
+    "balanced":   [(0, {"North": 0.25, "South": 0.25, "East": 0.25, "West": 0.25})],
+    "asymmetric": [(0, {"North": 0.45, "South": 0.15, "East": 0.30, "West": 0.05})],
+    "surge":      [(0,    {"North": 0.20, "South": 0.20, "East": 0.15, "West": 0.15}),
+                   (1800, {"North": 0.20, "South": 0.20, "East": 0.55, "West": 0.15}),
+                   (3600, {"North": 0.20, "South": 0.20, "East": 0.15, "West": 0.15})],
+}
+
+
+def _poisson(rng, lam):
+    """Knuth's method (λ per second is small)."""
+    limit, k, p = math.exp(-lam), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return k
+        k += 1
+
+
+def _pick_label(rng):
+    r, acc = rng.random(), 0.0
+    for label, (share, _, _) in VEHICLE_MIX.items():
+        acc += share
+        if r <= acc:
+            return label
+    return "car"
+
+
+def simulate(policy, scenario, duration_s, budget, seed):
+    rng = random.Random(seed)
+    optimizer = LookaheadOptimizer()
+    lost_time = optimizer.lost_time
+    queues = {p: deque() for p in PHASES}            # (arrival_t, weight)
+    segments = SCENARIOS[scenario]
+
+    served = 0
+    total_delay = 0.0
+    queue_area = 0.0
+    decision_samples = []
+    green_phase = None
+    credit = 0.0
+    t = 0
+
+    def rates_at(now):
+        current = segments[0][1]
+        for start, rates in segments:
+            if now >= start:
+                current = rates
+        return current
+
+    def tick(green):
+        nonlocal t, served, total_delay, queue_area, credit
+        for phase, lam in rates_at(t).items():
+            for _ in range(_poisson(rng, lam)):
+                queues[phase].append((t, WEIGHTS[_pick_label(rng)]))
+        if green is not None:
+            # Saturation flow in weighted units/second; unused credit is lost
+            credit += optimizer.discharge_rate
+            q = queues[green]
+            while q and q[0][1] <= credit:
+                arrived, weight = q.popleft()
+                credit -= weight
+                served += 1
+                total_delay += t - arrived
+            if not q:
+                credit = 0.0
+        queue_area += sum(w for q in queues.values() for _, w in q)
+        t += 1
+
+    while t < duration_s:
+        loads = {p: float(sum(w for _, w in q)) for p, q in queues.items()}
+        t0 = time.perf_counter()
+        if policy == "LOOKAHEAD":
+            optimizer.observe(loads, green_phase=green_phase, timestamp=t)
+            plan = optimizer.optimize(loads, deadline_s=budget)
+            phase, green = plan["winner_phase"], plan["green_time"]
+        else:
+            phase, green = optimizer.greedy_choice(loads)
+        decision_samples.append(time.perf_counter() - t0)
+
+        for _ in range(int(lost_time)):
+            tick(None)
+        credit = 0.0
+        for _ in range(int(green)):
+            tick(phase)
+        green_phase = phase
+
+    hours = t / 3600.0
+    return {
+        "throughput_veh_per_h": round(served / hours, 1),
+        "mean_delay_s": round(total_delay / served, 2) if served else 0.0,
+        "mean_queue_units": round(queue_area / t, 1),
+        "left_in_queue": sum(len(q) for q in queues.values()),
+        "decisions": len(decision_samples),
+        "decision_time": summarize(decision_samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare GREEDY and LOOKAHEAD decision policies")
+    parser.add_argument("--hours", type=float, default=2.0, help="Simulated hours per scenario")
+    parser.add_argument("--budget", type=float, default=config.LOOKAHEAD_BUDGET,
+                        help="Lookahead search deadline per decision (seconds)")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append",
+                        help="Run only these scenarios (repeatable)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    duration = int(args.hours * 3600)
+    results = {"hours": args.hours, "budget_s": args.budget, "seed": args.seed, "scenarios": {}}
+    print(f"🚦 Simulating {args.hours}h per scenario (lookahead budget {args.budget}s)\n")
+    print(f"   {'scenario':<11} {'policy':<10} {'veh/h':>8} {'delay s':>8} {'queue':>8} {'dec p95 ms':>11}")
+    for scenario in args.scenario or list(SCENARIOS):
+        results["scenarios"][scenario] = {}
+        for policy in ("GREEDY", "LOOKAHEAD"):
+            r = simulate(policy, scenario, duration, args.budget, args.seed)
+            results["scenarios"][scenario][policy] = r
+            print(f"   {scenario:<11} {policy:<10} {r['throughput_veh_per_h']:>8} {r['mean_delay_s']:>8} "
+                  f"{r['mean_queue_units']:>8} {r['decision_time']['p95_ms']:>11}")
+
+    if args.out:
+        write_json(args.out, results)
+        print(f"\n   📝 Results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
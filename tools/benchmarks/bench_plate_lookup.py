@@ -0,0 +1,188 @@
+"""
+bench_plate_lookup.py — /rewards/credit owner resolution against a 1M-owner RTO registry.
+
+Builds an rto_registry with the production layout (incl. the generated,
+indexed v1/v2_plate_norm columns) in a throwaway SQLite file, seeded with
+`--owners` synthetic dual-vehicle profiles (2M plates at the default 1M), then
+replays a credit stream: ANPR plates in mixed formats ("MH12-AB-0042",
+"mh12 ab 0042"), drawn from `--active` vehicles with a skewed repeat rate,
+plus `--ghost-share` unregistered plates.
+
+    scan     REPLACE(REPLACE(plate)) comparison (the old query; full scan)
+    indexed  OWNER_BY_PLATE_SQL on the normalised-plate indexes
+    cached   PlateOwnerCache in front of the indexed query
+
+Each credit = owner lookup + the user_rewards upsert + commit, as in the
+endpoint. The scan mode only runs `--scan-credits` credits (each reads the
+whole table).
+
+Usage:
+    python tools/benchmarks/bench_plate_lookup.py
+    python tools/benchmarks/bench_plate_lookup.py --owners 1000000 --credits 20000 --out bench_output/plate_lookup.json
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_utils import summarize, write_json
+
+from cms_layer.bulk_loader import load_rto_profiles, synthetic_profiles
+from cms_layer.plate_cache import OWNER_BY_PLATE_SQL, PlateOwnerCache, normalize_plate
+
+SCHEMA = """
+    CREATE TABLE rto_registry (
+        phone_number TEXT PRIMARY KEY,
+        email TEXT UNIQUE,
+        owner_name TEXT,
+        driver_license_id TEXT,
+        v1_plate TEXT UNIQUE,
+        v1_type TEXT DEFAULT 'Car',
+        v2_plate TEXT UNIQUE,
+        v2_type TEXT DEFAULT 'Car',
+        registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        v1_plate_norm TEXT GENERATED ALWAYS AS (UPPER(REPLACE(REPLACE(v1_plate, '-', ''), ' ', ''))) STORED,
+        v2_plate_norm TEXT GENERATED ALWAYS AS (UPPER(REPLACE(REPLACE(v2_plate, '-', ''), ' ', ''))) STORED
+    );
+    CREATE TABLE user_rewards (
+        phone_number TEXT PRIMARY KEY,
+        email TEXT, owner_name TEXT, driver_license_id TEXT,
+        v1_plate TEXT, v1_points INTEGER DEFAULT 0,
+        v2_plate TEXT, v2_points INTEGER DEFAULT 0,
+        last_updated TIMESTAMP, updated_at TIMESTAMP
+    );
+"""
+INDEXES = """
+    CREATE INDEX idx_rto_v1_plate_norm ON rto_registry (v1_plate_norm);
+    CREATE INDEX idx_rto_v2_plate_norm ON rto_registry (v2_plate_norm);
+"""
+
+SCAN_SQL = """
+    SELECT email, owner_name, phone_number, driver_license_id, v1_plate, v1_type, v2_plate, v2_type
+    FROM rto_registry
+    WHERE REPLACE(REPLACE(v1_plate, '-', ''), ' ', '') = ?
+       OR REPLACE(REPLACE(v2_plate, '-', ''), ' ', '') = ?
+"""
+
+UPSERT_SQL = """
+    INSERT INTO user_rewards (phone_number, email, owner_name, driver_license_id, v1_plate, v1_points, v2_plate, v2_points)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (phone_number) DO UPDATE SET
+    v1_points = user_rewards.v1_points + excluded.v1_points,
+    v2_points = user_rewards.v2_points + excluded.v2_points,
+    last_updated = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+"""
+
+
+class _QmarkCursor:
+    """Lets the production (%s) SQL run on sqlite3."""
+
+    def __init__(self, cur):
+        self._cur = cur
+
+    def execute(self, sql, params=()):
+        return self._cur.execute(sql.replace("%s", "?"), params)
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+
+def build_registry(path, owners):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    t0 = time.perf_counter()
+    load_rto_profiles(conn.cursor(), synthetic_profiles(owners))
+    conn.executescript(INDEXES)
+    conn.commit()
+    return conn, time.perf_counter() - t0
+
+
+def plate_stream(owners, count, active, ghost_share, rng):
+    """ANPR reads: skewed repeats over `active` vehicles, formats vary, some unregistered."""
+    vehicles = [p for p in synthetic_profiles(active, start=rng.randint(1, max(1, owners - active)))]
+    for _ in range(count):
+        if rng.random() < ghost_share:
+            yield f"KA{rng.randint(1, 60):02d}-ZZ-{rng.randint(0, 9999):04d}"
+            continue
+        p = vehicles[min(active - 1, int(rng.paretovariate(1.2)) - 1)]
+        plate = p["v1_plate"] if rng.random() < 0.6 else p["v2_plate"]
+        yield rng.choice((plate, plate.replace("-", " ").lower(), plate.replace("-", "")))
+
+
+def credit(conn, cur, plate, resolve):
+    owner = resolve(plate)
+    if owner is not None:
+        email, name, phone, license_id, v1_plate, _, v2_plate, _ = owner
+        v1 = 10 if normalize_plate(plate) == normalize_plate(v1_plate) else 0
+        cur.execute(UPSERT_SQL, (phone, email, name, license_id, v1_plate, v1, v2_plate, 10 - v1))
+    conn.commit()
+    return owner is not None
+
+
+def run_mode(conn, mode, plates):
+    cur = conn.cursor()
+    cache = PlateOwnerCache(max_entries=50000)
+    qcur = _QmarkCursor(cur)
+
+    def scan(plate):
+        norm = normalize_plate(plate)
+        return cur.execute(SCAN_SQL, (norm, norm)).fetchone()
+
+    def indexed(plate):
+        norm = normalize_plate(plate)
+        return cur.execute(OWNER_BY_PLATE_SQL.replace("%s", "?"), (norm, norm)).fetchone()
+
+    resolve = {"scan": scan, "indexed": indexed, "cached": lambda plate: cache.resolve(qcur, plate)}[mode]
+    samples, registered = [], 0
+    t_start = time.perf_counter()
+    for plate in plates:
+        t0 = time.perf_counter()
+        registered += credit(conn, cur, plate, resolve)
+        samples.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - t_start
+    result = {**summarize(samples), "credits_per_s": round(len(samples) / elapsed, 1), "registered": registered}
+    if mode == "cached":
+        result["cache"] = cache.snapshot()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /rewards/credit owner resolution")
+    parser.add_argument("--owners", type=int, default=1_000_000, help="RTO profiles (2 plates each)")
+    parser.add_argument("--credits", type=int, default=20_000)
+    parser.add_argument("--scan-credits", type=int, default=20, help="Credits replayed in scan mode")
+    parser.add_argument("--active", type=int, default=20_000, help="Distinct vehicles on the road")
+    parser.add_argument("--ghost-share", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    report = {"config": {k: v for k, v in vars(args).items() if k != "out"}, "results": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        conn, build_s = build_registry(os.path.join(workdir, "rto.db"), args.owners)
+        report["build_s"] = round(build_s, 2)
+        print(f"🪪 /rewards/credit against {args.owners:,} owners ({args.owners * 2:,} plates), built in {build_s:.1f}s")
+        for mode in ("scan", "indexed", "cached"):
+            rng = random.Random(args.seed)  # Same stream for every mode
+            count = args.scan_credits if mode == "scan" else args.credits
+            r = run_mode(conn, mode, list(plate_stream(args.owners, count, args.active, args.ghost_share, rng)))
+            report["results"][mode] = r
+            extra = f" hit_rate={r['cache']['hit_rate']}" if mode == "cached" else ""
+            print(f"   {mode:<8} {r['credits_per_s']:>9.1f} credits/s  p50={r['p50_ms']:.3f}ms "
+                  f"p95={r['p95_ms']:.3f}ms ({r['n']} credits, {r['registered']} registered){extra}")
+        conn.close()
+
+    if args.out:
+        write_json(args.out, report)
+        print(f"\n   📝 Results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
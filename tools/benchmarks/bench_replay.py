@@ -0,0 +1,145 @@
+"""
+bench_replay.py — Model-free benchmark of the downstream vision → decision pipeline.
+
+Replays per-camera detection logs (recorded with `main_controller.py --record DIR`)
+through LaneMapper → ZoneAnalyzer, and runs DecisionMaker on the latest frame of
+all four phases every --decide-every frames (mimicking the FREEZE snapshot).
+
+Usage:
+    python tools/benchmarks/bench_replay.py --logs logs/replay
+    python tools/benchmarks/bench_replay.py --synthesize 5000      # no recording needed
+    python tools/benchmarks/bench_replay.py --logs logs/replay --out bench_output/replay.json
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_utils import (PHASES, PROJECT_ROOT, frame_size, load_phase_config, summarize,
+                         synthetic_detections, write_json)
+
+from vision_fast.detection_recorder import DetectionRecorder, DetectionReplaySource, log_path_for
+from vision_fast.lane_mapper import LaneMapper
+from vision_fast.zone_analyzer import ZoneAnalyzer
+
+
+def synthesize_logs(log_dir, n_frames, seed=0):
+    """Writes one synthetic .htdr per phase: a queue that builds up and discharges."""
+    rng = random.Random(seed)
+    for phase in PHASES:
+        cfg = load_phase_config(phase)
+        rec = DetectionRecorder(log_path_for(log_dir, phase), phase, frame_size=frame_size(cfg))
+        t = 1_700_000_000.0
+        for i in range(n_frames):
+            # Triangle wave 0 → 40 vehicles over ~300 frames (10 s @ 30 fps)
+            n = int(40 * (1 - abs((i % 300) / 150.0 - 1)))
+            rec.write(t, synthetic_detections(cfg, n, rng))
+            t += 1.0 / 30
+        rec.close()
+
+
+def run(log_dir, detect_mode, decide_every):
+    # Silence the per-module init chatter so the report stays readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        from core_logic.decision_maker import DecisionMaker
+        decision_maker = DecisionMaker()
+        pipelines = {}
+        for phase in PHASES:
+            cfg = load_phase_config(phase)
+            mapper, analyzer = LaneMapper(), ZoneAnalyzer()
+            mapper.initialize(cfg)
+            analyzer.initialize(cfg.get("zone_configs", {}), stop_lines=cfg.get("stop_lines", {}))
+            pipelines[phase] = (mapper, analyzer)
+
+    sources = {}
+    for phase in PHASES:
+        path = log_path_for(log_dir, phase)
+        if os.path.exists(path):
+            sources[phase] = DetectionReplaySource(path, realtime=False)
+    if not sources:
+        print(f"❌ No .htdr logs found in {log_dir}")
+        return None
+
+    iters = {phase: src.frames() for phase, src in sources.items()}
+    shapes = {phase: (src.frame_size[1], src.frame_size[0]) for phase, src in sources.items()}
+    latest = {phase: [] for phase in PHASES}
+    frame_samples, decision_samples = [], []
+    frames = 0
+    wall_start = time.perf_counter()
+
+    while iters:
+        for phase in list(iters):
+            try:
+                _, detections = next(iters[phase])
+            except StopIteration:
+                del iters[phase]
+                continue
+            mapper, analyzer = pipelines[phase]
+            t0 = time.perf_counter()
+            lane_groups = mapper.assign_lanes(detections)
+            analyzer.analyze_zones(lane_groups, frame_obj=shapes[phase], mode=detect_mode)
+            frame_samples.append(time.perf_counter() - t0)
+            latest[phase] = detections
+            frames += 1
+
+            if decide_every and frames % decide_every == 0:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    t0 = time.perf_counter()
+                    decision_maker.decide_signals(dict(latest))
+                    decision_samples.append(time.perf_counter() - t0)
+
+    wall = time.perf_counter() - wall_start
+    return {
+        "log_dir": os.path.relpath(log_dir, PROJECT_ROOT) if log_dir.startswith(PROJECT_ROOT) else log_dir,
+        "detect_mode": detect_mode,
+        "frames": frames,
+        "wall_s": round(wall, 3),
+        "frames_per_s": round(frames / wall, 1) if wall > 0 else 0.0,
+        "frame_pipeline": summarize(frame_samples),
+        "decision": summarize(decision_samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay detection logs through the downstream pipeline")
+    parser.add_argument("--logs", help="Directory with <phase>.htdr logs")
+    parser.add_argument("--synthesize", type=int, default=0, metavar="FRAMES",
+                        help="Generate synthetic logs with FRAMES frames per camera instead")
+    parser.add_argument("--mode", default="HYBRID", choices=["HYBRID", "GRID"])
+    parser.add_argument("--decide-every", type=int, default=300,
+                        help="Run DecisionMaker every N replayed frames (0 = never)")
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    if not args.logs and not args.synthesize:
+        parser.error("pass --logs DIR or --synthesize FRAMES")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_dir = args.logs
+        if args.synthesize:
+            log_dir = tmp
+            print(f"🧪 Synthesizing {args.synthesize} frames per camera...")
+            synthesize_logs(log_dir, args.synthesize)
+        results = run(log_dir, args.mode, args.decide_every)
+
+    if results is None:
+        sys.exit(1)
+    fp = results["frame_pipeline"]
+    print(f"\n⏯️  Replayed {results['frames']} frames in {results['wall_s']}s "
+          f"→ {results['frames_per_s']} frames/s")
+    print(f"   Lane mapping + zones : p50={fp['p50_ms']}ms p95={fp['p95_ms']}ms p99={fp['p99_ms']}ms")
+    dm = results["decision"]
+    print(f"   DecisionMaker        : p50={dm['p50_ms']}ms p95={dm['p95_ms']}ms (n={dm['n']})")
+    if args.out:
+        write_json(args.out, results)
+        print(f"   📝 Results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
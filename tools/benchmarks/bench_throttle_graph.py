@@ -0,0 +1,187 @@
+"""
+bench_throttle_graph.py — Congestion-control decisions: per-event walk vs. compiled + incremental.
+
+Synthetic city graphs (street grid, each approach fed by the neighbouring
+junction with probability `--density`) of 36, 500 and 5,000 junctions.
+Every flush, all junctions report; phase saturations follow a random walk
+with hotspots, so most junctions keep their state between flushes.
+
+    legacy      per flush: every congested junction walks the connection
+                dicts for its upstream chain and re-emits its throttles;
+                every clear junction triggers a recovery lookup
+    compiled    ThrottleGraph built once; ThrottleController only plans
+                junctions whose congestion level changed
+
+Throttles are pushed onto a real in-process CommandBus in both modes (the
+DB INSERT each one also costs in production is not simulated). Reported per
+graph size: compile time, per-flush latency and the number of throttle /
+recovery actions emitted per flush.
+
+Usage:
+    python tools/benchmarks/bench_throttle_graph.py
+    python tools/benchmarks/bench_throttle_graph.py --sizes 36 500 5000 --flushes 60 --out bench_output/throttle_graph.json
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_utils import PHASES, summarize, write_json
+
+from cms_layer.command_bus import CommandBus
+from cms_layer.throttle_graph import CLEAR_BELOW, ThrottleController, ThrottleGraph, phase_level
+
+# Traffic entering on the North approach comes from the junction to the south, etc.
+_FEED_OFFSET = {"North": (1, 0), "South": (-1, 0), "East": (0, -1), "West": (0, 1)}
+
+
+def city_graph(n, density, rng):
+    """{downstream: {phase: upstream}} on a near-square street grid with n junctions."""
+    cols = math.ceil(math.sqrt(n))
+    ids = [f"J{i:05d}" for i in range(n)]
+    connections = {}
+    for i, jid in enumerate(ids):
+        r, c = divmod(i, cols)
+        feeders = {}
+        for phase, (dr, dc) in _FEED_OFFSET.items():
+            rr, cc = r + dr, c + dc
+            j = rr * cols + cc
+            if 0 <= rr and 0 <= cc < cols and j < n and rng.random() < density:
+                feeders[phase] = ids[j]
+        if feeders:
+            connections[jid] = feeders
+    return ids, connections
+
+
+def traffic(ids, flushes, rng, hotspot_share=0.05):
+    """Yields one {jid: state} per flush (random walk, a few hotspots drifting into congestion)."""
+    sats = {jid: {p: rng.uniform(20, 60) for p in PHASES} for jid in ids}
+    hot = set(rng.sample(ids, max(1, int(len(ids) * hotspot_share))))
+    for _ in range(flushes):
+        for jid in ids:
+            drift = 4.0 if jid in hot else -0.5
+            for p in PHASES:
+                sats[jid][p] = min(100.0, max(0.0, sats[jid][p] + drift + rng.gauss(0, 1.5)))
+        if rng.random() < 0.2:  # Hotspots move around
+            hot = set(rng.sample(ids, len(hot)))
+        yield {jid: {"phase_saturations": {p: round(s, 1) for p, s in phases.items()},
+                     "junction_saturation": round(sum(phases.values()) / len(phases), 1)}
+               for jid, phases in sats.items()}
+
+
+def _push(bus, upstream, phase, value):
+    bus.push(upstream, {"command_type": "THROTTLE_ADJUST", "target_lane": phase, "action": "REDUCE_GREEN",
+                        "value": value, "reason": "bench"})
+
+
+def legacy_flush(connections, states, max_hops, bus):
+    """Pre-compiled behaviour: walk the dicts per event, re-act on every congested / clear junction."""
+    throttles = recoveries = 0
+    for jid, state in states.items():
+        phases = state["phase_saturations"]
+        if any(s > 80 for s in phases.values()):
+            throttled = 0
+            for phase, sat in phases.items():
+                if sat <= 80 or throttled >= 3:
+                    continue
+                seen, current = {jid}, jid
+                for hop in range(1, max_hops + 1):
+                    upstream = connections.get(current, {}).get(phase)
+                    if upstream is None or upstream in seen:
+                        break
+                    if hop == 1 or sat > 95:
+                        _push(bus, upstream, phase, (25 if sat > 95 else 15) if hop == 1 else 10)
+                        throttles += 1
+                    seen.add(upstream)
+                    current = upstream
+                throttled += 1
+        if state["junction_saturation"] < CLEAR_BELOW:
+            recoveries += 1
+    return throttles, recoveries
+
+
+def compiled_flush(controller, states, bus):
+    throttle, recover, release = controller.evaluate(states)
+    throttles = 0
+    for jid, phases in throttle:
+        for upstream, phase, value, _ in controller.plan(jid, phases):
+            _push(bus, upstream, phase, value)
+            throttles += 1
+    for jid, phases in release:
+        for phase in phases:
+            for upstream, _ in controller.release_targets(jid, phase):
+                bus.push(upstream, {"command_type": "RESTORE_NORMAL", "target_lane": phase, "reason": "bench"})
+    return throttles, len(recover)
+
+
+def run(size, args, rng):
+    ids, connections = city_graph(size, args.density, rng)
+    t0 = time.perf_counter()
+    graph = ThrottleGraph(connections, max_hops=args.hops)
+    compile_ms = (time.perf_counter() - t0) * 1000
+    controller = ThrottleController(graph)
+
+    result = {"junctions": size, "links": sum(len(p) for p in connections.values()),
+              "compile_ms": round(compile_ms, 2),
+              "avg_upstream_set": round(sum(map(len, graph.upstream_sets.values())) / max(1, len(graph.upstream_sets)), 2)}
+    timings = {"legacy": [], "compiled": []}
+    actions = {"legacy": [0, 0], "compiled": [0, 0]}
+    buses = {"legacy": CommandBus(), "compiled": CommandBus()}
+    congested = 0
+    for states in traffic(ids, args.flushes, rng):
+        congested += sum(any(phase_level(s) for s in st["phase_saturations"].values()) for st in states.values())
+        for mode in ("legacy", "compiled"):
+            t0 = time.perf_counter()
+            if mode == "legacy":
+                t, r = legacy_flush(connections, states, args.hops, buses[mode])
+            else:
+                t, r = compiled_flush(controller, states, buses[mode])
+            timings[mode].append(time.perf_counter() - t0)
+            actions[mode][0] += t
+            actions[mode][1] += r
+        for bus in buses.values():  # Junctions drain their queues between flushes
+            for node in list(bus.backend._commands):
+                bus.pop(node)
+
+    result["congested_per_flush"] = round(congested / args.flushes, 1)
+    for mode in timings:
+        result[mode] = {**summarize(timings[mode]),
+                        "throttles_per_flush": round(actions[mode][0] / args.flushes, 1),
+                        "recoveries_per_flush": round(actions[mode][1] / args.flushes, 1)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compiled, incremental throttle decisions")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[36, 500, 5000])
+    parser.add_argument("--flushes", type=int, default=60, help="Flushes (1 s each in production)")
+    parser.add_argument("--hops", type=int, default=2)
+    parser.add_argument("--density", type=float, default=0.6, help="Share of approaches with a feeder")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = {"config": {k: v for k, v in vars(args).items() if k != "out"}, "results": {}}
+    print(f"🕸️  Throttle decisions per flush (max_hops={args.hops}, {args.flushes} flushes)")
+    for size in args.sizes:
+        r = run(size, args, rng)
+        report["results"][str(size)] = r
+        print(f"\n   {size} junctions, {r['links']} links, compiled in {r['compile_ms']:.1f}ms "
+              f"(avg upstream set {r['avg_upstream_set']}), ~{r['congested_per_flush']} congested/flush")
+        for mode in ("legacy", "compiled"):
+            m = r[mode]
+            print(f"      {mode:<8} p50={m['p50_ms']:.3f}ms p95={m['p95_ms']:.3f}ms "
+                  f"| throttles/flush={m['throttles_per_flush']} recoveries/flush={m['recoveries_per_flush']}")
+
+    if args.out:
+        write_json(args.out, report)
+        print(f"\n   📝 Results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
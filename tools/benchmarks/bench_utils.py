@@ -0,0 +1,211 @@
+"""
+bench_utils.py — Shared helpers for the HTMS benchmark scripts.
+
+- Timing + percentile summaries (stable, JSON-friendly)
+- Synthetic vehicle layouts generated against the shipped Hybrid ROI geometry
+"""
+
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+PHASES = ["North", "South", "East", "West"]
+HYBRID_CONFIG_DIR = os.path.join(PROJECT_ROOT, "config", "Hybrid_Based_System")
+
+# Vehicle mix seen on Pune arterials (label → (share, width px, height px))
+VEHICLE_MIX = {
+    "motorcycle": (0.40, 18, 30),
+    "car":        (0.30, 40, 50),
+    "auto":       (0.15, 30, 38),
+    "bus":        (0.05, 60, 95),
+    "truck":      (0.05, 55, 85),
+    "tempo":      (0.05, 40, 55),
+}
+
+
+# ─────────────────────────────────────────────────────────
+# TIMING
+# ─────────────────────────────────────────────────────────
+
+def percentile(samples, pct):
+    """Nearest-rank percentile (pct in 0-100). Returns 0.0 for no samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples_s):
+    """Summarise a list of durations (seconds) into milliseconds + percentiles."""
+    ms = [s * 1000.0 for s in samples_s]
+    if not ms:
+        return {"n": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    return {
+        "n": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "p50_ms": round(percentile(ms, 50), 4),
+        "p95_ms": round(percentile(ms, 95), 4),
+        "p99_ms": round(percentile(ms, 99), 4),
+        "max_ms": round(max(ms), 4),
+    }
+
+
+def time_call(fn, *args, **kwargs):
+    """Returns (elapsed_seconds, result)."""
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - t0, result
+
+
+def write_json(path, data):
+    """Write results with sorted keys so diffs between runs stay readable."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+# ─────────────────────────────────────────────────────────
+# SYNTHETIC LAYOUTS
+# ─────────────────────────────────────────────────────────
+
+def load_phase_config(phase):
+    """Loads config_Phase_<phase>_Hybrid.json (empty dict if missing)."""
+    path = os.path.join(HYBRID_CONFIG_DIR, f"config_Phase_{phase}_Hybrid.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _flatten_points(data):
+    if isinstance(data, list) and data and isinstance(data[0], (int, float)):
+        return [data]
+    points = []
+    if isinstance(data, list):
+        for item in data:
+            points.extend(_flatten_points(item))
+    return points
+
+
+def zone_boxes(phase_config):
+    """
+    Bounding boxes (x_min, y_min, x_max, y_max) of every placeable zone:
+    the 0-50m priority polygon plus each 51-100m grid cell.
+    """
+    boxes = []
+    prio = phase_config.get("priority_zone_0_50m") or []
+    if prio:
+        xs = [p[0] for p in prio]
+        ys = [p[1] for p in prio]
+        boxes.append((min(xs), min(ys), max(xs), max(ys)))
+    for row in phase_config.get("grid_rows_51_100m") or []:
+        for group in row:
+            for cell in group:
+                pts = _flatten_points(cell)
+                if len(pts) >= 3:
+                    xs = [p[0] for p in pts]
+                    ys = [p[1] for p in pts]
+                    boxes.append((min(xs), min(ys), max(xs), max(ys)))
+    return boxes
+
+
+def frame_size(phase_config):
+    """(width, height) that covers all zones of a phase (fallback 1280x720)."""
+    boxes = zone_boxes(phase_config)
+    if not boxes:
+        return 1280, 720
+    return max(b[2] for b in boxes) + 1, max(b[3] for b in boxes) + 1
+
+
+def _pick_label(rng):
+    r = rng.random()
+    acc = 0.0
+    for label, (share, _, _) in VEHICLE_MIX.items():
+        acc += share
+        if r <= acc:
+            return label
+    return "car"
+
+
+def synthetic_detections(phase_config, n_vehicles, rng=None):
+    """
+    Generates n_vehicles detections in VehicleDetector dict format, placed inside
+    the phase's ROI zones (priority zone weighted like a real stop-line queue).
+    """
+    rng = rng or random.Random(0)
+    boxes = zone_boxes(phase_config)
+    if not boxes:
+        boxes = [(0, 0, 1280, 720)]
+    detections = []
+    for _ in range(n_vehicles):
+        # 60% of vehicles queue in the 0-50m priority zone (first box), rest spread over cells
+        zone = boxes[0] if (rng.random() < 0.6 or len(boxes) == 1) else rng.choice(boxes[1:])
+        label = _pick_label(rng)
+        _, w, h = VEHICLE_MIX[label]
+        cx = rng.uniform(zone[0], zone[2])
+        cy = rng.uniform(zone[1], zone[3])
+        x1, y1 = int(cx - w / 2), int(cy - h / 2)
+        x2, y2 = x1 + w, y1 + h
+        detections.append({
+            "vehicle_type": label,
+            "bbox_coordinates": [x1, y1, x2, y2],
+            "confidence_score": round(rng.uniform(0.35, 0.95), 2),
+            "centroid": ((x1 + x2) // 2, (y1 + y2) // 2),
+            "bbox": [x1, y1, x2, y2],
+            "class_name": label
+        })
+    return detections
+
+
+def to_core_format(detections):
+    """
+    Converts VehicleDetector dicts (x1, y1, x2, y2) to the list format the
+    decision cores read as [x, y, w, h, class, conf].
+    """
+    out = []
+    for d in detections:
+        x1, y1, x2, y2 = d["bbox_coordinates"]
+        out.append([x1, y1, x2 - x1, y2 - y1, d["vehicle_type"], d["confidence_score"]])
+    return out
+
+
+# ─────────────────────────────────────────────────────────
+# BASELINES
+# ─────────────────────────────────────────────────────────
+
+def load_json(path):
+    """Returns parsed JSON, or None if the file does not exist."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compare_to_baseline(current, baseline, threshold, metric="p50_ms", floor_ms=0.05):
+    """
+    Walks two {group: {name: summary}} result trees and lists regressions where
+    current[metric] > baseline[metric] * (1 + threshold).
+    Timings under floor_ms are ignored (timer noise dominates).
+    Returns [(group, name, baseline_ms, current_ms), ...].
+    """
+    regressions = []
+    for group, entries in sorted(current.items()):
+        for name, summary in sorted(entries.items()):
+            base = (baseline.get(group) or {}).get(name)
+            if not base or metric not in base or metric not in summary:
+                continue
+            if base[metric] < floor_ms and summary[metric] < floor_ms:
+                continue
+            if summary[metric] > base[metric] * (1 + threshold):
+                regressions.append((group, name, base[metric], summary[metric]))
+    return regressions
@@ -0,0 +1,189 @@
+"""
+bench_violation_pages.py — /violations listing: OFFSET paging vs. keyset cursor.
+
+Fills a throwaway SQLite traffic_violations table (production columns and
+the migration's composite indexes) with `--rows` synthetic violations
+(5M by default) spread over 36 junctions, several per second so created_at
+ties exercise the id tie-breaker. Then times single pages at increasing
+depth, newest first, `--page` rows each:
+
+    unindexed  ORDER BY created_at DESC LIMIT n, indexes bypassed (page 0 only:
+               the old table had no index, so every page was a full sort)
+    offset     ... LIMIT n OFFSET depth * n, on the composite index
+    keyset     violation_pages.page_query with the cursor of the previous page
+
+for the city-wide listing and the per-junction listing. Before timing, the
+first pages are walked with both methods to check they return the same ids.
+
+Usage:
+    python tools/benchmarks/bench_violation_pages.py
+    python tools/benchmarks/bench_violation_pages.py --rows 5000000 --depths 0 10 100 1000 10000 --out bench_output/violation_pages.json
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_utils import summarize, write_json
+
+from cms_layer.violation_pages import COLUMNS, encode_cursor, page_query
+
+JUNCTIONS = [f"PUNE_JW_{i:02d}" for i in range(1, 37)]
+TYPES = ["RLV", "SLV", "WLV", "BI", "IT", "SPEED"]
+STATUSES = ["PENDING", "PENDING", "PENDING", "PROCESSED", "NOTIFIED"]
+
+SCHEMA = """
+    CREATE TABLE traffic_violations (
+        id INTEGER PRIMARY KEY,
+        junction_id TEXT NOT NULL,
+        plate_number TEXT DEFAULT 'PENDING',
+        violation_type TEXT NOT NULL,
+        violation_time TIMESTAMP,
+        evidence_url TEXT,
+        confidence FLOAT DEFAULT 0.0,
+        penalty_applied BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP,
+        status TEXT DEFAULT 'PENDING',
+        attributes TEXT DEFAULT '{}',
+        metadata TEXT DEFAULT '{}',
+        processed_at TIMESTAMP
+    )
+"""
+
+# Same composite indexes as migrations.py v8 (violation_listing)
+INDEXES = (
+    "CREATE INDEX idx_violations_created ON traffic_violations (created_at DESC, id DESC)",
+    "CREATE INDEX idx_violations_junction_created ON traffic_violations (junction_id, created_at DESC, id DESC)",
+    "CREATE INDEX idx_violations_status_created ON traffic_violations (status, created_at DESC, id DESC)",
+)
+
+
+def _rows(count, rng):
+    start = datetime(2026, 1, 1)
+    for i in range(1, count + 1):
+        ts = (start + timedelta(seconds=i // 4)).isoformat(sep=" ")  # ~4 violations/s -> created_at ties
+        yield (i, rng.choice(JUNCTIONS), f"MH12-AB-{rng.randint(0, 9999):04d}", rng.choice(TYPES), ts,
+               f"evidence/{i}.jpg", round(rng.uniform(0.5, 1.0), 2), False, ts, rng.choice(STATUSES), "{}", "{}", None)
+
+
+def build(path, count, seed):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute(SCHEMA)
+    t0 = time.perf_counter()
+    conn.executemany(f"INSERT INTO traffic_violations ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                     _rows(count, random.Random(seed)))
+    for sql in INDEXES:
+        conn.execute(sql)
+    conn.commit()
+    conn.row_factory = sqlite3.Row
+    return conn, time.perf_counter() - t0
+
+
+def _sqlite(sql):
+    return sql.replace("%s", "?")
+
+
+def offset_page(conn, page, depth, junction_id=None, unindexed=False):
+    table = "traffic_violations NOT INDEXED" if unindexed else "traffic_violations"
+    where, params = ("WHERE junction_id = ?", [junction_id]) if junction_id else ("", [])
+    sql = (f"SELECT {', '.join(COLUMNS)} FROM {table} {where} "
+           "ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?")
+    return conn.execute(sql, params + [page, depth * page]).fetchall()
+
+
+def keyset_page(conn, page, cursor, junction_id=None):
+    sql, params = page_query(page, cursor, junction_id=junction_id)
+    rows = conn.execute(_sqlite(sql), params).fetchall()
+    return rows[:page]
+
+
+def _cursor_before(conn, page, depth, junction_id):
+    """Cursor that makes the keyset query return page `depth` (taken from the row just before it)."""
+    if depth == 0:
+        return None
+    row = offset_page(conn, 1, depth * page - 1, junction_id)[0]
+    return encode_cursor(row["created_at"], row["id"])
+
+
+def check_equivalence(conn, page, pages, junction_id=None):
+    cursor = None
+    for depth in range(pages):
+        keyset = keyset_page(conn, page, cursor, junction_id)
+        offset = offset_page(conn, page, depth, junction_id)
+        if [r["id"] for r in keyset] != [r["id"] for r in offset]:
+            return False
+        cursor = encode_cursor(keyset[-1]["created_at"], keyset[-1]["id"])
+    return True
+
+
+def _time(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples)
+
+
+def run_listing(conn, args, junction_id=None):
+    where, params = ("WHERE junction_id = ?", [junction_id]) if junction_id else ("", [])
+    total = conn.execute(f"SELECT COUNT(*) FROM traffic_violations {where}", params).fetchone()[0]
+    result = {"rows": total, "equivalent_first_pages": check_equivalence(conn, args.page, 20, junction_id)}
+    if not args.skip_unindexed:
+        result["unindexed_page_0"] = _time(lambda: offset_page(conn, args.page, 0, junction_id, unindexed=True), 2)
+    for depth in args.depths:
+        if depth * args.page >= total:
+            continue  # Listing has fewer pages
+        cursor = _cursor_before(conn, args.page, depth, junction_id)
+        result[f"page_{depth}"] = {
+            "offset": _time(lambda: offset_page(conn, args.page, depth, junction_id), args.repeats),
+            "keyset": _time(lambda: keyset_page(conn, args.page, cursor, junction_id), args.repeats),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OFFSET vs keyset pagination of violations")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 10, 100, 1000, 10000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--skip-unindexed", action="store_true", help="Skip the full-sort baseline")
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    report = {"config": {k: v for k, v in vars(args).items() if k != "out"}, "results": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        conn, build_s = build(os.path.join(workdir, "violations.db"), args.rows, args.seed)
+        report["build_s"] = round(build_s, 1)
+        print(f"🚨 /violations paging over {args.rows:,} rows ({args.page}/page), built in {build_s:.0f}s")
+        for name, junction_id in (("city", None), ("junction", JUNCTIONS[0])):
+            r = run_listing(conn, args, junction_id)
+            report["results"][name] = r
+            print(f"\n   {name} listing, {r['rows']:,} rows (keyset == offset on first 20 pages: {r['equivalent_first_pages']})")
+            if "unindexed_page_0" in r:
+                print(f"      unindexed page 0: p50={r['unindexed_page_0']['p50_ms']:.1f}ms")
+            for depth in args.depths:
+                m = r.get(f"page_{depth}")
+                if m is None:
+                    continue
+                print(f"      page {depth:>6}: offset p50={m['offset']['p50_ms']:>9.3f}ms   "
+                      f"keyset p50={m['keyset']['p50_ms']:.3f}ms")
+        conn.close()
+
+    if args.out:
+        write_json(args.out, report)
+        print(f"\n   📝 Results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
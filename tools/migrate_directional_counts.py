@@ -1,7 +1,9 @@
 """
 migrate_directional_counts.py  —  Phase 8 One-time DB Migration
 
-Creates the directional_counts table in smart_net_db (local PostgreSQL).
+Creates the directional_counts table in smart_net_db (local PostgreSQL),
+partitioned by day (see cms_layer/history_store.py). An existing plain table
+is renamed to directional_counts_legacy and its recent rows copied over.
 Run ONCE before starting the system with Phase 8 enabled.
 
 Usage:
@@ -16,6 +18,8 @@ from dotenv import load_dotenv
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 load_dotenv()
 
+from cms_layer.history_store import HistoryStore
+
 DB_PARAMS = {
     "host":     os.getenv("DB_HOST", "localhost"),
     "port":     os.getenv("DB_PORT", "5432"),
@@ -24,29 +28,12 @@ DB_PARAMS = {
     "password": os.getenv("DB_PASS", ""),
 }
 
-CREATE_SQL = """
-CREATE TABLE IF NOT EXISTS directional_counts (
-    id            SERIAL PRIMARY KEY,
-    junction_id   TEXT        NOT NULL,
-    phase         TEXT        NOT NULL,
-    counts_json   JSONB       NOT NULL,
-    recorded_at   TIMESTAMPTZ NOT NULL DEFAULT NOW()
-);
-
--- Safe to run even if table already existed without recorded_at
-ALTER TABLE directional_counts
-    ADD COLUMN IF NOT EXISTS recorded_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
-
-CREATE INDEX IF NOT EXISTS idx_dc_junction
-    ON directional_counts (junction_id, recorded_at DESC);
-"""
-
 def run():
     try:
         conn = psycopg2.connect(**DB_PARAMS)
-        conn.autocommit = True
         cur = conn.cursor()
-        cur.execute(CREATE_SQL)
+        HistoryStore(lambda: None).ensure_schema(cur)  # One transaction: rename + create + copy
+        conn.commit()
         print("✅ directional_counts table created (or already exists).")
         cur.close()
         conn.close()
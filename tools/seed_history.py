@@ -0,0 +1,167 @@
+"""
+seed_history.py — Seed a month of synthetic history and compare query paths.
+
+Fills the partitioned directional_counts / saturation_history tables with
+`--days` of data for every junction in TOPOLOGY_NODES (one COPY per table per
+day), backfills the 1m/15m/1h rollups, then times the dashboard queries:
+
+    raw     aggregate directional_counts / saturation_history on the fly
+    rollup  read traffic_rollup_* / saturation_rollup_* (what /history serves)
+
+Needs the CMS PostgreSQL (get_db_connection). Run against a scratch database:
+it only appends rows, but a month at 5 s intervals is ~18M count rows.
+
+Usage:
+    python tools/seed_history.py --days 30 --interval 60
+    python tools/seed_history.py --skip-seed --out bench_output/history_queries.json
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "tools", "benchmarks"))
+
+from bench_utils import summarize, write_json
+from cms_layer.cloud_db_handler import get_db_connection
+from cms_layer.history_store import HistoryStore, RESOLUTIONS, _bucket
+from cms_layer.server import TOPOLOGY_NODES
+
+PHASES = ["North", "South", "East", "West"]
+MOVEMENTS = ["Straight", "Left", "Right"]
+
+QUERIES = {
+    "24h@15m": (24, "15m"),
+    "7d@1h": (24 * 7, "1h"),
+}
+
+
+def _day_rows(day, interval, rng):
+    """COPY text buffers (directional_counts, saturation_history) for one UTC day."""
+    counts, saturation = io.StringIO(), io.StringIO()
+    for offset in range(0, 86400, interval):
+        ts = (day + timedelta(seconds=offset)).isoformat()
+        hour = offset / 3600
+        rush = 1.0 + 0.8 * (7 <= hour <= 10 or 17 <= hour <= 20)
+        for jid in TOPOLOGY_NODES:
+            for phase in PHASES:
+                movement = {m: int(rng.expovariate(1 / (interval / 20 * rush))) for m in MOVEMENTS}
+                counts.write(f"{jid}\t{phase}\t{json.dumps(movement)}\t{ts}\n")
+            if offset % 60 == 0:
+                sat = min(100.0, max(0.0, rng.gauss(45 * rush, 12)))
+                saturation.write(f"{jid}\t{sat:.1f}\t0\tNormal\t{ts}\n")
+    counts.seek(0)
+    saturation.seek(0)
+    return counts, saturation
+
+
+def seed(conn, history, days, interval):
+    rng = random.Random(7)
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    cur = conn.cursor()
+    history.ensure_schema(cur)
+    history.ensure_partitions(cur, days_back=days)
+    conn.commit()
+
+    for n in range(days, -1, -1):
+        day = today - timedelta(days=n)
+        t0 = time.perf_counter()
+        counts, saturation = _day_rows(day, interval, rng)
+        cur.copy_expert("COPY directional_counts (junction_id, phase, counts_json, recorded_at) FROM STDIN", counts)
+        cur.copy_expert("COPY saturation_history (junction_id, avg_saturation, total_flow_count, active_alerts, ts) "
+                        "FROM STDIN", saturation)
+        conn.commit()
+        print(f"   📥 {day:%Y-%m-%d} seeded in {time.perf_counter() - t0:.1f}s")
+
+    t0 = time.perf_counter()
+    upserted = history.rollup(cur, since=today - timedelta(days=days))
+    conn.commit()
+    print(f"   🧮 Rollup backfill in {time.perf_counter() - t0:.1f}s: {upserted}")
+    cur.close()
+
+
+def _raw_counts(cur, jid, since, seconds):
+    cur.execute(f"""
+        SELECT {_bucket('recorded_at', seconds)} AS b, phase, kv.key, SUM((kv.value)::text::numeric)
+        FROM directional_counts, jsonb_each(counts_json) AS kv
+        WHERE junction_id = %s AND recorded_at >= %s
+        GROUP BY 1, 2, 3 ORDER BY 1
+    """, (jid, since))
+    return cur.fetchall()
+
+
+def _raw_saturation(cur, jid, since, seconds):
+    cur.execute(f"""
+        SELECT {_bucket('ts', seconds)} AS b, AVG(avg_saturation), MAX(avg_saturation), COUNT(*)
+        FROM saturation_history
+        WHERE junction_id = %s AND ts >= %s
+        GROUP BY 1 ORDER BY 1
+    """, (jid, since))
+    return cur.fetchall()
+
+
+def bench(conn, history, repeats):
+    cur = conn.cursor()
+    junctions = list(TOPOLOGY_NODES)
+    report = {}
+    for name, (hours, res) in QUERIES.items():
+        since = datetime.now(timezone.utc) - timedelta(hours=hours)
+        paths = {
+            "raw": lambda jid: (_raw_counts(cur, jid, since, RESOLUTIONS[res]),
+                                _raw_saturation(cur, jid, since, RESOLUTIONS[res])),
+            "rollup": lambda jid: (history.query_counts(cur, jid, since, res),
+                                   history.query_saturation(cur, jid, since, res)),
+        }
+        report[name] = {}
+        for path, fn in paths.items():
+            samples = []
+            for i in range(repeats):
+                t0 = time.perf_counter()
+                fn(junctions[i % len(junctions)])
+                samples.append(time.perf_counter() - t0)
+            conn.rollback()
+            report[name][path] = summarize(samples)
+            r = report[name][path]
+            print(f"   {name:<8} {path:<6} p50={r['p50_ms']:.2f}ms p95={r['p95_ms']:.2f}ms")
+    cur.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed synthetic history and benchmark raw vs rollup queries")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--interval", type=int, default=60, help="Seconds between synthetic count rows")
+    parser.add_argument("--repeats", type=int, default=50, help="Query runs per path")
+    parser.add_argument("--skip-seed", action="store_true", help="Only run the query benchmark")
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    if not conn:
+        print("[ERROR] DB Connection Failed")
+        sys.exit(1)
+    history = HistoryStore(lambda: None, retention_days=max(args.days, 30))
+
+    try:
+        if not args.skip_seed:
+            print(f"🌱 Seeding {args.days} days for {len(TOPOLOGY_NODES)} junctions (every {args.interval}s)...")
+            seed(conn, history, args.days, args.interval)
+        print("\n⏱️  Dashboard queries (raw aggregate vs rollup)")
+        report = {"config": {k: v for k, v in vars(args).items() if k != "out"}, "results": bench(conn, history, args.repeats)}
+    finally:
+        conn.close()
+
+    if args.out:
+        write_json(args.out, report)
+        print(f"\n   📝 Results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -69,6 +69,13 @@ def main():
                 "roi": points,
                 "threshold": 2 # Default gridlock threshold
             }
+            # Keep detector settings (detector_mode / light) from an existing config
+            if os.path.exists(OUTPUT_CONFIG):
+                with open(OUTPUT_CONFIG, 'r') as f:
+                    old = json.load(f)
+                for key in ("detector_mode", "light"):
+                    if key in old:
+                        data[key] = old[key]
             
             with open(OUTPUT_CONFIG, 'w') as f:
                 json.dump(data, f, indent=4)
@@ -2,11 +2,11 @@
 import cv2
 import time
 import random
-import requests
+import uuid
 import numpy as np
-import threading
 import easyocr
 from config.settings import SystemConfig
+from cms_layer.edge_outbox import get_outbox
 
 class ANPRController:
     """
@@ -16,7 +16,7 @@ class ANPRController:
     1. Detect vehicles near Stop Line (Compliance Check).
     2. Attempt Real OCR (EasyOCR).
     3. Fallback to Simulation if OCR fails (to ensure demo works).
-    4. Async Credit Points via Server API.
+    4. Async Credit Points via Server API (SafeDrive /api/rewards/credit, idempotent).
     """
     
     def __init__(self, endpoint_url=None, mode="REAL"):
@@ -172,22 +172,22 @@ class ANPRController:
         return None, 0.0
 
     def _send_credit(self, plate, points, phase):
-        """Send credit to CMS Server (Async)."""
+        """Send credit to SafeDrive (store-and-forward: local outbox append)."""
         if not plate or plate == "Scanning..." or points == 0:
             return
 
-        def _worker():
-            try:
-                payload = {
-                    "plate_number": plate,
-                    "points": points,
-                    "reason": "Traffic Compliance (Green Logic)",
-                    "junction_id": SystemConfig.JUNCTION_ID
-                }
-                requests.post(self.endpoint_url, json=payload, timeout=2.0)
-                print(f"    💸 [ANPR] Sent +{points} pts to {plate}") # Debug enabled for verification
-            except Exception as e:
-                print(f"    ⚠️ [ANPR] Credit Upload Failed: {e}")
-        
-        # Fire and Forget
-        threading.Thread(target=_worker, daemon=True).start()
+        payload = {
+            "plate_number": plate,
+            "points": points,
+            "reason": "Traffic Compliance (Green Logic)",
+            "junction_id": SystemConfig.JUNCTION_ID,
+            # Fixed when queued: every outbox retry of this credit carries the same key
+            "idempotency_key": f"{SystemConfig.JUNCTION_ID}:{uuid.uuid4().hex}"
+        }
+        try:
+            # One POST per credit (the SafeDrive backend has no batch route); the
+            # backend claims idempotency_key, so an outbox retry never credits twice
+            get_outbox().append(self.endpoint_url, "", payload)
+            print(f"    💸 [ANPR] Queued +{points} pts for {plate}") # Debug enabled for verification
+        except Exception as e:
+            print(f"    ⚠️ [ANPR] Credit Queue Failed: {e}")
@@ -19,6 +19,7 @@ try:
     from .lane_mapper import LaneMapper
     from .zone_analyzer import ZoneAnalyzer 
     from .anpr_controller import ANPRController # Phase 16: Reward System
+    from .detection_recorder import DetectionRecorder
     # --- UTILS ---
     from ..utils.logger import log_info, log_error
 except ImportError:
@@ -29,6 +30,7 @@ except ImportError:
     from lane_mapper import LaneMapper
     from zone_analyzer import ZoneAnalyzer
     from anpr_controller import ANPRController
+    from detection_recorder import DetectionRecorder
     def log_info(msg, src): print(f"ℹ️ [{src}] {msg}")
     def log_error(msg, src): print(f"❌ [{src}] {msg}")
 
@@ -55,14 +57,30 @@ class DetectionController:
         self.detect_every_n = self.config.get("detect_every_n", 3) 
         self._frame_count = 0
         self._cached_detections = [] 
+        
+        # Record & Replay: optional binary log of every frame's detections
+        self.recorder = None
+        self._record_request = None # (path, camera) — recorder opened on first frame
+
+    def set_recorder(self, recorder: DetectionRecorder):
+        """Attach a DetectionRecorder; every processed frame is appended to its log."""
+        self.recorder = recorder
+
+    def enable_recording(self, path: str, camera: str):
+        """Record to 'path' once the first frame arrives (so the log knows the frame size)."""
+        self._record_request = (path, camera)
 
-    def initialize(self) -> bool:
-        """Initialize all fast components."""
+    def initialize(self, replay: bool = False) -> bool:
+        """
+        Initialize all fast components.
+        Args:
+            replay: Detections come from a recorded log — skip loading the AI models.
+        """
         try:
             log_info("🚀 Initializing Detection Controller (Fast Path)...", self.module_name)
             
             # 1. Core Detection (Uses Shared Memory Model)
-            if not self.vehicle_detector.initialize(): 
+            if not replay and not self.vehicle_detector.initialize(): 
                 log_error("Vehicle Detector Failed to Init", self.module_name)
                 return False
             
@@ -83,8 +101,8 @@ class DetectionController:
                 self.zone_analyzer.initialize(zone_configs, pixels_per_meter=ppm, stop_lines=stop_lines)
             
             # 4. Phase 16/18: ANPR & Reward System
-            # Check for Dummy Mode Config
-            anpr_mode = "DUMMY" if self.config.get("anpr_dummy_mode", False) else "REAL"
+            # Check for Dummy Mode Config (Replay has no pixels to OCR → always DUMMY)
+            anpr_mode = "DUMMY" if (replay or self.config.get("anpr_dummy_mode", False)) else "REAL"
             self.anpr_controller = ANPRController(mode=anpr_mode)
             
             self._initialized = True
@@ -119,17 +137,17 @@ class DetectionController:
             detections = self._cached_detections
             timings["detection"] = time.time() - t0
             
-            t0 = time.time()
-            # Assign 'lane_id' to each vehicle using the new optimized logic
-            lane_groups = self.lane_mapper.assign_lanes(detections)
-            timings["mapping"] = time.time() - t0
+            # Record & Replay: append this frame's detections to the camera log
+            if self.recorder is None and self._record_request is not None:
+                h_img, w_img = frame.shape[:2]
+                path, camera = self._record_request
+                self.recorder = DetectionRecorder(path, camera, frame_size=(w_img, h_img))
+                self._record_request = None
+                log_info(f"⏺️ Recording detections -> {path}", self.module_name)
+            if self.recorder is not None:
+                self.recorder.write(t_start, detections)
             
-            # --- STEP 3: ANALYZE ZONES (Density/Counts) ---
-            t0 = time.time()
-            # This returns exactly what HybridCore needs:
-            # { "North_Left": {count: 5, density: 0.2}, ... }
-            zone_stats = self.zone_analyzer.analyze_zones(lane_groups, frame_obj=frame, mode=detect_mode)
-            timings["analysis"] = time.time() - t0
+            zone_stats = self._map_and_analyze(detections, frame, detect_mode, timings)
             
             # --- STEP 4: HYBRID ANPR (Reward System) ---
             # Randomly checks for Good Behavior (Stopped at Red)
@@ -199,6 +217,48 @@ class DetectionController:
             traceback.print_exc()
             return {"status": "error", "error": str(e)}
 
+    def _map_and_analyze(self, detections: List[Dict[str, Any]], frame_obj: Any, detect_mode: str, timings: Dict[str, float]) -> Dict[str, Dict]:
+        """STEP 2 + 3: Lane mapping and zone analysis (shared by live and replay paths)."""
+        t0 = time.time()
+        # Assign 'lane_id' to each vehicle using the new optimized logic
+        lane_groups = self.lane_mapper.assign_lanes(detections)
+        timings["mapping"] = time.time() - t0
+        
+        # --- STEP 3: ANALYZE ZONES (Density/Counts) ---
+        t0 = time.time()
+        # This returns exactly what HybridCore needs:
+        # { "North_Left": {count: 5, density: 0.2}, ... }
+        zone_stats = self.zone_analyzer.analyze_zones(lane_groups, frame_obj=frame_obj, mode=detect_mode)
+        timings["analysis"] = time.time() - t0
+        return zone_stats
+
+    def process_detections(self, detections: List[Dict[str, Any]], frame_shape: Tuple[int, int], timestamp: float = None, detect_mode: str = "HYBRID") -> Dict[str, Any]:
+        """
+        Replay path: run the downstream pipeline on recorded detections (no model, no frame).
+        frame_shape is (height, width). Returns the same packet shape as process_frame().
+        """
+        if not self._initialized:
+            return {"status": "error", "error": "Not initialized"}
+        
+        timings = {"detection": 0.0}
+        t_start = time.time()
+        try:
+            zone_stats = self._map_and_analyze(detections, frame_shape, detect_mode, timings)
+            timings["total"] = time.time() - t_start
+            return {
+                "status": "success",
+                "timestamp": timestamp if timestamp is not None else t_start,
+                "lane_data": zone_stats,
+                "raw_detections": detections,
+                "vehicle_count": len(detections),
+                "intersection_status": "CLEAR",
+                "metadata": {"timings": timings, "replay": True}
+            }
+        except Exception as e:
+            log_error(f"Process Detections Failed: {e}", self.module_name)
+            return {"status": "error", "error": str(e)}
+
     def shutdown(self):
         log_info("Shutting down Detection Controller...", self.module_name)
-        pass
\ No newline at end of file
+        if self.recorder is not None:
+            self.recorder.close()
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""
+Detection Recorder Module - Record & Replay of Per-Camera Detection Streams
+Role: Lets the downstream pipeline (LaneMapper → ZoneAnalyzer → DecisionMaker)
+      be re-run, benchmarked and regression-tested WITHOUT any AI model.
+
+Features:
+1. Compact binary log (one file per camera): 11 bytes per vehicle per frame.
+2. Streaming format: records are appended as they arrive, safe to tail / truncate.
+3. Replay source yields detections in the exact VehicleDetector dict format,
+   either as fast as possible (benchmarks) or paced to the original timestamps.
+
+File Layout (little-endian):
+    Header : MAGIC(4s) VERSION(B) CAM_LEN(B) CAMERA(utf-8) WIDTH(H) HEIGHT(H)
+    Records: TYPE(1s) + payload
+        b"C" → class definition : CLASS_IDX(B) NAME_LEN(B) NAME(utf-8)
+        b"F" → frame            : TIMESTAMP(d) FRAME_IDX(I) COUNT(H)
+                                  then COUNT × [X1 Y1 X2 Y2 (4h) CONF(e) CLASS_IDX(B)]
+"""
+
+import os
+import struct
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"HTDR"
+VERSION = 1
+FILE_EXT = ".htdr"
+
+_HEADER_FMT = "<4sBB"
+_SIZE_FMT = "<HH"
+_CLASS_FMT = "<BB"
+_FRAME_FMT = "<dIH"
+_VEHICLE_FMT = "<4heB"
+_VEHICLE_SIZE = struct.calcsize(_VEHICLE_FMT)
+
+_REC_CLASS = b"C"
+_REC_FRAME = b"F"
+
+
+def log_path_for(log_dir: str, camera: str) -> str:
+    """Returns the conventional log path for one camera (e.g. logs/replay/North.htdr)."""
+    return os.path.join(log_dir, f"{camera}{FILE_EXT}")
+
+
+class DetectionRecorder:
+    """
+    Appends per-frame detections of ONE camera to a binary log.
+    Hooked into DetectionController.process_frame (see set_recorder()).
+    """
+
+    def __init__(self, path: str, camera: str, frame_size: Tuple[int, int] = (1280, 720)):
+        self.path = path
+        self.camera = camera
+        self.frame_size = frame_size
+        self._lock = threading.Lock()
+        self._class_index: Dict[str, int] = {}
+        self._frame_idx = 0
+        self._bytes_written = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._fh = open(path, "wb")
+        cam = camera.encode("utf-8")[:255]
+        header = struct.pack(_HEADER_FMT, MAGIC, VERSION, len(cam)) + cam
+        header += struct.pack(_SIZE_FMT, int(frame_size[0]), int(frame_size[1]))
+        self._write(header)
+
+    def _write(self, data: bytes):
+        self._fh.write(data)
+        self._bytes_written += len(data)
+
+    def _class_id(self, label: str) -> int:
+        if label not in self._class_index and len(self._class_index) >= 255:
+            label = "unknown"  # Class table full: fold rare labels (256 slots is plenty)
+        idx = self._class_index.get(label)
+        if idx is None:
+            idx = len(self._class_index)
+            self._class_index[label] = idx
+            name = label.encode("utf-8")[:255]
+            self._write(_REC_CLASS + struct.pack(_CLASS_FMT, idx, len(name)) + name)
+        return idx
+
+    def write(self, timestamp: float, detections: List[Dict[str, Any]]):
+        """Record one frame worth of detections (VehicleDetector dict format)."""
+        with self._lock:
+            if self._fh is None:
+                return
+            body = bytearray()
+            count = 0
+            for det in detections[:65535]:
+                bbox = det.get("bbox_coordinates", det.get("bbox", [0, 0, 0, 0]))
+                x1, y1, x2, y2 = (max(-32768, min(32767, int(v))) for v in bbox[:4])
+                label = str(det.get("vehicle_type", det.get("class_name", "unknown")))
+                cid = self._class_id(label)
+                conf = float(det.get("confidence_score", det.get("conf", 0.0)))
+                body += struct.pack(_VEHICLE_FMT, x1, y1, x2, y2, conf, cid)
+                count += 1
+            self._write(_REC_FRAME + struct.pack(_FRAME_FMT, timestamp, self._frame_idx, count) + bytes(body))
+            self._frame_idx += 1
+            if self._frame_idx % 30 == 0:
+                self._fh.flush()  # ~1s at 30fps: a crash loses at most one second of log
+
+    @property
+    def frames_written(self) -> int:
+        return self._frame_idx
+
+    @property
+    def bytes_written(self) -> int:
+        return self._bytes_written
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+                self._fh.close()
+                self._fh = None
+
+
+class DetectionReplaySource:
+    """
+    Reads a DetectionRecorder log and yields (timestamp, detections) per frame.
+    Used by VisionThread in REPLAY mode instead of a video file / camera.
+
+    Args:
+        path:     .htdr log file
+        realtime: If True, sleep to reproduce the original frame spacing (× speed).
+                  If False, yield as fast as possible (benchmark mode).
+        loop:     Restart from the first frame on EOF.
+    """
+
+    def __init__(self, path: str, realtime: bool = False, speed: float = 1.0, loop: bool = False):
+        self.path = path
+        self.realtime = realtime
+        self.speed = speed if speed > 0 else 1.0
+        self.loop = loop
+        self.camera = None
+        self.frame_size = (0, 0)
+        with open(path, "rb") as f:
+            self._data_offset = self._read_header(f)
+
+    def _read_header(self, f) -> int:
+        magic, version, cam_len = struct.unpack(_HEADER_FMT, f.read(struct.calcsize(_HEADER_FMT)))
+        if magic != MAGIC:
+            raise ValueError(f"Not a detection log: {self.path}")
+        if version != VERSION:
+            raise ValueError(f"Unsupported detection log version {version}: {self.path}")
+        self.camera = f.read(cam_len).decode("utf-8")
+        self.frame_size = struct.unpack(_SIZE_FMT, f.read(struct.calcsize(_SIZE_FMT)))
+        return f.tell()
+
+    def frames(self, stop_event: Optional[threading.Event] = None) -> Iterator[Tuple[float, List[Dict[str, Any]]]]:
+        """
+        Generator of (timestamp, detections). Truncated trailing records are ignored.
+        A log without any complete frame ends the replay even with loop=True.
+        """
+        while stop_event is None or not stop_event.is_set():
+            first_ts = None
+            wall_start = time.time()
+            yielded = 0
+            for ts, dets in self._read_frames():
+                if stop_event is not None and stop_event.is_set():
+                    return
+                if self.realtime:
+                    if first_ts is None:
+                        first_ts = ts
+                    delay = (ts - first_ts) / self.speed - (time.time() - wall_start)
+                    if delay > 0:
+                        if stop_event is None:
+                            time.sleep(delay)
+                        elif stop_event.wait(delay):
+                            return
+                yield ts, dets
+                yielded += 1
+            if not self.loop or not yielded:
+                return  # Looping an empty log would spin at 100% CPU
+
+    def _read_frames(self):
+        classes: Dict[int, str] = {}
+        frame_size = struct.calcsize(_FRAME_FMT)
+        class_size = struct.calcsize(_CLASS_FMT)
+        with open(self.path, "rb") as f:
+            f.seek(self._data_offset)
+            while True:
+                rec_type = f.read(1)
+                if not rec_type:
+                    return
+                if rec_type == _REC_CLASS:
+                    raw = f.read(class_size)
+                    if len(raw) < class_size:
+                        return
+                    idx, name_len = struct.unpack(_CLASS_FMT, raw)
+                    classes[idx] = f.read(name_len).decode("utf-8")
+                elif rec_type == _REC_FRAME:
+                    raw = f.read(frame_size)
+                    if len(raw) < frame_size:
+                        return
+                    ts, _, count = struct.unpack(_FRAME_FMT, raw)
+                    body = f.read(count * _VEHICLE_SIZE)
+                    if len(body) < count * _VEHICLE_SIZE:
+                        return
+                    dets = []
+                    for x1, y1, x2, y2, conf, cid in struct.iter_unpack(_VEHICLE_FMT, body):
+                        label = classes.get(cid, "unknown")
+                        dets.append({
+                            "vehicle_type": label,
+                            "bbox_coordinates": [x1, y1, x2, y2],
+                            "confidence_score": round(float(conf), 2),
+                            "centroid": ((x1 + x2) // 2, (y1 + y2) // 2),
+                            "bbox": [x1, y1, x2, y2],
+                            "class_name": label
+                        })
+                    yield ts, dets
+                else:
+                    raise ValueError(f"Corrupt detection log {self.path}: record type {rec_type!r}")
@@ -5,6 +5,13 @@ Camera 5 Intersection Monitor with Finish-Line Directional Tracking
 - detect_status():         Returns BLOCKED / CLEAR (gridlock check)
 - detect_full():           Returns status + accumulated directional counts
 - drain_directional_counts(): Called once per heartbeat cycle to get counts
+
+Detector modes (intersection_roi.json → "detector_mode"):
+- ENSEMBLE (default): RT-DETR + Indian-YOLO on every frame.
+- LIGHT:    OccupancyEstimator (background subtraction over the box) on every
+            frame; the single Indian-YOLO at reduced resolution only runs when
+            the box is not idle. BLOCKED if count > threshold OR the box
+            occupancy reaches "occupancy_threshold".
 """
 import json
 import os
@@ -21,6 +28,11 @@ except ImportError:
     sys.path.append(os.path.join(_PROJECT_ROOT, "vision_fast"))
     from vehicle_detector import VehicleDetector
 
+try:
+    from .occupancy_estimator import OccupancyEstimator
+except ImportError:
+    from occupancy_estimator import OccupancyEstimator
+
 try:
     from core_logic.direction_finish_tracker import DirectionFinishTracker
 except ImportError:
@@ -29,13 +41,28 @@ except ImportError:
 
 
 class IntersectionDetector:
-    def __init__(self, config_path=None):
+    def __init__(self, config_path=None, detector_mode=None):
+        """
+        Args:
+            config_path:   ROI config (default config/intersection_roi.json)
+            detector_mode: Overrides the config's "detector_mode" (ENSEMBLE / LIGHT)
+        """
         self.module_name = "INTERSECTION_DETECTOR"
         self._config_path = config_path or os.path.join(_PROJECT_ROOT, "config", "intersection_roi.json")
+        self._mode_override = detector_mode
         self.roi_points = []
         self.gridlock_threshold = 5
         self._initialized = False
 
+        # Detector mode (ENSEMBLE / LIGHT) and LIGHT-path settings
+        self.detector_mode = "ENSEMBLE"
+        self.light_imgsz = 320
+        self.occupancy_threshold = 0.45
+        self.min_activity = 0.02
+        self.occupancy: OccupancyEstimator = None
+        self.last_occupancy = {"occupancy": 0.0, "motion": 0.0}
+        self._detector_ready = False
+
         # Reuse the singleton detector
         self.detector = VehicleDetector()
 
@@ -58,15 +85,28 @@ class IntersectionDetector:
                 roi_raw = data.get("roi", [])
                 self.roi_points = np.array(roi_raw, dtype=np.int32)
                 self.gridlock_threshold = data.get("threshold", 6)
-
-            if not self.detector.initialize():
-                return False
+                self.detector_mode = str(self._mode_override or data.get("detector_mode", "ENSEMBLE")).upper()
+                light = data.get("light", {})
+                self.light_imgsz = light.get("imgsz", self.light_imgsz)
+                self.occupancy_threshold = light.get("occupancy_threshold", self.occupancy_threshold)
+                self.min_activity = light.get("min_activity", self.min_activity)
+
+            if self.detector_mode == "LIGHT":
+                self.occupancy = OccupancyEstimator(roi_raw, scale=light.get("scale", 0.5))
+                self._detector_ready = self.detector.initialize()
+                if not self._detector_ready:
+                    # Occupancy alone still answers BLOCKED / CLEAR (no directional counts)
+                    print(f"⚠️ [{self.module_name}] Detector unavailable - LIGHT mode runs occupancy-only")
+            else:
+                if not self.detector.initialize():
+                    return False
+                self._detector_ready = True
 
             # Phase 8: Build finish-line tracker from ROI points
             self._finish_tracker = DirectionFinishTracker(roi_raw)
 
             self._initialized = True
-            print(f"✅ [{self.module_name}] Ready. Threshold: {self.gridlock_threshold}. "
+            print(f"✅ [{self.module_name}] Ready ({self.detector_mode}). Threshold: {self.gridlock_threshold}. "
                   f"Finish lines: {list(self._finish_tracker.get_finish_lines().keys())}")
             return True
         except Exception as e:
@@ -90,6 +130,18 @@ class IntersectionDetector:
         self._tracked_ids[vid] = (cx, cy)
         return vid
 
+    def _detect_light(self, frame: np.ndarray):
+        """LIGHT path: returns (detections, occupancy)."""
+        self.last_occupancy = self.occupancy.update(frame)
+        occupancy = self.last_occupancy["occupancy"]
+        # Idle box (nothing parked, nothing moving) → skip the model entirely
+        if occupancy < self.min_activity and self.last_occupancy["motion"] < self.min_activity:
+            return [], occupancy
+        if not self._detector_ready:
+            return [], occupancy
+        res = self.detector.detect_fast(frame, imgsz=self.light_imgsz)
+        return res.get("vehicle_detections", []), occupancy
+
     # ------------------------------------------------------------------ #
     # PUBLIC API                                                           #
     # ------------------------------------------------------------------ #
@@ -101,10 +153,14 @@ class IntersectionDetector:
         if not self._initialized:
             return "CLEAR"
 
-        res = self.detector.detect(frame)
-        detections = res.get("vehicle_detections", [])
-        if not detections:
-            return "CLEAR"
+        occupancy = None
+        if self.detector_mode == "LIGHT":
+            detections, occupancy = self._detect_light(frame)
+        else:
+            res = self.detector.detect(frame)
+            detections = res.get("vehicle_detections", [])
+            if not detections:
+                return "CLEAR"
 
         count_in_roi = 0
         current_ids = set()
@@ -130,6 +186,9 @@ class IntersectionDetector:
         if count_in_roi > self.gridlock_threshold:
             print(f"🔥 [{self.module_name}] GRIDLOCK! Count: {count_in_roi}")
             return "BLOCKED"
+        if occupancy is not None and occupancy >= self.occupancy_threshold:
+            print(f"🔥 [{self.module_name}] GRIDLOCK! Occupancy: {occupancy:.0%}")
+            return "BLOCKED"
         return "CLEAR"
 
     def detect_full(self, frame: np.ndarray) -> Dict[str, Any]:
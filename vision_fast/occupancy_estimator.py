@@ -0,0 +1,85 @@
+"""
+Occupancy Estimator Module - Model-free Junction Box Occupancy (Camera 5)
+Role: Cheap answer to "is the box-centre occupied / moving?" for the LIGHT
+      intersection path, without running the RT-DETR + YOLO ensemble.
+
+Features:
+1. Background subtraction (MOG2) over the ROI polygon only, at reduced resolution.
+2. Learning is frozen while the box is occupied, so a stalled gridlock is not
+   absorbed into the background after a few seconds.
+3. Frame-difference motion ratio, used to skip the detector on an idle box.
+"""
+
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+
+class OccupancyEstimator:
+    def __init__(self, roi_points, scale: float = 0.5, learning_rate: float = 0.002,
+                 freeze_above: float = 0.2):
+        """
+        Args:
+            roi_points:    Junction-box polygon in full-frame pixels
+            scale:         Downscale factor applied to the ROI crop (0.5 = half size)
+            learning_rate: MOG2 learning rate while the box is (mostly) empty
+            freeze_above:  Occupancy above which the background stops learning
+        """
+        self.module_name = "OCCUPANCY_ESTIMATOR"
+        self.scale = scale
+        self.learning_rate = learning_rate
+        self.freeze_above = freeze_above
+
+        pts = np.array(roi_points, dtype=np.int32).reshape(-1, 2)
+        self._x, self._y, self._w, self._h = cv2.boundingRect(pts)
+        self._size = (max(1, int(self._w * scale)), max(1, int(self._h * scale)))
+
+        # Polygon mask in the (scaled) crop coordinate system
+        local = ((pts - [self._x, self._y]) * scale).astype(np.int32)
+        self._mask = np.zeros((self._size[1], self._size[0]), dtype=np.uint8)
+        cv2.fillPoly(self._mask, [local], 255)
+        self._mask_area = max(1, int(cv2.countNonZero(self._mask)))
+
+        self._bg = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=25, detectShadows=True)
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self._prev_gray: Optional[np.ndarray] = None
+        self.occupancy = 0.0
+        self.motion = 0.0
+        self.frames = 0
+
+    def _crop(self, frame: np.ndarray) -> np.ndarray:
+        crop = frame[self._y:self._y + self._h, self._x:self._x + self._w]
+        if crop.shape[1] != self._size[0] or crop.shape[0] != self._size[1]:
+            crop = cv2.resize(crop, self._size, interpolation=cv2.INTER_AREA)
+        return crop
+
+    def update(self, frame: np.ndarray) -> Dict[str, Any]:
+        """
+        Feeds one frame. Returns {"occupancy": 0-1, "motion": 0-1}.
+        occupancy = foreground share of the box polygon (shadows ignored).
+        motion    = share of the box that changed since the previous frame.
+        """
+        crop = self._crop(frame)
+
+        # Freeze the background while occupied (learning rate 0)
+        rate = 0.0 if self.occupancy > self.freeze_above else self.learning_rate
+        # Learn fast on the very first frames to build the empty-box model
+        if self.frames < 30:
+            rate = -1
+        fg = self._bg.apply(crop, learningRate=rate)
+        fg = cv2.threshold(fg, 200, 255, cv2.THRESH_BINARY)[1]   # 127 = shadow
+        fg = cv2.morphologyEx(fg, cv2.MORPH_OPEN, self._kernel)
+        fg = cv2.bitwise_and(fg, self._mask)
+        self.occupancy = cv2.countNonZero(fg) / self._mask_area
+
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        if self._prev_gray is not None:
+            diff = cv2.absdiff(gray, self._prev_gray)
+            moving = cv2.threshold(diff, 25, 255, cv2.THRESH_BINARY)[1]
+            moving = cv2.bitwise_and(moving, self._mask)
+            self.motion = cv2.countNonZero(moving) / self._mask_area
+        self._prev_gray = gray
+        self.frames += 1
+
+        return {"occupancy": round(self.occupancy, 4), "motion": round(self.motion, 4)}
@@ -5,6 +5,8 @@ Features:
 1. Singleton Pattern: Loads AI models ONCE in shared memory for all 5 cameras.
 2. Dual Engine: RT-DETR (High Accuracy) + Indian YOLO (Local Classes).
 3. Resolution Optimization: Forces 640p inference for speed.
+4. Fast Path: detect_fast() runs only the smaller Indian-YOLO at reduced
+   resolution (used by the LIGHT Camera 5 gridlock path).
 """
 
 from typing import Dict, Any, List
@@ -148,6 +150,26 @@ class VehicleDetector:
             })
 
         # Parse Indian YOLO
+        all_detections.extend(self._parse_local(res_loc))
+
+        # --- STEP 3: SMART MERGE (NMS) ---
+        final_detections = self._merge_detections(all_detections)
+
+        return self._format_output(frame, final_detections, visualize)
+
+    def detect_fast(self, frame: np.ndarray, imgsz: int = 320) -> Dict[str, Any]:
+        """
+        Single-model path: Indian-YOLO only, at reduced resolution, no merge.
+        Same output format as detect(); trades class precision for speed.
+        """
+        if not self._initialized: return {"vehicle_count": 0, "vehicle_detections": []}
+
+        res_loc = self.model_local(frame, conf=self.conf_threshold, verbose=False, imgsz=imgsz)[0]
+        return self._format_output(frame, self._parse_local(res_loc), visualize=False)
+
+    def _parse_local(self, res_loc):
+        """Indian-YOLO boxes → internal detection dicts."""
+        detections = []
         for box in res_loc.boxes:
             confidence = float(box.conf[0])
             if confidence < self.conf_threshold: continue
@@ -158,16 +180,15 @@ class VehicleDetector:
                 raw_label = self.indian_names[cls_id]
                 label = self._normalize_indian_name(raw_label)
                 
-                all_detections.append({
+                detections.append({
                     "bbox": [x1, y1, x2, y2],
                     "label": label,
                     "conf": confidence,
                     "priority": 2 # Higher priority
                 })
+        return detections
 
-        # --- STEP 3: SMART MERGE (NMS) ---
-        final_detections = self._merge_detections(all_detections)
-
+    def _format_output(self, frame, final_detections, visualize):
         # --- STEP 4: FORMAT OUTPUT ---
         formatted_results = []
         for d in final_detections:
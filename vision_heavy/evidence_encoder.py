@@ -0,0 +1,209 @@
+"""
+Evidence Encoder - Off-Thread JPEG/WebP Encoding with Content-Addressed Dedupe
+Role: Turn violation frames into evidence files without encoding on the
+      background service's worker threads, and without storing the same
+      evidence several times.
+
+- Encoding (cv2.imencode, JPEG or WebP) and hashing run in a small process
+  pool, so they do not hold the edge process's GIL.
+- Each image is named <phash>_<content hash>.<ext>:
+      phash    64-bit DCT perceptual hash of the vehicle crop (the bbox; the
+               whole frame when there is none). Only the crop is hashed,
+               because the fixed camera background makes every whole frame
+               look alike.
+      content  BLAKE2b of the encoded bytes
+  An identical file is already on disk under that name (exact duplicate).
+  A frame whose crop phash is within `max_distance` bits of evidence stored
+  in the last `window_s` seconds for the same junction + violation type is
+  the same vehicle re-triggering (near duplicate). Neither is written again;
+  the caller still records the violation against the existing file. Frames
+  without a bbox are only deduped exactly (no crop, no vehicle to match).
+- Files are written atomically: <name>.tmp-<pid>, fsync, then os.replace, so
+  the uploader never sees a half-written image.
+
+Metrics (snapshot()): bytes written per second, dedupe ratio, encode time.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import numpy as np
+
+FORMATS = {
+    "jpg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+
+def perceptual_hash(image):
+    """64-bit DCT hash: low 8x8 frequencies of a 32x32 grayscale thumbnail vs. their median."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    thumb = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(thumb)[:8, :8].flatten()
+    bits = low > np.median(low[1:])  # DC term excluded from the median
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _crop(frame, bbox):
+    if bbox is None or len(bbox) != 4:
+        return frame
+    h, w = frame.shape[:2]
+    x1, y1, x2, y2 = (int(v) for v in bbox)
+    x1, x2 = max(0, min(x1, x2)), min(w, max(x1, x2))
+    y1, y2 = max(0, min(y1, y2)), min(h, max(y1, y2))
+    if x2 - x1 < 8 or y2 - y1 < 8:
+        return frame
+    return frame[y1:y2, x1:x2]
+
+
+def encode_evidence(frame, bbox, fmt, quality):
+    """Pool task: (encoded bytes, phash, content hex, encode seconds)."""
+    t0 = time.perf_counter()
+    ext, flag = FORMATS[fmt]
+    ok, buf = cv2.imencode(ext, frame, [flag, int(quality)])
+    if not ok:
+        raise ValueError(f"cv2.imencode({ext}) failed")
+    data = buf.tobytes()
+    phash = perceptual_hash(_crop(frame, bbox))
+    content = hashlib.blake2b(data, digest_size=8).hexdigest()
+    return data, phash, content, time.perf_counter() - t0
+
+
+def write_atomic(path, data):
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class EvidenceEncoder:
+    def __init__(self, storage_dir, fmt="jpg", quality=90, processes=2, max_distance=6, window_s=10.0):
+        """
+        Args:
+            storage_dir:  Directory the evidence files go to
+            fmt:          "jpg" or "webp"
+            quality:      Encoder quality (0-100)
+            processes:    Encoding processes (0 = encode on the calling thread)
+            max_distance: phash Hamming distance that still counts as the same vehicle
+            window_s:     How long stored evidence is remembered for near-duplicate checks
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown evidence format {fmt!r} (use {', '.join(FORMATS)})")
+        self.module_name = "EVIDENCE"
+        self.storage_dir = storage_dir
+        self.fmt = fmt
+        self.quality = quality
+        self.processes = processes
+        self.max_distance = max_distance
+        self.window_s = window_s
+
+        self._pool = None
+        self._lock = threading.Lock()
+        self._recent = deque()  # (stored_at, (junction, violation type), phash, path)
+        self._started = time.monotonic()
+        self.stats = {"frames": 0, "written": 0, "exact_duplicates": 0, "near_duplicates": 0,
+                      "bytes_written": 0, "encode_s": 0.0, "errors": 0}
+
+    # ─────────────────────────────────────────────────────────
+    # LIFECYCLE
+    # ─────────────────────────────────────────────────────────
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None and self.processes > 0:
+                # spawn: the caller is multi-threaded (forking it could copy held locks)
+                self._pool = ProcessPoolExecutor(max_workers=self.processes,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def warm_up(self):
+        """Spawns the encoding processes now (they import cv2) instead of on the first violation."""
+        pool = self._executor()
+        if pool is not None:
+            tiny = np.zeros((16, 16, 3), dtype=np.uint8)
+            list(pool.map(encode_evidence, [tiny] * self.processes, [None] * self.processes,
+                          [self.fmt] * self.processes, [self.quality] * self.processes))
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    # ─────────────────────────────────────────────────────────
+    # ENCODE + STORE
+    # ─────────────────────────────────────────────────────────
+
+    def _encode(self, frame, bbox):
+        pool = self._executor()
+        if pool is not None:
+            try:
+                return pool.submit(encode_evidence, frame, bbox, self.fmt, self.quality).result()
+            except BrokenProcessPool as e:
+                print(f"  ⚠️ [{self.module_name}] Encoder pool broke ({e}) — encoding in-process")
+                self.processes = 0
+                self.close()
+        return encode_evidence(frame, bbox, self.fmt, self.quality)
+
+    def store(self, frame, bbox=None, junction_id=None, violation_type=None):
+        """
+        Encodes and stores one evidence frame (blocks the caller only while
+        waiting for the pool). Returns (path, duplicate): duplicate is None
+        for a new file, "exact" or "near" when existing evidence was reused.
+        """
+        data, phash, content, encode_s = self._encode(frame, bbox)
+        ext = FORMATS[self.fmt][0]
+        path = os.path.join(self.storage_dir, f"{phash:016x}_{content}{ext}")
+        key = (junction_id, violation_type)
+        now = time.monotonic()
+
+        with self._lock:
+            self.stats["frames"] += 1
+            self.stats["encode_s"] += encode_s
+            while self._recent and now - self._recent[0][0] > self.window_s:
+                self._recent.popleft()
+            if os.path.exists(path):
+                self.stats["exact_duplicates"] += 1
+                return path, "exact"
+            for _, seen_key, seen_hash, seen_path in reversed(self._recent if bbox is not None else ()):
+                if seen_key == key and hamming(seen_hash, phash) <= self.max_distance:
+                    self.stats["near_duplicates"] += 1
+                    return seen_path, "near"
+            self._recent.append((now, key, phash, path))
+
+        try:
+            os.makedirs(self.storage_dir, exist_ok=True)
+            write_atomic(path, data)
+        except OSError:
+            with self._lock:
+                self.stats["errors"] += 1
+                self._recent = deque(entry for entry in self._recent if entry[3] != path)
+            raise
+        with self._lock:
+            self.stats["written"] += 1
+            self.stats["bytes_written"] += len(data)
+        return path, None
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        frames = stats["frames"]
+        duplicates = stats["exact_duplicates"] + stats["near_duplicates"]
+        return {**stats, "format": self.fmt, "processes": self.processes,
+                "bytes_per_s": round(stats["bytes_written"] / elapsed, 1),
+                "dedupe_ratio": round(duplicates / frames, 3) if frames else 0.0,
+                "encode_avg_ms": round(stats["encode_s"] / frames * 1000, 2) if frames else 0.0}